@@ -1,9 +1,11 @@
 # cli.py
 import os
+import sys
 import readline
 
 import pyfiglet
 from .commands import commands, get_mininet_macs, TEST_MODE, handle_help
+from .script import run_script, EXIT_SCRIPT_ERROR
 
 
 def setup_autocomplete():
@@ -38,5 +40,23 @@ def run_cli():
             print("\nUse 'exit' to quit.")
 
 
+def run_scripted(script, as_json=False, jobs=8):
+    """
+    Runs the commands of a script file ("-" for stdin) without any prompt.
+    Returns the process exit status.
+    """
+    hosts_mac = get_mininet_macs()
+    if not hosts_mac:
+        print("No MAC addresses found. Make sure Mininet is running.", file=sys.stderr)
+        return EXIT_SCRIPT_ERROR
+
+    if script == "-":
+        lines = sys.stdin.readlines()
+    else:
+        with open(script, "r") as f:
+            lines = f.readlines()
+    return run_script(lines, hosts_mac, as_json=as_json, jobs=jobs)
+
+
 if __name__ == "__main__":
     run_cli()
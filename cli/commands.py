@@ -2,10 +2,7 @@
 import os
 import json
 import asyncio
-import sys
-import time
 import websockets
-import psutil
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -53,39 +50,70 @@ async def send_ws_controller_request(data):
         response = await websocket.recv()
         return json.loads(response)
 
+async def mininet_exec(host, command, no_output=False, on_output=None):
+    """
+    Runs a command on a Mininet host through the Mininet WebSocket server.
+    Every output line is passed to on_output (if given) as soon as it is streamed.
+    The command fails if it exits with a non-zero status.
+    Returns:
+        tuple: (ok, output lines, error reason, exit status or None if the command was
+        launched without waiting or could not be run)
+    """
+    lines = []
+
+    def emit(line):
+        lines.append(line)
+        if on_output:
+            on_output(line)
+
+    try:
+        async with websockets.connect(WS_SERVER_MININET_URI) as websocket:
+            await websocket.send(json.dumps({
+                "command": "exec",
+                "host": host,
+                "cmd": command,
+                "no_output": no_output
+            }))
+
+            while True:
+                response = await websocket.recv()
+                data = json.loads(response)
+
+                if data.get("status") == "stream":
+                    emit(data.get("output"))
+                elif data.get("status") == "done":
+                    emit(data.get("output"))
+                    returncode = data.get("returncode")
+                    if returncode:
+                        return False, lines, f"Exited with status {returncode}", returncode
+                    return True, lines, None, returncode
+                elif data.get("status") == "error":
+                    return False, lines, data.get("reason"), None
+    except Exception as e:
+        return False, lines, f"Connection failed: {e}", None
+
+async def mininet_link(node1, node2, status):
+    """
+    Brings the link between two Mininet nodes down or up through the Mininet WebSocket server.
+    Returns:
+        tuple: (ok, time of the change, error reason)
+    """
+    try:
+        async with websockets.connect(WS_SERVER_MININET_URI) as websocket:
+            await websocket.send(json.dumps({"command": "link", "node1": node1, "node2": node2, "status": status}))
+            data = json.loads(await websocket.recv())
+    except Exception as e:
+        return False, None, f"Connection failed: {e}"
+    if data.get("status") != "done":
+        return False, None, data.get("reason")
+    return True, data.get("time"), None
+
 def send_mininet_exec_command(host, command, no_output=False):
     async def _send_and_stream():
-        try: 
-            async with websockets.connect(WS_SERVER_MININET_URI) as websocket:
-                await websocket.send(json.dumps({
-                    "command": "exec",
-                    "host": host,
-                    "cmd": command,
-                    "no_output": no_output
-                }))
-                
-                if no_output:
-                    response = await websocket.recv()
-                    data = json.loads(response)
-                    print(data.get("output"))
-                    return
-                
-                while True:
-                    response = await websocket.recv()
-                    data = json.loads(response)
-
-                    if data.get("status") == "stream":
-                        print(data.get("output"), flush=True)
-                    elif data.get("status") == "done":
-                        print(data.get("output"), flush=True)
-                        break
-                    elif data.get("status") == "error":
-                        print(f"Error executing command: {data.get('reason')}")
-                        break
-        except Exception as e:
-            print(f"❌ Connection failed: {e}")
-        finally:
-            await asyncio.sleep(0.1)
+        ok, _, reason, _ = await mininet_exec(host, command, no_output, on_output=lambda line: print(line, flush=True))
+        if not ok:
+            print(f"❌ Error executing command: {reason}")
+        await asyncio.sleep(0.1)
     run_async(_send_and_stream())
 
 def send_websocket_allocate_request(src, dst, bandwidth=8):
@@ -154,75 +182,28 @@ def handle_ping(hosts_mac):
         print(f"Pinging {dst['name']} from {src['name']}...")
         send_mininet_exec_command(src['name'], f"ping -c 2 {dst['ip']}")
 
-def show_progress(duration):
-    print("\nRunning iperf test:")
-    for i in range(duration):
-        print(f"[{i + 1}/{duration}] seconds", end="\r", flush=True)
-        time.sleep(1)
-    print("\nTest completed. Generating plot...\n")
-
-def show_progress_with_cpu(duration):
-    print("\nRunning iperf test with system monitoring:\n")
-    for i in range(duration):
-        cpu = psutil.cpu_percent(interval=0.9)
-        sys.stdout.write(f"\r[{i + 1}/{duration}] sec | CPU Usage: {cpu:.1f}%   ")
-        sys.stdout.flush()
-    print("\nTest completed. Generating plot...\n")
-
-def generate_plot():
-    # Call one script if the test is in slicing mode, otherwise call a different script
-    if TEST_MODE == "slicing":
-        os.system("python3 graph_mesh_slice.py")
-    elif TEST_MODE == "basic":
-        os.system("python3 graph_mesh_basic.py")
-    else:
-        print("Invalid TEST_MODE. Please set it to 'slicing' or 'basic'.")
-    return
-
-def iperf_test(hosts_mac):
-    if TEST_MODE == "slicing":
-        iperf_test_slice(hosts_mac)
-    elif TEST_MODE == "basic":
-        iperf_test_basic(hosts_mac)
-    else:
-        print("Invalid TEST_MODE. Please set it to 'slicing' or 'basic'.")
+def generate_plot(run_dir):
+    from .report import generate_report
+
+    summary = generate_report(run_dir)
+    for flow in summary["flows"]:
+        print(f"  {flow['name']:<20} mean {flow['mean'] or 0:.2f} Mbps (requested {flow['requested']})")
+    print(f"Report saved as {os.path.join(run_dir, 'report.html')}")
+
+def iperf_test(hosts_mac, scenario=None):
+    from .scenario import run_scenario, default_scenario
+
+    if scenario is None:
+        if TEST_MODE not in ("slicing", "basic"):
+            print("Invalid TEST_MODE. Please set it to 'slicing' or 'basic'.")
+            return None
+        scenario = default_scenario(TEST_MODE)
 
-def iperf_test_slice(hosts_mac):
-    os.makedirs("netbench", exist_ok=True)
-    
-    test_duration = 120
-    sample_interval = 5
-    
-    # kill any existing iperf processes
-    send_mininet_exec_command("h2", "pkill iperf")
-    send_mininet_exec_command("h3", "pkill iperf")
-    
-    send_mininet_exec_command("h2", f"iperf -u -s -b 6M -i {sample_interval} > netbench/h2_server_slice.txt", no_output=True)
-    send_mininet_exec_command("h3", f"iperf -u -s -b 4M -i {sample_interval} > netbench/h3_server_slice.txt", no_output=True)
-    send_mininet_exec_command("h1", f"iperf -c {hosts_mac['h2']['ip']} -u -b 6M -t {test_duration}", no_output=True)
-    send_mininet_exec_command("h4", f"iperf -c {hosts_mac['h3']['ip']} -u -b 4M -t {test_duration}", no_output=True)
-    show_progress_with_cpu(test_duration + 5)
-    # show_progress(test_duration)
-    generate_plot()
-
-def iperf_test_basic(hosts_mac):
     os.makedirs("netbench", exist_ok=True)
-    
-    test_duration = 120
-    sample_interval = 5
-    
-    send_mininet_exec_command("h2", "pkill iperf")
-    send_mininet_exec_command("h3", "pkill iperf")
-    send_mininet_exec_command("h5", "pkill iperf")
-    
-    send_mininet_exec_command("h2", f"iperf -u -s -b 6M -i {sample_interval} > netbench/h2_server_basic.txt", no_output=True)
-    send_mininet_exec_command("h3", f"iperf -u -s -b 4M -i {sample_interval} > netbench/h3_server_basic.txt", no_output=True)
-    send_mininet_exec_command("h5", f"iperf -u -s -b 4M -i {sample_interval} > netbench/h5_server_basic.txt", no_output=True)
-    send_mininet_exec_command("h1", f"iperf -c {hosts_mac['h2']['ip']} -u -b 6M -t {test_duration}", no_output=True)
-    send_mininet_exec_command("h4", f"iperf -c {hosts_mac['h3']['ip']} -u -b 4M -t {test_duration}", no_output=True)
-    send_mininet_exec_command("h6", f"iperf -c {hosts_mac['h5']['ip']} -u -b 4M -t {test_duration}", no_output=True)
-    show_progress(test_duration + 5)
-    generate_plot()
+    run_dir = run_scenario(scenario, hosts_mac)
+    print("\nTest completed. Generating report...\n")
+    generate_plot(run_dir)
+    return run_dir
 
 def clear_screen():
     os.system("clear" if os.name == "posix" else "cls")
@@ -239,7 +220,7 @@ commands = {
     "dump": {"description": "Dump flows from a switch", "handler": handle_dump},
     "show": {"description": "Show flow reservation table", "handler": lambda _: send_websocket_show_reservation_request()},
     "ping": {"description": "Ping between two hosts", "handler": handle_ping},
-    "iperf": {"description": "Run iperf based on TEST_MODE", "handler": iperf_test},
+    "iperf": {"description": "Run the iperf scenario of TEST_MODE", "handler": iperf_test},
     "help": {"description": "Show this help menu", "handler": handle_help},
     "clear": {"description": "Clear the screen", "handler": lambda _: clear_screen()},
     "exit": {"description": "Exit the CLI", "handler": lambda _: exit()}
@@ -0,0 +1,335 @@
+# loadgen.py
+import os
+import json
+import time
+import re
+import random
+import asyncio
+import argparse
+from datetime import datetime
+
+import websockets
+
+from .commands import WS_SERVER_CONTROLLER_URI, get_mininet_macs
+
+# Upper bounds (ms) of the latency histogram buckets, the last one catches everything else
+LATENCY_BUCKETS_MS = [0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float("inf")]
+
+# Attempts to reopen a pooled connection after a connection error, backing off exponentially from RECONNECT_BACKOFF_S
+RECONNECT_ATTEMPTS = 3
+RECONNECT_BACKOFF_S = 0.2
+
+MAC_RE = re.compile(r"^([0-9a-fA-F]{2}:){5}[0-9a-fA-F]{2}$")
+
+
+def parse_bandwidth_mix(mix):
+    """
+    Parses a bandwidth mix such as "2:0.3,4:0.5,6:0.2" into ([2, 4, 6], [0.3, 0.5, 0.2]).
+    Weights do not need to sum to 1.
+    """
+    bandwidths, weights = [], []
+    for item in mix.split(","):
+        bw, _, weight = item.partition(":")
+        bandwidths.append(float(bw) if "." in bw else int(bw))
+        weights.append(float(weight) if weight else 1.0)
+    return bandwidths, weights
+
+
+def synthesize_trace(hosts_mac, duration, rate, holding_mean, holding_alpha, bw_mix, show_ratio=0.0, seed=None):
+    """
+    Generates an allocate/delete/show trace.
+    Allocations arrive as a Poisson process of the given rate (requests/s) and hold the
+    bandwidth for a Pareto distributed time with the given mean, after which a delete is issued.
+    A host pair is never allocated twice while it still holds a reservation.
+    Args:
+        hosts_mac (dict): Host info as returned by get_mininet_macs()
+        duration (float): Length of the trace in seconds
+        rate (float): Mean allocation arrival rate (requests/s)
+        holding_mean (float): Mean holding time in seconds
+        holding_alpha (float): Pareto shape parameter (must be > 1)
+        bw_mix (str): Bandwidth mix, see parse_bandwidth_mix()
+        show_ratio (float): Probability of issuing a show_reservation alongside an arrival
+        seed (int): Optional seed for reproducible traces
+    Returns:
+        list: Events sorted by time, each one a dict with "t" and the controller request fields
+    """
+    rng = random.Random(seed)
+    bandwidths, weights = parse_bandwidth_mix(bw_mix)
+    # Scale of a Pareto distribution with the requested mean
+    holding_scale = holding_mean * (holding_alpha - 1) / holding_alpha
+
+    hosts = sorted(hosts_mac)
+    pairs = [(src, dst) for src in hosts for dst in hosts if src != dst]
+    busy_until = {}
+
+    events = []
+    t = rng.expovariate(rate)
+    while t < duration:
+        free_pairs = [pair for pair in pairs if busy_until.get(pair, 0) <= t]
+        if free_pairs:
+            src, dst = rng.choice(free_pairs)
+            bandwidth = rng.choices(bandwidths, weights)[0]
+            holding = holding_scale * rng.paretovariate(holding_alpha)
+            busy_until[(src, dst)] = t + holding
+            events.append({"t": t, "command": "allocate_flow", "src": src, "dst": dst, "bandwidth": bandwidth})
+            events.append({"t": t + holding, "command": "delete_flow", "src": src, "dst": dst})
+        if rng.random() < show_ratio:
+            events.append({"t": t, "command": "show_reservation"})
+        t += rng.expovariate(rate)
+
+    events.sort(key=lambda event: event["t"])
+    return events
+
+
+def load_trace(trace_file):
+    """
+    Reads a JSON lines trace, one event per line with a "t" offset in seconds.
+    Lines without "t" are spread one second apart, in file order.
+    """
+    events = []
+    with open(trace_file, "r") as f:
+        for i, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            event = json.loads(line)
+            event.setdefault("t", float(i))
+            events.append(event)
+    events.sort(key=lambda event: event["t"])
+    return events
+
+
+def save_trace(events, trace_file):
+    with open(trace_file, "w") as f:
+        for event in events:
+            f.write(json.dumps(event) + "\n")
+
+
+def to_request(event, hosts_mac):
+    """
+    Converts a trace event into a controller request, resolving host names into MAC addresses.
+    Raises:
+        ValueError: If the event has no command, or names a host which is neither known nor a MAC address
+    """
+    if "command" not in event:
+        raise ValueError("missing command")
+    request = {k: v for k, v in event.items() if k != "t"}
+    for field in ("src", "dst"):
+        host = request.get(field)
+        if host in hosts_mac:
+            request[field] = hosts_mac[host]["mac"]
+        elif host is not None and not MAC_RE.match(str(host)):
+            raise ValueError(f"unknown host {host}")
+    return request
+
+
+class LatencyStats:
+    """
+    Accumulates per-command latencies and outcomes.
+    Requests which got no response (connection errors) and events which could not be turned
+    into a request (bad requests) are counted apart and have no latency.
+    """
+
+    def __init__(self):
+        self.latencies = {}
+        self.success = {}
+        self.errors = {}
+        self.connection_errors = {}
+        self.bad_requests = {}
+
+    def record(self, command, latency, ok, reason=None):
+        self.latencies.setdefault(command, []).append(latency)
+        self.success[command] = self.success.get(command, 0) + (1 if ok else 0)
+        if not ok:
+            reasons = self.errors.setdefault(command, {})
+            reasons[reason] = reasons.get(reason, 0) + 1
+
+    def record_connection_error(self, command, reason):
+        reasons = self.connection_errors.setdefault(command, {})
+        reasons[reason] = reasons.get(reason, 0) + 1
+
+    def record_bad_request(self, command, reason):
+        reasons = self.bad_requests.setdefault(command, {})
+        reasons[reason] = reasons.get(reason, 0) + 1
+
+    def summary(self):
+        result = {}
+        for command in {**self.latencies, **self.connection_errors, **self.bad_requests}:
+            ordered = sorted(self.latencies.get(command, []))
+            success = self.success.get(command, 0)
+            connection_errors = sum(self.connection_errors.get(command, {}).values())
+            bad_requests = sum(self.bad_requests.get(command, {}).values())
+            histogram = [0] * len(LATENCY_BUCKETS_MS)
+            bucket = 0
+            for latency in ordered:
+                while latency > LATENCY_BUCKETS_MS[bucket]:
+                    bucket += 1
+                histogram[bucket] += 1
+
+            def percentile(p):
+                return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+            result[command] = {
+                "count": len(ordered),
+                "success": success,
+                "success_ratio": success / (len(ordered) + connection_errors + bad_requests),
+                "errors": self.errors.get(command, {}),
+                "connection_errors": connection_errors,
+                "connection_error_reasons": self.connection_errors.get(command, {}),
+                "bad_requests": bad_requests,
+                "bad_request_reasons": self.bad_requests.get(command, {}),
+                "latency_ms": {
+                    "min": ordered[0],
+                    "mean": sum(ordered) / len(ordered),
+                    "p50": percentile(50),
+                    "p95": percentile(95),
+                    "p99": percentile(99),
+                    "max": ordered[-1],
+                } if ordered else None,
+                "histogram": [
+                    {"le": "inf" if bound == float("inf") else bound, "count": count}
+                    for bound, count in zip(LATENCY_BUCKETS_MS, histogram)
+                ],
+            }
+        return result
+
+
+async def connect(attempts=RECONNECT_ATTEMPTS, backoff=RECONNECT_BACKOFF_S):
+    """
+    Opens a connection to the controller WebSocket API, retrying with exponential backoff.
+    Returns:
+        The connection, or None if every attempt failed
+    """
+    for attempt in range(attempts):
+        try:
+            return await websockets.connect(WS_SERVER_CONTROLLER_URI)
+        except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException):
+            if attempt < attempts - 1:
+                await asyncio.sleep(backoff * 2 ** attempt)
+    return None
+
+
+async def replay(events, hosts_mac, connections, speedup=1.0):
+    """
+    Replays the events against the controller WebSocket API.
+    Requests are spread over a pool of persistent connections, each event is sent at its
+    scheduled time (divided by speedup) as soon as a connection is free.
+    A connection which fails (or can't be opened at all) is closed and its pool slot left empty
+    (None), to be reopened by the next request taking it; requests are counted as connection
+    errors while it can't be. Events which can't be turned into a request are counted as bad
+    requests and leave their connection in the pool.
+    Returns:
+        tuple: (LatencyStats, number of events sent late by more than 100 ms, wall time in seconds)
+    """
+    pool = asyncio.Queue()
+    for _ in range(connections):
+        pool.put_nowait(await connect())
+
+    stats = LatencyStats()
+    late = 0
+    start = time.perf_counter()
+
+    async def send(event):
+        nonlocal late
+        delay = start + event["t"] / speedup - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        try:
+            request = to_request(event, hosts_mac)
+        except ValueError as e:
+            stats.record_bad_request(event.get("command"), f"bad request: {e}")
+            return
+        websocket = await pool.get()
+        try:
+            if websocket is None:
+                websocket = await connect()
+                if websocket is None:
+                    stats.record_connection_error(event.get("command"), "connection error: controller unreachable")
+                    return
+            if time.perf_counter() - (start + event["t"] / speedup) > 0.1:
+                late += 1
+            sent = time.perf_counter()
+            await websocket.send(json.dumps(request))
+            response = json.loads(await websocket.recv())
+            latency = (time.perf_counter() - sent) * 1000
+            ok = response.get("status") == "success"
+            stats.record(request["command"], latency, ok, response.get("reason"))
+        except Exception as e:
+            stats.record_connection_error(event.get("command"), f"connection error: {e}")
+            await websocket.close()
+            websocket = None
+        finally:
+            pool.put_nowait(websocket)
+
+    try:
+        await asyncio.gather(*(send(event) for event in events))
+    finally:
+        while not pool.empty():
+            websocket = pool.get_nowait()
+            if websocket is not None:
+                await websocket.close()
+
+    return stats, late, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Allocate/delete/show load generator for the flow allocator WebSocket API")
+    parser.add_argument("--trace", help="JSON lines trace to replay instead of synthesizing one")
+    parser.add_argument("--save-trace", help="Write the (synthesized) trace to this file")
+    parser.add_argument("--duration", type=float, default=60, help="Synthetic trace length in seconds")
+    parser.add_argument("--rate", type=float, default=5, help="Allocation arrival rate (requests/s)")
+    parser.add_argument("--holding-mean", type=float, default=10, help="Mean holding time in seconds")
+    parser.add_argument("--holding-alpha", type=float, default=1.5, help="Pareto shape of the holding time")
+    parser.add_argument("--bw-mix", default="2:0.4,4:0.4,6:0.2", help="Bandwidth mix as bw:weight,...")
+    parser.add_argument("--show-ratio", type=float, default=0.1, help="Fraction of arrivals followed by a show")
+    parser.add_argument("--seed", type=int, help="Seed for the synthetic trace")
+    parser.add_argument("--connections", type=int, default=8, help="Number of concurrent WebSocket connections")
+    parser.add_argument("--speedup", type=float, default=1.0, help="Replay the trace this many times faster")
+    parser.add_argument("--output", help="Results file (default: netbench/loadgen_<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    hosts_mac = get_mininet_macs()
+    if args.trace:
+        events = load_trace(args.trace)
+    else:
+        if not hosts_mac:
+            print("No MAC addresses found. Make sure Mininet is running.")
+            return 1
+        events = synthesize_trace(hosts_mac, args.duration, args.rate, args.holding_mean,
+                                  args.holding_alpha, args.bw_mix, args.show_ratio, args.seed)
+    if args.save_trace:
+        save_trace(events, args.save_trace)
+        print(f"Trace saved as {args.save_trace}")
+
+    print(f"Replaying {len(events)} requests over {args.connections} connections...")
+    stats, late, elapsed = asyncio.run(replay(events, hosts_mac, args.connections, args.speedup))
+
+    results = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "parameters": vars(args),
+        "requests": len(events),
+        "late_requests": late,
+        "elapsed_s": elapsed,
+        "achieved_rate": len(events) / elapsed if elapsed else 0,
+        "commands": stats.summary(),
+    }
+
+    output = args.output
+    if not output:
+        os.makedirs("netbench", exist_ok=True)
+        output = f"netbench/loadgen_{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    with open(output, "w") as f:
+        json.dump(results, f, indent=4)
+
+    for command, summary in results["commands"].items():
+        latency = summary["latency_ms"]
+        line = f"  {command:<18} {summary['count']:>6} req  {summary['success_ratio'] * 100:6.1f}% ok"
+        if latency:
+            line += f"  p50 {latency['p50']:.2f} ms  p99 {latency['p99']:.2f} ms"
+        if summary["connection_errors"]:
+            line += f"  {summary['connection_errors']} connection errors"
+        if summary["bad_requests"]:
+            line += f"  {summary['bad_requests']} bad requests"
+        print(line)
+    print(f"Results saved as {output}")
+    return 0
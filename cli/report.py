@@ -0,0 +1,273 @@
+# report.py
+import os
+import sys
+import html
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from .results import align_flows, load_flows, load_run
+
+# A sample meets the SLA if it reaches the requested bandwidth minus this tolerance
+SLA_TOLERANCE = 0.05
+FLOW_COLORS = ["g", "b", "orange", "r", "c", "m", "y", "tab:brown", "tab:pink", "tab:gray"]
+
+
+def requested_bandwidth(flow, reservations):
+    """
+    Returns the bandwidth (Mbps) a flow is expected to get: its reservation when the controller
+    holds one, otherwise the bandwidth reserved by the scenario, otherwise its sending rate.
+    """
+    meta = flow.meta
+    key = f"{meta.get('src_mac')}->{meta.get('dst_mac')}"
+    if reservations and key in reservations:
+        return float(reservations[key]["bandwidth"])
+    for field in ("reserve", "rate_mbps"):
+        if meta.get(field) is not None:
+            return float(meta[field])
+    return None
+
+
+def flow_summary(flow, throughput, requested):
+    """
+    Per-flow statistics over the aligned throughput samples (Mbps).
+    """
+    samples = throughput[~np.isnan(throughput)]
+    summary = {
+        "name": flow.name,
+        "src": flow.meta.get("src"),
+        "dst": flow.meta.get("dst"),
+        "samples": int(samples.size),
+        "requested": requested,
+        "mean": None,
+        "p5": None,
+        "p95": None,
+        "sla_compliance": None,
+        "loss_pct": None,
+        "jitter_ms": None,
+    }
+    if samples.size:
+        p5, p95 = np.percentile(samples, [5, 95])
+        summary.update(mean=float(samples.mean()), p5=float(p5), p95=float(p95))
+        if requested:
+            summary["sla_compliance"] = float(np.mean(samples >= requested * (1 - SLA_TOLERANCE)))
+    packets = np.nansum(flow.packets)
+    if packets:
+        summary["loss_pct"] = float(100 * np.nansum(flow.lost) / packets)
+    if not np.all(np.isnan(flow.jitter_ms)):
+        summary["jitter_ms"] = float(np.nanmean(flow.jitter_ms))
+    return summary
+
+
+def total_summary(total, capacity):
+    samples = total[~np.isnan(total)]
+    summary = {"capacity": capacity, "mean": None, "p95": None, "utilization": None, "over_capacity": None}
+    if samples.size:
+        summary.update(mean=float(samples.mean()), p95=float(np.percentile(samples, 95)))
+        if capacity:
+            summary["utilization"] = float(samples.mean() / capacity)
+            summary["over_capacity"] = float(np.mean(samples > capacity))
+    return summary
+
+
+def plot_throughput(grid, throughput, flows, requested, total, capacity, title, filenames):
+    """
+    Renders the throughput of every flow, the total and the reference lines with the Agg backend.
+    """
+    figure = Figure(figsize=(10, 6))
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot(111)
+    markers = ["o", "s", "^", "D", "v", "P", "X", "*"]
+
+    for i, flow in enumerate(flows):
+        color = FLOW_COLORS[i % len(FLOW_COLORS)]
+        src, dst = flow.meta.get("src"), flow.meta.get("dst")
+        label = f"{src} → {dst}" if src else flow.name
+        if requested[i]:
+            pair = f"{src}-{dst}" if src else flow.name
+            label += f" ({requested[i]:g}M requested)"
+            ax.axhline(y=requested[i], color=color, linestyle="--", label=f"Requested BW {pair} ({requested[i]:g}M)")
+        ax.plot(grid, throughput[i], color=color, label=label, marker=markers[i % len(markers)])
+
+    ax.plot(grid, total, label="Total Throughput", color="black")
+    if capacity:
+        ax.axhline(y=capacity, color="black", linestyle="--", label=f"Link Capacity ({capacity:g}M)")
+
+    ax.set_title(title)
+    ax.set_xlabel("Time (s)")
+    ax.set_ylabel("Throughput (Mbps)")
+    ax.legend()
+    ax.grid(True)
+    figure.tight_layout()
+    for filename in filenames:
+        figure.savefig(filename)
+
+
+def _fmt(value, pattern="{:.2f}"):
+    return "-" if value is None else pattern.format(value)
+
+
+def _pct(ratio):
+    return "-" if ratio is None else f"{100 * ratio:.1f}%"
+
+
+def write_html(filename, title, flows, total, images):
+    rows = "\n".join(
+        "<tr>" + "".join(f"<td>{html.escape(str(cell))}</td>" for cell in (
+            flow["name"],
+            f"{flow['src'] or '-'} → {flow['dst'] or '-'}",
+            _fmt(flow["requested"], "{:g}"),
+            _fmt(flow["mean"]),
+            _fmt(flow["p5"]),
+            _fmt(flow["p95"]),
+            _pct(flow["sla_compliance"]),
+            _fmt(flow["loss_pct"], "{:.2f}%"),
+            _fmt(flow["jitter_ms"], "{:.3f}"),
+        )) + "</tr>"
+        for flow in flows
+    )
+    # One image is enough, prefer the vector one
+    image = next((image for image in images if image.endswith(".svg")), images[0] if images else None)
+    figure = f'<img src="{html.escape(os.path.basename(image))}" alt="throughput">' if image else ""
+    document = f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{html.escape(title)}</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+table {{ border-collapse: collapse; margin-bottom: 1.5em; }}
+th, td {{ border: 1px solid #ccc; padding: 4px 10px; text-align: right; }}
+th {{ background: #eee; }}
+img {{ max-width: 100%; }}
+</style>
+</head>
+<body>
+<h1>{html.escape(title)}</h1>
+<h2>Flows</h2>
+<table>
+<tr><th>Flow</th><th>Hosts</th><th>Requested (Mbps)</th><th>Mean (Mbps)</th><th>p5</th><th>p95</th>
+<th>SLA compliance</th><th>Loss</th><th>Jitter (ms)</th></tr>
+{rows}
+</table>
+<h2>Total</h2>
+<table>
+<tr><th>Capacity (Mbps)</th><th>Mean (Mbps)</th><th>p95</th><th>Utilization</th><th>Time over capacity</th></tr>
+<tr><td>{_fmt(total["capacity"], "{:g}")}</td><td>{_fmt(total["mean"])}</td><td>{_fmt(total["p95"])}</td>
+<td>{_pct(total["utilization"])}</td><td>{_pct(total["over_capacity"])}</td></tr>
+</table>
+<p>SLA compliance: share of the samples reaching the requested bandwidth (minus {SLA_TOLERANCE:.0%}).</p>
+{figure}
+</body>
+</html>
+"""
+    with open(filename, "w") as f:
+        f.write(document)
+
+
+def generate_report(run_dir, flow_names=None, requested=None, capacity=None, title=None, formats=("png", "svg")):
+    """
+    Builds the report of a run directory: throughput plots, summary.json and report.html.
+    Args:
+        run_dir (str): Scenario run directory, or a directory of iperf reports
+        flow_names (list): Flows to include, required when the directory has no run.json
+        requested (list): Requested bandwidth (Mbps) of each flow, overriding the run data
+        capacity (float): Link capacity (Mbps) for the total throughput
+        title (str): Plot title, derived from the run mode by default
+        formats (tuple): Image formats to render
+    Returns:
+        dict: The report summary
+    """
+    run = {}
+    run_file = os.path.join(run_dir, "run.json")
+    if os.path.exists(run_file):
+        with open(run_file) as f:
+            run = json.load(f)
+    if flow_names:
+        flows = load_flows(run_dir, flow_names)
+    elif run:
+        flows = load_run(run_dir)
+    else:
+        raise ValueError(f"{run_dir} is not a scenario run, the flows to report must be given")
+
+    reservations = run.get("reservations")
+    requested = list(requested) if requested else [requested_bandwidth(flow, reservations) for flow in flows]
+    if capacity is None:
+        capacity = run.get("capacity")
+    if title is None:
+        mode = run.get("mode")
+        title = "UDP Throughput Over Time" + {
+            "slicing": " (Congested Link with Slicing)",
+            "basic": " (Congested Link without Slicing)",
+        }.get(mode, "")
+
+    grid, throughput = align_flows(flows)
+    throughput = throughput / 1e6
+    total = np.where(np.all(np.isnan(throughput), axis=0), np.nan, np.nansum(throughput, axis=0))
+
+    flow_summaries = [flow_summary(flow, throughput[i], requested[i]) for i, flow in enumerate(flows)]
+    summary = {
+        "run": run.get("name", os.path.basename(os.path.normpath(run_dir))),
+        "mode": run.get("mode"),
+        "title": title,
+        "flows": flow_summaries,
+        "total": total_summary(total, capacity),
+    }
+
+    images = [os.path.join(run_dir, f"throughput.{extension}") for extension in formats]
+    plot_throughput(grid, throughput, flows, requested, total, capacity, title, images)
+    write_html(os.path.join(run_dir, "report.html"), title, flow_summaries, summary["total"], images)
+    with open(os.path.join(run_dir, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=4)
+    return summary
+
+
+def _report_job(args):
+    run_dir, options = args
+    try:
+        generate_report(run_dir, **options)
+        return run_dir, None
+    except Exception as e:
+        return run_dir, str(e)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Throughput report of netbench runs")
+    parser.add_argument("runs", nargs="+", help="Scenario run directories (or directories of iperf reports)")
+    parser.add_argument("--flows", nargs="+", help="Flows to report (file names without extension)")
+    parser.add_argument("--requested", nargs="+", type=float, help="Requested bandwidth (Mbps) of each flow")
+    parser.add_argument("--capacity", type=float, help="Link capacity (Mbps)")
+    parser.add_argument("--title", help="Plot title")
+    parser.add_argument("--formats", nargs="+", default=["png", "svg"], help="Image formats")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="Runs reported in parallel")
+    args = parser.parse_args(argv)
+
+    if args.requested and args.flows and len(args.requested) != len(args.flows):
+        parser.error("--requested needs one value per flow")
+
+    options = {
+        "flow_names": args.flows,
+        "requested": args.requested,
+        "capacity": args.capacity,
+        "title": args.title,
+        "formats": tuple(args.formats),
+    }
+    jobs = [(run_dir, options) for run_dir in args.runs]
+    if len(jobs) == 1 or args.jobs == 1:
+        outcomes = list(map(_report_job, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            outcomes = list(pool.map(_report_job, jobs))
+
+    failed = 0
+    for run_dir, error in outcomes:
+        if error:
+            failed += 1
+            print(f"Report failed for {run_dir}: {error}", file=sys.stderr)
+        else:
+            print(f"Report saved as {os.path.join(run_dir, 'report.html')}")
+    return 1 if failed else 0
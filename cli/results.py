@@ -0,0 +1,341 @@
+# results.py
+import os
+import re
+import csv
+import json
+from datetime import datetime
+
+import numpy as np
+
+# Columns of a flow series, one value per report interval
+COLUMNS = ("start", "end", "bytes", "bps", "jitter_ms", "lost", "packets", "timestamp")
+# Fields of run.json flows kept as flow series metadata
+FLOW_META = ("src", "dst", "src_mac", "dst_mac", "protocol", "rate_mbps", "reserve")
+# Extensions of the flow files, in order of preference
+FLOW_EXTENSIONS = (".npz", ".csv", ".json", ".txt")
+# Columns counting events over the interval, added up (rather than averaged) when intervals are merged
+ADDITIVE_COLUMNS = ("bytes", "lost", "packets")
+# Stream of the iperf 2 reports summing up parallel streams ([SUM], transfer ID -1 in CSV)
+SUM_STREAM = -1
+# Errors of a server report which can't be parsed, e.g. left empty or truncated by a killed server
+REPORT_ERRORS = (ValueError, KeyError, IndexError, TypeError, OSError)
+
+
+class FlowSeries:
+    """
+    Per-interval measurements of a single flow as columnar NumPy arrays.
+    `start`/`end` are relative to the start of the flow, `offset` is the start of the flow
+    relative to the start of the run (so `offset + start` puts flows on a common time axis).
+    Missing values (e.g. jitter of a TCP flow) are NaN.
+    """
+
+    def __init__(self, name, columns, offset=0.0, meta=None):
+        self.name = name
+        self.columns = {column: np.asarray(columns.get(column, []), dtype=np.float64) for column in COLUMNS}
+        size = len(self.columns["start"])
+        for column, values in self.columns.items():
+            if len(values) != size:
+                self.columns[column] = np.full(size, np.nan)
+        self.offset = float(offset)
+        self.meta = meta or {}
+
+    def __len__(self):
+        return len(self.columns["start"])
+
+    def __getattr__(self, column):
+        columns = self.__dict__.get("columns", {})
+        if column in columns:
+            return columns[column]
+        raise AttributeError(column)
+
+    @property
+    def mbps(self):
+        return self.columns["bps"] / 1e6
+
+    @property
+    def time(self):
+        """Interval midpoints on the run time axis."""
+        return self.offset + (self.columns["start"] + self.columns["end"]) / 2
+
+
+def _merge_streams(rows):
+    # Parallel streams reporting the same interval: counts and rates add up
+    merged = []
+    for column, values in zip(COLUMNS, zip(*rows)):
+        values = [value for value in values if not np.isnan(value)]
+        if not values:
+            merged.append(np.nan)
+        elif column in ADDITIVE_COLUMNS or column == "bps":
+            merged.append(sum(values))
+        elif column == "timestamp":
+            merged.append(max(values))
+        else:
+            merged.append(sum(values) / len(values))
+    return tuple(merged)
+
+
+def _from_rows(rows):
+    """
+    Builds the columns from (stream, start, end, bytes, bps, jitter, lost, packets, timestamp) rows.
+    The final report of a stream is a summary over the whole transfer, told apart from its interval
+    reports by starting again at the first start of the stream; summary rows are dropped. Parallel
+    streams are merged per interval, from their [SUM] rows when the report has them.
+    """
+    starts, ends, intervals = {}, {}, {}
+    for stream, *row in rows:
+        start, end = row[0], row[1]
+        if start in starts.setdefault(stream, set()) and end >= ends[stream] - 1e-6:
+            continue
+        starts[stream].add(start)
+        ends[stream] = max(ends.get(stream, end), end)
+        intervals.setdefault((start, end), []).append((stream, tuple(row)))
+    kept = []
+    for interval in sorted(intervals):
+        streams = intervals[interval]
+        sums = [row for stream, row in streams if stream == SUM_STREAM]
+        kept.append(sums[0] if sums else _merge_streams([row for _, row in streams]))
+    if not kept:
+        return {column: [] for column in COLUMNS}
+    return dict(zip(COLUMNS, (list(values) for values in zip(*kept))))
+
+
+def _csv_timestamp(value):
+    # iperf 2 prints YYYYMMDDHHMMSS, newer releases add milliseconds (YYYYMMDDHHMMSS.sss)
+    try:
+        whole, _, fraction = value.partition(".")
+        return datetime.strptime(whole, "%Y%m%d%H%M%S").timestamp() + float(f"0.{fraction or 0}")
+    except ValueError:
+        return np.nan
+
+
+def parse_iperf2_csv(filename):
+    """
+    Parses the report of an iperf 2 run with `-y C`.
+    UDP server reports carry jitter, lost and total datagrams after the bandwidth column.
+    """
+    rows = []
+    with open(filename, newline="") as f:
+        for record in csv.reader(f):
+            if len(record) < 9:
+                continue
+            try:
+                stream = int(record[5])
+                start, end = (float(value) for value in record[6].split("-"))
+                transferred = float(record[7])
+                bps = float(record[8])
+            except ValueError:
+                continue
+            jitter = lost = packets = np.nan
+            if len(record) >= 12:
+                jitter, lost, packets = float(record[9]), float(record[10]), float(record[11])
+            rows.append((stream, start, end, transferred, bps, jitter, lost, packets, _csv_timestamp(record[0])))
+    return _from_rows(rows)
+
+
+def parse_iperf3_json(filename):
+    """
+    Parses the report of an iperf 3 run with `-J`.
+    """
+    with open(filename) as f:
+        data = json.load(f)
+    base = data.get("start", {}).get("timestamp", {}).get("timesecs", np.nan)
+    rows = []
+    for interval in data.get("intervals", []):
+        # The sum of an iperf 3 interval already covers its parallel streams
+        summary = interval["sum"]
+        rows.append((
+            None,
+            summary["start"],
+            summary["end"],
+            summary["bytes"],
+            summary["bits_per_second"],
+            summary.get("jitter_ms", np.nan),
+            summary.get("lost_packets", np.nan),
+            summary.get("packets", np.nan),
+            base + summary["end"],
+        ))
+    return _from_rows(rows)
+
+
+_TEXT_REPORT = re.compile(
+    r"\[\s*(\d+|SUM)\]\s+(\d+\.\d+)-\s*(\d+\.\d+)\s+sec\s+([\d.]+)\s+(\w)?Bytes\s+([\d.]+)\s+(\w)?bits/sec"
+    r"(?:\s+([\d.]+)\s+ms\s+(\d+)/\s*(\d+))?"
+)
+_UNITS = {None: 1, "K": 1e3, "M": 1e6, "G": 1e9}
+
+
+def parse_iperf2_text(filename):
+    """
+    Parses the human readable report of an iperf 2 run (logs of the runs made before CSV output).
+    """
+    rows = []
+    with open(filename) as f:
+        for line in f:
+            match = _TEXT_REPORT.search(line)
+            if not match:
+                continue
+            stream, start, end, transferred, transferred_unit, bps, bps_unit, jitter, lost, packets = match.groups()
+            rows.append((
+                SUM_STREAM if stream == "SUM" else int(stream),
+                float(start),
+                float(end),
+                float(transferred) * (1024 ** " KMG".index(transferred_unit) if transferred_unit else 1),
+                float(bps) * _UNITS[bps_unit],
+                float(jitter) if jitter else np.nan,
+                float(lost) if lost else np.nan,
+                float(packets) if packets else np.nan,
+                np.nan,
+            ))
+    return _from_rows(rows)
+
+
+def save_flow(filename, series):
+    """
+    Stores a flow series as a compressed .npz file (one array per column plus the metadata).
+    """
+    np.savez_compressed(
+        filename,
+        offset=series.offset,
+        meta=json.dumps(dict(series.meta, name=series.name)),
+        **series.columns,
+    )
+
+
+def load_flow(filename, name=None, offset=0.0, meta=None):
+    """
+    Loads a flow series from a .npz store or from an iperf report (.csv, .json or legacy .txt).
+    """
+    if name is None:
+        name = os.path.splitext(os.path.basename(filename))[0]
+    extension = os.path.splitext(filename)[1]
+    if extension == ".npz":
+        with np.load(filename) as data:
+            stored_meta = json.loads(str(data["meta"]))
+            return FlowSeries(stored_meta.pop("name", name), {column: data[column] for column in COLUMNS},
+                              float(data["offset"]), stored_meta)
+    parsers = {".csv": parse_iperf2_csv, ".json": parse_iperf3_json, ".txt": parse_iperf2_text}
+    if extension not in parsers:
+        raise ValueError(f"unsupported flow file '{filename}'")
+    return FlowSeries(name, parsers[extension](filename), offset, meta)
+
+
+def find_flow_file(directory, name):
+    """
+    Returns the preferred file holding the flow `name` in `directory`.
+    """
+    for extension in FLOW_EXTENSIONS:
+        filename = os.path.join(directory, name + extension)
+        if os.path.exists(filename):
+            return filename
+    raise FileNotFoundError(f"no results for flow '{name}' in {directory}")
+
+
+def ingest_run(run_dir):
+    """
+    Converts the server reports of a scenario run into .npz flow stores and records them in run.json.
+    A report which can't be parsed is skipped, its error is recorded as "data_error" of the flow.
+    Returns:
+        list: The ingested FlowSeries
+    """
+    run_file = os.path.join(run_dir, "run.json")
+    with open(run_file) as f:
+        run = json.load(f)
+
+    flows = []
+    for flow in run["flows"]:
+        report = os.path.join(run_dir, flow["server_log"])
+        if not os.path.exists(report):
+            continue
+        meta = {key: flow.get(key) for key in FLOW_META}
+        flow.pop("data", None)
+        try:
+            series = load_flow(report, flow["name"], flow.get("started_at", 0.0), meta)
+        except REPORT_ERRORS as e:
+            flow["data_error"] = f"{flow['server_log']}: {e}"
+            print(f"Unreadable report for {flow['name']}: {flow['data_error']}")
+            continue
+        flow.pop("data_error", None)
+        flow["data"] = f"{flow['name']}.npz"
+        save_flow(os.path.join(run_dir, flow["data"]), series)
+        flows.append(series)
+
+    with open(run_file, "w") as f:
+        json.dump(run, f, indent=4)
+    return flows
+
+
+def load_run(run_dir):
+    """
+    Loads every flow of a scenario run, in scenario order.
+    Flows without results (no report, or one which could not be ingested) are left out.
+    """
+    with open(os.path.join(run_dir, "run.json")) as f:
+        run = json.load(f)
+    flows = []
+    for flow in run["flows"]:
+        if flow.get("data"):
+            filename = os.path.join(run_dir, flow["data"])
+        elif flow.get("data_error"):
+            continue
+        else:
+            try:
+                filename = find_flow_file(run_dir, flow["name"])
+            except FileNotFoundError:
+                continue
+        meta = {key: flow.get(key) for key in FLOW_META}
+        flows.append(load_flow(filename, flow["name"], flow.get("started_at", 0.0), meta))
+    return flows
+
+
+def load_flows(directory, names):
+    """
+    Loads the named flows from a scenario run directory, or from a plain directory of iperf reports.
+    """
+    if os.path.exists(os.path.join(directory, "run.json")):
+        flows = {flow.name: flow for flow in load_run(directory)}
+        missing = [name for name in names if name not in flows]
+        if missing:
+            raise FileNotFoundError(f"no results for flows {', '.join(missing)} in {directory}")
+        return [flows[name] for name in names]
+    return [load_flow(find_flow_file(directory, name)) for name in names]
+
+
+def align_flows(flows, step=None, column="bps"):
+    """
+    Resamples any number of flows on a common time grid.
+    Each interval is assigned to the grid slot containing its midpoint (on the run time axis).
+    The samples of a flow falling in the same slot are averaged, or added up for the counting
+    columns (ADDITIVE_COLUMNS). Slots without a sample are NaN, so flows of different lengths or
+    start offsets are kept whole.
+    Args:
+        flows (list): FlowSeries to merge
+        step (float): Grid step in seconds, defaults to the median report interval
+        column (str): Column to resample
+    Returns:
+        tuple: (slot midpoints, array of shape (len(flows), slots))
+    """
+    times = [flow.time for flow in flows if len(flow)]
+    if not times:
+        return np.empty(0), np.empty((len(flows), 0))
+    if step is None:
+        step = float(np.median(np.concatenate([flow.end - flow.start for flow in flows if len(flow)])))
+    origin = min(float(t.min()) for t in times)
+    origin = step * np.floor(origin / step)
+    slots = int(np.floor((max(float(t.max()) for t in times) - origin) / step)) + 1
+
+    aligned = np.full((len(flows), slots), np.nan)
+    for i, flow in enumerate(flows):
+        if not len(flow):
+            continue
+        values = flow.columns[column]
+        sampled = ~np.isnan(values)
+        index = np.floor((flow.time[sampled] - origin) / step).astype(int)
+        total = np.zeros(slots)
+        count = np.zeros(slots)
+        np.add.at(total, index, values[sampled])
+        np.add.at(count, index, 1)
+        if column not in ADDITIVE_COLUMNS:
+            total /= np.maximum(count, 1)
+        aligned[i] = np.where(count > 0, total, np.nan)
+    grid = origin + step * (np.arange(slots) + 0.5)
+    return grid, aligned
@@ -0,0 +1,309 @@
+# scenario.py
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+from datetime import datetime
+
+import yaml
+import psutil
+
+from .commands import mininet_exec, send_ws_controller_request, run_async
+from .results import ingest_run
+
+# The path policies are the controller's own (path_finder.PATH_POLICIES)
+CONTROLLER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              "comnetsemu_dependencies", "ryu-v4.34", "ryu", "ryu", "app")
+sys.path.insert(0, CONTROLLER_DIR)
+from path_finder import PATH_POLICIES  # noqa: E402
+
+SCENARIO_DIR = "scenarios"
+IPERF_BASE_PORT = 5001
+# Time given to the servers to start listening before the clients start
+SERVER_SETTLE_TIME = 1
+
+
+def parse_rate(rate):
+    """
+    Converts an iperf rate ("6M", "500K", "1G", 6) into Mbps.
+    """
+    match = re.fullmatch(r"\s*([\d.]+)\s*([KMG]?)\s*", str(rate), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"invalid rate '{rate}'")
+    scale = {"": 1e-6, "K": 1e-3, "M": 1, "G": 1e3}[match.group(2).upper()]
+    return float(match.group(1)) * scale
+
+
+def check_seconds(value, what, positive=False):
+    """
+    Checks a time field of the scenario, in seconds.
+    Raises:
+        ValueError: If it is missing (null), not a number, negative or (when positive) zero
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value != value:
+        raise ValueError(f"{what}: expected a number of seconds, got {value!r}")
+    if value < 0 or (positive and value == 0):
+        expected = "positive" if positive else "non-negative"
+        raise ValueError(f"{what}: expected a {expected} number of seconds, got {value}")
+    return value
+
+
+def load_scenario(path, hosts_mac=None):
+    """
+    Loads and validates a YAML scenario.
+    The scenario defines the default `duration` and report `interval`, the `mode` (slicing or basic),
+    the `tool` (iperf or iperf3), the bottleneck `capacity` (Mbps, used by the report) and a list of
+    `flows`, each one with `src`, `dst` and optionally `name`, `protocol` (udp/tcp), `rate`, `duration`
+    (seconds), `start` (offset in seconds), `reserve` (Mbps to allocate before starting), `slice`
+    (slice of the reservation), `rate_limiter` (queue/meter, how the reservation is enforced), `priority`
+    (priority class of the reservation), `admission` (reject/preempt, when the reservation finds no capacity),
+    `path_policy` (how the path of the reservation is chosen) and `max_delay` (bound of its path delay, ms).
+    `slices` optionally lists the slices to create before the reservations, each one with `name`, `guaranteed`
+    (Mbps), `hosts` and optionally `tenant`, `max_rate`, `priority` and `rate_limiter`.
+    Returns:
+        dict: The scenario with every flow field filled in
+    """
+    with open(path, "r") as f:
+        spec = yaml.safe_load(f) or {}
+
+    spec.setdefault("name", os.path.splitext(os.path.basename(path))[0])
+    spec.setdefault("mode", "slicing")
+    spec.setdefault("duration", 120)
+    spec.setdefault("interval", 5)
+    spec.setdefault("tool", "iperf")
+    spec.setdefault("capacity", None)
+    if spec["tool"] not in ("iperf", "iperf3"):
+        raise ValueError(f"invalid tool '{spec['tool']}', expected 'iperf' or 'iperf3'")
+    if spec["mode"] not in ("slicing", "basic"):
+        raise ValueError(f"invalid mode '{spec['mode']}', expected 'slicing' or 'basic'")
+    check_seconds(spec["duration"], "duration", positive=True)
+
+    flows = spec.get("flows") or []
+    if not flows:
+        raise ValueError("the scenario does not define any flow")
+
+    names = set()
+    for i, flow in enumerate(flows):
+        for field in ("src", "dst"):
+            if field not in flow:
+                raise ValueError(f"flow {i + 1}: missing '{field}'")
+            if hosts_mac is not None and flow[field] not in hosts_mac:
+                raise ValueError(f"flow {i + 1}: unknown host '{flow[field]}'")
+        flow.setdefault("name", f"{flow['src']}_{flow['dst']}_{i + 1}")
+        flow.setdefault("protocol", "udp")
+        flow.setdefault("rate", None)
+        flow.setdefault("duration", spec["duration"])
+        flow.setdefault("start", 0)
+        flow.setdefault("reserve", None)
+        flow.setdefault("slice", None)
+        flow.setdefault("rate_limiter", None)
+        flow.setdefault("priority", 0)
+        flow.setdefault("admission", None)
+        flow.setdefault("path_policy", None)
+        flow.setdefault("max_delay", None)
+        flow["port"] = IPERF_BASE_PORT + i
+        check_seconds(flow["start"], f"flow {i + 1}: start")
+        check_seconds(flow["duration"], f"flow {i + 1}: duration", positive=True)
+        if flow["rate_limiter"] not in (None, "queue", "meter"):
+            raise ValueError(f"flow {i + 1}: invalid rate limiter '{flow['rate_limiter']}'")
+        if flow["admission"] not in (None, "reject", "preempt"):
+            raise ValueError(f"flow {i + 1}: invalid admission '{flow['admission']}'")
+        if flow["path_policy"] not in (None,) + PATH_POLICIES:
+            raise ValueError(f"flow {i + 1}: invalid path policy '{flow['path_policy']}'")
+        if flow["protocol"] not in ("udp", "tcp"):
+            raise ValueError(f"flow {i + 1}: invalid protocol '{flow['protocol']}'")
+        if flow["name"] in names:
+            raise ValueError(f"flow {i + 1}: duplicated name '{flow['name']}'")
+        names.add(flow["name"])
+        flow["rate_mbps"] = parse_rate(flow["rate"]) if flow["rate"] is not None else None
+
+    slices = spec.get("slices") or []
+    for i, network_slice in enumerate(slices):
+        for field in ("name", "guaranteed", "hosts"):
+            if field not in network_slice:
+                raise ValueError(f"slice {i + 1}: missing '{field}'")
+        for host in network_slice["hosts"]:
+            if hosts_mac is not None and host not in hosts_mac:
+                raise ValueError(f"slice {i + 1}: unknown host '{host}'")
+        network_slice.setdefault("tenant", network_slice["name"])
+        for field in ("guaranteed", "max_rate"):
+            # Plain numbers are Mbps, like `reserve`
+            if isinstance(network_slice.get(field), str):
+                network_slice[field] = parse_rate(network_slice[field])
+
+    spec["flows"] = flows
+    spec["slices"] = slices
+    return spec
+
+
+def default_scenario(test_mode):
+    return os.path.join(SCENARIO_DIR, f"{test_mode}.yaml")
+
+
+def server_log(flow, tool):
+    # iperf 2 writes CSV reports (-y C), iperf 3 a JSON document (-J)
+    return f"{flow['name']}.csv" if tool == "iperf" else f"{flow['name']}.json"
+
+
+def server_command(flow, interval, log_file, tool="iperf"):
+    if tool == "iperf3":
+        # -1: the server exits after serving its client
+        return f"iperf3 -s -1 -p {flow['port']} -i {interval} -J > {log_file} 2>/dev/null"
+    udp = " -u" if flow["protocol"] == "udp" else ""
+    return f"iperf -s{udp} -p {flow['port']} -i {interval} -y C > {log_file} 2>/dev/null"
+
+
+def client_command(flow, dst_ip, interval, tool="iperf"):
+    udp = " -u" if flow["protocol"] == "udp" else ""
+    rate = f" -b {flow['rate']}" if flow["rate"] is not None else ""
+    return f"{tool} -c {dst_ip}{udp}{rate} -p {flow['port']} -t {flow['duration']} -i {interval}"
+
+
+async def _create_slice(network_slice, hosts_mac):
+    request = dict(network_slice, command="create_slice", hosts=[hosts_mac[host]["mac"] for host in network_slice["hosts"]])
+    response = await send_ws_controller_request(request)
+    if response.get("status") != "success":
+        # Left over by a previous run, bring it to the scenario rates
+        response = await send_ws_controller_request(dict(request, command="resize_slice"))
+    ok = response.get("status") == "success"
+    return ok, None if ok else response.get("reason", "Unknown error")
+
+
+async def _reserve(flow, hosts_mac):
+    response = await send_ws_controller_request({
+        "command": "allocate_flow",
+        "src": hosts_mac[flow["src"]]["mac"],
+        "dst": hosts_mac[flow["dst"]]["mac"],
+        "bandwidth": flow["reserve"],
+        "slice": flow["slice"],
+        "rate_limiter": flow["rate_limiter"],
+        "priority": flow["priority"],
+        "admission": flow["admission"],
+        "path_policy": flow["path_policy"],
+        "max_delay": flow["max_delay"],
+    })
+    ok = response.get("status") == "success"
+    return ok, None if ok else response.get("reason", "Unknown error")
+
+
+async def _show_progress(expected, done):
+    start = time.perf_counter()
+    while not done.is_set():
+        elapsed = time.perf_counter() - start
+        cpu = psutil.cpu_percent(interval=None)
+        sys.stdout.write(f"\r[{elapsed:5.0f}/{expected:.0f}] sec | CPU Usage: {cpu:.1f}%   ")
+        sys.stdout.flush()
+        try:
+            await asyncio.wait_for(done.wait(), timeout=1)
+        except asyncio.TimeoutError:
+            pass
+    print()
+
+
+async def run_scenario_async(spec, hosts_mac, output_root="netbench", progress=True):
+    """
+    Runs a scenario: starts every iperf server at once, then every client at its start offset,
+    and waits for all the clients to exit. Server and client outputs and a run.json describing
+    the run are written to a new directory under output_root.
+    Returns:
+        str: The run directory
+    """
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    run_dir = os.path.abspath(os.path.join(output_root, f"{spec['name']}_{timestamp}"))
+    os.makedirs(run_dir, exist_ok=True)
+    flows = spec["flows"]
+    interval = spec["interval"]
+    tool = spec["tool"]
+
+    # Kill any existing iperf process on the involved hosts
+    hosts = sorted({flow["src"] for flow in flows} | {flow["dst"] for flow in flows})
+    await asyncio.gather(*(mininet_exec(host, f"pkill {tool}") for host in hosts))
+
+    for network_slice in spec["slices"]:
+        ok, reason = await _create_slice(network_slice, hosts_mac)
+        if not ok:
+            print(f"Slice creation failed for {network_slice['name']}: {reason}")
+
+    for flow in flows:
+        if flow["reserve"] is not None:
+            flow["reserved"], flow["reserve_error"] = await _reserve(flow, hosts_mac)
+            if not flow["reserved"]:
+                print(f"Reservation failed for {flow['name']}: {flow['reserve_error']}")
+
+    for flow in flows:
+        flow["server_log"] = server_log(flow, tool)
+        flow["client_log"] = f"{flow['name']}_client.txt"
+    await asyncio.gather(*(
+        mininet_exec(flow["dst"], server_command(flow, interval, os.path.join(run_dir, flow["server_log"]), tool), no_output=True)
+        for flow in flows
+    ))
+    await asyncio.sleep(SERVER_SETTLE_TIME)
+
+    run_start = time.time()
+
+    async def run_client(flow):
+        await asyncio.sleep(flow["start"])
+        flow["started_at"] = time.time() - run_start
+        ok, lines, reason, returncode = await mininet_exec(
+            flow["src"], client_command(flow, hosts_mac[flow["dst"]]["ip"], interval, tool))
+        flow["finished_at"] = time.time() - run_start
+        flow["client_ok"] = ok
+        flow["client_error"] = reason
+        flow["client_returncode"] = returncode
+        with open(os.path.join(run_dir, flow["client_log"]), "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+    done = asyncio.Event()
+    expected = max(flow["start"] + flow["duration"] for flow in flows)
+    progress_task = asyncio.ensure_future(_show_progress(expected, done)) if progress else None
+    try:
+        await asyncio.gather(*(run_client(flow) for flow in flows))
+    finally:
+        done.set()
+        if progress_task:
+            await progress_task
+
+    # Leave the servers one report interval to write their final report
+    await asyncio.sleep(interval)
+    await asyncio.gather(*(mininet_exec(host, f"pkill {tool}") for host in sorted({flow["dst"] for flow in flows})))
+
+    try:
+        response = await send_ws_controller_request({"command": "show_reservation"})
+        reservations = response.get("result") if response.get("status") == "success" else None
+    except Exception:
+        reservations = None
+
+    run = {
+        "name": spec["name"],
+        "mode": spec["mode"],
+        "timestamp": timestamp,
+        "interval": interval,
+        "tool": tool,
+        "duration": spec["duration"],
+        "capacity": spec["capacity"],
+        "slices": spec["slices"],
+        "wall_time": time.time() - run_start,
+        "flows": [
+            dict(flow,
+                 src_ip=hosts_mac[flow["src"]]["ip"], dst_ip=hosts_mac[flow["dst"]]["ip"],
+                 src_mac=hosts_mac[flow["src"]]["mac"], dst_mac=hosts_mac[flow["dst"]]["mac"])
+            for flow in flows
+        ],
+        "reservations": reservations,
+    }
+    with open(os.path.join(run_dir, "run.json"), "w") as f:
+        json.dump(run, f, indent=4)
+
+    # Store the server reports as columnar flow series next to the raw reports
+    ingest_run(run_dir)
+    return run_dir
+
+
+def run_scenario(path, hosts_mac, output_root="netbench", progress=True):
+    spec = load_scenario(path, hosts_mac)
+    print(f"\nRunning scenario '{spec['name']}' ({len(spec['flows'])} flows, mode {spec['mode']})")
+    run_dir = run_async(run_scenario_async(spec, hosts_mac, output_root, progress))
+    print(f"Scenario completed, results saved in {run_dir}")
+    return run_dir
@@ -0,0 +1,368 @@
+# script.py
+import os
+import re
+import sys
+import json
+import time
+import shlex
+import asyncio
+import contextlib
+
+import yaml
+
+from .commands import (
+    TEST_MODE,
+    mininet_exec,
+    mininet_link,
+    run_async,
+    send_ws_controller_request,
+)
+from .scenario import default_scenario, load_scenario, run_scenario
+
+# Exit status of a scripted run
+EXIT_OK = 0
+EXIT_COMMAND_FAILED = 1
+EXIT_SCRIPT_ERROR = 2
+# How long `link ... down` waits for the controller to report the recovery, and how often it asks
+RECOVERY_TIMEOUT = 10  # seconds
+RECOVERY_POLL_INTERVAL = 0.05  # seconds
+
+
+class ScriptError(Exception):
+    pass
+
+
+class ScriptCommand:
+    """
+    A parsed script line.
+    Commands on disjoint hosts are independent and may run concurrently, barrier commands
+    wait for everything before them and block everything after them.
+    """
+
+    def __init__(self, line_no, text, name, args, hosts=(), barrier=False):
+        self.line_no = line_no
+        self.text = text
+        self.name = name
+        self.args = args
+        self.hosts = set(hosts)
+        self.barrier = barrier
+
+
+def _check_hosts(hosts_mac, *hosts):
+    for host in hosts:
+        if host not in hosts_mac:
+            raise ScriptError(f"unknown host '{host}'")
+    if len(hosts) == 2 and hosts[0] == hosts[1]:
+        raise ScriptError("the source and destination hosts must be different")
+
+
+def parse_line(line_no, text, hosts_mac):
+    """
+    Parses one script line, returns None for blank lines and comments.
+    Supported commands:
+        allocate SRC DST [BANDWIDTH] [SLICE]
+        book SRC DST BANDWIDTH DELAY DURATION
+        delete SRC DST
+        ping SRC DST
+        dump SWITCH
+        show
+        occupancy
+        bookings
+        link SWITCH1 SWITCH2 down|up
+        iperf [SCENARIO]
+        sleep SECONDS
+        wait
+    """
+    tokens = shlex.split(text, comments=True)
+    if not tokens:
+        return None
+    name, args = tokens[0].lower(), tokens[1:]
+
+    if name == "allocate":
+        if len(args) not in (2, 3, 4):
+            raise ScriptError("usage: allocate SRC DST [BANDWIDTH] [SLICE]")
+        _check_hosts(hosts_mac, args[0], args[1])
+        if len(args) >= 3:
+            try:
+                float(args[2])
+            except ValueError:
+                raise ScriptError(f"invalid bandwidth '{args[2]}'")
+        return ScriptCommand(line_no, text, name, args, hosts=args[:2])
+    if name == "book":
+        if len(args) != 5:
+            raise ScriptError("usage: book SRC DST BANDWIDTH DELAY DURATION")
+        _check_hosts(hosts_mac, args[0], args[1])
+        for field, value in zip(("bandwidth", "delay", "duration"), args[2:]):
+            try:
+                float(value)
+            except ValueError:
+                raise ScriptError(f"invalid {field} '{value}'")
+        return ScriptCommand(line_no, text, name, args, hosts=args[:2])
+    if name in ("delete", "ping"):
+        if len(args) != 2:
+            raise ScriptError(f"usage: {name} SRC DST")
+        _check_hosts(hosts_mac, args[0], args[1])
+        return ScriptCommand(line_no, text, name, args, hosts=args)
+    if name == "dump":
+        if len(args) != 1:
+            raise ScriptError("usage: dump SWITCH")
+        return ScriptCommand(line_no, text, name, args)
+    if name == "link":
+        if len(args) != 3 or args[2].lower() not in ("down", "up"):
+            raise ScriptError("usage: link SWITCH1 SWITCH2 down|up")
+        for switch in args[:2]:
+            if not re.fullmatch(r"s\d+", switch):
+                raise ScriptError(f"invalid switch '{switch}'")
+        return ScriptCommand(line_no, text, name, [args[0], args[1], args[2].lower()], barrier=True)
+    if name == "sleep":
+        if len(args) != 1:
+            raise ScriptError("usage: sleep SECONDS")
+        try:
+            float(args[0])
+        except ValueError:
+            raise ScriptError(f"invalid duration '{args[0]}'")
+        return ScriptCommand(line_no, text, name, args, barrier=True)
+    if name == "iperf":
+        if len(args) > 1:
+            raise ScriptError("usage: iperf [SCENARIO]")
+        if not args and TEST_MODE not in ("slicing", "basic"):
+            raise ScriptError(f"invalid TEST_MODE '{TEST_MODE}'")
+        scenario = args[0] if args else default_scenario(TEST_MODE)
+        try:
+            load_scenario(scenario, hosts_mac)
+        except (OSError, ValueError, yaml.YAMLError) as e:
+            raise ScriptError(f"invalid scenario '{scenario}': {e}")
+        return ScriptCommand(line_no, text, name, [scenario], barrier=True)
+    if name in ("show", "occupancy", "bookings", "wait"):
+        if args:
+            raise ScriptError(f"usage: {name}")
+        return ScriptCommand(line_no, text, name, args, barrier=True)
+    raise ScriptError(f"unknown command '{name}'")
+
+
+def parse_script(lines, hosts_mac):
+    """
+    Parses all the script lines up front.
+    Returns:
+        tuple: (list of ScriptCommand, list of error dicts)
+    """
+    commands, errors = [], []
+    for line_no, text in enumerate(lines, start=1):
+        try:
+            command = parse_line(line_no, text.strip(), hosts_mac)
+        except (ScriptError, ValueError) as e:
+            errors.append({"line": line_no, "command": text.strip(), "reason": str(e)})
+            continue
+        if command:
+            commands.append(command)
+    return commands, errors
+
+
+def schedule(commands):
+    """
+    Groups consecutive commands into batches that can run concurrently:
+    a batch is closed by a barrier or by a command sharing a host with the batch.
+    """
+    batches, batch, busy_hosts = [], [], set()
+    for command in commands:
+        if command.barrier or command.hosts & busy_hosts:
+            if batch:
+                batches.append(batch)
+            batch, busy_hosts = [], set()
+        if command.barrier:
+            batches.append([command])
+            continue
+        batch.append(command)
+        busy_hosts |= command.hosts
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+async def _controller_command(data, success_key="result"):
+    response = await send_ws_controller_request(data)
+    if response.get("status") == "success":
+        return True, response.get(success_key), None
+    return False, None, response.get("reason", "Unknown error")
+
+
+async def _link(switch1, switch2, status):
+    """
+    Brings a switch link down or up. Once down, waits for the controller to move the reservations
+    crossing it and reports how long the failure took to be detected and recovered from.
+    """
+    ok, changed_at, reason = await mininet_link(switch1, switch2, status)
+    if not ok or status == "up":
+        return ok, None, reason
+
+    link = sorted(int(switch.lstrip("s")) for switch in (switch1, switch2))
+    deadline = time.time() + RECOVERY_TIMEOUT
+    while time.time() < deadline:
+        ok, recoveries, reason = await _controller_command({"command": "show_recoveries"})
+        if not ok:
+            return False, None, reason
+        for recovery in reversed(recoveries or []):
+            if link in recovery["links"] and recovery["recovered_at"] >= changed_at:
+                return True, {
+                    "detection_ms": round((recovery["detected_at"] - changed_at) * 1000, 3),
+                    "recovery_ms": round(recovery["recovery_time"] * 1000, 3),
+                    "total_ms": round((recovery["recovered_at"] - changed_at) * 1000, 3),
+                    "affected": recovery["affected"],
+                    **{outcome: len(recovery[outcome]) for outcome in ("kept", "backup", "rerouted", "released")},
+                }, None
+        await asyncio.sleep(RECOVERY_POLL_INTERVAL)
+    return False, None, f"No recovery reported within {RECOVERY_TIMEOUT} s"
+
+
+async def execute(command, hosts_mac):
+    """
+    Runs a single (non iperf) command.
+    Returns:
+        tuple: (ok, result, error reason)
+    """
+    name, args = command.name, command.args
+    if name == "allocate":
+        bandwidth = float(args[2]) if len(args) >= 3 else 8
+        bandwidth = int(bandwidth) if bandwidth.is_integer() else bandwidth
+        request = {
+            "command": "allocate_flow",
+            "src": hosts_mac[args[0]]["mac"],
+            "dst": hosts_mac[args[1]]["mac"],
+            "bandwidth": bandwidth,
+        }
+        if len(args) == 4:
+            request["slice"] = args[3]
+        return await _controller_command(request)
+    if name == "book":
+        return await _controller_command({
+            "command": "book_flow",
+            "src": hosts_mac[args[0]]["mac"],
+            "dst": hosts_mac[args[1]]["mac"],
+            "bandwidth": float(args[2]),
+            "delay": float(args[3]),
+            "duration": float(args[4]),
+        })
+    if name == "delete":
+        return await _controller_command({
+            "command": "delete_flow",
+            "src": hosts_mac[args[0]]["mac"],
+            "dst": hosts_mac[args[1]]["mac"],
+        })
+    if name == "show":
+        return await _controller_command({"command": "show_reservation"})
+    if name == "occupancy":
+        return await _controller_command({"command": "table_occupancy"})
+    if name == "bookings":
+        return await _controller_command({"command": "show_bookings"})
+    if name == "link":
+        return await _link(*args)
+    if name == "ping":
+        ok, lines, reason, returncode = await mininet_exec(args[0], f"ping -c 2 {hosts_mac[args[1]]['ip']}")
+        if not ok and returncode is None:
+            return False, lines, reason
+        loss = re.search(r"(\d+(?:\.\d+)?)% packet loss", "\n".join(lines))
+        if not loss or float(loss.group(1)) >= 100:
+            return False, lines, "Destination unreachable"
+        return True, lines, None
+    if name == "dump":
+        process = await asyncio.create_subprocess_exec(
+            "sudo", "ovs-ofctl", "-O", "OpenFlow13", "dump-flows", args[0],
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+        output, _ = await process.communicate()
+        output = output.decode("utf-8")
+        if process.returncode != 0:
+            return False, None, output.strip()
+        return True, output.splitlines(), None
+    if name == "sleep":
+        await asyncio.sleep(float(args[0]))
+        return True, None, None
+    if name == "wait":
+        return True, None, None
+    raise ScriptError(f"unknown command '{name}'")
+
+
+def run_batch(batch, hosts_mac, jobs):
+    semaphore = asyncio.Semaphore(jobs)
+
+    async def run_one(command):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                ok, result, reason = await execute(command, hosts_mac)
+            except Exception as e:
+                ok, result, reason = False, None, str(e)
+            return command, ok, result, reason, (time.perf_counter() - start) * 1000
+
+    async def run_all():
+        return await asyncio.gather(*(run_one(command) for command in batch))
+
+    return run_async(run_all())
+
+
+def run_iperf(command, hosts_mac, as_json):
+    start = time.perf_counter()
+    # Keep stdout clean for the JSON document
+    with contextlib.redirect_stdout(sys.stderr if as_json else sys.stdout):
+        try:
+            run_dir = run_scenario(command.args[0], hosts_mac, progress=False)
+            with open(os.path.join(run_dir, "run.json"), "r") as f:
+                failed = [flow["name"] for flow in json.load(f)["flows"] if not flow["client_ok"]]
+            ok, reason = not failed, f"iperf client failed: {', '.join(failed)}" if failed else None
+        except Exception as e:
+            run_dir, ok, reason = None, False, str(e)
+    return command, ok, run_dir, reason, (time.perf_counter() - start) * 1000
+
+
+def run_script(lines, hosts_mac, as_json=False, jobs=8):
+    """
+    Runs a whole script non-interactively.
+    Independent commands run concurrently (at most `jobs` at a time), results are printed
+    as they complete (text) or as a single document at the end (JSON).
+    Returns:
+        int: EXIT_OK if every command succeeded, EXIT_COMMAND_FAILED if at least one failed,
+             EXIT_SCRIPT_ERROR if the script could not be parsed (nothing is executed)
+    """
+    commands, errors = parse_script(lines, hosts_mac)
+    if errors:
+        if as_json:
+            print(json.dumps({"status": "error", "errors": errors}, indent=4))
+        else:
+            for error in errors:
+                print(f"line {error['line']}: {error['reason']}: {error['command']}", file=sys.stderr)
+        return EXIT_SCRIPT_ERROR
+
+    results = []
+    for batch in schedule(commands):
+        if batch[0].name == "iperf":
+            outcomes = [run_iperf(batch[0], hosts_mac, as_json)]
+        else:
+            outcomes = run_batch(batch, hosts_mac, jobs)
+        for command, ok, result, reason, elapsed in outcomes:
+            results.append({
+                "line": command.line_no,
+                "command": command.text,
+                "status": "success" if ok else "error",
+                "reason": reason,
+                "result": result,
+                "elapsed_ms": round(elapsed, 3),
+            })
+            if not as_json:
+                status = "OK " if ok else "ERR"
+                print(f"[{status}] line {command.line_no}: {command.text} ({elapsed:.1f} ms)"
+                      + (f" - {reason}" if reason else ""))
+                if ok and command.name in ("show", "occupancy", "bookings", "book", "link", "dump", "iperf") and result:
+                    if isinstance(result, dict):
+                        print(json.dumps(result, indent=4))
+                    else:
+                        print(result if isinstance(result, str) else "\n".join(result))
+
+    failed = sum(1 for result in results if result["status"] != "success")
+    if as_json:
+        print(json.dumps({
+            "status": "success" if not failed else "error",
+            "test_mode": TEST_MODE,
+            "commands": len(results),
+            "failed": failed,
+            "results": sorted(results, key=lambda result: result["line"]),
+        }, indent=4))
+    return EXIT_OK if not failed else EXIT_COMMAND_FAILED
@@ -0,0 +1,82 @@
+import bisect
+import math
+
+
+class CapacityCalendar:
+    def __init__(self):
+        """
+        Bandwidth booked on each link over time, for the reservations bounded in time.
+        The calendar of a link is a step function kept as two sorted lists: booked[i] is the bandwidth
+        booked from times[i] until times[i + 1] (until forever for the last step), the first step
+        starting at -inf. Booking or releasing a window and finding the peak of a window are
+        logarithmic in the number of steps plus linear in the steps covered by the window.
+        """
+        self.calendars = {}  # link -> (times, booked)
+
+    def __bool__(self):
+        return bool(self.calendars)
+
+    def _split(self, link, t):
+        # Index of the step starting at t, splitting the step containing t if needed
+        times, booked = self.calendars.setdefault(link, ([-math.inf], [0]))
+        i = bisect.bisect_right(times, t) - 1
+        if times[i] != t:
+            i += 1
+            times.insert(i, t)
+            booked.insert(i, booked[i - 1])
+        return i
+
+    def book(self, links, start, end, bandwidth):
+        """
+        Books the bandwidth on the links from start until end (seconds since the epoch, end may be inf).
+        """
+        for link in links:
+            i = self._split(link, start)
+            times, booked = self.calendars[link]
+            j = self._split(link, end) if end != math.inf else len(times)
+            for k in range(i, j):
+                booked[k] += bandwidth
+            self._merge(link, i, j)
+
+    def release(self, links, start, end, bandwidth):
+        """
+        Gives back a window booked with book().
+        """
+        self.book(links, start, end, -bandwidth)
+
+    def _merge(self, link, i, j):
+        # Merges the steps around [i, j] booking the same bandwidth, drops the link once nothing is booked
+        times, booked = self.calendars[link]
+        for k in range(min(j, len(times) - 1), max(i, 1) - 1, -1):
+            if abs(booked[k]) < 1e-9:
+                booked[k] = 0
+            if abs(booked[k] - booked[k - 1]) < 1e-9:
+                del times[k], booked[k]
+        if len(times) == 1 and not booked[0]:
+            del self.calendars[link]
+
+    def peak(self, link, start, end):
+        """
+        Returns the most bandwidth booked on a link at any time from start until end.
+        """
+        calendar = self.calendars.get(link)
+        if calendar is None:
+            return 0
+        times, booked = calendar
+        i = bisect.bisect_right(times, start) - 1
+        j = max(bisect.bisect_left(times, end), i + 1)
+        return max(booked[i:j])
+
+    def expire(self, now):
+        """
+        Forgets the steps ended before now.
+        """
+        for link, (times, booked) in list(self.calendars.items()):
+            i = bisect.bisect_right(times, now) - 1
+            if i > 0:
+                del times[1:i + 1], booked[:i]
+            if len(times) == 1 and not booked[0]:
+                del self.calendars[link]
+
+    def links(self):
+        return self.calendars.keys()
@@ -28,6 +28,7 @@ from ryu.ofproto import ofproto_v1_0
 
 class Cbench(app_manager.RyuApp):
     OFP_VERSIONS = [ofproto_v1_0.OFP_VERSION]
+    SHARDED = True
 
     def __init__(self, *args, **kwargs):
         super(Cbench, self).__init__(*args, **kwargs)
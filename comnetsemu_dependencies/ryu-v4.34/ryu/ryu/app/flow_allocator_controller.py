@@ -1,20 +1,75 @@
+import collections
+import heapq
+import itertools
 import json
 import logging
+import math
 import os
 import threading
 from ryu.base import app_manager
 from ryu.controller import ofp_event
 from ryu.controller.handler import MAIN_DISPATCHER, DEAD_DISPATCHER, CONFIG_DISPATCHER, set_ev_cls
 from ryu.ofproto import ofproto_v1_3
-from ryu.lib.packet import packet, ethernet, ether_types
+from ryu.lib.packet import header_view, ether_types
 from ryu.topology import event
-from ryu.topology.api import get_link
+from ryu.topology.api import get_topology_snapshot, TopologySnapshot
 from ryu.app.wsgi import WSGIApplication
+import ryu.app.stats.api  # noqa: F401, loads the stats service with the allocator
+from ryu.app.stats import event as stats_event
 from flow_allocator_handler_websocket import FlowWebSocketHandler
-from path_finder import PathFinder
+from path_finder import PathFinder, PATH_POLICIES
+from network_slice import NetworkSlice
+from capacity_calendar import CapacityCalendar
+from path_cache import PathCache
 import time
 
 RESERVATION_EXPIRE_TIME = 60  # seconds
+# Install the path rules when the flow is allocated instead of on its first PacketIn
+PROACTIVE_INSTALL = False
+# OpenFlow timeouts are 16 bits wide
+MAX_FLOW_TIMEOUT = 0xffff  # seconds
+# VLAN IDs used to tag slice traffic between the ingress and the egress switch
+SLICE_VLAN_IDS = range(1, 4095)
+# Tables of the slice pipeline: classification -> slice tagging -> forwarding -> QoS
+CLASSIFICATION_TABLE = 0
+SLICE_TAG_TABLE = 1
+FORWARDING_TABLE = 2
+QOS_TABLE = 3
+# Metadata bits carrying the slice tag from the classification to the slice tagging table
+SLICE_METADATA_MASK = 0xfff
+# Bandwidth enforcement: "queue" (OVS HTB queues on every hop) or "meter" (OpenFlow meter at the ingress switch)
+RATE_LIMITERS = ("queue", "meter")
+RATE_LIMITER = "queue"
+# Burst allowed by the meters, in seconds of traffic at the reserved rate
+METER_BURST = 0.1
+# Rate of the HTB root class of ports without a known capacity (host ports)
+DEFAULT_PORT_RATE = 1000  # Mbps
+# Admission of a reservation finding no path: "reject" it, or "preempt" lower priority reservations
+# (rerouting them when possible) to make room for it
+ADMISSION_MODES = ("reject", "preempt")
+ADMISSION_MODE = "reject"
+# Bounds of the preemption search: candidate paths, lower priority reservations considered on each
+# congested link, and time spent looking for a cheaper plan once one is found
+PREEMPTION_MAX_PATHS = 4
+PREEMPTION_MAX_CANDIDATES = 256
+PREEMPTION_TIME_BUDGET = 0.002  # seconds
+# Period of the activation and release of the reservations bounded in time
+CALENDAR_TICK = 1  # seconds
+# Protect the reservations with a backup path disjoint from their primary path: its rules are installed
+# with the primary ones, and the ingress switch forwards through a fast-failover group
+PROTECTION = False
+# Link failure recoveries kept for show_recoveries
+RECOVERY_HISTORY = 100
+# Path selection policy of the reservations not asking for one (see path_finder.PATH_POLICIES)
+PATH_POLICY = "widest"
+# Requests for the same switches, path policy and delay bound, with bandwidths in the same bucket, share
+# their admission decision in the path cache
+PATH_CACHE_BUCKET = 1  # Mbps
+PATH_CACHE_SIZE = 4096
+# The rules of the reverse direction of a reservation carry its cookie with this bit set, so that the
+# flow stats of a switch holding both directions tell them apart. The other bits are the reservation cookie
+REVERSE_COOKIE = 1 << 63
+RESERVATION_COOKIE_MASK = REVERSE_COOKIE - 1
 
 class FlowAllocator(app_manager.RyuApp):
     OFP_VERSIONS = [ofproto_v1_3.OFP_VERSION]
@@ -54,6 +109,10 @@ class FlowAllocator(app_manager.RyuApp):
         self.logger.info("Initializing FlowAllocator...")
         
         
+        # The WebSocket commands, the calendar and the reservation expiry run in their own threads,
+        # each one changes the reservations, capacities and calendar heaps under this lock
+        self.lock = threading.RLock()
+
         # Start the WebSocket server in a separate thread
         self.websocket_handler = FlowWebSocketHandler(flow_allocator=self, host="0.0.0.0", port=8765, logger=self.logger)
         threading.Thread(target=self.websocket_handler.start, daemon=True).start()
@@ -65,19 +124,69 @@ class FlowAllocator(app_manager.RyuApp):
         self.flow_reservations = {}
         
         self.links = {}  
+        self.topology = TopologySnapshot()  # links of the topology discovery as of the last delta applied
 
         self.datapaths = {}
         
         self.flow_capacity = {}
+        self.link_delay = {}  # link -> delay (ms) of the TCLink, for the latency aware path policies
         self._init_flow_capacity()
 
-        self.path_finder = PathFinder(self.flow_capacity, self.logger)
+        self.link_capacity = dict(self.flow_capacity)  # capacity of each link, flow_capacity is what is left of it
+
+        # Own copy of the capacities, where the failed links have none left
+        self.path_finder = PathFinder(dict(self.flow_capacity), self.logger)
+        # Admission decisions of the path finder, dropped when a link of their path changes
+        self.path_cache = PathCache(PATH_CACHE_BUCKET, PATH_CACHE_SIZE)
+        self.flow_mod_templates = {}  # whether the rule matches in_port -> OFPFlowModTemplate of the path rules
         
         # start a thread to periodically check for expired reservations
         threading.Thread(target=self._check_reservation_expiry, daemon=True).start()
                 
-        self.qos_queues = {}  # (dpid, port) -> {queue_id: bandwidth}
+        self.qos_queues = {}  # (dpid, port) -> {queue_id: {"min_rate", "max_rate", "priority", "owner"}}
         self.next_queue_id = 1  # start from 1 (0 is usually best-effort)
+
+        # Each reservation tags its rules with a cookie, so that OFPFlowRemoved can be mapped back to it
+        self.cookies = itertools.count(1)
+        self.cookie_to_reservation = {}  # cookie -> (src_mac, dst_mac)
+
+        # Reservations of a slice routed on the same path share a VLAN tag, the core switches forward on the tag
+        self.slice_paths = {}  # (slice, path) -> {"vid": int, "members": {(src_mac, dst_mac): {"in_port", "bandwidth"}}}
+
+        # Meters limiting the metered reservations at their ingress switch, one per direction
+        self.flow_meters = {}  # (cookie, src_mac) -> (dpid, meter_id)
+        self.meter_ids = {}  # dpid -> set of meter IDs in use
+
+        self.slices = {}  # name -> NetworkSlice
+
+        # Non slice reservations crossing each link (both directions), to pick the ones to preempt
+        # without scanning all the reservations
+        self.link_reservations = {}  # link -> {priority: set of (src_mac, dst_mac)}
+        self.link_priority_bandwidth = {}  # link -> {priority: bandwidth reserved}
+
+        # Reservations bounded in time (advance reservations and reservations with a lifetime) are booked
+        # in a per link capacity calendar, so that admission can check a whole time window
+        self.calendar = CapacityCalendar()
+        self.calendar_active = {}  # link -> bandwidth of the active bounded reservations (out of flow_capacity)
+        self.bookings = {}  # advance reservation ID -> advance reservation waiting for its window
+        self.booking_ids = itertools.count(1)
+        self.booking_starts = []  # heap of (start, advance reservation ID)
+        self.reservation_ends = []  # heap of (end, cookie) of the active bounded reservations
+        threading.Thread(target=self._run_calendar, daemon=True).start()
+
+        # Every reservation crossing each link (both directions, backup paths included), to find the
+        # reservations hit by a link failure without scanning all the reservations
+        self.link_flows = {}  # link -> set of (src_mac, dst_mac)
+        self.failed_links = set()  # links reported down, both directions
+        self.recoveries = collections.deque(maxlen=RECOVERY_HISTORY)
+
+        # Fast-failover groups of the protected reservations at their ingress switch, one per direction
+        self.flow_groups = {}  # (cookie, src_mac) -> (dpid, group_id)
+        self.group_ids = {}  # dpid -> set of group IDs in use
+
+        # Rates measured by the stats service (ryu.app.stats), which polls the switches for everyone
+        self.flow_rates = {}  # (src_mac, dst_mac) -> rate of the reservation rules at its first switch (Mbps)
+        self.link_load = {}  # link -> rate sent on the link (Mbps)
             
     def _init_host_to_switch(self):
         """
@@ -149,6 +258,10 @@ class FlowAllocator(app_manager.RyuApp):
             self.flow_capacity[(sw1_id, sw2_id)] = bw
             self.flow_capacity[(sw2_id, sw1_id)] = bw
 
+            delay = float(info.get("delay") or 0)
+            self.link_delay[(sw1_id, sw2_id)] = delay
+            self.link_delay[(sw2_id, sw1_id)] = delay
+
         self.logger.info(f"Flow capacities initialized: {self.flow_capacity}")
 
     @set_ev_cls(ofp_event.EventOFPStateChange, [MAIN_DISPATCHER, DEAD_DISPATCHER])
@@ -189,6 +302,8 @@ class FlowAllocator(app_manager.RyuApp):
         ----
         The default rule installed has the lowest priority (0) and matches all packets,
         sending them to the controller for processing.
+        It also sets up the slice pipeline: tagged packets skip classification and tagging,
+        and packets missing the QoS table leave with the actions written so far.
         """
         datapath = ev.msg.datapath
         dpid = datapath.id  # Datapath ID of the switch
@@ -201,7 +316,13 @@ class FlowAllocator(app_manager.RyuApp):
         actions = [parser.OFPActionOutput(ofproto.OFPP_CONTROLLER, ofproto.OFPCML_NO_BUFFER)]
         self.add_flow(datapath, 0, match, actions)
 
-    def add_flow(self, datapath, priority, match, actions):
+        # Slice pipeline
+        match = parser.OFPMatch(vlan_vid=(ofproto.OFPVID_PRESENT, ofproto.OFPVID_PRESENT))
+        self.add_flow(datapath, 1, match, None, instructions=[parser.OFPInstructionGotoTable(FORWARDING_TABLE)])
+        self.add_flow(datapath, 0, parser.OFPMatch(), None, table_id=QOS_TABLE, instructions=[])
+
+    def add_flow(self, datapath, priority, match, actions, idle_timeout=0, hard_timeout=0, cookie=0, flags=0,
+                 command=None, table_id=CLASSIFICATION_TABLE, instructions=None):
         """
         Add a flow entry to the OpenFlow switch.
         This method installs a flow rule in the switch's flow table using OpenFlow protocol.
@@ -211,31 +332,48 @@ class FlowAllocator(app_manager.RyuApp):
             priority: Integer indicating the priority of this flow rule
             match: Match object defining the packet match criteria
             actions: List of action objects defining what to do with matching packets
+            idle_timeout: Seconds without traffic after which the switch removes the rule (0: never)
+            hard_timeout: Seconds after which the switch removes the rule (0: never)
+            cookie: Opaque identifier of the rule
+            flags: OFPFF_* flags (e.g. OFPFF_SEND_FLOW_REM)
+            command: OFPFC_ADD by default, OFPFC_MODIFY_STRICT updates the actions of an existing rule
+                while keeping its timeouts and counters
+            table_id: Table of the rule
+            instructions: Instructions of the rule, replacing the default apply of `actions`
         """
         ofproto = datapath.ofproto
         parser = datapath.ofproto_parser
+        if command is None:
+            command = ofproto.OFPFC_ADD
         # Create flow mod message
-        inst = [parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS, actions)]
+        if instructions is None:
+            instructions = [parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS, actions)]
         mod = parser.OFPFlowMod(
-            datapath=datapath, priority=priority, match=match, instructions=inst
+            datapath=datapath, table_id=table_id, command=command, priority=priority, match=match,
+            instructions=instructions, idle_timeout=idle_timeout, hard_timeout=hard_timeout, cookie=cookie, flags=flags
         )
-        self.logger.debug(f"Adding flow: match={match}, actions={actions}")
+        if self.logger.isEnabledFor(logging.DEBUG):  # printing the match is slow
+            self.logger.debug(f"Adding flow: table={table_id}, match={match}, instructions={instructions}")
         datapath.send_msg(mod)
         self.logger.info(f"Flow added successfully.")
     
-    def _delete_flow(self, datapath, match):
+    def _delete_flow(self, datapath, match, priority=0, strict=False, table_id=CLASSIFICATION_TABLE, cookie=0,
+                     cookie_mask=0):
         ofproto = datapath.ofproto
         parser = datapath.ofproto_parser
         mod = parser.OFPFlowMod(
-            datapath=datapath, command=ofproto.OFPFC_DELETE, out_port=ofproto.OFPP_ANY, out_group=ofproto.OFPG_ANY,
-            match=match
+            datapath=datapath, table_id=table_id,
+            command=ofproto.OFPFC_DELETE_STRICT if strict else ofproto.OFPFC_DELETE,
+            priority=priority, out_port=ofproto.OFPP_ANY, out_group=ofproto.OFPG_ANY, match=match,
+            cookie=cookie, cookie_mask=cookie_mask
         )
-        self.logger.debug(f"Deleting flow: match={match}")
+        if self.logger.isEnabledFor(logging.DEBUG):  # printing the match is slow
+            self.logger.debug(f"Deleting flow: table={table_id}, match={match}")
         datapath.send_msg(mod)
         self.logger.info(f"Flow deleted successfully.")
          
     # ------------------------------------------------
-    # 2) Topology (SwitchEnter, LinkAdd, LinkDelete)
+    # 2) Topology (SwitchEnter, TopologyDelta, LinkDelete)
     # ------------------------------------------------
     @set_ev_cls(event.EventSwitchEnter)
     def switch_enter_handler(self, ev):
@@ -256,68 +394,207 @@ class FlowAllocator(app_manager.RyuApp):
         if old_links != self.links:
             self.logger.info(f"Switch added. Updated links: {self.links}")
 
-    @set_ev_cls(event.EventLinkAdd)
-    def link_add_handler(self, ev):
+    @set_ev_cls(event.EventTopologyDelta)
+    def topology_delta_handler(self, ev):
         """
-        Handler function for link addition events in the network topology.
-        This method is triggered when a new link is added to the network. It updates the
-        topology information by calling _get_topology_data() to refresh the network view.
+        Handler function for the batched topology changes of the network.
+        The links discovered or lost within the topology discovery window come in one delta,
+        which is applied to self.links instead of refreshing the whole link list on every link.
+        A link that failed before is given back to the path computation.
         Parameters:
-            ev: ryu.topology.event.EventLinkAdd
-                The event object containing information about the added link.
+            ev: ryu.topology.event.EventTopologyDelta
+                The event object containing the added and deleted links.
         """
 
-        self._get_topology_data()
+        if ev.version <= self.topology.version:
+            return
+        if ev.version != self.topology.version + 1:
+            # deltas were missed, catch up with the ones after the last version applied
+            self._catch_up_topology()
+            if ev.version != self.topology.version + 1:
+                return
+        self.topology.apply(ev)
+        self._apply_topology_changes(ev.added, ev.deleted)
+        self.logger.info(f"Topology version {ev.version}: {len(ev.added)} links added, "
+                         f"{len(ev.deleted)} deleted, {len(self.links)} links")
+
+    def _catch_up_topology(self):
+        """
+        Brings self.links up to date after missed topology deltas. The topology discovery replies the
+        deltas following the last version applied, or all its links if it no longer has them, and only
+        the links which changed meanwhile are applied.
+        """
+        links = set(self.topology.links)
+        self.topology = get_topology_snapshot(self, self.topology)
+        added = self.topology.links - links
+        deleted = links - self.topology.links
+        self._apply_topology_changes(added, deleted)
+        self.logger.info(f"Topology caught up to version {self.topology.version}: {len(added)} links added, "
+                         f"{len(deleted)} deleted, {len(self.links)} links")
+
+    def _apply_topology_changes(self, added, deleted):
+        """
+        Applies links added and deleted by the topology discovery to self.links, giving the links that
+        failed before back to the path computation.
+        """
+        for link in deleted:
+            key = (int(link.src.dpid), int(link.dst.dpid))
+            if self.links.get(key, {}).get("src_port") == link.src.port_no:
+                del self.links[key]
+        for link in added:
+            self._add_link(link)
+        restored = [(int(link.src.dpid), int(link.dst.dpid)) for link in added]
+        restored = [link for link in restored if link in self.failed_links]
+        if restored:
+            self._restore_links(restored)
 
     @set_ev_cls(event.EventLinkDelete)
     def link_delete_handler(self, ev):
         """
         Handles link deletion events in the network.
-        This method is triggered when a link is deleted from the network topology.
-        It logs information about the deleted link and the updated network links.
+        This method is triggered when a link is deleted from the network topology (LLDP timeout
+        or port down), the reservations crossing it are moved off it.
         Args:
             ev: The link deletion event object containing details about the deleted link
         """
 
-        self.logger.info(f"Link deleted. Updated links: {self.links}")
-        
+        link = (int(ev.link.src.dpid), int(ev.link.dst.dpid))
+        self.logger.info(f"Link deleted: {link}. Updated links: {self.links}")
+        self._fail_links([link])
+
+    @set_ev_cls(ofp_event.EventOFPPortStatus, MAIN_DISPATCHER)
+    def port_status_handler(self, ev):
+        """
+        Handles port status changes, the earliest sign of a link failure: a switch port going down
+        fails the link behind it without waiting for the topology discovery to notice it.
+        Args:
+            ev (EventOFPPortStatus): Event object containing the port status message from the switch
+        """
+        msg = ev.msg
+        ofproto = msg.datapath.ofproto
+        if msg.reason != ofproto.OFPPR_DELETE and not msg.desc.state & ofproto.OFPPS_LINK_DOWN:
+            return
+        dpid = msg.datapath.id
+        links = [(src, dst) for (src, dst), link in self.links.items()
+                 if src == dpid and link["src_port"] == msg.desc.port_no]
+        if links:
+            self.logger.info(f"Port down: s{dpid}-eth{msg.desc.port_no}, link {links[0]}")
+            self._fail_links(links)
+
+
     def _get_topology_data(self):
         """
-        Updates topology data by collecting information from get_switch() and get_link().
+        Updates topology data with a snapshot of the links of the topology discovery, from which the
+        following topology deltas apply.
         """
         # Resets the dictionaries
         self.links.clear()
                 
         # Gets the link data
-        link_list = get_link(self, None)
-        for link in link_list:
-            src_dpid = int(link.src.dpid)
-            dst_dpid = int(link.dst.dpid)
-            src_port_no = int(link.src.port_no)
-            dst_port_no = int(link.dst.port_no)
-
-            # Maps the links in the dictionaries
-            self.links[(src_dpid, dst_dpid)] = {
-                "src_port": src_port_no,
-                "dst_port": dst_port_no,
-                "src_hw_addr": link.src.hw_addr,
-                "dst_hw_addr": link.dst.hw_addr,
-            }
+        self.topology = get_topology_snapshot(self)
+        for link in self.topology.links:
+            self._add_link(link)
+
+    def _add_link(self, link):
+        """
+        Maps a ryu.topology.switches.Link in self.links.
+        """
+        src_dpid = int(link.src.dpid)
+        dst_dpid = int(link.dst.dpid)
+        src_port_no = int(link.src.port_no)
+        dst_port_no = int(link.dst.port_no)
+
+        # Maps the links in the dictionaries
+        self.links[(src_dpid, dst_dpid)] = {
+            "src_port": src_port_no,
+            "dst_port": dst_port_no,
+            "src_hw_addr": link.src.hw_addr,
+            "dst_hw_addr": link.dst.hw_addr,
+        }
     
     # 1. Endpoint for flow allocation
-    def allocate_flow(self, src_mac, dst_mac, bandwidth):
+    def allocate_flow(self, src_mac, dst_mac, bandwidth, proactive=None, lifetime=0, idle_timeout=0, slice_name=None,
+                      rate_limiter=None, priority=0, admission=None, protection=None, path_policy=None, max_delay=None):
         """
         Reserves network flow between two hosts with specified bandwidth requirements.
         This function performs the following operations:
         1. Validates source and destination MAC addresses
-        2. Finds a path with sufficient bandwidth between hosts
+        2. Finds a path with sufficient bandwidth between hosts, preempting lower priority
+           reservations if there is none and the admission mode allows it
         3. Updates network capacity along the chosen path
-        5. Records the flow reservation
+        4. Records the flow reservation and reroutes the preempted reservations when possible
+        5. Installs the path rules right away when the allocation is proactive
         Args:
             src_mac (str): Source host MAC address
             dst_mac (str): Destination host MAC address 
             bandwidth (float): Required bandwidth in Mbps
+            proactive (bool): Install the rules (and QoS queues) now instead of on the first PacketIn,
+                defaults to PROACTIVE_INSTALL
+            lifetime (int): Seconds after which the reservation is released (hard timeout of its rules, 0: never)
+            idle_timeout (int): Seconds without traffic after which the reservation is released (0: never)
+            slice_name (str): Slice of the flow (see create_slice), the flow is admitted against the slice
+                envelope and shares aggregated VLAN tagged rules with the other flows of the slice
+                (None: the flow is admitted against the link capacity, with exact per host pair rules)
+            rate_limiter (str): "queue" or "meter", defaults to RATE_LIMITER or to the one of the slice
+            priority (int): Priority class of the reservation (>= 0), higher classes may preempt lower ones
+            admission (str): "reject" or "preempt", defaults to ADMISSION_MODE. Flows of a slice are only
+                admitted against their slice envelope and never preempt
+            protection (bool): Install a backup path disjoint from the path of the reservation, defaults
+                to PROTECTION. Flows of a slice are not protected
+            path_policy (str): How the path is chosen among the ones with the bandwidth (see
+                path_finder.PATH_POLICIES), defaults to PATH_POLICY
+            max_delay (float): Bound of the path delay (ms). When the path of the policy does not meet it,
+                the lowest latency path is taken instead, the reservation is rejected if it does not either
         """
+        if proactive is None:
+            proactive = PROACTIVE_INSTALL
+        if protection is None:
+            protection = PROTECTION
+        if path_policy is None:
+            path_policy = PATH_POLICY
+        if path_policy not in PATH_POLICIES or (max_delay is not None and max_delay < 0):
+            self.logger.error(f"Invalid path policy: {path_policy}, max_delay={max_delay}")
+            return False
+        network_slice = None
+        if slice_name is not None:
+            network_slice = self.slices.get(slice_name)
+            if network_slice is None:
+                self.logger.error(f"Slice not found: {slice_name}")
+                return False
+            if src_mac not in network_slice.hosts or dst_mac not in network_slice.hosts:
+                self.logger.error(f"Hosts not in slice {slice_name}: {src_mac} -> {dst_mac}")
+                return False
+            if rate_limiter is None:
+                rate_limiter = network_slice.rate_limiter
+        if rate_limiter is None:
+            rate_limiter = RATE_LIMITER
+        if rate_limiter not in RATE_LIMITERS:
+            self.logger.error(f"Invalid rate limiter: {rate_limiter}")
+            return False
+        if network_slice is not None and rate_limiter != network_slice.rate_limiter:
+            self.logger.error(f"Slice {slice_name} does not use the {rate_limiter} rate limiter")
+            return False
+        if admission is None:
+            admission = ADMISSION_MODE
+        priority = int(priority or 0)
+        if admission not in ADMISSION_MODES or priority < 0:
+            self.logger.error(f"Invalid admission: mode={admission}, priority={priority}")
+            return False
+        lifetime = int(lifetime or 0)
+        idle_timeout = int(idle_timeout or 0)
+        if not 0 <= lifetime <= MAX_FLOW_TIMEOUT or not 0 <= idle_timeout <= MAX_FLOW_TIMEOUT:
+            self.logger.error(f"Invalid timeouts: lifetime={lifetime}, idle_timeout={idle_timeout}")
+            return False
+        if not isinstance(bandwidth, (int, float)) or not 0 < bandwidth < math.inf:
+            self.logger.error(f"Invalid bandwidth: {bandwidth}")
+            return False
+
+        if self.calendar:
+            self._update_calendar()
+        if (src_mac, dst_mac) in self.flow_reservations:
+            self.logger.error(f"Flow already reserved: {src_mac} -> {dst_mac}")
+            return False
+
         # Check if src_mac and dst_mac exist in host_to_switch mapping
         if src_mac not in self.host_to_switch or dst_mac not in self.host_to_switch:
             self.logger.error(f"Host not found: {src_mac} -> {dst_mac}")
@@ -340,38 +617,866 @@ class FlowAllocator(app_manager.RyuApp):
             self.logger.error(f"Datapath not found for dpid: {dst_dpid}")
             return False
 
-        # Create dictionaries for switches for path_finder
-        src_switch = {"dpid": src_dpid}
-        dst_switch = {"dpid": dst_dpid}
-
-        # Find the path with enough bandwidth
-        path, available_bandwidth = self.path_finder.find_max_bandwidth_path(src_switch, dst_switch, bandwidth)
+        # Find the path with enough bandwidth, in the slice envelope for the flows of a slice
+        now = time.time()
+        window = (now, now + lifetime) if lifetime and network_slice is None else None
+        free = None
+        if network_slice is not None:
+            path_finder = PathFinder(self._slice_capacities(network_slice), self.logger)
+            path, available_bandwidth = self._find_path(path_finder, src_dpid, dst_dpid, bandwidth, path_policy,
+                                                        max_delay)
+        elif self.calendar:
+            # Leave the bandwidth booked by the advance reservations overlapping this one
+            free = self._window_capacities(now, window[1] if window else math.inf)
+            path, available_bandwidth = self._find_path(PathFinder(free, self.logger), src_dpid, dst_dpid, bandwidth,
+                                                        path_policy, max_delay)
+        else:
+            path, available_bandwidth = self._find_cached_path(src_dpid, dst_dpid, bandwidth, path_policy, max_delay)
+        victims = []
+        if not path and admission == "preempt" and network_slice is None and priority > 0:
+            path, victims = self._plan_preemption(src_dpid, dst_dpid, bandwidth, priority, free)
+            available_bandwidth = bandwidth
+            if path and max_delay is not None and PathFinder.path_delay(path, self.link_delay) > max_delay:
+                path, victims = None, []
         if not path:
             self.logger.error("No path found with sufficient bandwidth.")
             return False
 
         self.logger.info(f"Path found: {path}, available bandwidth: {available_bandwidth} Mbps")
 
-        # Update remaining capacity and install flows
-        for i in range(len(path) - 1):
-            link = (path[i], path[i + 1])
-            reverse_link = (path[i + 1], path[i])
-            self.flow_capacity[link] -= bandwidth
-            self.flow_capacity[reverse_link] -= bandwidth
-            self.path_finder.link_capacities[link] = self.flow_capacity[link]
-            self.path_finder.link_capacities[reverse_link] = self.flow_capacity[reverse_link]
-        
-        self.path_finder.build_graph()  # Rebuild the graph
+        # Make room for the reservation
+        preempted = {}
+        for key in victims:
+            preempted[key] = self.flow_reservations[key]
+            self.logger.info(f"Preempting reservation: {key[0]} -> {key[1]} (priority {preempted[key]['priority']})")
+            self.delete_flow(*key)
+
+        self._add_reservation((src_mac, dst_mac), path, bandwidth, proactive, lifetime, idle_timeout, slice_name,
+                              rate_limiter, priority, window, protection=protection, path_policy=path_policy,
+                              max_delay=max_delay)
+        self.logger.info(f"Flow reservation added: {src_mac} -> {dst_mac}")
+
+        if preempted:
+            self._reroute_preempted((src_mac, dst_mac), preempted)
+
+        if proactive and not self.install_reservation(src_mac, dst_mac):
+            self.delete_flow(src_mac, dst_mac)
+            return False
+        return True
 
-        self.flow_reservations[(src_mac, dst_mac)] = {
+    def _add_reservation(self, key, path, bandwidth, proactive, lifetime, idle_timeout, slice_name, rate_limiter,
+                         priority, window=None, booking=None, booked=False, protection=False, path_policy=PATH_POLICY,
+                         max_delay=None):
+        """
+        Reserves the capacity of a path and records the reservation.
+        Reservations bounded in time (window) are booked in the calendar, unless already booked there by
+        their advance reservation (booking), and are released when their window ends.
+        Protected reservations get a backup path when one is free.
+        """
+        # Update remaining capacity
+        self._reserve_capacity(path, bandwidth, slice_name)
+        backup = None
+        if protection and slice_name is None:
+            backup = self._backup_path(path, bandwidth)
+
+        cookie = next(self.cookies)
+        self.flow_reservations[key] = {
             "path": path,
             "bandwidth": bandwidth,
             "start_time": time.time(),
-            "installed": False
+            "installed": False,
+            "proactive": proactive,
+            "lifetime": lifetime,
+            "idle_timeout": idle_timeout,
+            "cookie": cookie,
+            "slice": slice_name,
+            "rate_limiter": rate_limiter,
+            "priority": priority,
+            "preempted": [],
+            "rerouted": [],
+            "window": window,
+            "booking": booking,
+            "protection": protection,
+            "backup": backup,
+            "path_policy": path_policy,
+            "max_delay": max_delay
         }
-        self.logger.info(f"Flow reservation added: {src_mac} -> {dst_mac}")
-        return True
+        self.cookie_to_reservation[cookie] = key
+        self._index_reservation(key)
+
+        if window is not None:
+            links = self._path_links(path)
+            if not booked:
+                self.calendar.book(links, window[0], window[1], bandwidth)
+            for link in links:
+                self.calendar_active[link] = self.calendar_active.get(link, 0) + bandwidth
+            heapq.heappush(self.reservation_ends, (window[1], cookie))
+
+    def _find_path(self, path_finder, src_dpid, dst_dpid, bandwidth, path_policy, max_delay=None):
+        # Path with the bandwidth between two switches following a path policy
+        if max_delay is not None and path_policy != "latency":
+            # Only the latency policy looks for a path within the bound, the others check theirs
+            path, available_bandwidth = path_finder.find_path({"dpid": src_dpid}, {"dpid": dst_dpid}, bandwidth,
+                                                              path_policy, self.link_delay)
+            if not path or PathFinder.path_delay(path, self.link_delay) <= max_delay:
+                return path, available_bandwidth
+            path_policy = "latency"
+        return path_finder.find_path({"dpid": src_dpid}, {"dpid": dst_dpid}, bandwidth, path_policy, self.link_delay,
+                                     max_delay)
+
+    def _find_cached_path(self, src_dpid, dst_dpid, bandwidth, path_policy, max_delay=None):
+        # _find_path on the link capacities, answered from the path cache when it can
+        key = self.path_cache.key(src_dpid, dst_dpid, bandwidth, path_policy, max_delay)
+        cached = self.path_cache.get(key, bandwidth)
+        if cached is not None:
+            path, available_bandwidth = cached
+            return (list(path) if path else path), available_bandwidth
+        path, available_bandwidth = self._find_path(self.path_finder, src_dpid, dst_dpid, bandwidth, path_policy,
+                                                    max_delay)
+        if path:
+            self.path_cache.put(key, bandwidth, tuple(path), available_bandwidth, self._path_links(path))
+        else:
+            self.path_cache.put(key, bandwidth, None, 0)
+        return path, available_bandwidth
+
+    def path_cache_stats(self):
+        """
+        Returns the path cache counters: entries, hits, misses, hit ratio, invalidations and capacity epoch.
+        """
+        return self.path_cache.stats()
+
+    def _reserve_capacity(self, path, bandwidth, slice_name=None):
+        """
+        Subtracts the bandwidth from both directions of every link of the path,
+        from the slice envelope for the flows of a slice.
+        """
+        self._update_capacity(path, -bandwidth, slice_name)
+
+    def _release_capacity(self, path, bandwidth, slice_name=None):
+        """
+        Gives the bandwidth back to both directions of every link of the path.
+        """
+        self._update_capacity(path, bandwidth, slice_name)
+
+    def _update_capacity(self, path, delta, slice_name=None):
+        links = self._path_links(path)
+
+        if slice_name is not None:
+            network_slice = self.slices.get(slice_name)
+            if network_slice is not None:
+                for link in links:
+                    network_slice.used[link] = network_slice.used.get(link, 0) - delta
+            return
+        self._update_link_capacity(links, delta)
+
+    def _update_link_capacity(self, links, delta):
+        for link in links:
+            self.flow_capacity[link] += delta
+            # The failed links are left out of the graph, a search for no bandwidth would take them
+            if link in self.failed_links:
+                self.path_finder.link_capacities.pop(link, None)
+            else:
+                self.path_finder.link_capacities[link] = self.flow_capacity[link]
+        self.path_cache.invalidate(links, released=delta >= 0)
+
+        self.path_finder.build_graph()  # Rebuild the graph
+
+    def _remove_reservation(self, key):
+        """
+        Forgets a reservation and gives its capacity back, its rules are left to the caller.
+        """
+        reservation = self.flow_reservations[key]
+        self._index_reservation(key, remove=True)
+        self._release_capacity(reservation["path"], reservation["bandwidth"], reservation["slice"])
+        if reservation["window"] is not None:
+            links = self._path_links(reservation["path"])
+            self.calendar.release(links, reservation["window"][0], reservation["window"][1], reservation["bandwidth"])
+            for link in links:
+                self.calendar_active[link] -= reservation["bandwidth"]
+                if self.calendar_active[link] < 1e-9:
+                    del self.calendar_active[link]
+        self.flow_reservations.pop(key)
+        self.cookie_to_reservation.pop(reservation["cookie"], None)
+        self.flow_rates.pop(key, None)
+        return reservation
+
+    # Preemption
+    def _index_reservation(self, key, remove=False):
+        """
+        Adds a reservation to (or removes it from) the per link indexes of the reservations and of the
+        preemptable reservations.
+        Flows of a slice only use their slice envelope, preempting them would free no link capacity.
+        """
+        reservation = self.flow_reservations[key]
+        for link in self._path_links(reservation["path"]) + self._path_links(reservation["backup"] or []):
+            keys = self.link_flows.setdefault(link, set())
+            if remove:
+                keys.discard(key)
+                if not keys:
+                    del self.link_flows[link]
+            else:
+                keys.add(key)
+        if reservation["slice"] is not None:
+            return
+        path = reservation["path"]
+        priority = reservation["priority"]
+        for i in range(len(path) - 1):
+            for link in ((path[i], path[i + 1]), (path[i + 1], path[i])):
+                keys = self.link_reservations.setdefault(link, {}).setdefault(priority, set())
+                bandwidths = self.link_priority_bandwidth.setdefault(link, {})
+                if remove:
+                    keys.discard(key)
+                    bandwidths[priority] -= reservation["bandwidth"]
+                    if not keys:
+                        del self.link_reservations[link][priority]
+                        del bandwidths[priority]
+                else:
+                    keys.add(key)
+                    bandwidths[priority] = bandwidths.get(priority, 0) + reservation["bandwidth"]
+
+    def _preemption_cost(self, key):
+        # Bandwidth taken away from a reservation, weighted by its priority class
+        reservation = self.flow_reservations[key]
+        return reservation["bandwidth"] * (reservation["priority"] + 1)
+
+    def _plan_preemption(self, src_dpid, dst_dpid, bandwidth, priority, free=None):
+        """
+        Finds the cheapest set of lower priority reservations to move out of the way of a reservation.
+        Each link is given the estimated cost of freeing the missing bandwidth on it, taking the lowest
+        priority classes first, and the candidate paths are the cheapest ones where the lower priority
+        reservations would leave enough capacity, each one avoiding the most congested link of the
+        previous one. The search is bounded by PREEMPTION_MAX_PATHS candidate paths and, once a plan is
+        found, PREEMPTION_TIME_BUDGET seconds.
+        Args:
+            src_dpid (int): Switch of the source host
+            dst_dpid (int): Switch of the destination host
+            bandwidth (float): Bandwidth of the reservation (Mbps)
+            priority (int): Priority class of the reservation
+            free (dict): Bandwidth available on each link, defaults to flow_capacity
+        Returns:
+            tuple: (path, reservations to preempt), or (None, []) if no plan frees enough capacity
+        """
+        if free is None:
+            free = self.flow_capacity
+        deadline = time.perf_counter() + PREEMPTION_TIME_BUDGET
+        capacities, costs = {}, {}
+        for link, available in free.items():
+            if link in self.failed_links:
+                continue
+            missing, cost = bandwidth - available, 0
+            for p, reserved in sorted(self.link_priority_bandwidth.get(link, {}).items()):
+                if p >= priority:
+                    break
+                available += reserved
+                if missing > 0:
+                    cost += min(missing, reserved) * (p + 1)
+                    missing -= reserved
+            capacities[link] = available
+            costs[link] = cost
+
+        best_path, best_victims, best_cost = None, [], float("inf")
+        for _ in range(PREEMPTION_MAX_PATHS):
+            path, _ = PathFinder(capacities, self.logger).find_min_cost_path(
+                {"dpid": src_dpid}, {"dpid": dst_dpid}, costs, bandwidth)
+            if not path:
+                break
+            deficits = {}
+            for i in range(len(path) - 1):
+                link = (path[i], path[i + 1])
+                missing = bandwidth - free[link]
+                if missing > 1e-9:
+                    deficits[link] = missing
+            victims = self._pick_victims(deficits, priority)
+            if victims is not None:
+                cost = sum(self._preemption_cost(key) for key in victims)
+                if cost < best_cost:
+                    best_path, best_victims, best_cost = path, victims, cost
+            if not deficits or (best_path is not None and time.perf_counter() > deadline):
+                break
+            # The next candidate avoids the most congested link of this one
+            u, v = max(deficits, key=deficits.get)
+            capacities[(u, v)] = capacities[(v, u)] = 0
+
+        if best_path is not None:
+            self.logger.info(f"Preemption plan: path {best_path}, {len(best_victims)} reservations, cost {best_cost}")
+        return best_path, best_victims
+
+    def _pick_victims(self, deficits, priority):
+        """
+        Picks the lower priority reservations to preempt to free the missing bandwidth of each link.
+        Preempting a reservation costs its bandwidth weighted by its priority class, so the lowest classes
+        go first and, within a class, the reservations crossing the most congested links and then the
+        largest ones (the fewer reservations disrupted the better). Only the PREEMPTION_MAX_CANDIDATES
+        first reservations of each congested link are considered. The ones the others make unnecessary
+        are dropped afterwards, most expensive first.
+        Args:
+            deficits (dict): Bandwidth missing on each congested link {link: Mbps}
+            priority (int): Priority class of the preempting reservation
+        Returns:
+            list: The reservations to preempt, or None if the candidates cannot free enough bandwidth
+        """
+        def order(key):
+            reservation = self.flow_reservations[key]
+            return reservation["priority"], -reservation["bandwidth"]
+
+        candidates = set()
+        for link, missing in deficits.items():
+            keys, available = [], 0
+            for p, reservations in sorted(self.link_reservations.get(link, {}).items()):
+                if p >= priority or available >= missing:
+                    break
+                keys += reservations
+                available += self.link_priority_bandwidth[link][p]
+            candidates.update(heapq.nsmallest(PREEMPTION_MAX_CANDIDATES, keys, key=order))
+
+        crossed = {key: [link for link in self._path_links(self.flow_reservations[key]["path"]) if link in deficits]
+                   for key in candidates}
+        remaining = dict(deficits)
+        victims = []
+        for key in sorted(candidates, key=lambda key: (order(key)[0], -len(crossed[key]), order(key)[1])):
+            if not remaining:
+                break
+            if not any(link in remaining for link in crossed[key]):
+                continue
+            victims.append(key)
+            for link in crossed[key]:
+                if link in remaining:
+                    remaining[link] -= self.flow_reservations[key]["bandwidth"]
+                    if remaining[link] <= 1e-9:
+                        del remaining[link]
+        if remaining:
+            return None
+
+        freed = {link: 0 for link in deficits}
+        for key in victims:
+            for link in crossed[key]:
+                freed[link] += self.flow_reservations[key]["bandwidth"]
+        for key in sorted(victims, key=self._preemption_cost, reverse=True):
+            reserved = self.flow_reservations[key]["bandwidth"]
+            if all(freed[link] - reserved >= deficits[link] - 1e-9 for link in crossed[key]):
+                victims.remove(key)
+                for link in crossed[key]:
+                    freed[link] -= reserved
+        return victims
+
+    def _path_links(self, path):
+        # Links of a path, both directions
+        links = []
+        for i in range(len(path) - 1):
+            links += [(path[i], path[i + 1]), (path[i + 1], path[i])]
+        return links
+
+    def _reroute_preempted(self, key, preempted):
+        """
+        Allocates the reservations preempted by a reservation again, on whatever capacity is left.
+        The ones finding a path are rerouted (their rules are installed again if they were installed),
+        the others stay preempted. Both are recorded in the preempting reservation.
+        """
+        reservation = self.flow_reservations[key]
+        for (src_mac, dst_mac), victim in preempted.items():
+            lifetime = victim["lifetime"]
+            if lifetime:
+                lifetime = max(1, int(victim["start_time"] + lifetime - time.time()))
+            if self.allocate_flow(src_mac, dst_mac, victim["bandwidth"], victim["proactive"] or victim["installed"],
+                                  lifetime, victim["idle_timeout"], rate_limiter=victim["rate_limiter"],
+                                  priority=victim["priority"], admission="reject", protection=victim["protection"],
+                                  path_policy=victim["path_policy"], max_delay=victim["max_delay"]):
+                self.logger.info(f"Preempted reservation rerouted: {src_mac} -> {dst_mac}")
+                reservation["rerouted"].append(f"{src_mac}->{dst_mac}")
+            else:
+                self.logger.info(f"Preempted reservation released: {src_mac} -> {dst_mac}")
+                reservation["preempted"].append(f"{src_mac}->{dst_mac}")
     
+    # Advance reservations
+    def book_flow(self, src_mac, dst_mac, bandwidth, start, end, rate_limiter=None, priority=0, path_policy=None,
+                  max_delay=None):
+        """
+        Books bandwidth between two hosts for a time window (advance reservation).
+        Admission checks the whole window: the path must have the bandwidth left by the active reservations
+        (those bounded in time only until their own window ends) and by the advance reservations overlapping
+        the window. The reservation is activated, its rules installed, when the window starts, and released
+        when it ends.
+        Args:
+            src_mac (str): Source host MAC address
+            dst_mac (str): Destination host MAC address
+            bandwidth (float): Required bandwidth in Mbps
+            start (float): Start of the window (seconds since the epoch), now if in the past
+            end (float): End of the window (seconds since the epoch)
+            rate_limiter (str): "queue" or "meter", defaults to RATE_LIMITER
+            priority (int): Priority class of the reservation once active
+            path_policy (str): How the path is chosen, defaults to PATH_POLICY (see allocate_flow)
+            max_delay (float): Bound of the path delay (ms)
+        Returns:
+            int: ID of the advance reservation, False if rejected
+        """
+        now = time.time()
+        start = max(float(start), now)
+        end = float(end)
+        if rate_limiter is None:
+            rate_limiter = RATE_LIMITER
+        if path_policy is None:
+            path_policy = PATH_POLICY
+        if (not isinstance(bandwidth, (int, float)) or not 0 < bandwidth < math.inf or end <= start or rate_limiter not in RATE_LIMITERS
+                or path_policy not in PATH_POLICIES):
+            self.logger.error(f"Invalid advance reservation: bandwidth={bandwidth}, window={start}-{end}, "
+                              f"rate_limiter={rate_limiter}, path_policy={path_policy}")
+            return False
+        if src_mac not in self.host_to_switch or dst_mac not in self.host_to_switch:
+            self.logger.error(f"Host not found: {src_mac} -> {dst_mac}")
+            return False
+
+        self._update_calendar()
+        windows = [booking["window"] for booking in self.bookings.values()
+                   if (booking["src"], booking["dst"]) == (src_mac, dst_mac)]
+        reservation = self.flow_reservations.get((src_mac, dst_mac))
+        if reservation is not None:
+            windows.append(reservation["window"] or (reservation["start_time"], math.inf))
+        if any(other_start < end and start < other_end for other_start, other_end in windows):
+            self.logger.error(f"Flow already reserved during the window: {src_mac} -> {dst_mac}")
+            return False
+
+        src_dpid = int(self.host_to_switch[src_mac]["connected_switch"].lstrip("s"))
+        dst_dpid = int(self.host_to_switch[dst_mac]["connected_switch"].lstrip("s"))
+        path, _ = self._find_path(PathFinder(self._window_capacities(start, end), self.logger), src_dpid, dst_dpid,
+                                  bandwidth, path_policy, max_delay)
+        if not path:
+            self.logger.error("No path found with sufficient bandwidth during the window.")
+            return False
+
+        self.calendar.book(self._path_links(path), start, end, bandwidth)
+        booking_id = next(self.booking_ids)
+        self.bookings[booking_id] = {
+            "src": src_mac,
+            "dst": dst_mac,
+            "path": path,
+            "bandwidth": bandwidth,
+            "window": (start, end),
+            "rate_limiter": rate_limiter,
+            "priority": int(priority or 0),
+            "path_policy": path_policy,
+            "max_delay": max_delay
+        }
+        heapq.heappush(self.booking_starts, (start, booking_id))
+        self.logger.info(f"Advance reservation {booking_id} added: {src_mac} -> {dst_mac}, path {path}, "
+                         f"{bandwidth} Mbps from {time.ctime(start)} to {time.ctime(end)}")
+        if start <= now:
+            self._update_calendar()
+        return booking_id
+
+    def cancel_booking(self, booking_id):
+        """
+        Cancels an advance reservation, releasing it if its window already started.
+        Args:
+            booking_id (int): ID of the advance reservation
+        """
+        booking = self.bookings.pop(booking_id, None)
+        if booking is not None:
+            start, end = booking["window"]
+            self.calendar.release(self._path_links(booking["path"]), start, end, booking["bandwidth"])
+            self.logger.info(f"Advance reservation {booking_id} cancelled")
+            return True
+        for (src_mac, dst_mac), reservation in list(self.flow_reservations.items()):
+            if reservation["booking"] == booking_id:
+                return self.delete_flow(src_mac, dst_mac)
+        self.logger.error(f"Advance reservation not found: {booking_id}")
+        return False
+
+    def show_bookings(self):
+        """
+        Returns the advance reservations, waiting for their window or active, as a dictionary.
+        """
+        bookings = {}
+        for booking_id, booking in self.bookings.items():
+            bookings[booking_id] = dict(booking, active=False)
+        for (src_mac, dst_mac), reservation in self.flow_reservations.items():
+            if reservation["booking"] is not None:
+                bookings[reservation["booking"]] = {
+                    "src": src_mac,
+                    "dst": dst_mac,
+                    "path": reservation["path"],
+                    "bandwidth": reservation["bandwidth"],
+                    "window": reservation["window"],
+                    "rate_limiter": reservation["rate_limiter"],
+                    "priority": reservation["priority"],
+                    "path_policy": reservation["path_policy"],
+                    "max_delay": reservation["max_delay"],
+                    "active": True
+                }
+        return bookings
+
+    def _window_capacities(self, start, end):
+        """
+        Bandwidth available on each link during a whole window: what the active reservations leave,
+        minus the most the calendar books at any time of the window (the active bounded reservations
+        are both in flow_capacity and in the calendar, they are only counted in the calendar).
+        The failed links are left out.
+        """
+        capacities = {link: capacity for link, capacity in self.flow_capacity.items() if link not in self.failed_links}
+        for link in self.calendar.links():
+            if link in capacities:
+                capacities[link] += self.calendar_active.get(link, 0) - self.calendar.peak(link, start, end)
+        return capacities
+
+    def _update_calendar(self):
+        """
+        Releases the bounded reservations whose window ended and activates the advance reservations
+        whose window started.
+        """
+        now = time.time()
+        while self.reservation_ends and self.reservation_ends[0][0] <= now:
+            _, cookie = heapq.heappop(self.reservation_ends)
+            key = self.cookie_to_reservation.get(cookie)
+            if key is not None:
+                self.logger.info(f"Flow reservation window ended: {key[0]} -> {key[1]}")
+                self.delete_flow(*key)
+        while self.booking_starts and self.booking_starts[0][0] <= now:
+            _, booking_id = heapq.heappop(self.booking_starts)
+            if booking_id in self.bookings:
+                self._activate_booking(booking_id)
+        self.calendar.expire(now)
+
+    def _activate_booking(self, booking_id):
+        """
+        Turns an advance reservation whose window started into a reservation and installs its rules.
+        """
+        booking = self.bookings.pop(booking_id)
+        key = (booking["src"], booking["dst"])
+        start, end = booking["window"]
+        if key in self.flow_reservations or end <= time.time():
+            self.logger.error(f"Advance reservation {booking_id} cannot start: {key[0]} -> {key[1]}")
+            self.calendar.release(self._path_links(booking["path"]), start, end, booking["bandwidth"])
+            return False
+
+        # The rules expire with the window, the calendar releases the reservation anyway
+        lifetime = int(math.ceil(end - time.time()))
+        self._add_reservation(key, booking["path"], booking["bandwidth"], True,
+                              lifetime if lifetime <= MAX_FLOW_TIMEOUT else 0, 0, None, booking["rate_limiter"],
+                              booking["priority"], booking["window"], booking_id, booked=True,
+                              path_policy=booking["path_policy"], max_delay=booking["max_delay"])
+        self.logger.info(f"Advance reservation {booking_id} activated: {key[0]} -> {key[1]}")
+        if not self.install_reservation(*key):
+            self.delete_flow(*key)
+            return False
+        return True
+
+    def _run_calendar(self):
+        """
+        Activates and releases the reservations bounded in time at the boundaries of their window.
+        """
+        while True:
+            time.sleep(CALENDAR_TICK)
+            with self.lock:
+                self._update_calendar()
+
+    # Link failures
+    def _backup_path(self, path, bandwidth):
+        """
+        Finds the widest path between the ends of a primary path avoiding its links and its intermediate
+        switches, so that no single link or switch failure of the primary path hits the backup path.
+        The bandwidth of the backup path is free when it is computed but not reserved.
+        Returns:
+            list: The backup path, or None if there is none with the bandwidth
+        """
+        if len(path) < 2:
+            return None
+        excluded = set(path[1:-1])
+        primary = set(self._path_links(path))
+        capacities = {link: capacity for link, capacity in self.flow_capacity.items()
+                      if link not in primary and link not in self.failed_links
+                      and link[0] not in excluded and link[1] not in excluded}
+        backup, _ = PathFinder(capacities, self.logger).find_max_bandwidth_path(
+            {"dpid": path[0]}, {"dpid": path[-1]}, bandwidth)
+        if not backup:
+            self.logger.warning(f"No backup path for path {path} with {bandwidth} Mbps")
+            return None
+        return backup
+
+    def _slice_capacities(self, network_slice):
+        # Free bandwidth of the slice envelope on its links still up
+        return {link: capacity for link, capacity in network_slice.capacities().items()
+                if link not in self.failed_links}
+
+    def _fail_links(self, links):
+        """
+        Takes failed links out of the path computation and moves the reservations crossing them, in bulk.
+        The link index gives the reservations to move without scanning all of them. They are all released
+        first, then allocated again from the highest priority class down, each one on the first of:
+        - its path, if only its backup path failed (a new backup path is computed)
+        - its backup path, if it still has the bandwidth
+        - a new path with the bandwidth
+        The installed reservations get their new rules before their old ones are deleted (the old rules
+        are told apart by the old reservation cookie), except the flows of a slice whose shared rules are
+        updated in place. The reservations finding no path are released.
+        Args:
+            links (list): Failed links, as (src dpid, dst dpid), both directions fail
+        Returns:
+            dict: The recovery report, None if the links had already failed
+        """
+        detected_at = time.time()
+        started = time.perf_counter()
+        links = {failed for link in links for failed in (link, link[::-1])} - self.failed_links
+        if not links:
+            return None
+        self.failed_links |= links
+        for link in links:
+            self.path_finder.link_capacities.pop(link, None)
+        self.path_cache.invalidate(links, released=False)
+        self.path_finder.build_graph()
+
+        affected = set()
+        for link in links:
+            affected |= self.link_flows.get(link, set())
+        keys = sorted(affected, key=lambda key: -self.flow_reservations[key]["priority"])
+        removed = {key: self._remove_reservation(key) for key in keys}
+
+        report = {"links": sorted({tuple(sorted(link)) for link in links}), "detected_at": detected_at,
+                  "affected": len(keys), "kept": [], "backup": [], "rerouted": [], "released": []}
+        for key, reservation in removed.items():
+            outcome = self._recover(key, reservation)
+            report[outcome].append(f"{key[0]}->{key[1]}")
+        report["recovered_at"] = time.time()
+        report["recovery_time"] = time.perf_counter() - started
+        self.recoveries.append(report)
+        self.logger.info(f"Link failure {report['links']}: {len(keys)} reservations, {len(report['kept'])} kept, "
+                         f"{len(report['backup'])} on their backup path, {len(report['rerouted'])} rerouted, "
+                         f"{len(report['released'])} released in {report['recovery_time'] * 1000:.1f} ms")
+        return report
+
+    def _recover(self, key, old):
+        """
+        Allocates again a reservation released by a link failure (see _fail_links).
+        Returns:
+            str: "kept", "backup", "rerouted" or "released"
+        """
+        src_mac, dst_mac = key
+        bandwidth = old["bandwidth"]
+        lifetime = old["lifetime"]
+        if lifetime:
+            lifetime = max(1, int(old["start_time"] + lifetime - time.time()))
+        path_finder = self.path_finder
+        free = self.flow_capacity
+        if old["slice"] is not None:
+            free = self._slice_capacities(self.slices[old["slice"]])
+            path_finder = PathFinder(free, self.logger)
+        elif self.calendar:
+            free = self._window_capacities(time.time(), old["window"][1] if old["window"] else math.inf)
+            path_finder = PathFinder(free, self.logger)
+
+        def usable(path):
+            if old["max_delay"] is not None and path and PathFinder.path_delay(path, self.link_delay) > old["max_delay"]:
+                return False
+            return path and all(link not in self.failed_links and free.get(link, 0) >= bandwidth
+                                for link in self._path_links(path))
+
+        if usable(old["path"]):
+            path, outcome = old["path"], "kept"
+        elif usable(old["backup"]):
+            path, outcome = old["backup"], "backup"
+        else:
+            path, _ = self._find_path(path_finder, old["path"][0], old["path"][-1], bandwidth, old["path_policy"],
+                                      old["max_delay"])
+            outcome = "rerouted" if path else "released"
+
+        if path:
+            self._add_reservation(key, path, bandwidth, old["proactive"], lifetime, old["idle_timeout"], old["slice"],
+                                  old["rate_limiter"], old["priority"], old["window"], old["booking"],
+                                  protection=old["protection"], path_policy=old["path_policy"],
+                                  max_delay=old["max_delay"])
+            reservation = self.flow_reservations[key]
+            reservation["preempted"], reservation["rerouted"] = old["preempted"], old["rerouted"]
+        if not old["installed"]:
+            return outcome
+
+        # Make before break, the flows of a slice share their rules and are moved in place
+        if old["slice"] is not None:
+            self._delete_old_rules(key, old)
+        if path and not self.install_reservation(src_mac, dst_mac):
+            self.delete_flow(src_mac, dst_mac)
+            path, outcome = None, "released"
+        if old["slice"] is None:
+            self._delete_old_rules(key, old)
+        if not path:
+            self.logger.error(f"No path left for reservation {src_mac} -> {dst_mac}, released")
+        return outcome
+
+    def _delete_old_rules(self, key, old):
+        """
+        Deletes the rules a reservation had before it was moved, skipping the switches that are gone.
+        Rules are deleted by cookie, the ones the reservation now has are left alone.
+        """
+        src_mac, dst_mac = key
+        cookie = old["cookie"]
+        for path, src, dst in ((old["path"], src_mac, dst_mac), (old["path"][::-1], dst_mac, src_mac)):
+            if old["slice"] is not None and len(path) > 1:
+                try:
+                    self.delete_slice_path_flows(path, src, dst, old["slice"])
+                except KeyError:
+                    pass
+            else:
+                self._delete_path_rules(path, src, dst, cookie=cookie)
+            self.delete_meter((cookie, src))
+            self.delete_group((cookie, src))
+        if old["backup"]:
+            self._delete_path_rules(old["backup"][1:-1], src_mac, dst_mac, cookie=cookie)
+            self._delete_path_rules(old["backup"][-2:0:-1], dst_mac, src_mac, cookie=cookie)
+
+    def _restore_links(self, links):
+        """
+        Gives links back to the path computation once they are up again. The reservations moved off them
+        stay where they are, the protected reservations left without a backup path get one.
+        """
+        links = {restored for link in links for restored in (link, link[::-1])} & self.failed_links
+        if not links:
+            return
+        self.failed_links -= links
+        self._update_link_capacity(links, 0)
+        self.logger.info(f"Links restored: {sorted(links)}")
+        for key, reservation in list(self.flow_reservations.items()):
+            if (reservation["protection"] and reservation["backup"] is None and reservation["slice"] is None
+                    and self._backup_path(reservation["path"], reservation["bandwidth"])):
+                # Its path is still free once released, it is kept with a new backup path
+                self._recover(key, self._remove_reservation(key))
+
+    def show_recoveries(self):
+        """
+        Returns the last link failure recoveries, oldest first.
+        """
+        return list(self.recoveries)
+
+    # Slices
+    def create_slice(self, name, tenant, guaranteed, max_rate=None, priority=0, hosts=(), rate_limiter=None):
+        """
+        Creates a slice and carves its guaranteed rate out of the links connecting its member hosts.
+        The switches of the member hosts are connected along the widest paths having the guaranteed
+        rate left, starting from the switch of the first host. The slice is rejected if some of them
+        cannot be connected.
+        Args:
+            name (str): Name of the slice
+            tenant (str): Tenant owning the slice
+            guaranteed (float): Rate guaranteed to the slice on each of its links (Mbps)
+            max_rate (float): Rate the slice may reach by borrowing unused capacity (Mbps), defaults to guaranteed
+            priority (int): HTB priority of the slice queues, lower is served first when borrowing
+            hosts (list): MAC addresses of the member hosts
+            rate_limiter (str): "queue" or "meter", defaults to RATE_LIMITER
+        """
+        if name in self.slices:
+            self.logger.error(f"Slice already exists: {name}")
+            return False
+        if max_rate is None:
+            max_rate = guaranteed
+        if rate_limiter is None:
+            rate_limiter = RATE_LIMITER
+        if not guaranteed or guaranteed <= 0 or max_rate < guaranteed or rate_limiter not in RATE_LIMITERS:
+            self.logger.error(f"Invalid slice {name}: guaranteed={guaranteed}, max_rate={max_rate}, "
+                              f"rate_limiter={rate_limiter}")
+            return False
+        unknown = [mac for mac in hosts if mac not in self.host_to_switch]
+        if unknown:
+            self.logger.error(f"Hosts not found for slice {name}: {unknown}")
+            return False
+
+        network_slice = NetworkSlice(name, tenant, guaranteed, max_rate, int(priority or 0), hosts, rate_limiter)
+        switches = []
+        for mac in hosts:
+            dpid = int(self.host_to_switch[mac]["connected_switch"].lstrip("s"))
+            if dpid not in switches:
+                switches.append(dpid)
+
+        for dpid in switches[1:]:
+            # Links already carved for the slice can be reused for free
+            capacities = self._window_capacities(time.time(), math.inf)
+            capacities.update({link: guaranteed for link in network_slice.links})
+            path, _ = PathFinder(capacities, self.logger).find_max_bandwidth_path(
+                {"dpid": switches[0]}, {"dpid": dpid}, guaranteed)
+            if not path:
+                self.logger.error(f"Insufficient capacity for slice {name} between s{switches[0]} and s{dpid}")
+                self._update_link_capacity(network_slice.links, guaranteed)
+                return False
+            links = set()
+            for i in range(len(path) - 1):
+                links |= {(path[i], path[i + 1]), (path[i + 1], path[i])}
+            links -= network_slice.links
+            self._update_link_capacity(links, -guaranteed)
+            network_slice.links |= links
+
+        self.slices[name] = network_slice
+        self.logger.info(f"Slice created: {name} ({guaranteed}/{max_rate} Mbps, links {sorted(network_slice.links)})")
+        return True
+
+    def resize_slice(self, name, guaranteed=None, max_rate=None, priority=None):
+        """
+        Changes the rates of a slice.
+        Growing the guaranteed rate needs the difference to be free on every link of the slice,
+        shrinking it needs the flows of the slice to fit in the new rate.
+        Args:
+            name (str): Name of the slice
+            guaranteed (float): New guaranteed rate (Mbps), unchanged if None
+            max_rate (float): New maximum rate (Mbps), unchanged if None
+            priority (int): New HTB priority, unchanged if None
+        """
+        network_slice = self.slices.get(name)
+        if network_slice is None:
+            self.logger.error(f"Slice not found: {name}")
+            return False
+        if guaranteed is None:
+            guaranteed = network_slice.guaranteed
+        if max_rate is None:
+            max_rate = max(network_slice.max_rate, guaranteed)
+        if guaranteed <= 0 or max_rate < guaranteed:
+            self.logger.error(f"Invalid rates for slice {name}: guaranteed={guaranteed}, max_rate={max_rate}")
+            return False
+        if guaranteed < network_slice.max_used():
+            self.logger.error(f"Slice {name} flows use {network_slice.max_used()} Mbps, cannot shrink to {guaranteed}")
+            return False
+
+        delta = guaranteed - network_slice.guaranteed
+        capacities = self._window_capacities(time.time(), math.inf)
+        if delta > 0 and any(capacities[link] < delta for link in network_slice.links):
+            self.logger.error(f"Insufficient capacity to grow slice {name} to {guaranteed} Mbps")
+            return False
+        self._update_link_capacity(network_slice.links, -delta)
+
+        network_slice.guaranteed = guaranteed
+        network_slice.max_rate = max_rate
+        if priority is not None:
+            network_slice.priority = int(priority)
+        self._update_slice_queues(name)
+        self.logger.info(f"Slice resized: {name} ({guaranteed}/{max_rate} Mbps)")
+        return True
+
+    def delete_slice(self, name):
+        """
+        Deletes a slice with all its flows and gives its guaranteed rate back to its links.
+        Args:
+            name (str): Name of the slice
+        """
+        network_slice = self.slices.get(name)
+        if network_slice is None:
+            self.logger.error(f"Slice not found: {name}")
+            return False
+
+        for (src_mac, dst_mac), reservation in list(self.flow_reservations.items()):
+            if reservation["slice"] == name:
+                self.delete_flow(src_mac, dst_mac)
+
+        self._update_link_capacity(network_slice.links, network_slice.guaranteed)
+        del self.slices[name]
+        self._update_slice_queues(name)
+        self.logger.info(f"Slice deleted: {name}")
+        return True
+
+    def show_slices(self):
+        """
+        Returns all the slices with their flows as a dictionary.
+        """
+        slices = {}
+        for name, network_slice in self.slices.items():
+            slices[name] = network_slice.to_dict()
+            slices[name]["flows"] = [f"{src_mac}->{dst_mac}"
+                                     for (src_mac, dst_mac), reservation in self.flow_reservations.items()
+                                     if reservation["slice"] == name]
+        return slices
+
     # 2. Endpoint for deleting a flow
     def delete_flow(self, src_mac, dst_mac):
         """
@@ -389,25 +1494,17 @@ class FlowAllocator(app_manager.RyuApp):
             return False
 
         path = reservation["path"]
-        bandwidth = reservation["bandwidth"]
 
         # Restore the flow capacity
-        for i in range(len(path) - 1):
-            link = (path[i], path[i + 1])
-            reverse_link = (path[i + 1], path[i])
-            self.flow_capacity[link] += bandwidth
-            self.flow_capacity[reverse_link] += bandwidth
-            self.path_finder.link_capacities[link] = self.flow_capacity[link]
-            self.path_finder.link_capacities[reverse_link] = self.flow_capacity[reverse_link]
-        
-        self.path_finder.build_graph()
-        
-        self.flow_reservations.pop((src_mac, dst_mac))
+        self._remove_reservation((src_mac, dst_mac))
         self.logger.info(f"Flow reservation deleted: {src_mac} -> {dst_mac}")
         
         # Delete flow rules
-        self.delete_path_flows(path, src_mac, dst_mac)
-        self.delete_path_flows(path[::-1], dst_mac, src_mac)
+        backup = reservation["backup"]
+        self.delete_path_flows(path, src_mac, dst_mac, slice_name=reservation["slice"], cookie=reservation["cookie"],
+                               backup=backup)
+        self.delete_path_flows(path[::-1], dst_mac, src_mac, slice_name=reservation["slice"], cookie=reservation["cookie"],
+                               backup=backup[::-1] if backup else None)
         
         return True
     
@@ -431,7 +1528,22 @@ class FlowAllocator(app_manager.RyuApp):
                     "bandwidth": bandwidth,
                     "elapsed_time": f"{elapsed:.2f}",
                     "start_time": start_time,
-                    "installed": installed
+                    "installed": installed,
+                    "proactive": reservation["proactive"],
+                    "lifetime": reservation["lifetime"],
+                    "idle_timeout": reservation["idle_timeout"],
+                    "slice": reservation["slice"],
+                    "rate_limiter": reservation["rate_limiter"],
+                    "priority": reservation["priority"],
+                    "preempted": reservation["preempted"],
+                    "rerouted": reservation["rerouted"],
+                    "window": reservation["window"],
+                    "booking": reservation["booking"],
+                    "protection": reservation["protection"],
+                    "backup": reservation["backup"],
+                    "path_policy": reservation["path_policy"],
+                    "delay": PathFinder.path_delay(path, self.link_delay),
+                    "measured_rate": self.flow_rates.get((src_mac, dst_mac))
                 }
             
             print(f"Reservations: {reservations}")  # Log the reservations
@@ -446,32 +1558,27 @@ class FlowAllocator(app_manager.RyuApp):
         This function runs in a separate thread and checks the flow_reservations dictionary
         for any reservations that have exceeded their expiration time (RESERVATION_EXPIRE_TIME seconds).
         If an expired reservation is found, it restores the network capacity and deletes the reservation.
+        Installed reservations with a lifetime are normally released by the OFPFlowRemoved of their rules,
+        they are released here too in case the switch never reported it.
         """
         while True:
             time.sleep(10)
-            current_time = time.time()
-            expired_reservations = []
-            for (src_mac, dst_mac), reservation in list(self.flow_reservations.items()):
-                elapsed_time = current_time - reservation["start_time"]
+            with self.lock:
+                current_time = time.time()
+                expired_reservations = []
+                for (src_mac, dst_mac), reservation in list(self.flow_reservations.items()):
+                    elapsed_time = current_time - reservation["start_time"]
                 
-                if not reservation["installed"] and elapsed_time > RESERVATION_EXPIRE_TIME:
-                    self.logger.info(f"Flow reservation expired: {src_mac} -> {dst_mac}")
-                    expired_reservations.append((src_mac, dst_mac))
-                    path = reservation["path"]
-                    bandwidth = reservation["bandwidth"]
-                    
-                    # Restore the flow capacity
-                    for i in range(len(path) - 1):
-                        link = (path[i], path[i + 1])
-                        reverse_link = (path[i + 1], path[i])
-                        self.flow_capacity[link] += bandwidth
-                        self.flow_capacity[reverse_link] += bandwidth
-                        self.path_finder.link_capacities[link] = self.flow_capacity[link]
-                        self.path_finder.link_capacities[reverse_link] = self.flow_capacity[reverse_link]
+                    if not reservation["installed"] and elapsed_time > RESERVATION_EXPIRE_TIME:
+                        self.logger.info(f"Flow reservation expired: {src_mac} -> {dst_mac}")
+                        expired_reservations.append((src_mac, dst_mac))
                     
-                    self.path_finder.build_graph()  # Rebuild the graph
-                    self.logger.info(f"Flow capacity restored for {src_mac} -> {dst_mac}.")    
-                    self.flow_reservations.pop((src_mac, dst_mac))
+                        # Restore the flow capacity
+                        self._remove_reservation((src_mac, dst_mac))
+                        self.logger.info(f"Flow capacity restored for {src_mac} -> {dst_mac}.")    
+                    elif reservation["lifetime"] and elapsed_time > reservation["lifetime"] + RESERVATION_EXPIRE_TIME:
+                        self.logger.info(f"Flow reservation lifetime exceeded: {src_mac} -> {dst_mac}")
+                        self.delete_flow(src_mac, dst_mac)
                     
     def check_reservation(self, src_mac, dst_mac):
         """
@@ -489,29 +1596,36 @@ class FlowAllocator(app_manager.RyuApp):
             self.logger.error(f"Flow not found: {src_mac} -> {dst_mac}")
             return False
 
-        path = reservation["path"]
-        bandwidth = reservation["bandwidth"]
         start_time = reservation["start_time"]
         current_time = time.time()
         elapsed_time = current_time - start_time
 
         # Check if the reservation has expired
-        if elapsed_time > RESERVATION_EXPIRE_TIME:
+        if not reservation["installed"] and elapsed_time > RESERVATION_EXPIRE_TIME:
             self.logger.error(f"Flow reservation expired: {src_mac} -> {dst_mac}")
-            for i in range(len(path) - 1):
-                link = (path[i], path[i + 1])
-                reverse_link = (path[i + 1], path[i])
-                self.flow_capacity[link] += bandwidth
-                self.flow_capacity[reverse_link] += bandwidth
-                self.path_finder.link_capacities[link] = self.flow_capacity[link]
-                self.path_finder.link_capacities[reverse_link] = self.flow_capacity[reverse_link]
-            
-            self.path_finder.build_graph()  # Rebuild the graph
+            self._remove_reservation((src_mac, dst_mac))
 
             self.logger.error(f"Flow capacity restored.")
                 
             return False
-        
+
+        return self.install_reservation(src_mac, dst_mac)
+
+    def install_reservation(self, src_mac, dst_mac):
+        """
+        Installs the rules of a reservation along its path, in both directions.
+        The rules carry the reservation cookie and timeouts and ask the switches for an OFPFlowRemoved,
+        the idle timeout is only set on the forward direction so that a one-way flow is not released
+        because its reverse direction is idle. The reverse direction rules have REVERSE_COOKIE set in
+        their cookie.
+        Args:
+            src_mac (str): Source host MAC address
+            dst_mac (str): Destination host MAC address
+        """
+        reservation = self.flow_reservations[(src_mac, dst_mac)]
+        path = reservation["path"]
+        bandwidth = reservation["bandwidth"]
+
         self.logger.info(f"Applying flow reservation: {src_mac} -> {dst_mac}")
 
         try:
@@ -527,8 +1641,17 @@ class FlowAllocator(app_manager.RyuApp):
             return False
         
         # Install the flow rules
-        self.install_path_flows(path, src_mac, dst_mac, src_port, dst_port, bandwidth)
-        self.install_path_flows(path[::-1], dst_mac, src_mac, dst_port, src_port, bandwidth)
+        timeouts = {"hard_timeout": reservation["lifetime"], "slice_name": reservation["slice"],
+                    "rate_limiter": reservation["rate_limiter"]}
+        backup = reservation["backup"]
+        if not self.install_path_flows(path, src_mac, dst_mac, src_port, dst_port, bandwidth,
+                                       idle_timeout=reservation["idle_timeout"], cookie=reservation["cookie"],
+                                       backup=backup, **timeouts):
+            return False
+        if not self.install_path_flows(path[::-1], dst_mac, src_mac, dst_port, src_port, bandwidth,
+                                       cookie=reservation["cookie"] | REVERSE_COOKIE,
+                                       backup=backup[::-1] if backup else None, **timeouts):
+            return False
         
         self.logger.info(f"Flow successfully allocated from {src_mac} to {dst_mac}.")
         
@@ -536,7 +1659,9 @@ class FlowAllocator(app_manager.RyuApp):
 
         return True
 
-    def install_path_flows(self, path, src_mac, dst_mac, src_port, dst_port, bandwidth):
+    def install_path_flows(self, path, src_mac, dst_mac, src_port, dst_port, bandwidth,
+                           idle_timeout=0, hard_timeout=0, cookie=0, slice_name=None, rate_limiter="queue",
+                           backup=None):
         """
         Installs flow rules along the given path.
         Args:
@@ -545,51 +1670,169 @@ class FlowAllocator(app_manager.RyuApp):
             dst_mac (str): Destination MAC address.
             src_port (int): Source port.
             dst_port (int): Destination port.
+            idle_timeout (int): Idle timeout of the rules (0: never).
+            hard_timeout (int): Hard timeout of the rules (0: never).
+            cookie (int): Cookie of the rules, rules with a cookie are reported when removed. Their meter and
+                group are kept under the reservation cookie (without REVERSE_COOKIE).
+            slice_name (str): Slice of the flow, installs the aggregated slice rules instead of per host pair rules.
+            rate_limiter (str): "queue" to send the flow to a queue on every hop, "meter" to meter it
+                on the first switch.
+            backup (list): Backup path with the same ends, the first switch forwards through a fast-failover
+                group falling back to it when the port of the path goes down. Its rules carry no idle timeout
+                (they see no traffic until the failover) and are not reported when removed.
+        Returns:
+            bool: True if every rule was sent.
         """
+        if slice_name is not None and len(path) > 1:
+            return self.install_slice_path_flows(path, src_mac, dst_mac, src_port, dst_port, bandwidth, slice_name,
+                                                 idle_timeout=idle_timeout, hard_timeout=hard_timeout, cookie=cookie,
+                                                 rate_limiter=rate_limiter)
+
         for i in range(len(path)):
-            datapath = self.get_datapath(path[i])
+            try:
+                datapath = self.get_datapath(path[i])
+            except KeyError:
+                self.logger.error(f"Switch not connected: {path[i]}")
+                return False
             parser = datapath.ofproto_parser
+            flags = datapath.ofproto.OFPFF_SEND_FLOW_REM if cookie else 0
 
             try:
-                if i == 0:
+                in_port = None
+                if i == 0 and len(path) > 1:
                     self.logger.info(f"First switch: {path[i]} -> {path[i + 1]}")
                     # First switch: match src_mac and forward to the next switch
                     out_port = self.links[(path[i], path[i + 1])]["src_port"]
-                    match = parser.OFPMatch(eth_src=src_mac, eth_dst=dst_mac, in_port=src_port)
+                    in_port = src_port
                 elif i == len(path) - 1:
                     self.logger.info(f"Last switch: {path[i]} -> host B")
                     # Last switch: forward to destination port
                     out_port = dst_port
-                    match = parser.OFPMatch(eth_src=src_mac, eth_dst=dst_mac)
                 else:
                     self.logger.info(f"Intermediate switch: {path[i]} -> {path[i + 1]}")
                     # Intermediate switches
                     out_port = self.links[(path[i], path[i + 1])]["src_port"]
+
+                if rate_limiter != "meter" and not (i == 0 and backup):
+                    queue_id = self.get_or_create_queue_id(datapath.id, out_port, bandwidth)
+                    self._add_path_flow(datapath, src_mac, dst_mac, in_port, out_port, queue_id,
+                                        idle_timeout=idle_timeout, hard_timeout=hard_timeout, cookie=cookie,
+                                        flags=flags)
+                    continue
+
+                if in_port is not None:
+                    match = parser.OFPMatch(eth_src=src_mac, eth_dst=dst_mac, in_port=in_port)
+                else:
                     match = parser.OFPMatch(eth_src=src_mac, eth_dst=dst_mac)
 
-               #  Apply QoS queue to enforce bandwidth limitation
-                # queue_id = self.setup_qos_queue(datapath, out_port, bandwidth)
-                
-                queue_id = self.get_or_create_queue_id(datapath.id, out_port, bandwidth)
-                actions = [parser.OFPActionSetQueue(queue_id), parser.OFPActionOutput(out_port)]
-                self.add_flow(datapath, 1, match, actions)
+                if i == 0 and backup:
+                    # The group forwards on the first of the path and backup ports still up
+                    out_ports = [out_port, self.links[(backup[0], backup[1])]["src_port"]]
+                    buckets = [parser.OFPBucket(watch_port=port, actions=self._output_actions(
+                        datapath, port, bandwidth, rate_limiter)) for port in out_ports]
+                    group_id = self.add_group(datapath, (cookie & RESERVATION_COOKIE_MASK, src_mac), buckets)
+                    actions = [parser.OFPActionGroup(group_id)]
+                else:
+                    actions = self._output_actions(datapath, out_port, bandwidth, rate_limiter)
+
+                if rate_limiter == "meter":
+                    # Meter the flow once, when it enters the network
+                    inst = None
+                    if i == 0:
+                        meter_id = self.add_meter(datapath, (cookie & RESERVATION_COOKIE_MASK, src_mac), bandwidth)
+                        inst = [parser.OFPInstructionMeter(meter_id),
+                                parser.OFPInstructionActions(datapath.ofproto.OFPIT_APPLY_ACTIONS, actions)]
+                    self.add_flow(datapath, 1, match, actions, idle_timeout=idle_timeout,
+                                  hard_timeout=hard_timeout, cookie=cookie, flags=flags, instructions=inst)
+                    continue
+
+                self.add_flow(datapath, 1, match, actions, idle_timeout=idle_timeout,
+                              hard_timeout=hard_timeout, cookie=cookie, flags=flags)
 
             except KeyError:
                 self.logger.error(f"Link not found: {path[i]} -> {path[i + 1]}")
-                return
+                return False
+
+        if backup:
+            for i in range(1, len(backup) - 1):
+                try:
+                    datapath = self.get_datapath(backup[i])
+                    out_port = self.links[(backup[i], backup[i + 1])]["src_port"]
+                except KeyError:
+                    self.logger.error(f"Switch or link not found on backup path: {backup}")
+                    return False
+                match = datapath.ofproto_parser.OFPMatch(eth_src=src_mac, eth_dst=dst_mac)
+                self.add_flow(datapath, 1, match, self._output_actions(datapath, out_port, bandwidth, rate_limiter),
+                              hard_timeout=hard_timeout, cookie=cookie)
+
+        self.logger.info(f"Flow rules installed along path: {path}" + (f", backup path: {backup}" if backup else ""))
+        return True
+
+    def _add_path_flow(self, datapath, src_mac, dst_mac, in_port, out_port, queue_id, idle_timeout=0,
+                       hard_timeout=0, cookie=0, flags=0):
+        """
+        Adds the rule of a hop sending a reserved flow to a queue, as add_flow() would.
+        Rather than encoding the match and actions again, the addresses, ports and queue are patched into
+        a FlowMod serialized once per rule shape (matching in_port or not).
+        """
+        template = self.flow_mod_templates.get(in_port is not None)
+        if template is None:
+            parser = datapath.ofproto_parser
+            if in_port is not None:
+                match = parser.OFPMatch(eth_src="00:00:00:00:00:00", eth_dst="00:00:00:00:00:00", in_port=0)
+            else:
+                match = parser.OFPMatch(eth_src="00:00:00:00:00:00", eth_dst="00:00:00:00:00:00")
+            actions = [parser.OFPActionSetQueue(0), parser.OFPActionOutput(0)]
+            template = parser.OFPFlowModTemplate(parser.OFPFlowMod(
+                datapath=datapath, table_id=CLASSIFICATION_TABLE, priority=1, match=match,
+                instructions=[parser.OFPInstructionActions(datapath.ofproto.OFPIT_APPLY_ACTIONS, actions)]))
+            self.flow_mod_templates[in_port is not None] = template
+
+        match = {"eth_src": src_mac, "eth_dst": dst_mac}
+        if in_port is not None:
+            match["in_port"] = in_port
+        mod = template.to_msg(datapath, match=match, actions={0: {"queue_id": queue_id}, 1: {"port": out_port}},
+                              idle_timeout=idle_timeout, hard_timeout=hard_timeout, cookie=cookie, flags=flags)
+        if self.logger.isEnabledFor(logging.DEBUG):  # printing the match is slow
+            self.logger.debug(f"Adding flow: match={mod.match}, instructions={mod.instructions}")
+        datapath.send_msg(mod)
+        self.logger.info(f"Flow added successfully.")
 
-        self.logger.info(f"Flow rules installed along path: {path}")
+    def _output_actions(self, datapath, out_port, bandwidth, rate_limiter):
+        # Actions forwarding a reserved flow on a port, through a queue enforcing its bandwidth unless metered
+        parser = datapath.ofproto_parser
+        if rate_limiter == "meter":
+            return [parser.OFPActionOutput(out_port)]
+        #  Apply QoS queue to enforce bandwidth limitation
+        queue_id = self.get_or_create_queue_id(datapath.id, out_port, bandwidth)
+        return [parser.OFPActionSetQueue(queue_id), parser.OFPActionOutput(out_port)]
 
-    def delete_path_flows(self, path, src_mac, dst_mac):
+    def delete_path_flows(self, path, src_mac, dst_mac, slice_name=None, cookie=0, backup=None):
         """
         Deletes flow rules along the given path.
         Args:
             path (list): List of switch IDs in the path.
             src_mac (str): Source MAC address.
             dst_mac (str): Destination MAC address.
+            slice_name (str): Slice of the flow, only the rules no other flow of the slice uses are deleted.
+            cookie (int): Cookie of the reservation, to delete its meter and group.
+            backup (list): Backup path of the flow, whose rules are deleted too.
         """
+        if slice_name is not None and len(path) > 1:
+            self.delete_slice_path_flows(path, src_mac, dst_mac, slice_name)
+        else:
+            self._delete_path_rules(path, src_mac, dst_mac)
+        if backup:
+            self._delete_path_rules(backup[1:-1], src_mac, dst_mac)
+        self.delete_meter((cookie, src_mac))
+        self.delete_group((cookie, src_mac))
+
+    def _delete_path_rules(self, path, src_mac, dst_mac, cookie=0):
+        # With a reservation cookie, only the rules of the reservation are deleted (whatever their direction)
         for i in range(len(path)):
-            datapath = self.get_datapath(path[i])
+            datapath = self.datapaths.get(path[i])
+            if datapath is None:
+                continue  # The switch left with its rules
             parser = datapath.ofproto_parser
 
             try:
@@ -603,7 +1846,7 @@ class FlowAllocator(app_manager.RyuApp):
                     # Intermediate switches
                     match = parser.OFPMatch(eth_src=src_mac, eth_dst=dst_mac)
 
-                self._delete_flow(datapath, match)
+                self._delete_flow(datapath, match, cookie=cookie, cookie_mask=RESERVATION_COOKIE_MASK if cookie else 0)
 
             except KeyError:
                 self.logger.error(f"Link not found: {path[i]} -> {path[i + 1]}")
@@ -611,42 +1854,423 @@ class FlowAllocator(app_manager.RyuApp):
 
         self.logger.info(f"Flow rules deleted along path: {path}")
     
-    def get_or_create_queue_id(self, dpid, port, bandwidth):
+    def install_slice_path_flows(self, path, src_mac, dst_mac, src_port, dst_port, bandwidth, slice_name,
+                                 idle_timeout=0, hard_timeout=0, cookie=0, rate_limiter="queue"):
+        """
+        Adds a flow to the slice pipeline rules of its slice along the given path.
+        The flows of a slice routed on the same path share a VLAN tag, their packets go through:
+        - classification (ingress switch): the host pair is mapped to the slice tag in the metadata
+        - slice tagging (ingress switch): the tag of the metadata is pushed
+        - forwarding (every switch): the tag is forwarded to the next switch, the egress switch
+          pops it towards the destination host
+        - QoS (every switch): the tag is sent to the queue of the slice
+        Only the first flow of a (slice, path) installs the tagging, forwarding and QoS rules, the next
+        ones add their classification rule (and egress rules for a new destination host). Metered slices
+        have no QoS rules, each flow is metered by its classification rule instead.
+        Args:
+            path (list): List of switch IDs in the path.
+            src_mac (str): Source MAC address.
+            dst_mac (str): Destination MAC address.
+            src_port (int): Source port.
+            dst_port (int): Destination port.
+            bandwidth (float): Bandwidth of the flow.
+            slice_name (str): Slice of the flow.
+            idle_timeout (int): Idle timeout of the classification rule (0: never).
+            hard_timeout (int): Hard timeout of the classification rule (0: never).
+            cookie (int): Cookie of the reservation, set on the classification rule.
+            rate_limiter (str): "queue" or "meter".
+        Returns:
+            bool: True if every rule was sent.
+        """
+        key = (slice_name, tuple(path))
+        group = self.slice_paths.get(key)
+        new_group = group is None
+        if new_group:
+            used = {group["vid"] for group in self.slice_paths.values()}
+            vid = next((vid for vid in SLICE_VLAN_IDS if vid not in used), None)
+            if vid is None:
+                self.logger.error(f"No VLAN ID left for slice {slice_name} on path {path}")
+                return False
+            group = self.slice_paths[key] = {"vid": vid, "members": {}, "rate_limiter": rate_limiter}
+        new_destination = all(other_dst != dst_mac for _, other_dst in group["members"])
+        group["members"][(src_mac, dst_mac)] = {"in_port": src_port, "dst_port": dst_port, "bandwidth": bandwidth}
+
+        try:
+            if new_group:
+                self._install_slice_forwarding(path, group["vid"])
+            if new_destination:
+                self._install_slice_egress(path[-1], group["vid"], dst_mac, dst_port)
+                self._install_slice_qos(key, None if new_group else dst_mac)
+
+            ingress = self.get_datapath(path[0])
+            parser = ingress.ofproto_parser
+            ofproto = ingress.ofproto
+            match = parser.OFPMatch(in_port=src_port, eth_src=src_mac, eth_dst=dst_mac)
+            inst = [parser.OFPInstructionWriteMetadata(group["vid"], SLICE_METADATA_MASK),
+                    parser.OFPInstructionGotoTable(SLICE_TAG_TABLE)]
+            if rate_limiter == "meter":
+                inst.insert(0, parser.OFPInstructionMeter(
+                    self.add_meter(ingress, (cookie & RESERVATION_COOKIE_MASK, src_mac), bandwidth)))
+            self.add_flow(ingress, 1, match, None, idle_timeout=idle_timeout, hard_timeout=hard_timeout,
+                          cookie=cookie, flags=ofproto.OFPFF_SEND_FLOW_REM if cookie else 0, instructions=inst)
+        except KeyError as e:
+            self.logger.error(f"Switch or link not found on path {path}: {e}")
+            self.delete_slice_path_flows(path, src_mac, dst_mac, slice_name)
+            self.delete_meter((cookie & RESERVATION_COOKIE_MASK, src_mac))
+            return False
+
+        self.logger.info(f"Slice {slice_name} rules installed along path: {path} (VLAN {group['vid']})")
+        return True
+
+    def delete_slice_path_flows(self, path, src_mac, dst_mac, slice_name):
+        """
+        Removes a flow from the slice pipeline rules of its slice along the given path.
+        The classification rule of the flow is deleted, the shared rules are deleted with the last
+        flow using them.
+        Args:
+            path (list): List of switch IDs in the path.
+            src_mac (str): Source MAC address.
+            dst_mac (str): Destination MAC address.
+            slice_name (str): Slice of the flow.
+        """
+        key = (slice_name, tuple(path))
+        group = self.slice_paths.get(key)
+        if group is None or (src_mac, dst_mac) not in group["members"]:
+            return  # The rules were never installed
+        member = group["members"].pop((src_mac, dst_mac))
+        vid = group["vid"]
+
+        try:
+            ingress = self.get_datapath(path[0])
+            parser = ingress.ofproto_parser
+            self._delete_flow(ingress, parser.OFPMatch(in_port=member["in_port"], eth_src=src_mac, eth_dst=dst_mac),
+                              priority=1, strict=True)
+
+            if not group["members"]:
+                del self.slice_paths[key]
+                self._delete_flow(ingress, parser.OFPMatch(metadata=(vid, SLICE_METADATA_MASK)),
+                                  priority=1, strict=True, table_id=SLICE_TAG_TABLE)
+                for dpid in path[:-1]:
+                    datapath = self.get_datapath(dpid)
+                    for table_id in self._slice_tables(group):
+                        self._delete_flow(datapath, self._slice_match(datapath, vid), priority=1, strict=True,
+                                          table_id=table_id)
+
+            # The egress rules are shared by the flows of the slice towards the same host
+            if all(other_dst != dst_mac for _, other_dst in group["members"]):
+                egress = self.get_datapath(path[-1])
+                for table_id in self._slice_tables(group):
+                    self._delete_flow(egress, self._slice_match(egress, vid, dst_mac), priority=1, strict=True,
+                                      table_id=table_id)
+        except KeyError as e:
+            self.logger.error(f"Switch not found on path {path}: {e}")
+            return
+
+        self.logger.info(f"Slice {slice_name} rules updated along path: {path} (VLAN {vid})")
+
+    def _slice_tables(self, group):
+        # Tables holding the shared rules of a (slice, path)
+        if group["rate_limiter"] == "meter":
+            return (FORWARDING_TABLE,)
+        return (FORWARDING_TABLE, QOS_TABLE)
+
+    def _slice_match(self, datapath, vid, dst_mac=None):
+        parser = datapath.ofproto_parser
+        vlan_vid = datapath.ofproto.OFPVID_PRESENT | vid
+        if dst_mac is None:
+            return parser.OFPMatch(vlan_vid=vlan_vid)
+        return parser.OFPMatch(vlan_vid=vlan_vid, eth_dst=dst_mac)
+
+    def _install_slice_forwarding(self, path, vid):
+        """
+        Installs the tagging rule of a (slice, path) on its ingress switch and its forwarding rules
+        up to the egress switch.
+        """
+        ingress = self.get_datapath(path[0])
+        parser = ingress.ofproto_parser
+        ofproto = ingress.ofproto
+        actions = [parser.OFPActionPushVlan(ether_types.ETH_TYPE_8021Q),
+                   parser.OFPActionSetField(vlan_vid=ofproto.OFPVID_PRESENT | vid)]
+        inst = [parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS, actions),
+                parser.OFPInstructionGotoTable(FORWARDING_TABLE)]
+        self.add_flow(ingress, 1, parser.OFPMatch(metadata=(vid, SLICE_METADATA_MASK)), None,
+                      table_id=SLICE_TAG_TABLE, instructions=inst)
+
+        for i in range(len(path) - 1):
+            datapath = self.get_datapath(path[i])
+            parser = datapath.ofproto_parser
+            ofproto = datapath.ofproto
+            out_port = self.links[(path[i], path[i + 1])]["src_port"]
+            inst = [parser.OFPInstructionActions(ofproto.OFPIT_WRITE_ACTIONS, [parser.OFPActionOutput(out_port)]),
+                    parser.OFPInstructionGotoTable(QOS_TABLE)]
+            self.add_flow(datapath, 1, self._slice_match(datapath, vid), None, table_id=FORWARDING_TABLE,
+                          instructions=inst)
+
+    def _install_slice_egress(self, dpid, vid, dst_mac, dst_port):
+        """
+        Installs the rule popping the tag of a (slice, path) towards a destination host.
+        """
+        datapath = self.get_datapath(dpid)
+        parser = datapath.ofproto_parser
+        ofproto = datapath.ofproto
+        actions = [parser.OFPActionPopVlan(), parser.OFPActionOutput(dst_port)]
+        inst = [parser.OFPInstructionActions(ofproto.OFPIT_WRITE_ACTIONS, actions),
+                parser.OFPInstructionGotoTable(QOS_TABLE)]
+        self.add_flow(datapath, 1, self._slice_match(datapath, vid, dst_mac), None, table_id=FORWARDING_TABLE,
+                      instructions=inst)
+
+    def _install_slice_qos(self, key, dst_mac=None):
+        """
+        Installs the QoS rules of a (slice, path), sending its traffic to the queue of the slice
+        on every port (the child of the port HTB root class guaranteed the slice rate).
+        Only the egress rule towards dst_mac is installed when it is given.
+        """
+        slice_name, path = key
+        group = self.slice_paths[key]
+        if group["rate_limiter"] == "meter":
+            return
+        vid = group["vid"]
+
+        if dst_mac is None:
+            for i in range(len(path) - 1):
+                datapath = self.get_datapath(path[i])
+                out_port = self.links[(path[i], path[i + 1])]["src_port"]
+                self._add_qos_flow(datapath, self._slice_match(datapath, vid), out_port, slice_name)
+
+        egress = self.get_datapath(path[-1])
+        for (_, member_dst), member in group["members"].items():
+            if dst_mac is None or member_dst == dst_mac:
+                self._add_qos_flow(egress, self._slice_match(egress, vid, member_dst), member["dst_port"], slice_name)
+
+    def _add_qos_flow(self, datapath, match, port, slice_name):
+        parser = datapath.ofproto_parser
+        network_slice = self.slices[slice_name]
+        queue_id = self.get_or_create_queue_id(datapath.id, port, network_slice.guaranteed, network_slice.max_rate,
+                                               network_slice.priority, owner=slice_name)
+        inst = [parser.OFPInstructionActions(datapath.ofproto.OFPIT_WRITE_ACTIONS,
+                                             [parser.OFPActionSetQueue(queue_id)])]
+        self.add_flow(datapath, 1, match, None, table_id=QOS_TABLE, instructions=inst)
+
+    def add_meter(self, datapath, key, bandwidth):
+        """
+        Creates a meter dropping the traffic above the bandwidth.
+        Args:
+            datapath: The switch of the meter
+            key: Identifier of the metered flow, to delete the meter
+            bandwidth (float): Rate of the meter in Mbps
+        Returns:
+            int: The meter ID
+        """
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+        command = ofproto.OFPMC_ADD
+        if self.flow_meters.get(key, (None, None))[0] == datapath.id:
+            # The flow is installed again, update its meter
+            command = ofproto.OFPMC_MODIFY
+            meter_id = self.flow_meters[key][1]
+        else:
+            self.delete_meter(key)
+            used = self.meter_ids.setdefault(datapath.id, set())
+            meter_id = next(meter_id for meter_id in itertools.count(1) if meter_id not in used)
+            used.add(meter_id)
+            self.flow_meters[key] = (datapath.id, meter_id)
+
+        rate = int(bandwidth * 1000)  # kbps
+        bands = [parser.OFPMeterBandDrop(rate=rate, burst_size=max(int(rate * METER_BURST), 1))]
+        mod = parser.OFPMeterMod(datapath=datapath, command=command,
+                                 flags=ofproto.OFPMF_KBPS | ofproto.OFPMF_BURST, meter_id=meter_id, bands=bands)
+        self.logger.info(f"Creating meter {meter_id} on Switch {datapath.id} ({bandwidth} Mbps)")
+        datapath.send_msg(mod)
+        return meter_id
+
+    def delete_meter(self, key):
+        """
+        Deletes the meter of a flow, if it has one.
+        """
+        if key not in self.flow_meters:
+            return
+        dpid, meter_id = self.flow_meters.pop(key)
+        self.meter_ids[dpid].discard(meter_id)
+        datapath = self.datapaths.get(dpid)
+        if datapath is None:
+            return
+        ofproto = datapath.ofproto
+        mod = datapath.ofproto_parser.OFPMeterMod(datapath=datapath, command=ofproto.OFPMC_DELETE, meter_id=meter_id)
+        self.logger.info(f"Deleting meter {meter_id} on Switch {dpid}")
+        datapath.send_msg(mod)
+
+    def add_group(self, datapath, key, buckets):
+        """
+        Creates a fast-failover group, forwarding on the first bucket whose watched port is up.
+        Args:
+            datapath: The switch of the group
+            key: Identifier of the protected flow, to delete the group
+            buckets (list): OFPBucket list, in order of preference
+        Returns:
+            int: The group ID
+        """
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+        command = ofproto.OFPGC_ADD
+        if self.flow_groups.get(key, (None, None))[0] == datapath.id:
+            # The flow is installed again, update its group
+            command = ofproto.OFPGC_MODIFY
+            group_id = self.flow_groups[key][1]
+        else:
+            self.delete_group(key)
+            used = self.group_ids.setdefault(datapath.id, set())
+            group_id = next(group_id for group_id in itertools.count(1) if group_id not in used)
+            used.add(group_id)
+            self.flow_groups[key] = (datapath.id, group_id)
+
+        mod = parser.OFPGroupMod(datapath=datapath, command=command, type_=ofproto.OFPGT_FF, group_id=group_id,
+                                 buckets=buckets)
+        self.logger.info(f"Creating fast-failover group {group_id} on Switch {datapath.id}")
+        datapath.send_msg(mod)
+        return group_id
+
+    def delete_group(self, key):
+        """
+        Deletes the fast-failover group of a flow, if it has one.
+        """
+        if key not in self.flow_groups:
+            return
+        dpid, group_id = self.flow_groups.pop(key)
+        self.group_ids[dpid].discard(group_id)
+        datapath = self.datapaths.get(dpid)
+        if datapath is None:
+            return
+        ofproto = datapath.ofproto
+        mod = datapath.ofproto_parser.OFPGroupMod(datapath=datapath, command=ofproto.OFPGC_DELETE, group_id=group_id)
+        self.logger.info(f"Deleting group {group_id} on Switch {dpid}")
+        datapath.send_msg(mod)
+
+    def table_occupancy(self):
+        """
+        Counts the rules the allocator installed on each switch (the table-miss and pipeline
+        default rules excluded), to compare the per host pair rules with the slice rules.
+        Returns:
+            dict: {switch ID: number of rules}
+        """
+        occupancy = {dpid: 0 for dpid in self.datapaths}
+
+        def count(dpid, rules):
+            occupancy[dpid] = occupancy.get(dpid, 0) + rules
+
+        for reservation in self.flow_reservations.values():
+            path = reservation["path"]
+            if not reservation["installed"] or (reservation["slice"] is not None and len(path) > 1):
+                continue
+            for dpid in path + (reservation["backup"] or [])[1:-1]:
+                count(dpid, 2)  # one rule per direction
+        for (slice_name, path), group in self.slice_paths.items():
+            tables = len(self._slice_tables(group))
+            count(path[0], len(group["members"]) + 1)  # classification and tagging
+            for dpid in path[:-1]:
+                count(dpid, tables)  # forwarding and QoS
+            count(path[-1], tables * len({dst_mac for _, dst_mac in group["members"]}))
+        return occupancy
+
+    def show_link_load(self):
+        """
+        Returns the rate measured on each link against its capacity.
+        Returns:
+            dict: {"src-dst": {"rate", "capacity", "reserved"}} in Mbps
+        """
+        return {f"{src}-{dst}": {"rate": rate,
+                                 "capacity": self.link_capacity.get((src, dst)),
+                                 "reserved": self.link_capacity.get((src, dst), 0)
+                                 - self.flow_capacity.get((src, dst), 0)}
+                for (src, dst), rate in sorted(self.link_load.items())}
+
+    def get_or_create_queue_id(self, dpid, port, bandwidth, max_rate=None, priority=None, owner=None):
+        """
+        Returns the queue of a port with the given rates, creating it if needed.
+        The queues are the children of the HTB root class of the port, whose rate is the port capacity.
+        Args:
+            dpid (int): Switch ID
+            port (int): Port number
+            bandwidth (float): Guaranteed rate of the queue (Mbps)
+            max_rate (float): Ceiling of the queue (Mbps), defaults to the guaranteed rate
+            priority (int): HTB priority of the queue
+            owner (str): Slice owning the queue, the slice queues are shared by all its flows and
+                updated when the slice is resized
+        """
         key = (dpid, port)
+        if max_rate is None:
+            max_rate = bandwidth
         
         # Initialize queues on this port if not already done
         if key not in self.qos_queues:
             self.qos_queues[key] = {}
         
         # Return existing queue ID if the bandwidth already exists
-        for qid, bw in self.qos_queues[key].items():
-            if bw == bandwidth:
+        for qid, queue in self.qos_queues[key].items():
+            if queue["owner"] == owner and (owner is not None or (queue["min_rate"], queue["max_rate"]) == (bandwidth, max_rate)):
                 return qid
 
         # Otherwise, create a new queue ID (per-port)
         queue_id = max(self.qos_queues[key].keys(), default=0) + 1
-        self.qos_queues[key][queue_id] = bandwidth
+        self.qos_queues[key][queue_id] = {"min_rate": bandwidth, "max_rate": max_rate, "priority": priority, "owner": owner}
+
+        self.logger.info(f"Creating/updating QoS on s{dpid}-eth{port} with queue {queue_id} ({bandwidth} Mbps)")
+        self._apply_port_qos(dpid, port)
+
+        return queue_id
+
+    def _port_rate(self, dpid, port):
+        # Capacity of the link behind a switch port (Mbps)
+        for (src, dst), link in self.links.items():
+            if src == dpid and link["src_port"] == port and (src, dst) in self.link_capacity:
+                return self.link_capacity[(src, dst)]
+        return DEFAULT_PORT_RATE
+
+    def _apply_port_qos(self, dpid, port):
+        """
+        Recreates the QoS configuration of a port with all its queues.
+        """
+        queues = self.qos_queues.get((dpid, port))
+        if not queues:
+            os.system(f"sudo ovs-vsctl clear Port s{dpid}-eth{port} qos")
+            return
 
         # --- Build the full queue mapping for this port ---
-        queue_refs = ",".join([f"{qid}=@q{qid}" for qid in self.qos_queues[key]])
+        queue_refs = ",".join([f"{qid}=@q{qid}" for qid in queues])
         
         # --- Build the queue creation commands ---
         queue_creations = " ".join([
-            f"-- --id=@q{qid} create Queue other-config:min-rate={bw * 1000000} other-config:max-rate={bw * 1000000} "
-            for qid, bw in self.qos_queues[key].items()
+            f"-- --id=@q{qid} create Queue other-config:min-rate={int(queue['min_rate'] * 1000000)} "
+            f"other-config:max-rate={int(queue['max_rate'] * 1000000)}"
+            + (f" other-config:priority={queue['priority']}" if queue["priority"] is not None else "")
+            for qid, queue in queues.items()
         ])
 
         # Full OVS command: recreate QoS config with all queues attached
         ovs_cmd = (
             f"sudo ovs-vsctl -- set Port s{dpid}-eth{port} qos=@newqos "
-            f"-- --id=@newqos create QoS type=linux-htb other-config:max-rate=1000000"
+            f"-- --id=@newqos create QoS type=linux-htb other-config:max-rate={int(self._port_rate(dpid, port) * 1000000)} "
             f"queues={{{queue_refs}}} {queue_creations}"
         )
-
-        self.logger.info(f"Creating/updating QoS on s{dpid}-eth{port} with queue {queue_id} ({bandwidth} Mbps)")
         os.system(ovs_cmd)
 
-        return queue_id
+    def _update_slice_queues(self, slice_name):
+        """
+        Updates the queues of a slice on every port after it is resized, or removes them once it is deleted.
+        """
+        network_slice = self.slices.get(slice_name)
+        for (dpid, port), queues in self.qos_queues.items():
+            changed = False
+            for qid, queue in list(queues.items()):
+                if queue["owner"] != slice_name:
+                    continue
+                if network_slice is None:
+                    del queues[qid]
+                else:
+                    queue.update(min_rate=network_slice.guaranteed, max_rate=network_slice.max_rate,
+                                 priority=network_slice.priority)
+                changed = True
+            if changed:
+                self._apply_port_qos(dpid, port)
  
     def get_datapath(self, switch_id):
         """
@@ -660,6 +2284,57 @@ class FlowAllocator(app_manager.RyuApp):
         """        
         return self.datapaths[switch_id]
 
+    @set_ev_cls(ofp_event.EventOFPFlowRemoved, MAIN_DISPATCHER)
+    def flow_removed_handler(self, ev):
+        """
+        Releases the reservation whose rule timed out on a switch.
+        The other rules of the reservation are deleted along with it, their own OFPFlowRemoved
+        messages then carry a cookie that no longer maps to a reservation and are ignored.
+        Parameters:
+            ev (EventOFPFlowRemoved): Event object containing the flow removed message from the switch
+        """
+        msg = ev.msg
+        ofproto = msg.datapath.ofproto
+        key = self.cookie_to_reservation.get(msg.cookie & RESERVATION_COOKIE_MASK)
+        if key is None:
+            return
+
+        reasons = {
+            ofproto.OFPRR_IDLE_TIMEOUT: "idle timeout",
+            ofproto.OFPRR_HARD_TIMEOUT: "hard timeout",
+            ofproto.OFPRR_DELETE: "deleted",
+        }
+        src_mac, dst_mac = key
+        self.logger.info(f"Flow removed on Switch {msg.datapath.id} ({reasons.get(msg.reason, msg.reason)}), "
+                         f"releasing reservation: {src_mac} -> {dst_mac}")
+        self.delete_flow(src_mac, dst_mac)
+
+    @set_ev_cls(stats_event.EventFlowRates)
+    def flow_rates_handler(self, ev):
+        """
+        Records the rate of the reservations starting at a switch, measured by the stats service on the
+        rules tagged with their cookie. The reverse direction rules, whose cookie has REVERSE_COOKIE set,
+        map to no reservation and are left out.
+        Parameters:
+            ev (EventFlowRates): Rates of the flows of a switch, keyed by cookie
+        """
+        for cookie, rate in ev.to_dict("byte_count").items():
+            key = self.cookie_to_reservation.get(cookie)
+            if key is not None and self.flow_reservations[key]["path"][0] == ev.dpid:
+                self.flow_rates[key] = rate * 8 / 1e6
+
+    @set_ev_cls(stats_event.EventPortRates)
+    def port_rates_handler(self, ev):
+        """
+        Records the rate sent on the links of a switch, measured by the stats service on their ports.
+        Parameters:
+            ev (EventPortRates): Rates of the ports of a switch, keyed by port number
+        """
+        rates = ev.to_dict("tx_bytes")
+        for (src, dst), link in self.links.items():
+            if src == ev.dpid and link["src_port"] in rates:
+                self.link_load[(src, dst)] = rates[link["src_port"]] * 8 / 1e6
+
     @set_ev_cls(ofp_event.EventOFPPacketIn, MAIN_DISPATCHER)
     def packet_in_handler(self, ev):
         """
@@ -681,16 +2356,16 @@ class FlowAllocator(app_manager.RyuApp):
         ofproto = dp.ofproto
         in_port = msg.match["in_port"]
 
-        pkt = packet.Packet(msg.data)
-        eth = pkt.get_protocol(ethernet.ethernet)
+        # Only the Ethernet header is needed, unpacked without parsing the whole packet
+        eth = header_view.HeaderView(msg.data, depth=header_view.ETHERNET)
         
         if eth.ethertype in [ether_types.ETH_TYPE_LLDP, ether_types.ETH_TYPE_IPV6]:
             return  # Ignore LLDP and IPv6 packets 
         
-        src_mac = eth.src
-        dst_mac = eth.dst
+        src_mac = eth.eth_src
+        dst_mac = eth.eth_dst
     
-        self.logger.info(f"PacketIn received: {eth.src} -> {eth.dst} on Switch {dpid}, Port {in_port}")
+        self.logger.info(f"PacketIn received: {src_mac} -> {dst_mac} on Switch {dpid}, Port {in_port}")
         
         installed = self.check_reservation(src_mac, dst_mac)
 
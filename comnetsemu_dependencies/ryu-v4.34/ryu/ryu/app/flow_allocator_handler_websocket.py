@@ -1,5 +1,6 @@
 import asyncio
 import json
+import time
 import websockets
 
 
@@ -29,6 +30,14 @@ class FlowWebSocketHandler:
         - allocate_flow: Allocates bandwidth for a flow between source and destination
         - show_reservation: Displays current flow reservations
         - delete_flow: Removes an existing flow
+        - table_occupancy: Number of allocator rules installed on each switch
+        - link_load: Rate measured on each link by the stats service, against its capacity
+        - create_slice, resize_slice, delete_slice: Manage the slices and their bandwidth envelope
+        - show_slices: Displays the slices and their flows
+        - book_flow, cancel_booking, show_bookings: Manage the advance reservations, booked for a time window
+          given by `start`/`end` (seconds since the epoch) or `delay`/`duration` (seconds from now)
+        - show_recoveries: Displays the last link failure recoveries and how long they took
+        - path_cache: Displays the path cache counters and hit ratio
         - dump_flows: Shows OpenFlow rules for a specific switch
         Args:
             websocket: The WebSocket connection object
@@ -45,32 +54,122 @@ class FlowWebSocketHandler:
                     await websocket.send(json.dumps(error_response))
                     continue
 
-                command = data.get("command", "").lower()
-                if command == "allocate_flow":
-                    src = data.get("src")
-                    dst = data.get("dst")
-                    bandwidth = data.get("bandwidth")
-                    self.logger.info(f"Recieved allocate_flow: src={src}, dst={dst}, bandwidth={bandwidth}")
-                    if self.flow_allocator.allocate_flow(src, dst, bandwidth):
-                        response = {"status": "success", "command": "allocate_flow"}
+                # The allocator threads (calendar, expiry) change the same state
+                with self.flow_allocator.lock:
+                    command = data.get("command", "").lower()
+                    if command == "allocate_flow":
+                        src = data.get("src")
+                        dst = data.get("dst")
+                        bandwidth = data.get("bandwidth")
+                        proactive = data.get("proactive")
+                        lifetime = data.get("lifetime", 0)
+                        idle_timeout = data.get("idle_timeout", 0)
+                        slice_name = data.get("slice")
+                        rate_limiter = data.get("rate_limiter")
+                        priority = data.get("priority", 0)
+                        admission = data.get("admission")
+                        protection = data.get("protection")
+                        path_policy = data.get("path_policy")
+                        max_delay = data.get("max_delay")
+                        self.logger.info(f"Recieved allocate_flow: src={src}, dst={dst}, bandwidth={bandwidth}, "
+                                         f"proactive={proactive}, lifetime={lifetime}, idle_timeout={idle_timeout}, "
+                                         f"slice={slice_name}, rate_limiter={rate_limiter}, priority={priority}, "
+                                         f"admission={admission}, protection={protection}, path_policy={path_policy}, "
+                                         f"max_delay={max_delay}")
+                        if self.flow_allocator.allocate_flow(src, dst, bandwidth, proactive, lifetime, idle_timeout,
+                                                             slice_name, rate_limiter, priority, admission, protection,
+                                                             path_policy, max_delay):
+                            response = {"status": "success", "command": "allocate_flow"}
+                            # Reservations moved out of the way of this one
+                            reservation = self.flow_allocator.flow_reservations.get((src, dst))
+                            if reservation and (reservation["preempted"] or reservation["rerouted"]):
+                                response["result"] = {"preempted": reservation["preempted"],
+                                                      "rerouted": reservation["rerouted"]}
+                        else:
+                            response = {"status": "error", "reason": "Insufficient capacity",
+                                        "command": "allocate_flow"}
+                    elif command == "show_reservation":
+                        try: 
+                            reservations= self.flow_allocator.show_reservation()
+                            response = {"status": "success", "command": "show_reservation", "result": reservations}
+                        except Exception as e:
+                            response = {"status": "error", "reason": str(e), "command": "show_reservation"}
+                    elif command == "delete_flow":
+                        src = data.get("src")
+                        dst = data.get("dst")
+                        self.logger.info(f"Recieved delete_flow: src={src}, dst={dst}")
+                        if self.flow_allocator.delete_flow(src, dst):
+                            response = {"status": "success", "command": "delete_flow"}
+                        else:
+                            response = {"status": "error", "reason": "Flow not found", "command": "delete_flow"}
+                    elif command == "create_slice":
+                        name = data.get("name")
+                        self.logger.info(f"Recieved create_slice: {data}")
+                        if self.flow_allocator.create_slice(name, data.get("tenant"), data.get("guaranteed"),
+                                                            data.get("max_rate"), data.get("priority", 0),
+                                                            data.get("hosts", []), data.get("rate_limiter")):
+                            response = {"status": "success", "command": "create_slice"}
+                        else:
+                            response = {"status": "error", "reason": "Slice rejected", "command": "create_slice"}
+                    elif command == "resize_slice":
+                        name = data.get("name")
+                        self.logger.info(f"Recieved resize_slice: {data}")
+                        if self.flow_allocator.resize_slice(name, data.get("guaranteed"), data.get("max_rate"),
+                                                            data.get("priority")):
+                            response = {"status": "success", "command": "resize_slice"}
+                        else:
+                            response = {"status": "error", "reason": "Resize rejected", "command": "resize_slice"}
+                    elif command == "delete_slice":
+                        name = data.get("name")
+                        self.logger.info(f"Recieved delete_slice: name={name}")
+                        if self.flow_allocator.delete_slice(name):
+                            response = {"status": "success", "command": "delete_slice"}
+                        else:
+                            response = {"status": "error", "reason": "Slice not found", "command": "delete_slice"}
+                    elif command == "show_slices":
+                        response = {"status": "success", "command": "show_slices",
+                                    "result": self.flow_allocator.show_slices()}
+                    elif command == "book_flow":
+                        self.logger.info(f"Recieved book_flow: {data}")
+                        start = data.get("start", time.time() + float(data.get("delay", 0)))
+                        end = data.get("end", start + float(data.get("duration", 0)))
+                        booking_id = self.flow_allocator.book_flow(data.get("src"), data.get("dst"),
+                                                                   data.get("bandwidth"), start, end,
+                                                                   data.get("rate_limiter"),
+                                                                   data.get("priority", 0), data.get("path_policy"),
+                                                                   data.get("max_delay"))
+                        if booking_id:
+                            response = {"status": "success", "command": "book_flow", "result": {"id": booking_id}}
+                        else:
+                            response = {"status": "error", "reason": "Insufficient capacity during the window",
+                                        "command": "book_flow"}
+                    elif command == "cancel_booking":
+                        booking_id = data.get("id")
+                        self.logger.info(f"Recieved cancel_booking: id={booking_id}")
+                        if self.flow_allocator.cancel_booking(booking_id):
+                            response = {"status": "success", "command": "cancel_booking"}
+                        else:
+                            response = {"status": "error", "reason": "Advance reservation not found",
+                                        "command": "cancel_booking"}
+                    elif command == "show_bookings":
+                        response = {"status": "success", "command": "show_bookings",
+                                    "result": {str(booking_id): booking
+                                               for booking_id, booking in self.flow_allocator.show_bookings().items()}}
+                    elif command == "show_recoveries":
+                        response = {"status": "success", "command": "show_recoveries",
+                                    "result": self.flow_allocator.show_recoveries()}
+                    elif command == "path_cache":
+                        response = {"status": "success", "command": "path_cache",
+                                    "result": self.flow_allocator.path_cache_stats()}
+                    elif command == "table_occupancy":
+                        occupancy = self.flow_allocator.table_occupancy()
+                        response = {"status": "success", "command": "table_occupancy",
+                                    "result": {str(dpid): count for dpid, count in sorted(occupancy.items())}}
+                    elif command == "link_load":
+                        response = {"status": "success", "command": "link_load",
+                                    "result": self.flow_allocator.show_link_load()}
                     else:
-                        response = {"status": "error", "reason": "Insufficient capacity", "command": "allocate_flow"}
-                elif command == "show_reservation":
-                    try: 
-                        reservations= self.flow_allocator.show_reservation()
-                        response = {"status": "success", "command": "show_reservation", "result": reservations}
-                    except Exception as e:
-                        response = {"status": "error", "reason": str(e), "command": "show_reservation"}
-                elif command == "delete_flow":
-                    src = data.get("src")
-                    dst = data.get("dst")
-                    self.logger.info(f"Recieved delete_flow: src={src}, dst={dst}")
-                    if self.flow_allocator.delete_flow(src, dst):
-                        response = {"status": "success", "command": "delete_flow"}
-                    else:
-                        response = {"status": "error", "reason": "Flow not found", "command": "delete_flow"}
-                else:
-                    response = {"status": "error", "reason": "Unknown command"}
+                        response = {"status": "error", "reason": "Unknown command"}
                 await websocket.send(json.dumps(response))
 
 
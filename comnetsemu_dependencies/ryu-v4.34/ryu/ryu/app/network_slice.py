@@ -0,0 +1,52 @@
+class NetworkSlice:
+    def __init__(self, name, tenant, guaranteed, max_rate, priority, hosts, rate_limiter="queue"):
+        """
+        A slice owning a bandwidth envelope shared by the flows of its member hosts.
+        The guaranteed rate is carved out of the capacity of every link of the slice, the flows
+        of the slice are admitted against what is left of it on the links of their path.
+        :param name: Name of the slice.
+        :param tenant: Tenant owning the slice.
+        :param guaranteed: Rate guaranteed to the slice on each of its links (Mbps).
+        :param max_rate: Rate the slice may reach by borrowing unused capacity (Mbps).
+        :param priority: HTB priority of the slice queues, lower is served first when borrowing.
+        :param hosts: MAC addresses of the member hosts.
+        :param rate_limiter: How the flows of the slice are enforced, "queue" or "meter".
+        """
+        self.name = name
+        self.tenant = tenant
+        self.guaranteed = guaranteed
+        self.max_rate = max_rate
+        self.priority = priority
+        self.hosts = set(hosts)
+        self.rate_limiter = rate_limiter
+        self.links = set()  # links carved out for the slice, both directions
+        self.used = {}  # link -> bandwidth reserved by the slice flows
+
+    def headroom(self, link):
+        """
+        Bandwidth of the slice envelope still free on a link.
+        """
+        if link not in self.links:
+            return 0
+        return self.guaranteed - self.used.get(link, 0)
+
+    def capacities(self):
+        """
+        Free bandwidth of the slice envelope on each of its links, as PathFinder link capacities.
+        """
+        return {link: self.headroom(link) for link in self.links}
+
+    def max_used(self):
+        return max(self.used.values(), default=0)
+
+    def to_dict(self):
+        return {
+            "tenant": self.tenant,
+            "guaranteed": self.guaranteed,
+            "max_rate": self.max_rate,
+            "priority": self.priority,
+            "hosts": sorted(self.hosts),
+            "rate_limiter": self.rate_limiter,
+            "links": sorted([list(link) for link in self.links]),
+            "used": {f"{u}-{v}": bandwidth for (u, v), bandwidth in sorted(self.used.items()) if bandwidth},
+        }
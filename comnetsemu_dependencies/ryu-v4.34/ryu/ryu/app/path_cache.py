@@ -0,0 +1,92 @@
+import collections
+import math
+
+
+class PathCache:
+    def __init__(self, bucket=1, max_entries=4096):
+        """
+        Admission decisions of recent requests, keyed by (source switch, destination switch, bandwidth bucket,
+        path policy, delay bound), so that retried or repeated requests skip the path search.
+        A cached path stays valid until a link it crosses changes: the links index the entries crossing them,
+        and a capacity change drops those entries only, changes elsewhere leave the cache alone. A cached path
+        still has the bandwidth, it may no longer be the best one once capacity is released elsewhere.
+        A cached rejection stays valid until capacity is released anywhere (the capacity epoch changes),
+        taking capacity away never makes a rejected request fit.
+        :param bucket: Width of the bandwidth buckets (Mbps).
+        :param max_entries: Entries kept, the least recently used ones are dropped first.
+        """
+        self.bucket = bucket
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()  # key -> (path, bandwidth, links) or (None, bandwidth, epoch)
+        self.link_keys = {}  # link -> keys of the cached paths crossing it
+        self.epoch = 0  # capacity epoch, bumped when capacity is released
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def key(self, src, dst, bandwidth, policy, max_delay=None):
+        return src, dst, math.ceil(bandwidth / self.bucket), policy, max_delay
+
+    def get(self, key, bandwidth):
+        """
+        Returns the cached decision for a request: (path, available bandwidth), (None, 0) for a rejection,
+        or None if the cache cannot tell.
+        """
+        entry = self.entries.get(key)
+        if entry is not None:
+            path, cached_bandwidth, extra = entry
+            if path is not None and cached_bandwidth >= bandwidth:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return path, cached_bandwidth
+            if path is None and extra == self.epoch and bandwidth >= cached_bandwidth:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return None, 0
+        self.misses += 1
+        return None
+
+    def put(self, key, bandwidth, path, available_bandwidth, links=()):
+        """
+        Caches the decision for a request: the path found with its available bandwidth and links,
+        or the rejection of the bandwidth if path is None.
+        """
+        if path is None:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] is None and entry[2] == self.epoch:
+                bandwidth = min(bandwidth, entry[1])
+            self.entries[key] = (None, bandwidth, self.epoch)
+        else:
+            links = frozenset(links)
+            self.entries[key] = (path, available_bandwidth, links)
+            for link in links:
+                self.link_keys.setdefault(link, set()).add(key)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, links, released):
+        """
+        Drops the cached paths crossing links whose capacity changed, and the cached rejections
+        if capacity was released.
+        """
+        if released:
+            self.epoch += 1
+        for link in links:
+            for key in self.link_keys.pop(link, ()):
+                entry = self.entries.get(key)
+                # The key may have been cached again since, with a path avoiding the link
+                if entry is not None and entry[0] is not None and link in entry[2]:
+                    del self.entries[key]
+                    self.invalidations += 1
+
+    def stats(self):
+        requests = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / requests if requests else 0,
+            "invalidations": self.invalidations,
+            "epoch": self.epoch,
+        }
@@ -1,5 +1,14 @@
 import heapq
 
+# Path selection policies:
+# - widest: the path with the most bandwidth left on its bottleneck link
+# - widest_shortest: the widest among the paths with the fewest hops
+# - shortest_widest: the path with the fewest hops among the widest ones
+# - min_hop: the path with the fewest hops, then the lowest latency
+# - latency: the path with the lowest latency (sum of the link delays), within an optional bound
+# - load_balance: the path where the reservation takes the smallest share of the bandwidth left
+PATH_POLICIES = ("widest", "widest_shortest", "shortest_widest", "min_hop", "latency", "load_balance")
+
 class PathFinder:
     def __init__(self, link_capacities, logger):
         """
@@ -78,4 +87,120 @@ class PathFinder:
                         heapq.heappush(pq, (-new_bandwidth, neighbor, path + [node]))
 
         self.logger.error("No path found.")
-        return None, 0
\ No newline at end of file
+        return None, 0
+
+    def find_min_cost_path(self, src, dst, link_costs, required_bandwidth=0):
+        """
+        Finds the cheapest path with sufficient bandwidth between src and dst (Dijkstra),
+        the fewest hops first among the paths of the same cost.
+
+        :param src: Source node (switch ID).
+        :param dst: Destination node (switch ID).
+        :param link_costs: Dictionary of link costs {(node1, node2): cost}, missing links cost nothing.
+        :param required_bandwidth: The required bandwidth for the path.
+        :return: Tuple (path, cost), or (None, 0) if no path exists.
+        """
+        src_dpid = src['dpid']
+        dst_dpid = dst['dpid']
+
+        pq = [(0, 0, src_dpid, [src_dpid])]  # (cost, hops, current_node, path)
+        visited = set()
+
+        while pq:
+            cost, hops, node, path = heapq.heappop(pq)
+            if node in visited:
+                continue
+            visited.add(node)
+
+            if node == dst_dpid:
+                self.logger.info(f"Path found: {path}, cost: {cost}")
+                return path, cost
+
+            for neighbor, capacity in self.graph.get(node, {}).items():
+                if neighbor not in visited and capacity >= required_bandwidth:
+                    heapq.heappush(pq, (cost + link_costs.get((node, neighbor), 0), hops + 1, neighbor, path + [neighbor]))
+
+        self.logger.error("No path found.")
+        return None, 0
+
+    def find_path(self, src, dst, required_bandwidth=0, policy="widest", link_delays=None, max_delay=None):
+        """
+        Finds a path with sufficient bandwidth between src and dst following a path policy (see PATH_POLICIES).
+        Only the links with the required bandwidth are considered, the policies are lexicographic orders
+        of the path metrics (hops, delay, cost, bottleneck bandwidth) searched with a single Dijkstra.
+
+        :param src: Source node (switch ID).
+        :param dst: Destination node (switch ID).
+        :param required_bandwidth: The required bandwidth for the path.
+        :param policy: Path policy, "widest" by default.
+        :param link_delays: Dictionary of link delays {(node1, node2): ms}, missing links have none.
+        :param max_delay: Bound of the path delay (ms) of the latency policy.
+        :return: Tuple (path, bandwidth), or (None, 0) if no path exists.
+        """
+        if policy == "widest":
+            return self.find_max_bandwidth_path(src, dst, required_bandwidth)
+        delays = link_delays or {}
+
+        if policy == "shortest_widest":
+            # The widest bandwidth first, then the fewest hops among the links having it
+            path, bandwidth = self.find_max_bandwidth_path(src, dst, required_bandwidth)
+            if not path:
+                return None, 0
+            return self._lexicographic_path(src, dst, bandwidth, lambda u, v, capacity: (1,))
+        if policy == "widest_shortest":
+            return self._lexicographic_path(src, dst, required_bandwidth, lambda u, v, capacity: (1,))
+        if policy == "min_hop":
+            return self._lexicographic_path(src, dst, required_bandwidth,
+                                            lambda u, v, capacity: (1, delays.get((u, v), 0)))
+        if policy == "latency":
+            path, bandwidth = self._lexicographic_path(src, dst, required_bandwidth,
+                                                       lambda u, v, capacity: (delays.get((u, v), 0), 1))
+            if path and max_delay is not None and self.path_delay(path, delays) > max_delay:
+                self.logger.error(f"No path within {max_delay} ms.")
+                return None, 0
+            return path, bandwidth
+        if policy == "load_balance":
+            return self._lexicographic_path(src, dst, required_bandwidth,
+                                            lambda u, v, capacity: (required_bandwidth / capacity if capacity else 0, 1))
+        raise ValueError(f"Unknown path policy: {policy}")
+
+    def _lexicographic_path(self, src, dst, required_bandwidth, link_metrics):
+        """
+        Dijkstra on path labels compared lexicographically: the metrics added by each link
+        (link_metrics(node1, node2, capacity) returns a tuple), then the widest bottleneck.
+        Extending a path keeps the order of the labels, so the first label reaching dst is the best.
+
+        :return: Tuple (path, bandwidth), or (None, 0) if no path exists.
+        """
+        src_dpid = src['dpid']
+        dst_dpid = dst['dpid']
+
+        pq = [((), -float('inf'), src_dpid, [src_dpid])]  # (metrics, -bandwidth, current_node, path)
+        visited = set()
+
+        while pq:
+            metrics, bandwidth, node, path = heapq.heappop(pq)
+            if node in visited:
+                continue
+            visited.add(node)
+
+            if node == dst_dpid:
+                bandwidth = -bandwidth
+                self.logger.info(f"Path found: {path}, bandwidth: {bandwidth}")
+                return path, bandwidth
+
+            for neighbor, capacity in self.graph.get(node, {}).items():
+                if neighbor not in visited and capacity >= required_bandwidth:
+                    added = link_metrics(node, neighbor, capacity)
+                    new_metrics = tuple(a + b for a, b in zip(metrics, added)) if metrics else added
+                    heapq.heappush(pq, (new_metrics, max(bandwidth, -capacity), neighbor, path + [neighbor]))
+
+        self.logger.error("No path found.")
+        return None, 0
+
+    @staticmethod
+    def path_delay(path, link_delays):
+        """
+        Sum of the delays (ms) of the links of a path.
+        """
+        return sum(link_delays.get((path[i], path[i + 1]), 0) for i in range(len(path) - 1))
\ No newline at end of file
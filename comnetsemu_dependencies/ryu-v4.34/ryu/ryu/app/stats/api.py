@@ -0,0 +1,57 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# client for ryu.app.stats.service
+
+from ryu.base import app_manager
+from . import event
+
+
+def get_flow_rates(app, dpid=None, window=1):
+    """
+    Get the latest flow rates (event.EventFlowRates) of datapaths.
+
+    :param app: Client RyuApp instance
+    :param dpid: Datapath ID (int type) or None for all the datapaths
+    :param window: Number of samples the rates are averaged over
+
+    Returns a dict of the rates of each datapath with at least two samples.
+
+    Example::
+
+        # ...(snip)...
+        import ryu.app.stats.api as stats_api
+
+
+        class MyApp(app_manager.RyuApp):
+
+            def _my_handler(self, ev):
+                rates = stats_api.get_flow_rates(self, dpid=1)
+                if 1 in rates:
+                    byte_rates = rates[1].to_dict('byte_count')
+    """
+    return app.send_request(event.EventRatesRequest(
+        event.EventFlowRates, dpid, window)).rates
+
+
+def get_port_rates(app, dpid=None, window=1):
+    """
+    Get the latest port rates (event.EventPortRates) of datapaths.
+
+    Same as get_flow_rates().
+    """
+    return app.send_request(event.EventRatesRequest(
+        event.EventPortRates, dpid, window)).rates
+
+
+app_manager.require_app('ryu.app.stats.service', api_style=True)
@@ -0,0 +1,93 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from ryu.controller import event
+
+
+class EventRatesBase(event.EventBase):
+    """
+    Rates of the counters of a datapath between two stats samples.
+
+    ========= =========================================================
+    Attribute Description
+    ========= =========================================================
+    dpid      Datapath ID
+    timestamp Time of the latest sample
+    interval  Seconds between the two samples
+    keys      Sorted numpy array of the keys (uint64)
+    rates     Numpy array of the rates (per second) of each key, one
+              row per key and one column per counter of ``columns``
+    ========= =========================================================
+    """
+    columns = ()
+
+    def __init__(self, dpid, timestamp, interval, keys, rates):
+        super(EventRatesBase, self).__init__()
+        self.dpid = dpid
+        self.timestamp = timestamp
+        self.interval = interval
+        self.keys = keys
+        self.rates = rates
+
+    def column(self, name):
+        """Returns the rates of the counter name of every key."""
+        return self.rates[:, self.columns.index(name)]
+
+    def to_dict(self, name):
+        """Returns a dict of the rate of the counter name of each key."""
+        return dict(zip(self.keys.tolist(), self.column(name).tolist()))
+
+    def __str__(self):
+        return '%s<dpid=%s, %s keys>' % \
+            (self.__class__.__name__, self.dpid, len(self.keys))
+
+
+class EventFlowRates(EventRatesBase):
+    """
+    Rates of the flows of a datapath, keyed by cookie.
+
+    The counters of the flows sharing a cookie are summed.
+    """
+    columns = ('packet_count', 'byte_count')
+
+
+class EventPortRates(EventRatesBase):
+    """
+    Rates of the ports of a datapath, keyed by port number.
+    """
+    columns = ('rx_packets', 'tx_packets', 'rx_bytes', 'tx_bytes',
+               'rx_dropped', 'tx_dropped', 'rx_errors', 'tx_errors')
+
+
+class EventRatesRequest(event.EventRequestBase):
+    # If dpid is None, reply the rates of all the datapaths
+    def __init__(self, rates_cls, dpid=None, window=1):
+        super(EventRatesRequest, self).__init__()
+        self.dst = 'stats_service'
+        self.rates_cls = rates_cls
+        self.dpid = dpid
+        self.window = window
+
+    def __str__(self):
+        return 'EventRatesRequest<src=%s, %s, dpid=%s>' % \
+            (self.src, self.rates_cls.__name__, self.dpid)
+
+
+class EventRatesReply(event.EventReplyBase):
+    def __init__(self, dst, rates):
+        super(EventRatesReply, self).__init__(dst)
+        self.rates = rates
+
+    def __str__(self):
+        return 'EventRatesReply<dst=%s, %s datapaths>' % \
+            (self.dst, len(self.rates))
@@ -0,0 +1,286 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Stats collection service.
+
+Requests the flow and port stats of all the datapaths every
+``[stats] interval`` seconds, keeps a history of the counters of each
+datapath and sends the rates between the two latest samples to the
+applications observing EventFlowRates and EventPortRates, so that they
+don't have to poll the datapaths themselves.
+
+The counters are read from the raw multipart replies into numpy arrays
+without decoding the stats entries, which is only skipped altogether
+when the datapaths decode lazily (``--ofp-lazy-decoding``).
+"""
+
+import collections
+import struct
+import time
+
+import numpy as np
+
+from ryu import cfg
+from ryu.base import app_manager
+from ryu.controller import ofp_event
+from ryu.controller.handler import MAIN_DISPATCHER, DEAD_DISPATCHER
+from ryu.controller.handler import set_ev_cls
+from ryu.lib import hub
+from ryu.ofproto import ofproto_v1_3
+
+from . import event
+
+
+CONF = cfg.CONF
+
+CONF.register_opts([
+    cfg.FloatOpt('interval', default=10.0,
+                 help='seconds between two stats requests to a datapath'),
+    cfg.IntOpt('history', default=30,
+               help='stats samples kept per datapath')
+], 'stats')
+
+
+_FLOW_STATS_LENGTH = struct.Struct('!H')
+# cookie, packet_count and byte_count of ofp_flow_stats
+_FLOW_STATS_COUNTERS = np.arange(
+    struct.calcsize('!HBxIIHHHH4x'), ofproto_v1_3.OFP_FLOW_STATS_0_SIZE)
+
+_PORT_STATS = np.dtype(
+    [('port_no', '>u4'), ('pad', 'V4')] +
+    [(name, '>u8') for name in (
+        'rx_packets', 'tx_packets', 'rx_bytes', 'tx_bytes', 'rx_dropped',
+        'tx_dropped', 'rx_errors', 'tx_errors', 'rx_frame_err',
+        'rx_over_err', 'rx_crc_err', 'collisions')] +
+    [('duration_sec', '>u4'), ('duration_nsec', '>u4')])
+assert _PORT_STATS.itemsize == ofproto_v1_3.OFP_PORT_STATS_SIZE
+
+
+def parse_flow_stats(buf, offset, end):
+    """
+    Returns the cookies and the counters (one row per entry, one column
+    per counter of EventFlowRates) of the ofp_flow_stats in buf[offset:end].
+    """
+    offsets = []
+    while offset < end:
+        offsets.append(offset)
+        (length,) = _FLOW_STATS_LENGTH.unpack_from(buf, offset)
+        if length < ofproto_v1_3.OFP_FLOW_STATS_0_SIZE:
+            raise ValueError('invalid flow stats length %d' % length)
+        offset += length
+    data = np.frombuffer(buf, np.uint8, end)
+    values = data[np.array(offsets, np.intp)[:, None] +
+                  _FLOW_STATS_COUNTERS].view('>u8')
+    return values[:, 0].astype(np.uint64), values[:, 1:].astype(np.float64)
+
+
+def parse_port_stats(buf, offset, end):
+    """
+    Returns the port numbers and the counters (one row per entry, one
+    column per counter of EventPortRates) of the ofp_port_stats in
+    buf[offset:end].
+    """
+    stats = np.frombuffer(buf, _PORT_STATS,
+                          (end - offset) // _PORT_STATS.itemsize, offset)
+    counters = np.empty((len(stats), len(event.EventPortRates.columns)))
+    for i, name in enumerate(event.EventPortRates.columns):
+        counters[:, i] = stats[name]
+    return stats['port_no'].astype(np.uint64), counters
+
+
+class StatsHistory(object):
+    """
+    History of the counters of a datapath.
+
+    A sample is the time it was taken at, the sorted keys (cookies or port
+    numbers) and an array of the counters of each key, one row per key and
+    one column per counter; the counters of the entries sharing a key are
+    summed.  The oldest samples are dropped beyond size.
+    """
+
+    def __init__(self, columns, size):
+        self.columns = columns
+        self.samples = collections.deque(maxlen=size)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def append(self, timestamp, keys, counters):
+        keys, inverse = np.unique(keys, return_inverse=True)
+        sums = np.empty((len(keys), len(self.columns)))
+        for i in range(len(self.columns)):
+            sums[:, i] = np.bincount(inverse, counters[:, i], len(keys))
+        self.samples.append((timestamp, keys, sums))
+
+    def rates(self, window=1):
+        """
+        Returns the interval, the keys of the latest sample and their rates
+        since the sample window samples before (or the oldest one), or None
+        without two samples taken at different times.
+
+        A key missing from the older sample, or whose counters went down
+        (its flows were replaced), is counted from zero.
+        """
+        window = min(window, len(self.samples) - 1)
+        if window < 1:
+            return None
+        start, old_keys, old = self.samples[-1 - window]
+        end, keys, counters = self.samples[-1]
+        if end <= start:
+            return None
+
+        index = np.searchsorted(old_keys, keys)
+        found = index < len(old_keys)
+        found[found] = old_keys[index[found]] == keys[found]
+        delta = counters.copy()
+        delta[found] -= old[index[found]]
+        reset = delta < 0
+        delta[reset] = counters[reset]
+
+        interval = end - start
+        return interval, keys, delta / interval
+
+
+class _Reply(object):
+    # Multipart reply being received
+    def __init__(self, rates_cls):
+        self.rates_cls = rates_cls
+        self.timestamp = None
+        self.keys = []
+        self.counters = []
+
+
+class StatsService(app_manager.RyuApp):
+    OFP_VERSIONS = [ofproto_v1_3.OFP_VERSION]
+    _EVENTS = [event.EventFlowRates, event.EventPortRates]
+
+    _PARSERS = {
+        event.EventFlowRates: parse_flow_stats,
+        event.EventPortRates: parse_port_stats,
+    }
+
+    def __init__(self, *args, **kwargs):
+        super(StatsService, self).__init__(*args, **kwargs)
+        self.name = 'stats_service'
+        self.interval = self.CONF.stats.interval
+        self.history_size = self.CONF.stats.history
+        self.datapaths = {}
+        # rates class -> dpid -> StatsHistory
+        self.histories = dict((rates_cls, {}) for rates_cls in self._PARSERS)
+        self._xids = {}  # (dpid, rates class) -> xid of the pending request
+        self._replies = {}  # (dpid, xid) -> _Reply
+
+    def start(self):
+        super(StatsService, self).start()
+        self.threads.append(hub.spawn(self._monitor))
+
+    def _monitor(self):
+        while self.is_active:
+            self.request_stats()
+            hub.sleep(self.interval)
+
+    def request_stats(self):
+        """
+        Sends the flow and port stats requests to all the datapaths at
+        once, the replies are handled as they come.
+        """
+        for datapath in list(self.datapaths.values()):
+            ofproto = datapath.ofproto
+            parser = datapath.ofproto_parser
+            self._send_request(event.EventFlowRates,
+                               parser.OFPFlowStatsRequest(datapath))
+            self._send_request(event.EventPortRates,
+                               parser.OFPPortStatsRequest(
+                                   datapath, 0, ofproto.OFPP_ANY))
+
+    def _send_request(self, rates_cls, req):
+        datapath = req.datapath
+        datapath.set_xid(req)
+        old_xid = self._xids.pop((datapath.id, rates_cls), None)
+        if self._replies.pop((datapath.id, old_xid), None) is not None:
+            self.logger.debug('stats: no reply to request %s of %016x',
+                              old_xid, datapath.id)
+        self._xids[(datapath.id, rates_cls)] = req.xid
+        self._replies[(datapath.id, req.xid)] = _Reply(rates_cls)
+        datapath.send_msg(req)
+
+    def _handle_reply(self, msg):
+        dpid = msg.datapath.id
+        reply = self._replies.get((dpid, msg.xid))
+        if reply is None:
+            # requested by another application
+            return
+        if reply.timestamp is None:
+            reply.timestamp = time.time()
+        keys, counters = self._PARSERS[reply.rates_cls](
+            msg.buf, msg.datapath.ofproto.OFP_MULTIPART_REPLY_SIZE,
+            msg.msg_len)
+        reply.keys.append(keys)
+        reply.counters.append(counters)
+        if msg.flags & msg.datapath.ofproto.OFPMPF_REPLY_MORE:
+            return
+
+        del self._replies[(dpid, msg.xid)]
+        del self._xids[(dpid, reply.rates_cls)]
+        histories = self.histories[reply.rates_cls]
+        history = histories.get(dpid)
+        if history is None:
+            history = histories[dpid] = StatsHistory(
+                reply.rates_cls.columns, self.history_size)
+        history.append(reply.timestamp, np.concatenate(reply.keys),
+                       np.concatenate(reply.counters))
+        rates = history.rates()
+        if rates is not None:
+            self.send_event_to_observers(
+                reply.rates_cls(dpid, reply.timestamp, *rates))
+
+    @set_ev_cls(ofp_event.EventOFPStateChange,
+                [MAIN_DISPATCHER, DEAD_DISPATCHER])
+    def _state_change_handler(self, ev):
+        datapath = ev.datapath
+        if ev.state == MAIN_DISPATCHER:
+            self.datapaths[datapath.id] = datapath
+        elif ev.state == DEAD_DISPATCHER:
+            if self.datapaths.get(datapath.id) is not datapath:
+                return
+            del self.datapaths[datapath.id]
+            for histories in self.histories.values():
+                histories.pop(datapath.id, None)
+            for rates_cls in self.histories:
+                xid = self._xids.pop((datapath.id, rates_cls), None)
+                self._replies.pop((datapath.id, xid), None)
+
+    @set_ev_cls(ofp_event.EventOFPFlowStatsReply, MAIN_DISPATCHER)
+    def _flow_stats_reply_handler(self, ev):
+        self._handle_reply(ev.msg)
+
+    @set_ev_cls(ofp_event.EventOFPPortStatsReply, MAIN_DISPATCHER)
+    def _port_stats_reply_handler(self, ev):
+        self._handle_reply(ev.msg)
+
+    @set_ev_cls(event.EventRatesRequest)
+    def _rates_request_handler(self, req):
+        histories = self.histories[req.rates_cls]
+        if req.dpid is None:
+            dpids = list(histories)
+        else:
+            dpids = [req.dpid] if req.dpid in histories else []
+        rates = {}
+        for dpid in dpids:
+            history = histories[dpid]
+            result = history.rates(req.window)
+            if result is not None:
+                rates[dpid] = req.rates_cls(
+                    dpid, history.samples[-1][0], *result)
+        self.reply_to_request(req, event.EventRatesReply(req.src, rates))
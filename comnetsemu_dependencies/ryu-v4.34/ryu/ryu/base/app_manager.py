@@ -33,6 +33,7 @@ import gc
 from ryu import cfg
 from ryu import utils
 from ryu.app import wsgi
+from ryu.base import shard
 from ryu.controller.handler import register_instance, get_dependent_services
 from ryu.controller.controller import Datapath
 from ryu.controller import event
@@ -143,6 +144,17 @@ class RyuApp(object):
     the intersection of their OFP_VERSIONS is used.
     """
 
+    SHARDED = False
+    """
+    Whether this RyuApp can run in every shard with --shards, each
+    instance seeing only the datapaths of its shard.  An application
+    keeping state across datapaths, such as the topology or paths over
+    several switches, can't unless it shares that state with
+    send_event_to_shards.
+    ryu-manager refuses to shard the datapaths if a loaded application
+    doesn't set it.
+    """
+
     @classmethod
     def context_iteritems(cls):
         """
@@ -154,6 +166,8 @@ class RyuApp(object):
         super(RyuApp, self).__init__()
         self.name = self.__class__.__name__
         self.event_handlers = {}        # ev_cls -> handlers:list
+        # (ev_cls, state) -> handlers:tuple, resolved by get_handlers
+        self._state_handlers = {}
         self.observers = {}     # ev_cls -> observer-name -> states:set
         self.threads = []
         self.main_thread = None
@@ -196,12 +210,14 @@ class RyuApp(object):
         assert callable(handler)
         self.event_handlers.setdefault(ev_cls, [])
         self.event_handlers[ev_cls].append(handler)
+        self._state_handlers.clear()
 
     def unregister_handler(self, ev_cls, handler):
         assert callable(handler)
         self.event_handlers[ev_cls].remove(handler)
         if not self.event_handlers[ev_cls]:
             del self.event_handlers[ev_cls]
+        self._state_handlers.clear()
 
     def register_observer(self, ev_cls, name, states=None):
         states = states or set()
@@ -235,11 +251,18 @@ class RyuApp(object):
                       Otherwise, returns only handlers that are interested
                       in the specified state.
                       The default is None.
+
+        The handlers of each event class and state are resolved once,
+        until a handler is registered or unregistered.
         """
         ev_cls = ev.__class__
-        handlers = self.event_handlers.get(ev_cls, [])
         if state is None:
-            return handlers
+            return self.event_handlers.get(ev_cls, [])
+        try:
+            return self._state_handlers[(ev_cls, state)]
+        except KeyError:
+            pass
+        handlers = self.event_handlers.get(ev_cls, [])
 
         def test(h):
             if not hasattr(h, 'callers') or ev_cls not in h.callers:
@@ -252,7 +275,9 @@ class RyuApp(object):
                 return True
             return state in states
 
-        return filter(test, handlers)
+        handlers = tuple(filter(test, handlers))
+        self._state_handlers[(ev_cls, state)] = handlers
+        return handlers
 
     def get_observers(self, ev, state):
         observers = []
@@ -325,6 +350,21 @@ class RyuApp(object):
         for observer in self.get_observers(ev, state):
             self.send_event(observer, ev, state)
 
+    def send_event_to_shards(self, ev, state=None):
+        """
+        Send the specified event to all observers of this RyuApp in every
+        shard.
+
+        The datapaths are sharded across worker processes with --shards.
+        The event is pickled for the other shards, where it is sent by the
+        RyuApp of the same name.  Without shards, this is the same as
+        send_event_to_observers.
+        """
+
+        self.send_event_to_observers(ev, state)
+        if shard.bus is not None:
+            shard.bus.publish(self.name, ev, state)
+
     def reply_to_request(self, req, rep):
         """
         Send a reply for a synchronous request sent by send_request.
@@ -436,6 +476,17 @@ class AppManager(object):
                 app_lists.extend([s for s in set(services)
                                   if s not in app_lists])
 
+    def unsharded_apps(self):
+        """
+        Return the names of the loaded applications, contexts included,
+        which can't run in every shard (see RyuApp.SHARDED).
+        """
+        classes = list(self.applications_cls.values())
+        classes.extend(cls for cls in self.contexts_cls.values()
+                       if issubclass(cls, RyuApp))
+        return sorted(set(cls.__name__ for cls in classes
+                          if not cls.SHARDED))
+
     def create_contexts(self):
         for key, cls in self.contexts_cls.items():
             if issubclass(cls, RyuApp):
@@ -0,0 +1,273 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Sharding of the datapaths across worker processes.
+
+With --shards N, ryu-manager starts N worker processes running the
+applications and relays the messages between them.  Worker i handles
+the datapaths whose id is i modulo N.  The workers all listen on the
+OpenFlow port; the one which accepts a connection hands it over to the
+worker owning the datapath when the Features Reply tells the datapath
+id, along with the bytes received from then on.  TLS connections can't
+be handed over and stay with the worker which accepted them.
+
+Applications run in every worker and see the datapaths of their shard,
+so ryu-manager only shards applications setting RyuApp.SHARDED.  The
+ones keeping state across datapaths share it with events sent to every
+shard with RyuApp.send_event_to_shards().
+"""
+
+import array
+import errno
+import logging
+import os
+import pickle
+import signal
+import socket
+import ssl
+import struct
+import subprocess
+import sys
+
+from ryu import cfg
+from ryu.lib import hub
+
+
+LOG = logging.getLogger('ryu.base.shard')
+
+CONF = cfg.CONF
+CONF.register_cli_opts([
+    cfg.IntOpt('shards', default=1, min=1,
+               help='worker processes the datapaths are sharded across '
+                    'by datapath id (default 1, no sharding)'),
+])
+
+# Set by ryu-manager for its worker processes: "<shard index> <fd>"
+SHARD_ENV = 'RYU_SHARD'
+
+# A message is sent in frames of a SOCK_SEQPACKET socket, the file
+# descriptors along with the first one.
+_FRAME = struct.Struct('!?h')   # more frames follow, destination shard
+_FRAME_SIZE = 64 * 1024
+_MAX_FDS = 4
+_ALL = -1   # every shard but the sender
+
+# The bus of this worker process, None without shards
+bus = None
+
+
+def _send(sock, dst, data, fds=()):
+    for offset in range(0, max(len(data), 1), _FRAME_SIZE):
+        frame = _FRAME.pack(offset + _FRAME_SIZE < len(data), dst)
+        frame += data[offset:offset + _FRAME_SIZE]
+        ancdata = []
+        if fds and not offset:
+            ancdata.append((socket.SOL_SOCKET, socket.SCM_RIGHTS,
+                            array.array('i', fds)))
+        while True:
+            try:
+                sock.sendmsg([frame], ancdata)
+                break
+            except (IOError, OSError) as e:
+                if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    raise
+            hub.trampoline(sock.fileno(), write=True)
+
+
+def _recv(sock):
+    # Returns the destination, the data and the file descriptors of the
+    # next message
+    chunks = []
+    fds = []
+    while True:
+        try:
+            frame, ancdata, _flags, _addr = sock.recvmsg(
+                _FRAME.size + _FRAME_SIZE,
+                socket.CMSG_SPACE(_MAX_FDS * array.array('i').itemsize))
+        except (IOError, OSError) as e:
+            if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise
+            hub.trampoline(sock.fileno(), read=True)
+            continue
+        if not frame:
+            raise EOFError()
+        for level, type_, cmsg in ancdata:
+            if level == socket.SOL_SOCKET and type_ == socket.SCM_RIGHTS:
+                fds_ = array.array('i')
+                fds_.frombytes(cmsg[:len(cmsg) - len(cmsg) % fds_.itemsize])
+                fds.extend(fds_)
+        more, dst = _FRAME.unpack_from(frame)
+        chunks.append(frame[_FRAME.size:])
+        if not more:
+            return dst, b''.join(chunks), fds
+
+
+class ShardBus(object):
+    """
+    The connection of a worker process to the others, through ryu-manager.
+    """
+
+    def __init__(self, index, shards, sock):
+        self.index = index
+        self.shards = shards
+        self.sock = sock
+        self.sock.setblocking(False)
+        self._send_sem = hub.Semaphore()
+
+    def owner(self, dpid):
+        return dpid % self.shards
+
+    def owns(self, dpid):
+        return self.owner(dpid) == self.index
+
+    def send(self, dst, kind, args, fds=()):
+        data = pickle.dumps((kind, args), pickle.HIGHEST_PROTOCOL)
+        # the frames of the messages must not interleave
+        with self._send_sem:
+            _send(self.sock, dst, data, fds)
+
+    def publish(self, name, ev, state=None):
+        self.send(_ALL, 'event', (name, ev, state))
+
+    def hand_off(self, datapath, msg, data):
+        """
+        Hands the connection of the datapath over to the shard owning it
+        if msg is its Features Reply.  data is what is received from msg
+        on.  Returns whether the connection was handed over.
+        """
+        if msg.msg_type != datapath.ofproto.OFPT_FEATURES_REPLY:
+            return False
+        owner = self.owner(msg.datapath_id)
+        sock = datapath.socket
+        if owner == self.index:
+            return False
+        if isinstance(sock, ssl.SSLSocket):
+            LOG.warning('TLS connection of datapath %016x kept by shard %d',
+                        msg.datapath_id, self.index)
+            return False
+        LOG.debug('datapath %016x handed over to shard %d',
+                  msg.datapath_id, owner)
+        self.send(owner, 'datapath',
+                  (int(sock.family), datapath.address,
+                   datapath.ofproto.OFP_VERSION, bytes(data)),
+                  [sock.fileno()])
+        return True
+
+    def _adopt(self, fds, family, address, version, data):
+        from ryu.controller import controller
+        sock = socket.fromfd(fds[0], family, socket.SOCK_STREAM)
+        os.close(fds[0])
+        hub.spawn(controller.datapath_connection_factory,
+                  sock, address, version, data)
+
+    def _deliver(self, name, ev, state):
+        from ryu.base import app_manager
+        brick = app_manager.lookup_service_brick(name)
+        if brick is None:
+            LOG.debug('EVENT LOST shard %s %s', name, ev.__class__.__name__)
+            return
+        brick.send_event_to_observers(ev, state)
+
+    def serve(self):
+        while True:
+            try:
+                _dst, data, fds = _recv(self.sock)
+            except EOFError:
+                LOG.error('shard %d: ryu-manager is gone', self.index)
+                os.kill(os.getpid(), signal.SIGTERM)
+                return
+            kind, args = pickle.loads(data)
+            if kind == 'datapath':
+                self._adopt(fds, *args)
+            elif kind == 'event':
+                self._deliver(*args)
+
+
+def start_worker():
+    """
+    Sets the bus of this process if ryu-manager started it as a worker.
+    """
+    global bus
+    value = os.environ.pop(SHARD_ENV, None)
+    if value is None:
+        return None
+    index, fd = [int(v) for v in value.split()]
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET, fileno=fd)
+    bus = ShardBus(index, CONF.shards, sock)
+    return bus
+
+
+def _relay(index, socks, sems):
+    # Forwards the messages of a worker as they are, without unpickling
+    # them.
+    while True:
+        try:
+            dst, data, fds = _recv(socks[index])
+        except EOFError:
+            return
+        if dst == _ALL:
+            dsts = [i for i in range(len(socks)) if i != index]
+        else:
+            dsts = [dst]
+        for i in dsts:
+            with sems[i]:
+                try:
+                    _send(socks[i], dst, data, fds)
+                except (IOError, OSError) as e:
+                    LOG.error('shard %d unreachable: %s', i, e)
+        for fd in fds:
+            os.close(fd)
+
+
+def run(shards, args):
+    """
+    Runs ryu-manager with args in shards worker processes and relays the
+    messages between them until they exit.
+    """
+    socks = []
+    workers = []
+    for index in range(shards):
+        sock, worker_sock = socket.socketpair(socket.AF_UNIX,
+                                              socket.SOCK_SEQPACKET)
+        sock.setblocking(False)
+        env = dict(os.environ)
+        env[SHARD_ENV] = '%d %d' % (index, worker_sock.fileno())
+        workers.append(subprocess.Popen(
+            [sys.executable, '-m', 'ryu.cmd.manager'] + list(args),
+            env=env, pass_fds=[worker_sock.fileno()]))
+        worker_sock.close()
+        socks.append(sock)
+    LOG.info('datapaths sharded across %d workers: %s', shards,
+             ' '.join(str(worker.pid) for worker in workers))
+
+    def terminate(signum, frame):
+        sys.exit(0)
+
+    # stop the workers too, before their listening sockets are gone
+    signal.signal(signal.SIGTERM, terminate)
+    sems = [hub.Semaphore() for _ in socks]
+    threads = [hub.spawn(_relay, index, socks, sems)
+               for index in range(shards)]
+    try:
+        for worker in workers:
+            worker.wait()
+    finally:
+        for worker in workers:
+            if worker.poll() is None:
+                worker.terminate()
+        for worker in workers:
+            worker.wait()
+        for thread in threads:
+            hub.kill(thread)
+        hub.joinall(threads)
@@ -31,6 +31,7 @@ log.early_init_log(logging.DEBUG)
 from ryu import flags
 from ryu import version
 from ryu.app import wsgi
+from ryu.base import shard
 from ryu.base.app_manager import AppManager
 from ryu.controller import controller
 from ryu.topology import switches
@@ -85,7 +86,8 @@ def main(args=None, prog=None):
     else:
         hub.patch(thread=True)
 
-    if CONF.pid_file:
+    bus = shard.start_worker()
+    if CONF.pid_file and bus is None:
         with open(CONF.pid_file, 'w') as pid_file:
             pid_file.write(str(os.getpid()))
 
@@ -96,9 +98,25 @@ def main(args=None, prog=None):
 
     app_mgr = AppManager.get_instance()
     app_mgr.load_apps(app_lists)
+
+    if CONF.shards > 1 and bus is None:
+        unsharded = app_mgr.unsharded_apps()
+        if unsharded:
+            raise SystemExit('--shards %d: %s must see all the datapaths, '
+                             'run them without --shards'
+                             % (CONF.shards, ', '.join(unsharded)))
+        # the applications run in the worker processes
+        try:
+            shard.run(CONF.shards, sys.argv[1:] if args is None else args)
+        except KeyboardInterrupt:
+            logger.debug("Keyboard Interrupt received. "
+                         "Stopping the RYU worker processes...")
+        return
     contexts = app_mgr.create_contexts()
     services = []
     services.extend(app_mgr.instantiate_apps(**contexts))
+    if bus is not None:
+        services.append(hub.spawn(bus.serve))
 
     webapp = wsgi.start_service(app_mgr)
     if webapp:
@@ -23,8 +23,11 @@ The main component of OpenFlow controller.
 """
 
 import contextlib
+import errno
 import logging
 import random
+import struct
+import time
 from socket import IPPROTO_TCP
 from socket import TCP_NODELAY
 from socket import SHUT_WR
@@ -36,6 +39,7 @@ from ryu.lib import hub
 from ryu.lib.hub import StreamServer
 
 import ryu.base.app_manager
+from ryu.base import shard
 
 from ryu.ofproto import ofproto_common
 from ryu.ofproto import ofproto_parser
@@ -44,7 +48,8 @@ from ryu.ofproto import ofproto_v1_0
 from ryu.ofproto import nx_match
 
 from ryu.controller import ofp_event
-from ryu.controller.handler import HANDSHAKE_DISPATCHER, DEAD_DISPATCHER
+from ryu.controller.handler import HANDSHAKE_DISPATCHER, CONFIG_DISPATCHER
+from ryu.controller.handler import DEAD_DISPATCHER
 
 from ryu.lib.dpid import dpid_to_str
 from ryu.lib import ip
@@ -85,9 +90,38 @@ CONF.register_opts([
     cfg.IntOpt('maximum-unreplied-echo-requests',
                default=0,
                min=0,
-               help='Maximum number of unreplied echo requests before datapath is disconnected.')
+               help='Maximum number of unreplied echo requests before datapath is disconnected.'),
+    cfg.IntOpt('socket-recv-buffer-size',
+               default=256 * 1024,
+               min=0xffff,
+               help='Size, in bytes, of the buffer the messages from a datapath are received in. '
+                    'It holds at least the largest OpenFlow message.'),
+    cfg.IntOpt('ofp-send-queue-size',
+               default=1024,
+               min=1,
+               help='Messages queued for sending to a datapath before send_msg() blocks.'),
+    cfg.IntOpt('ofp-send-queue-high-watermark',
+               default=768,
+               min=1,
+               help='Queued messages from which a datapath is congested and '
+                    'EventOFPBackpressure is sent.'),
+    cfg.IntOpt('ofp-send-queue-low-watermark',
+               default=256,
+               min=0,
+               help='Queued messages under which a congested datapath is '
+                    'relieved and EventOFPBackpressure is sent.'),
+    cfg.BoolOpt('ofp-lazy-decoding',
+                default=False,
+                help='Decode the match and data of packet-in messages and '
+                     'the body of multipart replies on first access '
+                     '(OpenFlow 1.3).'),
 ])
 
+# Messages written to the socket at once, within the IOV_MAX of sendmsg()
+_SEND_BATCH_SIZE = 512
+
+_OFP_HEADER = struct.Struct(ofproto_common.OFP_HEADER_PACK_STR)
+
 
 def _split_addr(addr):
     """
@@ -206,9 +240,9 @@ class OpenFlowController(object):
 
 
 def _deactivate(method):
-    def deactivate(self):
+    def deactivate(self, *args):
         try:
-            method(self)
+            method(self, *args)
         finally:
             try:
                 self.socket.close()
@@ -264,6 +298,25 @@ class Datapath(ofproto_protocol.ProtocolDesc):
     send_delete_all_flows                deprecated
     send_barrier                         Queue an OpenFlow barrier message to
                                          send to the switch.
+    congested                            True from when the send queue
+                                         reaches its high watermark until it
+                                         drains under its low watermark.
+                                         EventOFPBackpressure is sent on each
+                                         change.
+    send_stats                           Counters of the messages sent:
+                                         "messages", "bytes", "writes" (socket
+                                         writes, each sending a batch of
+                                         queued messages), "latency_sum" and
+                                         "latency_max" (seconds from queueing
+                                         to writing).
+    lazy_decoding                        True if the parser leaves the
+                                         match and data of packet-in messages
+                                         and the body of multipart replies
+                                         undecoded until they are accessed,
+                                         and serves match field lookups from
+                                         the undecoded OXM TLVs (OpenFlow
+                                         1.3).  Decoding errors are then
+                                         raised on access.
     send_nxt_set_flow_format             deprecated
     is_reserved_port                     deprecated
     ==================================== ======================================
@@ -280,8 +333,18 @@ class Datapath(ofproto_protocol.ProtocolDesc):
 
         # The limit is arbitrary. We need to limit queue size to
         # prevent it from eating memory up.
-        self.send_q = hub.Queue(16)
+        self.send_q = hub.Queue(CONF.ofp_send_queue_size)
         self._send_q_sem = hub.BoundedSemaphore(self.send_q.maxsize)
+        self.send_q_high_watermark = min(CONF.ofp_send_queue_high_watermark,
+                                         self.send_q.maxsize)
+        self.send_q_low_watermark = min(CONF.ofp_send_queue_low_watermark,
+                                        self.send_q_high_watermark - 1)
+        self.congested = False
+        self.send_stats = {'messages': 0, 'bytes': 0, 'writes': 0,
+                           'latency_sum': 0.0, 'latency_max': 0.0}
+        # Plain sockets write a batch with one sendmsg() (writev)
+        self._sendmsg = getattr(self.socket, 'sendmsg', None)
+        self.lazy_decoding = CONF.ofp_lazy_decoding
 
         self.echo_request_interval = CONF.echo_request_interval
         self.max_unreplied_echo_requests = CONF.maximum_unreplied_echo_requests
@@ -317,61 +380,78 @@ class Datapath(ofproto_protocol.ProtocolDesc):
 
     # Low level socket handling layer
     @_deactivate
-    def _recv_loop(self):
-        buf = bytearray()
+    def _recv_loop(self, data=b''):
+        # The socket is read into a fixed buffer with recv_into() and the
+        # messages are sliced out of it by offset. The bytes of a partly
+        # received message are moved back to the front of the buffer only
+        # when the end of the buffer is reached, so each byte is copied
+        # at most once more before being handed to the parser.
+        # data is what another shard received before handing the
+        # connection over.
+        buf = bytearray(CONF.socket_recv_buffer_size)
+        view = memoryview(buf)
+        buf_size = len(buf)
+        start, end = 0, len(data)  # unparsed bytes are buf[start:end]
+        view[:end] = data
         count = 0
-        min_read_len = remaining_read_len = ofproto_common.OFP_HEADER_SIZE
+        min_read_len = ofproto_common.OFP_HEADER_SIZE
 
         while self.state != DEAD_DISPATCHER:
-            try:
-                read_len = min_read_len
-                if remaining_read_len > min_read_len:
-                    read_len = remaining_read_len
-                ret = self.socket.recv(read_len)
-            except SocketTimeout:
-                continue
-            except ssl.SSLError:
-                # eventlet throws SSLError (which is a subclass of IOError)
-                # on SSL socket read timeout; re-try the loop in this case.
-                continue
-            except (EOFError, IOError):
-                break
-
-            if not ret:
-                break
-
-            buf += ret
-            buf_len = len(buf)
-            while buf_len >= min_read_len:
-                (version, msg_type, msg_len, xid) = ofproto_parser.header(buf)
+            if data:
+                data = None
+            else:
+                if start == end:
+                    start = end = 0
+                elif end == buf_size:
+                    view[:end - start] = view[start:end]
+                    start, end = 0, end - start
+                try:
+                    read_len = self.socket.recv_into(view[end:])
+                except SocketTimeout:
+                    continue
+                except ssl.SSLError:
+                    # eventlet throws SSLError (which is a subclass of
+                    # IOError) on SSL socket read timeout; re-try the loop
+                    # in this case.
+                    continue
+                except (EOFError, IOError):
+                    break
+
+                if not read_len:
+                    break
+
+                end += read_len
+
+            while end - start >= min_read_len:
+                (version, msg_type, msg_len, xid) = _OFP_HEADER.unpack_from(
+                    buf, start)
                 if msg_len < min_read_len:
                     # Someone isn't playing nicely; log it, and try something sane.
                     LOG.debug("Message with invalid length %s received from switch at address %s",
                               msg_len, self.address)
                     msg_len = min_read_len
-                if buf_len < msg_len:
-                    remaining_read_len = (msg_len - buf_len)
+                if end - start < msg_len:
                     break
 
+                # The parsers keep references to the message buffer, so each
+                # message gets its own bytes rather than a view of buf.
                 msg = ofproto_parser.msg(
-                    self, version, msg_type, msg_len, xid, buf[:msg_len])
+                    self, version, msg_type, msg_len, xid,
+                    view[start:start + msg_len].tobytes())
                 # LOG.debug('queue msg %s cls %s', msg, msg.__class__)
+                if (self.state == CONFIG_DISPATCHER and
+                        shard.bus is not None and msg and
+                        shard.bus.hand_off(self, msg, view[start:end])):
+                    # another shard handles the datapath
+                    return
                 if msg:
                     ev = ofp_event.ofp_msg_to_ev(msg)
                     self.ofp_brick.send_event_to_observers(ev, self.state)
-
-                    def dispatchers(x):
-                        return x.callers[ev.__class__].dispatchers
-
-                    handlers = [handler for handler in
-                                self.ofp_brick.get_handlers(ev) if
-                                self.state in dispatchers(handler)]
-                    for handler in handlers:
+                    for handler in self.ofp_brick.get_handlers(ev,
+                                                               self.state):
                         handler(ev)
 
-                buf = buf[msg_len:]
-                buf_len = len(buf)
-                remaining_read_len = min_read_len
+                start += msg_len
 
                 # We need to schedule other greenlets. Otherwise, ryu
                 # can't accept new switches or handle the existing
@@ -385,9 +465,24 @@ class Datapath(ofproto_protocol.ProtocolDesc):
     def _send_loop(self):
         try:
             while self.state != DEAD_DISPATCHER:
-                buf, close_socket = self.send_q.get()
+                # Everything queued meanwhile is written along with the
+                # first message
+                batch = [self.send_q.get()]
                 self._send_q_sem.release()
-                self.socket.sendall(buf)
+                close_socket = batch[0][1]
+                while not close_socket and len(batch) < _SEND_BATCH_SIZE:
+                    try:
+                        batch.append(self.send_q.get(block=False))
+                    except hub.QueueEmpty:
+                        break
+                    self._send_q_sem.release()
+                    close_socket = batch[-1][1]
+                bufs = [buf for buf, _, _ in batch]
+                self._write(bufs)
+                self._count_sent(batch, bufs)
+                if (self.congested and
+                        self.send_q.qsize() <= self.send_q_low_watermark):
+                    self._set_congested(False)
                 if close_socket:
                     break
         except SocketTimeout:
@@ -412,12 +507,58 @@ class Datapath(ofproto_protocol.ProtocolDesc):
             # Finally, disallow further sends.
             self._close_write()
 
+    def _write(self, bufs):
+        # Writes the buffers with one sendmsg() when the socket has it,
+        # sendall() writes whatever it did not take.
+        sent = 0
+        if len(bufs) > 1 and self._sendmsg is not None:
+            try:
+                sent = self._sendmsg(bufs)
+            except NotImplementedError:
+                # SSL sockets
+                self._sendmsg = None
+            except IOError as e:
+                # Green sockets are non-blocking underneath
+                if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    raise
+        data = bufs[0] if len(bufs) == 1 else b''.join(bufs)
+        if sent < len(data):
+            self.socket.sendall(memoryview(data)[sent:] if sent else data)
+
+    def _count_sent(self, batch, bufs):
+        now = time.time()
+        stats = self.send_stats
+        stats['messages'] += len(batch)
+        stats['bytes'] += sum(len(buf) for buf in bufs)
+        stats['writes'] += 1
+        latency_max = stats['latency_max']
+        for _, _, queued_at in batch:
+            latency = now - queued_at
+            stats['latency_sum'] += latency
+            if latency > latency_max:
+                latency_max = latency
+        stats['latency_max'] = latency_max
+
+    def _set_congested(self, congested):
+        self.congested = congested
+        LOG.debug('Send queue to switch at address %s %s: %d messages',
+                  self.address, 'congested' if congested else 'relieved',
+                  self.send_q.qsize())
+        ev = ofp_event.EventOFPBackpressure(self, congested,
+                                            self.send_q.qsize())
+        # Not from the sending thread, which may be an observer whose own
+        # event queue is full
+        hub.spawn(self.ofp_brick.send_event_to_observers, ev, self.state)
+
     def send(self, buf, close_socket=False):
         msg_enqueued = False
         self._send_q_sem.acquire()
         if self.send_q:
-            self.send_q.put((buf, close_socket))
+            self.send_q.put((buf, close_socket, time.time()))
             msg_enqueued = True
+            if (not self.congested and
+                    self.send_q.qsize() >= self.send_q_high_watermark):
+                self._set_congested(True)
         else:
             self._send_q_sem.release()
         if not msg_enqueued:
@@ -456,17 +597,18 @@ class Datapath(ofproto_protocol.ProtocolDesc):
         except ValueError:
             pass
 
-    def serve(self):
+    def serve(self, data=None):
         send_thr = hub.spawn(self._send_loop)
 
-        # send hello message immediately
-        hello = self.ofproto_parser.OFPHello(self)
-        self.send_msg(hello)
+        if data is None:
+            # send hello message immediately
+            hello = self.ofproto_parser.OFPHello(self)
+            self.send_msg(hello)
 
         echo_thr = hub.spawn(self._echo_request_loop)
 
         try:
-            self._recv_loop()
+            self._recv_loop(data or b'')
         finally:
             hub.kill(send_thr)
             hub.kill(echo_thr)
@@ -544,11 +686,15 @@ class Datapath(ofproto_protocol.ProtocolDesc):
         return port_no > self.ofproto.OFPP_MAX
 
 
-def datapath_connection_factory(socket, address):
+def datapath_connection_factory(socket, address, version=None, data=None):
     LOG.debug('connected socket:%s address:%s', socket, address)
     with contextlib.closing(Datapath(socket, address)) as datapath:
         try:
-            datapath.serve()
+            if data is not None:
+                # handed over by another shard after the Hello exchange
+                datapath.set_version(version)
+                datapath.set_state(CONFIG_DISPATCHER)
+            datapath.serve(data)
         except:
             # Something went wrong.
             # Especially malicious switch can send malformed packet,
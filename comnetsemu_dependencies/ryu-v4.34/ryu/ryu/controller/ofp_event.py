@@ -149,4 +149,32 @@ class EventOFPPortStateChange(event.EventBase):
         self.port_no = port_no
 
 
+class EventOFPBackpressure(event.EventBase):
+    """
+    An event class to notify the congestion of the send queue of a
+    Datapath instance.
+
+    It is sent when the queue reaches its high watermark
+    (``ofp_send_queue_high_watermark``), and when it drains under its low
+    watermark (``ofp_send_queue_low_watermark``). Applications should hold
+    their bulk messages to the switch while it is congested.
+    An instance has at least the following attributes.
+
+    ========= =================================================================
+    Attribute Description
+    ========= =================================================================
+    datapath  ryu.controller.controller.Datapath instance of the switch
+    congested True when the queue reached its high watermark, False when it
+              drained under its low watermark
+    queued    Messages in the queue
+    ========= =================================================================
+    """
+
+    def __init__(self, dp, congested, queued):
+        super(EventOFPBackpressure, self).__init__()
+        self.datapath = dp
+        self.congested = congested
+        self.queued = queued
+
+
 handler.register_service('ryu.controller.ofp_handler')
@@ -49,6 +49,8 @@ from ryu.ofproto import ofproto_parser
 
 
 class OFPHandler(ryu.base.app_manager.RyuApp):
+    SHARDED = True
+
     def __init__(self, *args, **kwargs):
         super(OFPHandler, self).__init__(*args, **kwargs)
         self.name = ofp_event.NAME
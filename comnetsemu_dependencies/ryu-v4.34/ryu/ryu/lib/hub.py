@@ -33,6 +33,7 @@ if HUB_TYPE == 'eventlet':
     # https://github.com/eventlet/eventlet/issues/401
     eventlet.sleep()
     import eventlet.event
+    import eventlet.hubs
     import eventlet.queue
     import eventlet.semaphore
     import eventlet.timeout
@@ -50,6 +51,11 @@ if HUB_TYPE == 'eventlet':
     listen = eventlet.listen
     connect = eventlet.connect
 
+    def trampoline(fileno, read=False, write=False):
+        # Waits for a non-blocking file descriptor, for the socket calls
+        # green sockets don't wrap, e.g. sendmsg() and recvmsg()
+        eventlet.hubs.trampoline(fileno, read=read, write=write)
+
     def spawn(*args, **kwargs):
         raise_error = kwargs.pop('raise_error', False)
 
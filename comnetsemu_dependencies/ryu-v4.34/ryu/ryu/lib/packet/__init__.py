@@ -3,5 +3,5 @@ Ryu packet library. Decoder/Encoder implementations of popular protocols
 like TCP/IP.
 """
 
-from . import (ethernet, arp, icmp, icmpv6, ipv4, ipv6, lldp, mpls, packet,
-               packet_base, packet_utils)
+from . import (ethernet, arp, header_view, icmp, icmpv6, ipv4, ipv6, lldp,
+               mpls, packet, packet_base, packet_utils)
@@ -0,0 +1,202 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Header view of Ethernet/IP packets.
+
+A lightweight alternative to packet.Packet for the packet-in handlers
+which only need a few header fields: the headers are unpacked with
+precompiled structs into plain attributes named after the OXM fields,
+without building protocol objects, and addresses are converted to text
+when accessed.
+"""
+
+import socket
+import struct
+
+from . import ether_types as ether
+from . import in_proto as inet
+from ryu.lib import addrconv
+
+
+# depth of the headers to unpack
+ETHERNET = 1    # Ethernet and VLAN tags
+NETWORK = 2     # ARP, IPv4 and IPv6
+TRANSPORT = 3   # TCP, UDP and SCTP ports
+
+_ETHERNET = struct.Struct('!6s6sH')
+_VLAN = struct.Struct('!HH')
+_ARP = struct.Struct('!HHBBH6s4s6s4s')
+_IPV4 = struct.Struct('!B5xHxB2x4s4s')
+_IPV6 = struct.Struct('!6xBx16s16s')
+_PORTS = struct.Struct('!HH')
+_MAC = struct.Struct('!6B')
+
+_VLAN_TYPES = (ether.ETH_TYPE_8021Q, ether.ETH_TYPE_8021AD)
+_PORT_PROTOS = (inet.IPPROTO_TCP, inet.IPPROTO_UDP, inet.IPPROTO_SCTP)
+
+
+def _mac_to_text(addr):
+    return '%02x:%02x:%02x:%02x:%02x:%02x' % _MAC.unpack(addr)
+
+
+class HeaderView(object):
+    """Header view of an Ethernet frame.
+
+    Unpacks the headers of data down to depth (ETHERNET, NETWORK or
+    TRANSPORT).  The fields of the headers which are not in the frame, or
+    are deeper than depth, are None.  Raises struct.error if data is
+    shorter than an Ethernet header, as ethernet.parser() does; deeper
+    headers which are truncated are left out.
+
+    ============== ===================================== ===================
+    Attribute      Description                           Example
+    ============== ===================================== ===================
+    eth_dst        Ethernet destination address          'ff:ff:ff:ff:ff:ff'
+    eth_src        Ethernet source address               '08:60:6e:7f:74:e7'
+    ethertype      Ether type of the Ethernet header     0x8100
+                   (as ethernet.ethertype)
+    eth_type       Ether type after the VLAN tags        0x0800
+    vlan_vid       VLAN ID of the outer tag              10
+    arp_op         ARP opcode                            1
+    arp_sha        ARP sender hardware address           '08:60:6e:7f:74:e7'
+    arp_spa        ARP sender protocol address           '10.0.0.1'
+    arp_tha        ARP target hardware address           '00:00:00:00:00:00'
+    arp_tpa        ARP target protocol address           '10.0.0.2'
+    ip_proto       IP protocol (of the IPv6 header,      6
+                   before any extension header)
+    ipv4_src       IPv4 source address                   '10.0.0.1'
+    ipv4_dst       IPv4 destination address              '10.0.0.2'
+    ipv6_src       IPv6 source address                   'fe80::1'
+    ipv6_dst       IPv6 destination address              'fe80::2'
+    src_port       TCP, UDP or SCTP source port          40000
+                   (of the first IPv4 fragment)
+    dst_port       TCP, UDP or SCTP destination port     5001
+    ============== ===================================== ===================
+    """
+
+    __slots__ = ('data', 'ethertype', 'eth_type', 'vlan_vid', 'arp_op',
+                 'ip_proto', 'src_port', 'dst_port', '_eth_dst', '_eth_src',
+                 '_arp_sha', '_arp_spa', '_arp_tha', '_arp_tpa',
+                 '_ipv4_src', '_ipv4_dst', '_ipv6_src', '_ipv6_dst')
+
+    def __init__(self, data, depth=TRANSPORT):
+        self.data = data
+        self.vlan_vid = None
+        self.arp_op = None
+        self._arp_sha = self._arp_spa = self._arp_tha = self._arp_tpa = None
+        self.ip_proto = None
+        self._ipv4_src = self._ipv4_dst = None
+        self._ipv6_src = self._ipv6_dst = None
+        self.src_port = self.dst_port = None
+
+        (self._eth_dst, self._eth_src,
+         self.ethertype) = _ETHERNET.unpack_from(data)
+        eth_type = self.ethertype
+        offset = _ETHERNET.size
+        while eth_type in _VLAN_TYPES and len(data) >= offset + _VLAN.size:
+            tci, eth_type = _VLAN.unpack_from(data, offset)
+            if self.vlan_vid is None:
+                self.vlan_vid = tci & 0xfff
+            offset += _VLAN.size
+        self.eth_type = eth_type
+
+        if depth < NETWORK:
+            return
+
+        if eth_type == ether.ETH_TYPE_IP:
+            if len(data) < offset + _IPV4.size:
+                return
+            (version_ihl, frag_off, self.ip_proto, self._ipv4_src,
+             self._ipv4_dst) = _IPV4.unpack_from(data, offset)
+            if frag_off & 0x1fff:
+                # not the first fragment, which has the ports
+                return
+            offset += (version_ihl & 0xf) * 4
+        elif eth_type == ether.ETH_TYPE_IPV6:
+            if len(data) < offset + _IPV6.size:
+                return
+            (self.ip_proto, self._ipv6_src,
+             self._ipv6_dst) = _IPV6.unpack_from(data, offset)
+            offset += _IPV6.size
+        elif eth_type == ether.ETH_TYPE_ARP:
+            if len(data) < offset + _ARP.size:
+                return
+            (_hwtype, _proto, _hlen, _plen, self.arp_op, self._arp_sha,
+             self._arp_spa, self._arp_tha,
+             self._arp_tpa) = _ARP.unpack_from(data, offset)
+            return
+        else:
+            return
+
+        if depth < TRANSPORT or self.ip_proto not in _PORT_PROTOS:
+            return
+        if len(data) >= offset + _PORTS.size:
+            self.src_port, self.dst_port = _PORTS.unpack_from(data, offset)
+
+    @property
+    def eth_dst(self):
+        return _mac_to_text(self._eth_dst)
+
+    @property
+    def eth_src(self):
+        return _mac_to_text(self._eth_src)
+
+    @property
+    def arp_sha(self):
+        if self._arp_sha is not None:
+            return _mac_to_text(self._arp_sha)
+
+    @property
+    def arp_spa(self):
+        if self._arp_spa is not None:
+            return socket.inet_ntoa(self._arp_spa)
+
+    @property
+    def arp_tha(self):
+        if self._arp_tha is not None:
+            return _mac_to_text(self._arp_tha)
+
+    @property
+    def arp_tpa(self):
+        if self._arp_tpa is not None:
+            return socket.inet_ntoa(self._arp_tpa)
+
+    @property
+    def ipv4_src(self):
+        if self._ipv4_src is not None:
+            return socket.inet_ntoa(self._ipv4_src)
+
+    @property
+    def ipv4_dst(self):
+        if self._ipv4_dst is not None:
+            return socket.inet_ntoa(self._ipv4_dst)
+
+    @property
+    def ipv6_src(self):
+        if self._ipv6_src is not None:
+            return addrconv.ipv6.bin_to_text(self._ipv6_src)
+
+    @property
+    def ipv6_dst(self):
+        if self._ipv6_dst is not None:
+            return addrconv.ipv6.bin_to_text(self._ipv6_dst)
+
+    def __repr__(self):
+        fields = ('eth_dst', 'eth_src', 'ethertype', 'eth_type', 'vlan_vid',
+                  'arp_op', 'arp_sha', 'arp_spa', 'arp_tha', 'arp_tpa',
+                  'ip_proto', 'ipv4_src', 'ipv4_dst', 'ipv6_src',
+                  'ipv6_dst', 'src_port', 'dst_port')
+        return '%s(%s)' % (self.__class__.__name__, ', '.join(
+            '%s=%r' % (k, getattr(self, k)) for k in fields
+            if getattr(self, k) is not None))
@@ -184,6 +184,37 @@ class StringifyMixin(stringify.StringifyMixin):
         return obj_cls
 
 
+class LazyAttribute(object):
+    """
+    A descriptor for a message attribute the parser may leave undecoded
+    until it is first accessed.
+
+    A parser defers the attribute with defer(), giving a callable decoding
+    it from the message; the decoded value is then stored as a plain
+    instance attribute. Message classes list their lazy attributes in
+    _opt_attributes so that they are stringified like the others.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, obj, cls):
+        if obj is None:
+            return self
+        try:
+            decode = obj._lazy_decoders.pop(self.name)
+        except (AttributeError, KeyError):
+            raise AttributeError(self.name)
+        value = decode(obj)
+        obj.__dict__[self.name] = value
+        return value
+
+    @staticmethod
+    def defer(obj, name, decode):
+        obj.__dict__.pop(name, None)
+        obj.__dict__.setdefault('_lazy_decoders', {})[name] = decode
+
+
 class MsgBase(StringifyMixin):
     """
     This is a base class for OpenFlow message classes.
@@ -40,6 +40,7 @@ The following extensions are not implemented yet.
     - EXT-192-v Vacancy events Extension
 """
 
+import copy
 import struct
 import base64
 
@@ -51,7 +52,7 @@ from ryu.lib.pack_utils import msg_pack_into
 from ryu.lib.packet import packet
 from ryu import exception
 from ryu import utils
-from ryu.ofproto.ofproto_parser import StringifyMixin, MsgBase
+from ryu.ofproto.ofproto_parser import StringifyMixin, MsgBase, LazyAttribute
 from ryu.ofproto import ether
 from ryu.ofproto import nx_actions
 from ryu.ofproto import ofproto_parser
@@ -61,6 +62,8 @@ from ryu.ofproto import ofproto_v1_3 as ofproto
 import logging
 LOG = logging.getLogger('ryu.ofproto.ofproto_v1_3_parser')
 
+_OFP_FLOW_MOD_0 = struct.Struct(ofproto.OFP_FLOW_MOD_PACK_STR0)
+
 _MSG_PARSERS = {}
 
 
@@ -79,6 +82,12 @@ def _register_parser(cls):
     return cls
 
 
+def _lazy_decoding(datapath):
+    # Whether the messages of datapath are decoded lazily, see
+    # Datapath.lazy_decoding
+    return getattr(datapath, 'lazy_decoding', False) is True
+
+
 def _register_exp_type(experimenter, exp_type):
     assert exp_type not in OFPExperimenter._subtypes
 
@@ -876,6 +885,9 @@ class OFPMatch(StringifyMixin):
         define.
         """
         super(OFPMatch, self).__init__()
+        # (buf, offset, length, [(n, value, mask)]) of a match parsed
+        # lazily, until its fields are decoded
+        self._raw = None
         self._wc = FlowWildcards()
         self._flow = Flow()
         self.fields = []
@@ -900,10 +912,64 @@ class OFPMatch(StringifyMixin):
             self._fields2 = [ofproto.oxm_to_user(n, v, m) for (n, v, m)
                              in fields]
 
+    @property
+    def fields(self):
+        if self._raw is not None:
+            self._decode()
+        return self._old_fields
+
+    @fields.setter
+    def fields(self, fields):
+        if self._raw is not None:
+            self._decode()
+        self._old_fields = fields
+
+    @property
+    def _fields2(self):
+        if self._raw is not None:
+            self._decode()
+        return self._oxm_fields
+
+    @_fields2.setter
+    def _fields2(self, fields):
+        if self._raw is not None:
+            self._decode()
+        self._oxm_fields = fields
+
+    def _decode(self):
+        # Decodes the fields of a match parsed lazily
+        (buf, offset, length, oxms), self._raw = self._raw, None
+        self._oxm_fields = [ofproto.oxm_to_user(n, value, mask)
+                            for (n, value, mask) in oxms]
+        self._old_fields = []
+        try:
+            self.parser_old(self, buf, offset, length)
+        except struct.error:
+            pass
+
+    def _lookup(self, key):
+        # Decodes the field named key alone, from a match parsed lazily
+        try:
+            num = ofproto.oxm_from_user_header(key)
+        except (AttributeError, KeyError, ValueError):
+            return dict(self._fields2)[key]
+        for (n, value, mask) in reversed(self._raw[3]):
+            if n == num:
+                return ofproto.oxm_to_user(n, value, mask)[1]
+        raise KeyError(key)
+
     def __getitem__(self, key):
+        if self._raw is not None:
+            return self._lookup(key)
         return dict(self._fields2)[key]
 
     def __contains__(self, key):
+        if self._raw is not None:
+            try:
+                self._lookup(key)
+            except KeyError:
+                return False
+            return True
         return key in dict(self._fields2)
 
     def iteritems(self):
@@ -913,6 +979,11 @@ class OFPMatch(StringifyMixin):
         return self._fields2
 
     def get(self, key, default=None):
+        if self._raw is not None:
+            try:
+                return self._lookup(key)
+            except KeyError:
+                return default
         return dict(self._fields2).get(key, default)
 
     def stringify_attrs(self):
@@ -1302,10 +1373,13 @@ class OFPMatch(StringifyMixin):
         return length + pad_len
 
     @classmethod
-    def parser(cls, buf, offset):
+    def parser(cls, buf, offset, lazy=False):
         """
         Returns an object which is generated from a buffer including the
         expression of the wire protocol of the flow match.
+
+        If lazy is True, only the OXM TLVs are split, a field is decoded
+        when it is looked up and all of them when they are listed.
         """
         match = OFPMatch()
         type_, length = struct.unpack_from('!HH', buf, offset)
@@ -1317,6 +1391,9 @@ class OFPMatch(StringifyMixin):
         offset += 4
         length -= 4
 
+        if lazy:
+            return cls.parser_lazy(match, buf, offset, length)
+
         exc = None
         residue = None
         # XXXcompat
@@ -1341,6 +1418,24 @@ class OFPMatch(StringifyMixin):
             raise exception.OFPTruncatedMessage(match, residue, exc)
         return match
 
+    @staticmethod
+    def parser_lazy(match, buf, offset, length):
+        oxms = []
+        field_offset = offset
+        remaining = length
+        try:
+            while remaining > 0:
+                n, value, mask, field_len = ofproto.oxm_parse(buf,
+                                                              field_offset)
+                oxms.append((n, value, mask))
+                field_offset += field_len
+                remaining -= field_len
+        except struct.error as e:
+            match._fields2 = []
+            raise exception.OFPTruncatedMessage(match, buf[field_offset:], e)
+        match._raw = (buf, offset, length, oxms)
+        return match
+
     @staticmethod
     def parser_old(match, buf, offset, length):
         while length > 0:
@@ -2319,6 +2414,20 @@ class OFPPacketIn(MsgBase):
         self.match = match
         self.data = data
 
+    # decoded on first access if the datapath decodes lazily
+    data = LazyAttribute('data')
+    _opt_attributes = ['data']
+
+    def _parser_data(self):
+        match_len = utils.round_up(self.match.length, 8)
+        data = self.buf[(ofproto.OFP_PACKET_IN_SIZE -
+                         ofproto.OFP_MATCH_SIZE + match_len + 2):]
+
+        if self.total_len < len(data):
+            # discard padding for 8-byte alignment of OFP packet
+            data = data[:self.total_len]
+        return data
+
     @classmethod
     def parser(cls, datapath, version, msg_type, msg_len, xid, buf):
         msg = super(OFPPacketIn, cls).parser(datapath, version, msg_type,
@@ -2328,16 +2437,14 @@ class OFPPacketIn(MsgBase):
             ofproto.OFP_PACKET_IN_PACK_STR,
             msg.buf, ofproto.OFP_HEADER_SIZE)
 
+        lazy = _lazy_decoding(datapath)
         msg.match = OFPMatch.parser(msg.buf, ofproto.OFP_PACKET_IN_SIZE -
-                                    ofproto.OFP_MATCH_SIZE)
-
-        match_len = utils.round_up(msg.match.length, 8)
-        msg.data = msg.buf[(ofproto.OFP_PACKET_IN_SIZE -
-                            ofproto.OFP_MATCH_SIZE + match_len + 2):]
+                                    ofproto.OFP_MATCH_SIZE, lazy=lazy)
 
-        if msg.total_len < len(msg.data):
-            # discard padding for 8-byte alignment of OFP packet
-            msg.data = msg.data[:msg.total_len]
+        if lazy:
+            LazyAttribute.defer(msg, 'data', cls._parser_data)
+        else:
+            msg.data = msg._parser_data()
 
         return msg
 
@@ -2729,7 +2836,24 @@ class OFPFlowMod(MsgBase):
             assert isinstance(i, OFPInstruction)
         self.instructions = instructions
 
+    # the match and instructions of a flow mod made by OFPFlowModTemplate
+    # are decoded from its bytes on first access
+    match = LazyAttribute('match')
+    instructions = LazyAttribute('instructions')
+    _opt_attributes = ['match', 'instructions']
+    _template_buf = None
+
     def _serialize_body(self):
+        if self._template_buf is not None:
+            self.buf += self._template_buf[ofproto.OFP_HEADER_SIZE:]
+            _OFP_FLOW_MOD_0.pack_into(
+                self.buf, ofproto.OFP_HEADER_SIZE,
+                self.cookie, self.cookie_mask, self.table_id,
+                self.command, self.idle_timeout, self.hard_timeout,
+                self.priority, self.buffer_id, self.out_port,
+                self.out_group, self.flags)
+            return
+
         msg_pack_into(ofproto.OFP_FLOW_MOD_PACK_STR0, self.buf,
                       ofproto.OFP_HEADER_SIZE,
                       self.cookie, self.cookie_mask, self.table_id,
@@ -2790,6 +2914,177 @@ class OFPFlowMod(MsgBase):
         return msg
 
 
+class OFPFlowModTemplate(object):
+    """
+    Template of Modify Flow entry messages
+
+    Serializes a flow mod once, then makes flow mods of the same shape by
+    patching its bytes: the values of its match fields and actions change,
+    the fields, their masks and the actions themselves do not.
+
+    ================ ======================================================
+    Attribute        Description
+    ================ ======================================================
+    flow_mod         Instance of ``OFPFlowMod`` giving the shape
+    ================ ======================================================
+
+    The flow mods are made by ``to_msg()``:
+
+    ================ ======================================================
+    Argument         Description
+    ================ ======================================================
+    datapath         Datapath the flow mod is sent to
+    match            dict of the match fields to change, by OXM field
+                     name.  A field must be in the match of ``flow_mod``,
+                     with a mask if it has one there.
+    actions          dict of the actions to change, by index of the action
+                     in the instructions of ``flow_mod`` (the actions of
+                     the instructions counted in order), each a dict of
+                     the attributes to change
+    kwargs           The other ``OFPFlowMod`` attributes to change
+                     (cookie, priority, idle_timeout, flags, ...)
+    ================ ======================================================
+
+    The match and instructions of the flow mods are decoded from their
+    bytes when accessed, changing them has no effect.  A flow mod is
+    serialized as ``OFPFlowMod`` does, byte for byte.
+
+    Example::
+
+        template = ofp_parser.OFPFlowModTemplate(ofp_parser.OFPFlowMod(
+            datapath, priority=1,
+            match=ofp_parser.OFPMatch(eth_src='00:00:00:00:00:00',
+                                      eth_dst='00:00:00:00:00:00'),
+            instructions=[ofp_parser.OFPInstructionActions(
+                ofp.OFPIT_APPLY_ACTIONS,
+                [ofp_parser.OFPActionOutput(ofp.OFPP_ANY)])]))
+
+        req = template.to_msg(datapath,
+                              match={'eth_src': '00:00:00:00:00:01',
+                                     'eth_dst': '00:00:00:00:00:02'},
+                              actions={0: {'port': 2}},
+                              idle_timeout=60)
+        datapath.send_msg(req)
+    """
+
+    _ATTRIBUTES = ('cookie', 'cookie_mask', 'table_id', 'command',
+                   'idle_timeout', 'hard_timeout', 'priority', 'buffer_id',
+                   'out_port', 'out_group', 'flags')
+
+    def __init__(self, flow_mod):
+        self.flow_mod = flow_mod
+        self.attributes = dict((k, getattr(flow_mod, k))
+                               for k in self._ATTRIBUTES)
+
+        xid = flow_mod.xid
+        flow_mod.serialize()
+        flow_mod.xid = xid
+        self.buf = bytes(flow_mod.buf)
+
+        # OXM field number -> (offset, length, whether masked)
+        self.fields = {}
+        offset = ofproto.OFP_FLOW_MOD_SIZE - ofproto.OFP_MATCH_SIZE
+        field_offset = offset + 4
+        while field_offset < offset + flow_mod.match.length:
+            n, _value, mask, field_len = ofproto.oxm_parse(self.buf,
+                                                           field_offset)
+            self.fields[n] = (field_offset, field_len, mask is not None)
+            field_offset += field_len
+
+        # [(offset, action)] of the actions of the instructions in order
+        self.actions = []
+        offset += utils.round_up(flow_mod.match.length, 8)
+        for inst in flow_mod.instructions:
+            action_offset = offset + ofproto.OFP_INSTRUCTION_ACTIONS_SIZE
+            for a in getattr(inst, 'actions', None) or []:
+                self.actions.append((action_offset, a))
+                action_offset += a.len
+            offset += inst.len
+
+        # the bytes of the values last patched in, by field or action
+        self._patches = {}
+
+    def _patch_field(self, buf, name, value):
+        key = ('field', name)
+        patch = self._patches.get(key)
+        if patch is None or patch[0] != value:
+            n, v, m = ofproto.oxm_from_user(name, value)
+            try:
+                offset, length, masked = self.fields[n]
+            except KeyError:
+                raise KeyError(name)
+            if (m is not None) != masked:
+                raise ValueError('%s must be %smasked as in the template' %
+                                 (name, '' if masked else 'un'))
+            field = bytearray()
+            ofproto.oxm_serialize(n, v, m, field, 0)
+            patch = self._patches[key] = (value, offset, bytes(field))
+        _value, offset, field = patch
+        buf[offset:offset + len(field)] = field
+
+    def _patch_action(self, buf, index, attributes):
+        key = ('action', index)
+        patch = self._patches.get(key)
+        if patch is None or patch[0] != attributes:
+            offset, action = self.actions[index]
+            action = copy.copy(action)
+            for k, v in attributes.items():
+                if not hasattr(action, k):
+                    raise AttributeError('%s has no attribute %s' %
+                                         (action.__class__.__name__, k))
+                setattr(action, k, v)
+            serialized = bytearray()
+            action.serialize(serialized, 0)
+            if len(serialized) != self.actions[index][1].len:
+                raise ValueError('action %d must keep its length' % index)
+            patch = self._patches[key] = (dict(attributes), offset,
+                                          bytes(serialized))
+        _attributes, offset, serialized = patch
+        buf[offset:offset + len(serialized)] = serialized
+
+    def to_msg(self, datapath, match=None, actions=None, **kwargs):
+        attributes = dict(self.attributes)
+        for k, v in kwargs.items():
+            if k not in attributes:
+                raise TypeError('unexpected OFPFlowMod attribute %s' % k)
+            attributes[k] = v
+
+        buf = self.buf
+        if match or actions:
+            buf = bytearray(buf)
+            for name, value in (match or {}).items():
+                self._patch_field(buf, name, value)
+            for index, action_attributes in (actions or {}).items():
+                self._patch_action(buf, index, action_attributes)
+            buf = bytes(buf)
+
+        msg = OFPFlowMod(datapath, match=self.flow_mod.match,
+                         instructions=self.flow_mod.instructions,
+                         **attributes)
+        msg._template_buf = buf
+        LazyAttribute.defer(msg, 'match', self._decode_match)
+        LazyAttribute.defer(msg, 'instructions', self._decode_instructions)
+        return msg
+
+    @staticmethod
+    def _decode_match(msg):
+        return OFPMatch.parser(msg._template_buf, ofproto.OFP_FLOW_MOD_SIZE -
+                               ofproto.OFP_MATCH_SIZE)
+
+    @staticmethod
+    def _decode_instructions(msg):
+        buf = msg._template_buf
+        offset = ofproto.OFP_FLOW_MOD_SIZE - ofproto.OFP_MATCH_SIZE
+        (match_len,) = struct.unpack_from('!H', buf, offset + 2)
+        offset += utils.round_up(match_len, 8)
+        instructions = []
+        while offset < len(buf):
+            inst = OFPInstruction.parser(buf, offset)
+            instructions.append(inst)
+            offset += inst.len
+        return instructions
+
+
 class OFPInstruction(StringifyMixin):
     _INSTRUCTION_TYPES = {}
 
@@ -3905,6 +4200,27 @@ class OFPMultipartReply(MsgBase):
         self.body = body
         self.flags = flags
 
+    # decoded on first access if the datapath decodes lazily
+    body = LazyAttribute('body')
+    _opt_attributes = ['body']
+
+    def _parser_body(self):
+        body_cls = self.cls_stats_body_cls
+        lazy = _lazy_decoding(self.datapath)
+        offset = ofproto.OFP_MULTIPART_REPLY_SIZE
+        body = []
+        while offset < self.msg_len:
+            if lazy and getattr(body_cls, 'cls_lazy_match', False):
+                b = body_cls.parser(self.buf, offset, lazy=True)
+            else:
+                b = body_cls.parser(self.buf, offset)
+            body.append(b)
+            offset += b.length if hasattr(b, 'length') else b.len
+
+        if self.cls_body_single_struct:
+            return body[0]
+        return body
+
     @classmethod
     def parser_stats_body(cls, buf, msg_len, offset):
         body_cls = cls.cls_stats_body_cls
@@ -3937,17 +4253,10 @@ class OFPMultipartReply(MsgBase):
         msg.type = type_
         msg.flags = flags
 
-        offset = ofproto.OFP_MULTIPART_REPLY_SIZE
-        body = []
-        while offset < msg_len:
-            b = stats_type_cls.cls_stats_body_cls.parser(msg.buf, offset)
-            body.append(b)
-            offset += b.length if hasattr(b, 'length') else b.len
-
-        if stats_type_cls.cls_body_single_struct:
-            msg.body = body[0]
+        if _lazy_decoding(datapath):
+            LazyAttribute.defer(msg, 'body', stats_type_cls._parser_body)
         else:
-            msg.body = body
+            msg.body = msg._parser_body()
         return msg
 
 
@@ -4055,8 +4364,24 @@ class OFPFlowStats(StringifyMixin):
         self.instructions = instructions
         self.length = length
 
+    # the stats reply parser may ask for the match and instructions to be
+    # decoded lazily
+    cls_lazy_match = True
+    instructions = LazyAttribute('instructions')
+    _opt_attributes = ['instructions']
+
+    @staticmethod
+    def _parser_instructions(buf, offset, inst_length):
+        instructions = []
+        while inst_length > 0:
+            inst = OFPInstruction.parser(buf, offset)
+            instructions.append(inst)
+            offset += inst.len
+            inst_length -= inst.len
+        return instructions
+
     @classmethod
-    def parser(cls, buf, offset):
+    def parser(cls, buf, offset, lazy=False):
         flow_stats = cls()
 
         (flow_stats.length, flow_stats.table_id,
@@ -4068,20 +4393,20 @@ class OFPFlowStats(StringifyMixin):
             ofproto.OFP_FLOW_STATS_0_PACK_STR, buf, offset)
         offset += ofproto.OFP_FLOW_STATS_0_SIZE
 
-        flow_stats.match = OFPMatch.parser(buf, offset)
+        flow_stats.match = OFPMatch.parser(buf, offset, lazy=lazy)
         match_length = utils.round_up(flow_stats.match.length, 8)
         inst_length = (flow_stats.length - (ofproto.OFP_FLOW_STATS_SIZE -
                                             ofproto.OFP_MATCH_SIZE +
                                             match_length))
         offset += match_length
-        instructions = []
-        while inst_length > 0:
-            inst = OFPInstruction.parser(buf, offset)
-            instructions.append(inst)
-            offset += inst.len
-            inst_length -= inst.len
-
-        flow_stats.instructions = instructions
+        if lazy:
+            LazyAttribute.defer(
+                flow_stats, 'instructions',
+                lambda flow_stats: cls._parser_instructions(buf, offset,
+                                                            inst_length))
+        else:
+            flow_stats.instructions = cls._parser_instructions(
+                buf, offset, inst_length)
         return flow_stats
 
 
@@ -0,0 +1,96 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+PacketIn dispatch benchmark.
+
+Times the handler resolution and calls done for each PacketIn: by the
+Datapath receive loop on the ofp_event service brick (OFPHandler), and by
+the event loop of an application handling PacketIn, with no-op handlers.
+
+Usage::
+
+    python -m ryu.tests.benchmark.bench_dispatch [--messages N]
+"""
+
+import argparse
+import os
+import timeit
+
+from ryu.base import app_manager
+from ryu.controller import ofp_event
+from ryu.controller import ofp_handler
+from ryu.controller.handler import CONFIG_DISPATCHER
+from ryu.controller.handler import MAIN_DISPATCHER
+from ryu.controller.handler import register_instance
+from ryu.controller.handler import set_ev_cls
+from ryu.ofproto import ofproto_parser
+from ryu.ofproto import ofproto_protocol
+from ryu.ofproto import ofproto_v1_3
+
+
+PACKET_IN = os.path.join(os.path.dirname(__file__),
+                         '../packet_data/of13/4-4-ofp_packet_in.packet')
+
+
+class _PacketInApp(app_manager.RyuApp):
+    OFP_VERSIONS = [ofproto_v1_3.OFP_VERSION]
+
+    @set_ev_cls(ofp_event.EventOFPPacketIn, MAIN_DISPATCHER)
+    def packet_in_handler(self, ev):
+        pass
+
+    @set_ev_cls(ofp_event.EventOFPPacketIn, CONFIG_DISPATCHER)
+    def config_packet_in_handler(self, ev):
+        pass
+
+    @set_ev_cls(ofp_event.EventOFPPortStatus, MAIN_DISPATCHER)
+    def port_status_handler(self, ev):
+        pass
+
+    @set_ev_cls(ofp_event.EventOFPSwitchFeatures, CONFIG_DISPATCHER)
+    def switch_features_handler(self, ev):
+        pass
+
+
+def packet_in_event():
+    with open(PACKET_IN, 'rb') as f:
+        buf = f.read()
+    (version, msg_type, msg_len, xid) = ofproto_parser.header(buf)
+    dp = ofproto_protocol.ProtocolDesc(version)
+    msg = ofproto_parser.msg(dp, version, msg_type, msg_len, xid, buf)
+    return ofp_event.ofp_msg_to_ev(msg)
+
+
+def dispatch(app, ev, state):
+    for handler in app.get_handlers(ev, state):
+        handler(ev)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--messages', type=int, default=1000000,
+                        help='PacketIns dispatched')
+    args = parser.parse_args()
+
+    ev = packet_in_event()
+    for name, app in (('ofp_event', ofp_handler.OFPHandler()),
+                      ('app', _PacketInApp())):
+        register_instance(app)
+        elapsed = min(timeit.repeat(lambda: dispatch(app, ev, MAIN_DISPATCHER),
+                                    number=args.messages, repeat=3))
+        print('%-10s %8.0f ns/message' % (name, elapsed / args.messages * 1e9))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+OpenFlow 1.3 FlowMod serialization benchmark.
+
+Times making and serializing the FlowMods of a reserved path, matching
+the MAC addresses and input port of a flow and sending it to a queue of
+an output port: built with OFPMatch and actions, and patched into an
+OFPFlowModTemplate.
+
+Usage::
+
+    python -m ryu.tests.benchmark.bench_flow_mod [--messages N]
+"""
+
+import argparse
+import timeit
+
+from ryu.ofproto import ofproto_protocol
+from ryu.ofproto import ofproto_v1_3
+from ryu.ofproto import ofproto_v1_3_parser
+
+
+def flow_mod(dp, src, dst, in_port, queue_id, out_port):
+    parser = ofproto_v1_3_parser
+    match = parser.OFPMatch(eth_src=src, eth_dst=dst, in_port=in_port)
+    actions = [parser.OFPActionSetQueue(queue_id),
+               parser.OFPActionOutput(out_port)]
+    inst = [parser.OFPInstructionActions(ofproto_v1_3.OFPIT_APPLY_ACTIONS,
+                                         actions)]
+    return parser.OFPFlowMod(dp, priority=1, match=match, instructions=inst,
+                             idle_timeout=60, cookie=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--messages', type=int, default=20000,
+                        help='FlowMods serialized per run')
+    args = parser.parse_args()
+
+    dp = ofproto_protocol.ProtocolDesc(ofproto_v1_3.OFP_VERSION)
+    template = ofproto_v1_3_parser.OFPFlowModTemplate(
+        flow_mod(dp, '00:00:00:00:00:00', '00:00:00:00:00:00', 0, 0, 0))
+    hops = [(port, port % 8, port + 1) for port in range(1, 9)]
+
+    def build():
+        for in_port, queue_id, out_port in hops:
+            msg = flow_mod(dp, '00:00:00:00:00:01', '00:00:00:00:00:02',
+                           in_port, queue_id, out_port)
+            msg.xid = 0
+            msg.serialize()
+
+    def patch():
+        for in_port, queue_id, out_port in hops:
+            msg = template.to_msg(
+                dp, match={'eth_src': '00:00:00:00:00:01',
+                           'eth_dst': '00:00:00:00:00:02',
+                           'in_port': in_port},
+                actions={0: {'queue_id': queue_id}, 1: {'port': out_port}},
+                idle_timeout=60, cookie=1)
+            msg.xid = 0
+            msg.serialize()
+
+    number = max(args.messages // len(hops), 1)
+    for name, stmt in (('OFPFlowMod', build), ('template', patch)):
+        elapsed = min(timeit.repeat(stmt, number=number, repeat=3))
+        print('%-10s %8.1f us/message' % (
+            name, elapsed / (number * len(hops)) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
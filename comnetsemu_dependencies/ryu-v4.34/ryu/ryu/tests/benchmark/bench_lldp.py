@@ -0,0 +1,114 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+LLDP link discovery benchmark.
+
+Times a round of LLDP packets to every port of the datapaths: building a
+PacketOut per port and sending the ports one by one LLDP_SEND_GUARD
+apart, as ryu.topology.switches did, and sending the serialized
+PacketOuts in turns of a batch per datapath.  The round time adds the
+guard sleeps to the CPU time.
+
+Usage::
+
+    python -m ryu.tests.benchmark.bench_lldp [--datapaths N] [--ports N]
+"""
+
+import argparse
+import timeit
+
+from ryu.ofproto import ofproto_protocol
+from ryu.ofproto import ofproto_v1_3
+from ryu.ofproto import ofproto_v1_3_parser
+from ryu.topology import switches
+
+
+class Datapath(ofproto_protocol.ProtocolDesc):
+    def __init__(self, id):
+        super(Datapath, self).__init__(ofproto_v1_3.OFP_VERSION)
+        self.id = id
+        self.xid = 0
+
+    def set_xid(self, msg):
+        self.xid += 1
+        msg.set_xid(self.xid)
+
+    def send(self, buf):
+        return True
+
+    def send_msg(self, msg):
+        self.set_xid(msg)
+        msg.serialize()
+        return self.send(msg.buf)
+
+
+def make_switches(datapaths, ports):
+    app = switches.Switches()
+    app.LLDP_SEND_GUARD = 0
+    for dpid in range(1, datapaths + 1):
+        app.dps[dpid] = Datapath(dpid)
+        for port_no in range(1, ports + 1):
+            ofpport = ofproto_v1_3_parser.OFPPort(
+                port_no, '00:00:00:00:00:01', 'eth%d' % port_no,
+                0, 0, 0, 0, 0, 0, 0, 0)
+            app._port_added(switches.Port(dpid, ofproto_v1_3, ofpport))
+    return app
+
+
+def send_one_by_one(app):
+    # the PacketOut of each port is built and serialized on every round
+    for port, port_data in app.ports.items():
+        port_data = app.ports.lldp_sent(port)
+        dp = app.dps[port.dpid]
+        parser = dp.ofproto_parser
+        out = parser.OFPPacketOut(
+            datapath=dp, in_port=dp.ofproto.OFPP_CONTROLLER,
+            buffer_id=dp.ofproto.OFP_NO_BUFFER,
+            actions=[parser.OFPActionOutput(port.port_no)],
+            data=port_data.lldp_data)
+        dp.send_msg(out)
+
+
+def send_batches(app):
+    for port in app.ports:
+        app.ports[port].timestamp = None
+    app.lldp_round()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--datapaths', type=int, default=20,
+                        help='datapaths')
+    parser.add_argument('--ports', type=int, default=48,
+                        help='ports per datapath')
+    args = parser.parse_args()
+
+    app = make_switches(args.datapaths, args.ports)
+    ports = args.datapaths * args.ports
+    guard = switches.Switches.LLDP_SEND_GUARD
+    sleeps = {
+        'one by one': ports - 1,
+        'batches': len(app._lldp_turns(list(app.ports))) - 1,
+    }
+    print('%-10s %12s %12s' % ('sending', 'cpu/port', 'round'))
+    for name, send in (('one by one', send_one_by_one),
+                       ('batches', send_batches)):
+        send(app)   # serialize the PacketOuts once
+        elapsed = min(timeit.repeat(lambda: send(app), number=1, repeat=3))
+        print('%-10s %9.1f us %10.3f s' % (
+            name, elapsed / ports * 1e6, elapsed + sleeps[name] * guard))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Packet header parsing benchmark.
+
+Times getting the header fields packet-in handlers use out of mixed
+ARP, IPv4 (TCP and UDP) and LLDP traffic: with packet.Packet, with
+ethernet.parser() and with header_view.HeaderView, down to the Ethernet
+header (the addresses) and to the transport header (the addresses and
+ports).
+
+Usage::
+
+    python -m ryu.tests.benchmark.bench_packet [--packets N]
+"""
+
+import argparse
+import timeit
+
+from ryu.lib.packet import arp
+from ryu.lib.packet import ether_types
+from ryu.lib.packet import ethernet
+from ryu.lib.packet import header_view
+from ryu.lib.packet import in_proto
+from ryu.lib.packet import ipv4
+from ryu.lib.packet import packet
+from ryu.lib.packet import tcp
+from ryu.lib.packet import udp
+from ryu.topology.switches import LLDPPacket
+
+
+def _serialize(*protocols):
+    pkt = packet.Packet()
+    for p in protocols:
+        pkt.add_protocol(p)
+    pkt.serialize()
+    return bytes(pkt.data)
+
+
+def traffic():
+    src = '00:00:00:00:00:01'
+    dst = '00:00:00:00:00:02'
+    payload = b'\x00' * 1400
+    return [
+        _serialize(ethernet.ethernet('ff:ff:ff:ff:ff:ff', src,
+                                     ether_types.ETH_TYPE_ARP),
+                   arp.arp_ip(arp.ARP_REQUEST, src, '10.0.0.1',
+                              '00:00:00:00:00:00', '10.0.0.2')),
+        _serialize(ethernet.ethernet(dst, src, ether_types.ETH_TYPE_IP),
+                   ipv4.ipv4(proto=in_proto.IPPROTO_TCP, src='10.0.0.1',
+                             dst='10.0.0.2'),
+                   tcp.tcp(src_port=40000, dst_port=5001), payload),
+        _serialize(ethernet.ethernet(dst, src, ether_types.ETH_TYPE_IP),
+                   ipv4.ipv4(proto=in_proto.IPPROTO_UDP, src='10.0.0.1',
+                             dst='10.0.0.2'),
+                   udp.udp(src_port=40000, dst_port=5001), payload),
+        LLDPPacket.lldp_packet(1, 1, src, 120),
+    ]
+
+
+def with_packet(data):
+    pkt = packet.Packet(data)
+    eth = pkt.get_protocol(ethernet.ethernet)
+    return eth.src, eth.dst
+
+
+def with_packet_ports(data):
+    pkt = packet.Packet(data)
+    eth = pkt.get_protocol(ethernet.ethernet)
+    l4 = pkt.get_protocol(tcp.tcp) or pkt.get_protocol(udp.udp)
+    return eth.src, eth.dst, l4 and (l4.src_port, l4.dst_port)
+
+
+def with_ethernet_parser(data):
+    eth, _cls, _rest = ethernet.ethernet.parser(data)
+    return eth.src, eth.dst
+
+
+def with_view(data):
+    view = header_view.HeaderView(data, depth=header_view.ETHERNET)
+    return view.eth_src, view.eth_dst
+
+
+def with_view_ports(data):
+    view = header_view.HeaderView(data)
+    return view.eth_src, view.eth_dst, (view.src_port, view.dst_port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--packets', type=int, default=20000,
+                        help='packets parsed per run')
+    args = parser.parse_args()
+
+    packets = traffic()
+    number = max(args.packets // len(packets), 1)
+    for name, parse in (('Packet', with_packet),
+                        ('ethernet.parser', with_ethernet_parser),
+                        ('HeaderView', with_view),
+                        ('Packet ports', with_packet_ports),
+                        ('HeaderView ports', with_view_ports)):
+        def stmt():
+            for data in packets:
+                parse(data)
+        elapsed = min(timeit.repeat(stmt, number=number, repeat=3))
+        print('%-18s %10.0f packets/s' % (
+            name, number * len(packets) / elapsed))
+
+
+if __name__ == '__main__':
+    main()
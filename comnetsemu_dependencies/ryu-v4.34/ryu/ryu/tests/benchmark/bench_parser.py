@@ -0,0 +1,141 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+OpenFlow 1.3 parser benchmark.
+
+Times the parsing of PacketIns and of a flow stats reply, decoded eagerly
+and lazily (Datapath.lazy_decoding), by a handler which:
+
+- ignores the message (a PacketIn of a flow already set up),
+- reads a field (the in_port of a PacketIn, the counters and in_port of
+  each flow stats entry),
+- converts the whole message (to_jsondict()).
+
+Usage::
+
+    python -m ryu.tests.benchmark.bench_parser [--messages N] [--flows N]
+"""
+
+import argparse
+import os
+import struct
+import timeit
+
+from ryu.ofproto import ofproto_parser
+from ryu.ofproto import ofproto_protocol
+from ryu.ofproto import ofproto_v1_3
+from ryu.ofproto import ofproto_v1_3_parser
+
+
+PACKET_DATA_DIR = os.path.join(os.path.dirname(__file__),
+                               '../packet_data/of13')
+
+
+def read_packet(name):
+    with open(os.path.join(PACKET_DATA_DIR, name), 'rb') as f:
+        return f.read()
+
+
+def flow_stats_entry():
+    # An entry of a flow set up by the FlowAllocator application
+    match = ofproto_v1_3_parser.OFPMatch(
+        in_port=1, eth_type=0x800, ip_proto=6, ipv4_src='10.0.0.1',
+        ipv4_dst='10.0.0.2', tcp_src=40000, tcp_dst=5001)
+    actions = [ofproto_v1_3_parser.OFPActionSetQueue(1),
+               ofproto_v1_3_parser.OFPActionOutput(2)]
+    inst = ofproto_v1_3_parser.OFPInstructionActions(
+        ofproto_v1_3.OFPIT_APPLY_ACTIONS, actions)
+
+    buf = bytearray(ofproto_v1_3.OFP_FLOW_STATS_0_SIZE)
+    match.serialize(buf, len(buf))
+    inst.serialize(buf, len(buf))
+    struct.pack_into(ofproto_v1_3.OFP_FLOW_STATS_0_PACK_STR, buf, 0,
+                     len(buf), 0, 120, 500000000, 100, 0, 0, 0, 0x1234,
+                     1000000, 1500000000)
+    return bytes(buf)
+
+
+def flow_stats_reply(flows):
+    entry = flow_stats_entry()
+    flows = min(flows, (0xffff - ofproto_v1_3.OFP_MULTIPART_REPLY_SIZE) //
+                len(entry))
+    length = ofproto_v1_3.OFP_MULTIPART_REPLY_SIZE + len(entry) * flows
+    buf = bytearray(length)
+    struct.pack_into(ofproto_v1_3.OFP_HEADER_PACK_STR, buf, 0,
+                     ofproto_v1_3.OFP_VERSION, ofproto_v1_3.OFPT_MULTIPART_REPLY,
+                     length, 0)
+    struct.pack_into(ofproto_v1_3.OFP_MULTIPART_REPLY_PACK_STR, buf,
+                     ofproto_v1_3.OFP_HEADER_SIZE,
+                     ofproto_v1_3.OFPMP_FLOW, 0)
+    buf[ofproto_v1_3.OFP_MULTIPART_REPLY_SIZE:] = entry * flows
+    return bytes(buf)
+
+
+def read_packet_in(msg):
+    return msg.match.get('in_port')
+
+
+def read_flow_stats(msg):
+    return [(stats.packet_count, stats.byte_count, stats.match.get('in_port'))
+            for stats in msg.body]
+
+
+def convert(msg):
+    return msg.to_jsondict()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--messages', type=int, default=10000,
+                        help='messages parsed per run')
+    parser.add_argument('--flows', type=int, default=500,
+                        help='entries of the flow stats reply')
+    args = parser.parse_args()
+
+    messages = (
+        ('packet_in', read_packet('4-4-ofp_packet_in.packet'),
+         read_packet_in, args.messages),
+        ('packet_in_tunnel',
+         read_packet('libofproto-OFP13-packet_in.packet'),
+         read_packet_in, args.messages),
+        ('flow_stats', flow_stats_reply(args.flows),
+         read_flow_stats, max(args.messages // args.flows, 1)),
+    )
+    print('%-18s %-8s %12s %12s %12s' % ('message', 'decoding', 'ignore',
+                                         'read', 'convert'))
+    for name, buf, read, number in messages:
+        (version, msg_type, msg_len, xid) = ofproto_parser.header(buf)
+        for lazy in (False, True):
+            dp = ofproto_protocol.ProtocolDesc(version)
+            dp.lazy_decoding = lazy
+
+            def parse():
+                return ofproto_parser.msg(dp, version, msg_type, msg_len,
+                                          xid, buf)
+
+            results = []
+            for handle in (None, read, convert):
+                if handle is None:
+                    stmt = parse
+                else:
+                    def stmt(handle=handle):
+                        handle(parse())
+                elapsed = min(timeit.repeat(stmt, number=number, repeat=3))
+                results.append(elapsed / number * 1e6)
+            print('%-18s %-8s %9.1f us %9.1f us %9.1f us' % (
+                (name, 'lazy' if lazy else 'eager') + tuple(results)))
+
+
+if __name__ == '__main__':
+    main()
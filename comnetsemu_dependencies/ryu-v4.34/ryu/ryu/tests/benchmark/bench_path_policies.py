@@ -0,0 +1,96 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Path policy benchmark.
+
+Times PathFinder.find_path for each path policy between random switches
+of a random network with random link capacities and delays, the widest
+path search being the one the flow allocator had before the policies.
+
+Usage::
+
+    python -m ryu.tests.benchmark.bench_path_policies [--switches N]
+        [--requests N]
+"""
+
+import argparse
+import logging
+import random
+import time
+
+from ryu.app.path_finder import PathFinder, PATH_POLICIES
+
+
+LOG = logging.getLogger(__name__)
+
+
+def make_network(n, degree, seed):
+    # a ring of n switches with random chords, up to degree links each,
+    # of random capacity (Mbps) and delay (ms) in each direction
+    rng = random.Random(seed)
+    links = set((i, i % n + 1) for i in range(1, n + 1))
+    while len(links) < n * degree // 2:
+        u, v = rng.sample(range(1, n + 1), 2)
+        if (v, u) not in links:
+            links.add((u, v))
+    capacities, delays = {}, {}
+    for u, v in sorted(links):
+        for link in ((u, v), (v, u)):
+            capacities[link] = rng.choice((100, 200, 500, 1000))
+            delays[link] = rng.uniform(1, 20)
+    return capacities, delays
+
+
+def run(finder, delays, policy, requests, seed):
+    # search time (s) of each request, the same requests for each policy
+    rng = random.Random(seed)
+    switches = sorted(finder.graph)
+    times, found = [], 0
+    for _ in range(requests):
+        src, dst = rng.sample(switches, 2)
+        bandwidth = rng.choice((10, 50, 100))
+        start = time.perf_counter()
+        path, _ = finder.find_path({'dpid': src}, {'dpid': dst}, bandwidth,
+                                   policy, delays)
+        times.append(time.perf_counter() - start)
+        found += path is not None
+    return times, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--switches', type=int, default=30,
+                        help='switches of the network')
+    parser.add_argument('--degree', type=int, default=4,
+                        help='links per switch')
+    parser.add_argument('--requests', type=int, default=2000,
+                        help='path searches to time for each policy')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    LOG.setLevel(logging.CRITICAL)
+    capacities, delays = make_network(args.switches, args.degree, args.seed)
+    finder = PathFinder(capacities, LOG)
+    print('%d switches, %d links' % (args.switches, len(capacities) // 2))
+    print('%-16s %5s %8s %8s' % ('policy', 'found', 'p50', 'p99'))
+    for policy in PATH_POLICIES:
+        times, found = run(finder, delays, policy, args.requests, args.seed)
+        times.sort()
+        print('%-16s %5d %5.3f ms %5.3f ms' %
+              (policy, found, times[len(times) // 2] * 1e3,
+               times[min(len(times) - 1, len(times) * 99 // 100)] * 1e3))
+
+
+if __name__ == '__main__':
+    main()
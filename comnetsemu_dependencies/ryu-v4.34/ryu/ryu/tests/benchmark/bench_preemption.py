@@ -0,0 +1,147 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Preemption planning benchmark.
+
+Fills a random network with reservations of random priority classes
+until it is congested, then times the flow allocator planning the
+preemption of a high priority request (_plan_preemption) between random
+switches. The reservations are not installed and nothing is preempted.
+
+Usage::
+
+    python -m ryu.tests.benchmark.bench_preemption [--switches N]
+        [--reservations N] [--requests N]
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+import mock
+
+import ryu.app
+
+# The allocator imports its sibling modules as ryu-manager runs it
+sys.path.insert(0, os.path.dirname(ryu.app.__file__))
+from ryu.app import flow_allocator_controller as fac  # noqa: E402
+
+
+HOSTS_PER_SWITCH = 50
+BANDWIDTHS = (1, 2, 5, 10)
+
+
+def make_allocator(n, degree, capacity, seed):
+    # a ring of n switches with random chords, up to degree links each
+    rng = random.Random(seed)
+    links = set((i, i % n + 1) for i in range(1, n + 1))
+    while len(links) < n * degree // 2:
+        u, v = rng.sample(range(1, n + 1), 2)
+        if (v, u) not in links:
+            links.add((u, v))
+
+    def init_flow_capacity(allocator):
+        for u, v in links:
+            for link in ((u, v), (v, u)):
+                allocator.flow_capacity[link] = capacity
+                allocator.links[link] = {'src_port': link[1]}
+
+    with mock.patch.object(fac.threading, 'Thread'), \
+            mock.patch.object(fac, 'FlowWebSocketHandler'), \
+            mock.patch.object(fac.logging, 'StreamHandler',
+                              logging.NullHandler), \
+            mock.patch.object(fac.FlowAllocator, '_init_host_to_switch'), \
+            mock.patch.object(fac.FlowAllocator, '_init_flow_capacity',
+                              autospec=True, side_effect=init_flow_capacity):
+        allocator = fac.FlowAllocator()
+    allocator.logger.setLevel(logging.CRITICAL)
+    for dpid in range(1, n + 1):
+        # the reservations are not installed, no message is sent
+        allocator.datapaths[dpid] = object()
+        for i in range(HOSTS_PER_SWITCH):
+            mac = '00:00:00:00:%02x:%02x' % (dpid, i)
+            allocator.host_to_switch[mac] = {'connected_switch': 's%d' % dpid,
+                                             'src_port': i + 1}
+    return allocator
+
+
+def fill(allocator, reservations, classes, seed):
+    rng = random.Random(seed)
+    hosts = list(allocator.host_to_switch)
+    admitted = attempts = 0
+    while admitted < reservations and attempts < reservations * 10:
+        attempts += 1
+        src, dst = rng.sample(hosts, 2)
+        if allocator.allocate_flow(src, dst, rng.choice(BANDWIDTHS),
+                                   priority=rng.randrange(classes)):
+            admitted += 1
+    return admitted
+
+
+def plan(allocator, requests, bandwidth, priority, seed):
+    # planning time (s) of each request, and the number of plans found
+    rng = random.Random(seed)
+    switches = sorted(allocator.datapaths)
+    times, found = [], 0
+    for _ in range(requests):
+        src, dst = rng.sample(switches, 2)
+        start = time.perf_counter()
+        path, _ = allocator._plan_preemption(src, dst, bandwidth, priority)
+        times.append(time.perf_counter() - start)
+        found += path is not None
+    return times, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--switches', type=int, default=20,
+                        help='switches of the network')
+    parser.add_argument('--degree', type=int, default=4,
+                        help='links per switch')
+    parser.add_argument('--capacity', type=float, default=4000,
+                        help='capacity of each link (Mbps)')
+    parser.add_argument('--reservations', type=int, default=10000,
+                        help='reservations to fill the network with')
+    parser.add_argument('--classes', type=int, default=3,
+                        help='priority classes of the reservations')
+    parser.add_argument('--requests', type=int, default=1000,
+                        help='preemption plans to time')
+    parser.add_argument('--bandwidth', type=float, default=100,
+                        help='bandwidth of the preempting requests (Mbps)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    allocator = make_allocator(args.switches, args.degree, args.capacity,
+                               args.seed)
+    admitted = fill(allocator, args.reservations, args.classes, args.seed)
+    congested = sum(1 for free in allocator.flow_capacity.values()
+                    if free < args.bandwidth)
+    print('%d reservations, %d of %d links with less than %g Mbps free' %
+          (admitted, congested, len(allocator.flow_capacity),
+           args.bandwidth))
+
+    times, found = plan(allocator, args.requests, args.bandwidth,
+                        args.classes, args.seed)
+    times.sort()
+    print('%d plans found out of %d requests' % (found, len(times)))
+    for name, p in (('p50', 50), ('p99', 99), ('max', 100)):
+        elapsed = times[min(len(times) - 1, len(times) * p // 100)]
+        print('%-4s %8.2f ms' % (name, elapsed * 1e3))
+
+
+if __name__ == '__main__':
+    main()
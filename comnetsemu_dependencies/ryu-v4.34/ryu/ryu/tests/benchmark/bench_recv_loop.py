@@ -0,0 +1,143 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Receive path benchmark of a switch connection.
+
+The OpenFlow messages captured in ryu/tests/packet_data, those a switch
+sends to the controller, are replayed in a loop over a loopback TCP
+connection to a Datapath, which parses them in its receive loop. The
+events are dropped, so the figures are those of the socket reads and the
+message parsing alone.
+
+Usage::
+
+    python -m ryu.tests.benchmark.bench_recv_loop [--messages N]
+"""
+
+import argparse
+import logging
+import os
+import re
+import socket
+import threading
+import time
+
+from ryu.base import app_manager
+from ryu.controller import controller
+from ryu.controller import handler
+from ryu.ofproto import ofproto_parser
+from ryu.ofproto import ofproto_protocol
+
+
+PACKET_DATA_DIR = os.path.join(os.path.dirname(__file__), '../packet_data')
+
+# Captured messages sent by the switches
+SWITCH_MESSAGES = re.compile(
+    r'^(\d+-\d+-ofp_|libofproto-OFP\d+-)(.*_reply|packet_in|port_status|'
+    r'flow_removed|error_msg|echo_request|hello)\.packet$')
+PACKET_INS = re.compile(r'^(\d+-\d+-ofp_|libofproto-OFP\d+-)packet_in\.packet$')
+ECHOS = re.compile(r'^(\d+-\d+-ofp_|libofproto-OFP\d+-)echo_(request|reply)\.packet$')
+
+
+class _DropBrick(object):
+    # Stands for the ofp_event service brick, without any observer
+
+    def send_event_to_observers(self, ev, state=None):
+        pass
+
+    def get_handlers(self, ev, state=None):
+        return []
+
+
+def load_stream(version_dir, pattern=SWITCH_MESSAGES):
+    """
+    Returns the captured messages of a packet_data directory matching
+    pattern, concatenated, and their number. The files not holding exactly
+    one message the parser accepts are left out.
+    """
+    path = os.path.join(PACKET_DATA_DIR, version_dir)
+    stream = bytearray()
+    count = 0
+    for name in sorted(os.listdir(path)):
+        if not pattern.match(name):
+            continue
+        with open(os.path.join(path, name), 'rb') as f:
+            buf = f.read()
+        (version, msg_type, msg_len, xid) = ofproto_parser.header(buf)
+        if msg_len != len(buf):
+            continue
+        dp = ofproto_protocol.ProtocolDesc(version)
+        try:
+            dp.ofproto_parser.msg_parser(dp, version, msg_type, msg_len, xid,
+                                         buf)
+        except Exception:
+            continue
+        stream += buf
+        count += 1
+    return bytes(stream), count
+
+
+def replay(stream, repeat):
+    """
+    Sends the stream repeat times to a Datapath over a loopback TCP
+    connection and returns the seconds its receive loop took.
+    """
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('127.0.0.1', 0))
+    server.listen(1)
+    client = socket.create_connection(server.getsockname())
+    sock, addr = server.accept()
+    server.close()
+
+    def send():
+        for _ in range(repeat):
+            client.sendall(stream)
+        client.close()
+
+    dp = controller.Datapath(sock, addr)
+    dp.set_state(handler.MAIN_DISPATCHER)
+    sender = threading.Thread(target=send)
+    start = time.time()
+    sender.start()
+    dp._recv_loop()
+    elapsed = time.time() - start
+    sender.join()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--messages', type=int, default=200000,
+                        help='messages replayed per stream')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    app_manager.SERVICE_BRICKS['ofp_event'] = _DropBrick()
+    streams = [('of13', ECHOS, 'echo'), ('of13', PACKET_INS, 'packet_in')]
+    streams += [(version, SWITCH_MESSAGES, 'mixed')
+                for version in ('of10', 'of12', 'of13', 'of14', 'of15')]
+    print('%-6s %-10s %10s %12s %10s' % ('stream', 'messages', 'bytes/msg',
+                                         'messages/s', 'MB/s'))
+    for version, pattern, kind in streams:
+        stream, count = load_stream(version, pattern)
+        repeat = max(1, args.messages // count)
+        elapsed = replay(stream, repeat)
+        total = count * repeat
+        print('%-6s %-10s %10d %12.0f %10.1f' % (
+            version, kind, len(stream) // count, total / elapsed,
+            len(stream) * repeat / elapsed / 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Send path benchmark of a switch connection.
+
+An application greenthread installs paths, queueing a burst of
+serialized FlowMods for each one, to a Datapath connected over loopback TCP to a greenthread
+reading and dropping everything. Reports the messages sent per second,
+the socket writes per message and the send latency counters.
+
+Usage::
+
+    python -m ryu.tests.benchmark.bench_send_loop [--paths N] [--hops H]
+"""
+
+import argparse
+import time
+
+from ryu.lib import hub
+hub.patch()
+
+from ryu.base import app_manager
+from ryu.controller import controller
+from ryu.controller import handler
+from ryu.ofproto import ofproto_v1_3
+from ryu.ofproto import ofproto_v1_3_parser
+
+
+class _DropBrick(object):
+    # Stands for the ofp_event service brick, without any observer
+
+    def send_event_to_observers(self, ev, state=None):
+        pass
+
+    def get_handlers(self, ev, state=None):
+        return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--paths', type=int, default=5000,
+                        help='paths installed')
+    parser.add_argument('--hops', type=int, default=10,
+                        help='FlowMods per direction of a path')
+    args = parser.parse_args()
+
+    app_manager.SERVICE_BRICKS['ofp_event'] = _DropBrick()
+    server = hub.socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen(1)
+    client = hub.socket.create_connection(server.getsockname())
+    sock, addr = server.accept()
+    server.close()
+
+    def drop():
+        while client.recv(1 << 16):
+            pass
+
+    dp = controller.Datapath(sock, addr)
+    dp.set_version(ofproto_v1_3.OFP_VERSION)
+    dp.set_state(handler.MAIN_DISPATCHER)
+    parser = ofproto_v1_3_parser
+    reader = hub.spawn(drop)
+    sender = hub.spawn(dp._send_loop)
+
+    # The FlowMods of a path are serialized once, the send path alone
+    # is timed
+    bufs = []
+    for hop in range(2 * args.hops):
+        match = parser.OFPMatch(eth_src='00:00:00:00:00:01',
+                                eth_dst='00:00:00:00:00:02')
+        actions = [parser.OFPActionOutput(hop + 1)]
+        inst = [parser.OFPInstructionActions(
+            ofproto_v1_3.OFPIT_APPLY_ACTIONS, actions)]
+        msg = parser.OFPFlowMod(dp, priority=10, match=match,
+                                instructions=inst)
+        dp.set_xid(msg)
+        msg.serialize()
+        bufs.append(msg.buf)
+
+    start = time.time()
+    for _ in range(args.paths):
+        for buf in bufs:
+            dp.send(buf)
+        # The handler installing the path returns
+        hub.sleep(0)
+    dp.send_msg(parser.OFPBarrierRequest(dp), close_socket=True)
+    hub.joinall([sender])
+    elapsed = time.time() - start
+    hub.joinall([reader])
+
+    stats = dp.send_stats
+    print('messages/s        %10.0f' % (stats['messages'] / elapsed))
+    print('writes/message    %10.3f' % (stats['writes'] /
+                                        float(stats['messages'])))
+    print('mean latency (ms) %10.3f' % (stats['latency_sum'] /
+                                        stats['messages'] * 1e3))
+    print('max latency (ms)  %10.3f' % (stats['latency_max'] * 1e3))
+
+
+if __name__ == '__main__':
+    main()
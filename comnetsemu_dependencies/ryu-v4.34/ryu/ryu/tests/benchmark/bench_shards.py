@@ -0,0 +1,175 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Sharded controller throughput benchmark.
+
+Runs ryu-manager with ryu.app.cbench and the datapaths sharded across
+1, 2, 4... worker processes, and counts the FlowMods it answers to the
+packet-ins of emulated OpenFlow 1.0 switches, as cbench does in
+throughput mode: each switch keeps a window of packet-ins outstanding.
+The switches run in processes of their own, so the throughput only
+scales while there are cores left for the workers.
+
+Usage::
+
+    python -m ryu.tests.benchmark.bench_shards [--switches N] [--shards N,N]
+"""
+
+import argparse
+import multiprocessing
+import os
+import selectors
+import socket
+import struct
+import subprocess
+import sys
+import time
+
+from ryu.ofproto import ofproto_v1_0 as ofp
+
+
+_HEADER = struct.Struct(ofp.OFP_HEADER_PACK_STR)
+_PACKET = b'\xff' * 6 + b'\x00\x00\x00\x00\x00\x01' + b'\x08\x00' + \
+    b'\x00' * 46
+
+
+def _msg(msg_type, xid, body=b''):
+    return _HEADER.pack(ofp.OFP_VERSION, msg_type,
+                        ofp.OFP_HEADER_SIZE + len(body), xid) + body
+
+
+def _packet_in(buffer_id):
+    return _msg(ofp.OFPT_PACKET_IN, 0, struct.pack(
+        '!IHHBx', buffer_id, len(_PACKET), 1, ofp.OFPR_NO_MATCH) + _PACKET)
+
+
+class Switch(object):
+    def __init__(self, dpid, address, window):
+        self.dpid = dpid
+        self.window = window
+        self.sock = socket.create_connection(address)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.sendall(_msg(ofp.OFPT_HELLO, 0))
+        self.buf = b''
+        self.flow_mods = 0
+
+    def handle(self):
+        data = self.sock.recv(256 * 1024)
+        if not data:
+            raise EOFError()
+        self.buf += data
+        out = []
+        while len(self.buf) >= ofp.OFP_HEADER_SIZE:
+            _version, msg_type, msg_len, xid = _HEADER.unpack_from(self.buf)
+            if len(self.buf) < msg_len:
+                break
+            self.buf = self.buf[msg_len:]
+            if msg_type == ofp.OFPT_FLOW_MOD:
+                self.flow_mods += 1
+                out.append(_packet_in(self.flow_mods))
+            elif msg_type == ofp.OFPT_FEATURES_REQUEST:
+                out.append(_msg(ofp.OFPT_FEATURES_REPLY, xid, struct.pack(
+                    ofp.OFP_SWITCH_FEATURES_PACK_STR,
+                    self.dpid, 256, 1, 0, 0)))
+                out.extend(_packet_in(i) for i in range(self.window))
+            elif msg_type == ofp.OFPT_ECHO_REQUEST:
+                out.append(_msg(ofp.OFPT_ECHO_REPLY, xid))
+        if out:
+            self.sock.sendall(b''.join(out))
+
+
+def run_switches(dpids, address, window, warmup, duration, results):
+    sel = selectors.DefaultSelector()
+    switches = [Switch(dpid, address, window) for dpid in dpids]
+    for switch in switches:
+        sel.register(switch.sock, selectors.EVENT_READ, switch)
+    start = time.time() + warmup
+    end = start + duration
+    counted = None
+    while time.time() < end:
+        if counted is None and time.time() >= start:
+            counted = [switch.flow_mods for switch in switches]
+        for key, _events in sel.select(timeout=.1):
+            key.data.handle()
+    counted = counted or [0] * len(switches)
+    results.put(sum(switch.flow_mods - c
+                    for switch, c in zip(switches, counted)))
+
+
+def _wait_listening(address, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(address).close()
+            return
+        except socket.error:
+            time.sleep(.2)
+    raise RuntimeError('ryu-manager does not listen on %s:%d' % address)
+
+
+def measure(shards, args):
+    address = ('127.0.0.1', args.port)
+    controller = subprocess.Popen(
+        [sys.executable, '-m', 'ryu.cmd.manager',
+         '--ofp-tcp-listen-port', str(args.port),
+         '--shards', str(shards), 'ryu.app.cbench'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_listening(address)
+        time.sleep(shards * .5)     # the workers start listening one by one
+        results = multiprocessing.Queue()
+        dpids = list(range(1, args.switches + 1))
+        clients = [multiprocessing.Process(
+            target=run_switches,
+            args=(dpids[i::args.clients], address, args.window,
+                  args.warmup, args.duration, results))
+            for i in range(min(args.clients, len(dpids)))]
+        for client in clients:
+            client.start()
+        timeout = args.warmup + args.duration + 30
+        flow_mods = sum(results.get(timeout=timeout) for _ in clients)
+        for client in clients:
+            client.join()
+        return flow_mods / args.duration
+    finally:
+        controller.terminate()
+        controller.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--switches', type=int, default=16,
+                        help='emulated switches')
+    parser.add_argument('--shards', default='1,2,4',
+                        help='comma separated worker process counts')
+    parser.add_argument('--clients', type=int, default=2,
+                        help='processes running the switches')
+    parser.add_argument('--window', type=int, default=64,
+                        help='outstanding packet-ins per switch')
+    parser.add_argument('--warmup', type=float, default=2.,
+                        help='seconds before counting')
+    parser.add_argument('--duration', type=float, default=5.,
+                        help='seconds counted')
+    parser.add_argument('--port', type=int, default=16653,
+                        help='OpenFlow port of ryu-manager')
+    args = parser.parse_args()
+
+    print('%d cores, %d switches' % (os.cpu_count(), args.switches))
+    print('%-8s %14s' % ('shards', 'flow mods/s'))
+    for shards in [int(n) for n in args.shards.split(',')]:
+        print('%-8d %14.0f' % (shards, measure(shards, args)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Flow stats collection benchmark.
+
+Times turning two samples of the flow stats of a datapath, split in
+multipart replies, into the rates of each cookie: decoding the entries
+and diffing dicts, as the monitoring applications do, and reading the
+counters into the history of the stats service.
+
+Usage::
+
+    python -m ryu.tests.benchmark.bench_stats [--flows N] [--cookies N]
+"""
+
+import argparse
+import struct
+import timeit
+
+import numpy as np
+
+from ryu.app.stats import event
+from ryu.app.stats import service
+from ryu.ofproto import ofproto_parser
+from ryu.ofproto import ofproto_protocol
+from ryu.ofproto import ofproto_v1_3
+from ryu.tests.benchmark.bench_parser import flow_stats_entry
+
+
+def flow_stats_replies(flows, cookies, packets):
+    entry = flow_stats_entry()
+    per_reply = (0xffff - ofproto_v1_3.OFP_MULTIPART_REPLY_SIZE) // len(entry)
+    entries = []
+    for i in range(flows):
+        buf = bytearray(entry)
+        struct.pack_into('!QQQ', buf, 24, i % cookies, packets, packets * 1500)
+        entries.append(bytes(buf))
+
+    replies = []
+    for start in range(0, flows, per_reply):
+        body = b''.join(entries[start:start + per_reply])
+        length = ofproto_v1_3.OFP_MULTIPART_REPLY_SIZE + len(body)
+        more = start + per_reply < flows
+        buf = struct.pack(ofproto_v1_3.OFP_HEADER_PACK_STR,
+                          ofproto_v1_3.OFP_VERSION,
+                          ofproto_v1_3.OFPT_MULTIPART_REPLY, length, 0)
+        buf += struct.pack(ofproto_v1_3.OFP_MULTIPART_REPLY_PACK_STR,
+                           ofproto_v1_3.OFPMP_FLOW,
+                           ofproto_v1_3.OFPMPF_REPLY_MORE if more else 0)
+        replies.append(buf + body)
+    return replies
+
+
+def parse(dp, buf):
+    (version, msg_type, msg_len, xid) = ofproto_parser.header(buf)
+    return ofproto_parser.msg(dp, version, msg_type, msg_len, xid, buf)
+
+
+def with_dicts(dp, samples):
+    old = None
+    for timestamp, replies in samples:
+        counters = {}
+        for buf in replies:
+            for stats in parse(dp, buf).body:
+                packets, bytes_ = counters.get(stats.cookie, (0, 0))
+                counters[stats.cookie] = (packets + stats.packet_count,
+                                          bytes_ + stats.byte_count)
+        if old is not None:
+            interval = timestamp - old[0]
+            rates = {}
+            for cookie, count in counters.items():
+                old_count = old[1].get(cookie, (0, 0))
+                rates[cookie] = tuple((c - o) / interval
+                                      for c, o in zip(count, old_count))
+        old = (timestamp, counters)
+    return rates
+
+
+def with_history(dp, samples):
+    history = service.StatsHistory(event.EventFlowRates.columns, 2)
+    for timestamp, replies in samples:
+        keys = []
+        counters = []
+        for buf in replies:
+            msg = parse(dp, buf)
+            k, c = service.parse_flow_stats(
+                msg.buf, ofproto_v1_3.OFP_MULTIPART_REPLY_SIZE, msg.msg_len)
+            keys.append(k)
+            counters.append(c)
+        history.append(timestamp, np.concatenate(keys),
+                       np.concatenate(counters))
+    return history.rates()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--flows', type=int, default=5000,
+                        help='flow entries of the datapath')
+    parser.add_argument('--cookies', type=int, default=1000,
+                        help='cookies (reservations) of the flow entries')
+    args = parser.parse_args()
+
+    samples = [(t, flow_stats_replies(args.flows, args.cookies, t * 100))
+               for t in (10, 20)]
+    print('%-8s %-8s %12s' % ('method', 'decoding', 'per sample'))
+    for name, collect in (('dicts', with_dicts), ('history', with_history)):
+        for lazy in (False, True):
+            dp = ofproto_protocol.ProtocolDesc(ofproto_v1_3.OFP_VERSION)
+            dp.lazy_decoding = lazy
+            elapsed = min(timeit.repeat(lambda: collect(dp, samples),
+                                        number=1, repeat=3))
+            print('%-8s %-8s %9.2f ms' % (
+                name, 'lazy' if lazy else 'eager',
+                elapsed / len(samples) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
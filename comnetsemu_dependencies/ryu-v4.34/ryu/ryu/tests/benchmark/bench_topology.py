@@ -0,0 +1,106 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Topology discovery observer benchmark.
+
+Times an observer building its link map while the links of a network are
+discovered: getting the whole link list on every EventLinkAdd, as the
+flow allocator did, and applying the EventTopologyDelta of each window.
+The request round trips are left out.
+
+Usage::
+
+    python -m ryu.tests.benchmark.bench_topology [--switches N] [--window N]
+"""
+
+import argparse
+import timeit
+
+from ryu.ofproto import ofproto_v1_3
+from ryu.ofproto import ofproto_v1_3_parser
+from ryu.topology import switches
+
+
+def _port(dpid, port_no):
+    ofpport = ofproto_v1_3_parser.OFPPort(
+        port_no, '00:00:00:00:00:01', 'eth%d' % port_no,
+        0, 0, 0, 0, 0, 0, 0, 0)
+    return switches.Port(dpid, ofproto_v1_3, ofpport)
+
+
+def make_switches(n, window):
+    # a full mesh of n switches, window links discovered per delta
+    app = switches.Switches.__new__(switches.Switches)
+    app.links = switches.LinkState()
+    app.topology_version = 0
+    app._delta = {}
+    app._delta_log = []
+    app.delta_event = switches.hub.Event()
+    app.send_event_to_observers = lambda ev, state=None: None
+    links = [switches.Link(_port(src, dst), _port(dst, src))
+             for src in range(1, n + 1) for dst in range(1, n + 1)
+             if src != dst]
+    deltas = []
+    for i, link in enumerate(links):
+        app._link_added(link)
+        app.links.update_link(link.src, link.dst)
+        if (i + 1) % window == 0 or i + 1 == len(links):
+            deltas.append(app.send_topology_delta())
+    return links, deltas
+
+
+def _add(links, link):
+    links[(link.src.dpid, link.dst.dpid)] = {
+        'src_port': link.src.port_no, 'dst_port': link.dst.port_no,
+        'src_hw_addr': link.src.hw_addr, 'dst_hw_addr': link.dst.hw_addr}
+
+
+def with_link_list(links, deltas):
+    observed = {}
+    for i in range(len(links)):
+        observed.clear()
+        for link in links[:i + 1]:
+            _add(observed, link)
+    return observed
+
+
+def with_deltas(links, deltas):
+    observed = {}
+    for ev in deltas:
+        for link in ev.deleted:
+            observed.pop((link.src.dpid, link.dst.dpid), None)
+        for link in ev.added:
+            _add(observed, link)
+    return observed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--switches', type=int, default=20,
+                        help='switches of the full mesh')
+    parser.add_argument('--window', type=int, default=50,
+                        help='links discovered per delta')
+    args = parser.parse_args()
+
+    links, deltas = make_switches(args.switches, args.window)
+    print('%d links, %d deltas' % (len(links), len(deltas)))
+    for name, observe in (('link list', with_link_list),
+                          ('deltas', with_deltas)):
+        elapsed = min(timeit.repeat(lambda: observe(links, deltas),
+                                    number=1, repeat=3))
+        print('%-10s %10.2f ms' % (name, elapsed * 1e3))
+
+
+if __name__ == '__main__':
+    main()
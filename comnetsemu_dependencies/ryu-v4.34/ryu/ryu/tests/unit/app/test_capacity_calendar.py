@@ -0,0 +1,110 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+import unittest
+
+from nose.tools import eq_, ok_
+
+from ryu.app.capacity_calendar import CapacityCalendar
+
+
+LINK = (1, 2)
+
+
+class Test_capacity_calendar(unittest.TestCase):
+    """ Test case for the step functions of CapacityCalendar
+    """
+
+    def setUp(self):
+        self.calendar = CapacityCalendar()
+
+    def _steps(self, link=LINK):
+        times, booked = self.calendar.calendars[link]
+        return list(zip(times, booked))
+
+    def test_empty(self):
+        ok_(not self.calendar)
+        eq_(self.calendar.peak(LINK, 0, math.inf), 0)
+
+    def test_overlapping(self):
+        self.calendar.book([LINK], 10, 20, 4)
+        self.calendar.book([LINK], 15, 30, 3)
+        eq_(self._steps(),
+            [(-math.inf, 0), (10, 4), (15, 7), (20, 3), (30, 0)])
+        eq_(self.calendar.peak(LINK, 0, 10), 0)
+        eq_(self.calendar.peak(LINK, 10, 15), 4)
+        eq_(self.calendar.peak(LINK, 12, 25), 7)
+        eq_(self.calendar.peak(LINK, 20, 30), 3)
+        eq_(self.calendar.peak(LINK, 30, 40), 0)
+        eq_(self.calendar.peak((2, 1), 0, 40), 0)
+
+    def test_adjacent_merged(self):
+        self.calendar.book([LINK], 10, 20, 4)
+        self.calendar.book([LINK], 20, 30, 4)
+        eq_(self._steps(), [(-math.inf, 0), (10, 4), (30, 0)])
+        self.calendar.release([LINK], 10, 20, 4)
+        eq_(self._steps(), [(-math.inf, 0), (20, 4), (30, 0)])
+
+    def test_open_ended(self):
+        self.calendar.book([LINK], 10, math.inf, 2)
+        eq_(self._steps(), [(-math.inf, 0), (10, 2)])
+        self.calendar.book([LINK], 5, 20, 1)
+        eq_(self._steps(), [(-math.inf, 0), (5, 1), (10, 3), (20, 2)])
+        eq_(self.calendar.peak(LINK, 0, 5), 0)
+        eq_(self.calendar.peak(LINK, 100, math.inf), 2)
+        eq_(self.calendar.peak(LINK, 0, math.inf), 3)
+
+    def test_release_to_empty(self):
+        links = [LINK, (2, 3)]
+        self.calendar.book(links, 10, 20, .1)
+        self.calendar.book(links, 15, math.inf, .2)
+        eq_(set(self.calendar.links()), set(links))
+        self.calendar.release(links, 10, 20, .1)
+        self.calendar.release([LINK], 15, math.inf, .2)
+        # the float remainders are zeroed and the link dropped
+        eq_(list(self.calendar.links()), [(2, 3)])
+        self.calendar.release([(2, 3)], 15, math.inf, .2)
+        ok_(not self.calendar)
+
+    def test_release_float(self):
+        self.calendar.book([LINK], 10, 20, .1)
+        self.calendar.book([LINK], 10, 20, .2)
+        self.calendar.release([LINK], 10, 20, .3)
+        ok_(LINK not in self.calendar.calendars)
+
+    def test_expire(self):
+        self.calendar.book([LINK], 10, 20, 4)
+        self.calendar.book([LINK], 30, 40, 2)
+        self.calendar.expire(5)
+        eq_(self._steps(),
+            [(-math.inf, 0), (10, 4), (20, 0), (30, 2), (40, 0)])
+        # the step running at now is kept, from -inf on
+        self.calendar.expire(15)
+        eq_(self._steps(), [(-math.inf, 4), (20, 0), (30, 2), (40, 0)])
+        eq_(self.calendar.peak(LINK, 0, 20), 4)
+        self.calendar.expire(25)
+        eq_(self._steps(), [(-math.inf, 0), (30, 2), (40, 0)])
+        self.calendar.expire(40)
+        ok_(not self.calendar)
+
+    def test_expire_open_ended(self):
+        self.calendar.book([LINK], 10, math.inf, 2)
+        self.calendar.expire(100)
+        eq_(self._steps(), [(-math.inf, 2)])
+        # released after the expiry, the past before 10 is left to the
+        # next one
+        self.calendar.release([LINK], 10, math.inf, 2)
+        eq_(self.calendar.peak(LINK, 100, math.inf), 0)
+        self.calendar.expire(100)
+        ok_(not self.calendar)
@@ -0,0 +1,881 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import os
+import sys
+import unittest
+
+import mock
+from nose.tools import eq_, ok_
+
+import ryu.app
+from ryu.controller import ofp_event
+from ryu.ofproto import ofproto_v1_3
+from ryu.ofproto import ofproto_v1_3_parser
+from ryu.topology import event as topology_event
+from ryu.topology import switches
+
+# The allocator imports its sibling modules as ryu-manager runs it, from
+# the directory of the app
+sys.path.insert(0, os.path.dirname(ryu.app.__file__))
+from ryu.app import flow_allocator_controller as fac  # noqa: E402
+
+
+CAPACITY = 100
+
+
+def _mac(host):
+    return '00:00:00:00:00:%02x' % int(host[1:])
+
+
+class _Datapath(object):
+    """ Switch recording the messages sent to it, with a model of its
+    flow table, meters and groups
+    """
+    ofproto = ofproto_v1_3
+    ofproto_parser = ofproto_v1_3_parser
+
+    def __init__(self, dpid):
+        self.id = dpid
+        self.msgs = []
+        self.flows = {}
+        self.meters = {}
+        self.groups = {}
+
+    def send_msg(self, msg):
+        self.msgs.append(msg)
+        ofp = self.ofproto
+        if isinstance(msg, ofproto_v1_3_parser.OFPMeterMod):
+            self._mod(self.meters, msg.meter_id, msg, msg.command,
+                      ofp.OFPMC_ADD, ofp.OFPMC_MODIFY)
+        elif isinstance(msg, ofproto_v1_3_parser.OFPGroupMod):
+            self._mod(self.groups, msg.group_id, msg, msg.command,
+                      ofp.OFPGC_ADD, ofp.OFPGC_MODIFY)
+        elif isinstance(msg, ofproto_v1_3_parser.OFPFlowMod):
+            self._flow_mod(msg)
+
+    @staticmethod
+    def _mod(table, key, msg, command, add, modify):
+        if command == add:
+            assert key not in table, key
+            table[key] = msg
+        elif command == modify:
+            assert key in table, key
+            table[key] = msg
+        else:
+            del table[key]
+
+    def _flow_mod(self, msg):
+        ofp = self.ofproto
+        key = (msg.table_id, msg.priority, tuple(sorted(msg.match.items())))
+        if msg.command == ofp.OFPFC_ADD:
+            self.flows[key] = msg
+        elif msg.command == ofp.OFPFC_MODIFY_STRICT:
+            assert key in self.flows, key
+            self.flows[key] = msg
+        elif msg.command == ofp.OFPFC_DELETE_STRICT:
+            del self.flows[key]
+        elif msg.command == ofp.OFPFC_DELETE:
+            fields = dict(msg.match.items())
+            for table_id, priority, match in list(self.flows):
+                cookie = self.flows[(table_id, priority, match)].cookie
+                if (table_id == msg.table_id and
+                        cookie & msg.cookie_mask ==
+                        msg.cookie & msg.cookie_mask and
+                        all(dict(match).get(field) == value
+                            for field, value in fields.items())):
+                    del self.flows[(table_id, priority, match)]
+
+    def sent(self, cls):
+        return [msg for msg in self.msgs if isinstance(msg, cls)]
+
+
+class _FlowAllocatorTestCase(unittest.TestCase):
+    """ Base of the FlowAllocator test cases: an allocator built on the
+    links and hosts of the class, with a _Datapath per switch
+    """
+
+    # links (both directions) of CAPACITY Mbps
+    LINKS = [(1, 2), (2, 3), (3, 4), (4, 1)]
+    # host -> switch
+    HOSTS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4}
+
+    def setUp(self):
+        def init_flow_capacity(allocator):
+            for u, v in self.LINKS:
+                for link in ((u, v), (v, u)):
+                    allocator.flow_capacity[link] = CAPACITY
+                    allocator.links[link] = {'src_port': 100 + link[1]}
+
+        with mock.patch.object(fac.threading, 'Thread'), \
+                mock.patch.object(fac, 'FlowWebSocketHandler'), \
+                mock.patch.object(fac.logging, 'StreamHandler',
+                                  logging.NullHandler), \
+                mock.patch.object(fac.FlowAllocator, '_init_host_to_switch'), \
+                mock.patch.object(fac.FlowAllocator, '_init_flow_capacity',
+                                  autospec=True,
+                                  side_effect=init_flow_capacity):
+            self.allocator = fac.FlowAllocator()
+        self.allocator.logger.setLevel(logging.CRITICAL)
+
+        switches = set(self.HOSTS.values())
+        for link in self.LINKS:
+            switches.update(link)
+        self.datapaths = dict((dpid, _Datapath(dpid)) for dpid in switches)
+        self.allocator.datapaths.update(self.datapaths)
+        for host, dpid in self.HOSTS.items():
+            self.allocator.host_to_switch[_mac(host)] = {
+                'name': host, 'connected_switch': 's%d' % dpid,
+                'src_port': 1}
+
+        # ovs-vsctl, setting up the queues
+        patcher = mock.patch.object(fac.os, 'system', return_value=0)
+        self.system = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _allocate(self, src, dst, bandwidth, **kwargs):
+        return self.allocator.allocate_flow(_mac(src), _mac(dst), bandwidth,
+                                            **kwargs)
+
+    def _reservation(self, src, dst):
+        return self.allocator.flow_reservations[(_mac(src), _mac(dst))]
+
+    def _flows(self, dpid=None):
+        datapaths = ([self.datapaths[dpid]] if dpid is not None
+                     else self.datapaths.values())
+        return [flow for datapath in datapaths
+                for flow in datapath.flows.values()]
+
+    def _check(self):
+        # the rules, meters and groups on the switches are the allocator's,
+        # and the capacity left on each link is what its reservations and
+        # slices did not take
+        allocator = self.allocator
+        eq_(dict((dpid, len(datapath.flows))
+                 for dpid, datapath in self.datapaths.items()),
+            allocator.table_occupancy())
+        eq_(sum(len(datapath.meters) for datapath in self.datapaths.values()),
+            len(allocator.flow_meters))
+        eq_(sum(len(datapath.groups) for datapath in self.datapaths.values()),
+            len(allocator.flow_groups))
+        cookies = set(reservation['cookie']
+                      for reservation in allocator.flow_reservations.values())
+        for flow in self._flows():
+            ok_(flow.cookie == 0 or
+                flow.cookie & fac.RESERVATION_COOKIE_MASK in cookies,
+                flow.cookie)
+
+        used = dict((link, 0) for link in allocator.link_capacity)
+        for reservation in allocator.flow_reservations.values():
+            if reservation['slice'] is None:
+                for link in allocator._path_links(reservation['path']):
+                    used[link] += reservation['bandwidth']
+        for network_slice in allocator.slices.values():
+            for link in network_slice.links:
+                used[link] += network_slice.guaranteed
+        for link, capacity in allocator.link_capacity.items():
+            self.assertAlmostEqual(allocator.flow_capacity[link],
+                                   capacity - used[link])
+
+
+class Test_proactive_install(_FlowAllocatorTestCase):
+    """ Test case for the proactive install of the reservations, their
+    expiry and their release by OFPFlowRemoved
+    """
+
+    def _flow_removed(self, datapath, cookie, reason=None):
+        ofp = datapath.ofproto
+        if reason is None:
+            reason = ofp.OFPRR_HARD_TIMEOUT
+        msg = datapath.ofproto_parser.OFPFlowRemoved(
+            datapath, cookie=cookie, priority=1, reason=reason,
+            table_id=fac.CLASSIFICATION_TABLE)
+        self.allocator.flow_removed_handler(ofp_event.ofp_msg_to_ev(msg))
+
+    def test_reactive(self):
+        ok_(self._allocate('h1', 'h2', 10))
+        reservation = self._reservation('h1', 'h2')
+        eq_(reservation['path'], [1, 2])
+        ok_(not reservation['installed'])
+        eq_(self._flows(), [])
+        eq_(self.allocator.flow_capacity[(1, 2)], CAPACITY - 10)
+        eq_(self.allocator.flow_capacity[(2, 1)], CAPACITY - 10)
+        self._check()
+
+    def test_install(self):
+        ok_(self._allocate('h1', 'h2', 10, proactive=True, lifetime=30,
+                           idle_timeout=5))
+        reservation = self._reservation('h1', 'h2')
+        ok_(reservation['installed'])
+        cookie = reservation['cookie']
+        eq_(self.allocator.cookie_to_reservation[cookie],
+            (_mac('h1'), _mac('h2')))
+
+        ofp = ofproto_v1_3
+        for dpid in (1, 2):
+            flows = dict((dict(flow.match.items())['eth_src'], flow)
+                         for flow in self._flows(dpid))
+            eq_(len(flows), 2)
+            # the idle timeout is only set on the forward direction
+            forward, reverse = flows[_mac('h1')], flows[_mac('h2')]
+            eq_((forward.cookie, forward.idle_timeout, forward.hard_timeout),
+                (cookie, 5, 30))
+            eq_((reverse.cookie, reverse.idle_timeout, reverse.hard_timeout),
+                (cookie | fac.REVERSE_COOKIE, 0, 30))
+            for flow in (forward, reverse):
+                eq_(flow.flags, ofp.OFPFF_SEND_FLOW_REM)
+        self._check()
+
+    def test_expiry(self):
+        ok_(self._allocate('h1', 'h2', 10))
+        ok_(self._allocate('h3', 'h4', 20, proactive=True, lifetime=30))
+        ok_(self._allocate('h2', 'h3', 30, proactive=True))
+        self._reservation('h1', 'h2')['start_time'] -= \
+            fac.RESERVATION_EXPIRE_TIME + 1
+        # installed, expired on the switches without an OFPFlowRemoved
+        self._reservation('h3', 'h4')['start_time'] -= \
+            30 + fac.RESERVATION_EXPIRE_TIME + 1
+        self._reservation('h2', 'h3')['start_time'] -= \
+            fac.RESERVATION_EXPIRE_TIME + 1
+
+        # a single pass of the expiry thread
+        with mock.patch.object(fac.time, 'sleep',
+                               side_effect=[None, StopIteration]):
+            self.assertRaises(StopIteration,
+                              self.allocator._check_reservation_expiry)
+
+        eq_(list(self.allocator.flow_reservations),
+            [(_mac('h2'), _mac('h3'))])
+        eq_(self._flows(4), [])
+        eq_(self.allocator.flow_capacity[(1, 2)], CAPACITY)
+        eq_(self.allocator.flow_capacity[(3, 4)], CAPACITY)
+        self._check()
+
+    def test_flow_removed(self):
+        ok_(self._allocate('h1', 'h2', 10, proactive=True, lifetime=30))
+        ok_(self._allocate('h1', 'h3', 10, proactive=True, lifetime=30))
+        cookie = self._reservation('h1', 'h2')['cookie']
+
+        # the reverse direction rule timed out on the last switch
+        self._flow_removed(self.datapaths[1], cookie | fac.REVERSE_COOKIE)
+        ok_((_mac('h1'), _mac('h2')) not in self.allocator.flow_reservations)
+        ok_(cookie not in self.allocator.cookie_to_reservation)
+        for flow in self._flows():
+            ok_(flow.cookie & fac.RESERVATION_COOKIE_MASK != cookie)
+        self._check()
+
+        # the other rules of the reservation, deleted along with it
+        flows = len(self._flows())
+        self._flow_removed(self.datapaths[2], cookie,
+                           ofproto_v1_3.OFPRR_DELETE)
+        eq_(len(self.allocator.flow_reservations), 1)
+        eq_(len(self._flows()), flows)
+        self._check()
+
+
+class Test_slice_aggregation(_FlowAllocatorTestCase):
+    """ Test case for the VLAN tagged rules shared by the flows of a slice
+    """
+
+    # 4 edge switches with 2 hosts each, behind the core switch 5
+    LINKS = [(1, 5), (2, 5), (3, 5), (4, 5)]
+    HOSTS = dict(('h%d' % i, (i + 1) // 2) for i in range(1, 9))
+
+    def setUp(self):
+        super(Test_slice_aggregation, self).setUp()
+        ok_(self.allocator.create_slice(
+            'gold', 'tenant', 20, hosts=[_mac(host) for host in self.HOSTS]))
+
+    def _vids(self, dpid, table_id=fac.FORWARDING_TABLE):
+        return sorted(dict(flow.match.items())['vlan_vid'] &
+                      ~ofproto_v1_3.OFPVID_PRESENT
+                      for flow in self._flows(dpid)
+                      if flow.table_id == table_id)
+
+    def test_create_slice(self):
+        network_slice = self.allocator.slices['gold']
+        eq_(len(network_slice.links), 8)
+        for link in network_slice.links:
+            eq_(self.allocator.flow_capacity[link], CAPACITY - 20)
+        self._check()
+
+    def test_shared_rules(self):
+        for src, dst in (('h1', 'h3'), ('h2', 'h3'), ('h1', 'h4')):
+            ok_(self._allocate(src, dst, 5, proactive=True,
+                               slice_name='gold'))
+        # one (slice, path) per direction
+        eq_(sorted(self.allocator.slice_paths),
+            [('gold', (1, 5, 2)), ('gold', (2, 5, 1))])
+        eq_(len(self.allocator.slice_paths[('gold', (1, 5, 2))]['members']),
+            3)
+        # slice flows are admitted against the slice, not the links
+        eq_(self.allocator.flow_capacity[(1, 5)], CAPACITY - 20)
+        eq_(self.allocator.slices['gold'].used[(1, 5)], 15)
+
+        # edge: 3 classification rules, 1 tagging rule, forwarding and QoS
+        # of the tag towards the core, forwarding and QoS towards each of
+        # the 2 destination hosts of the other direction
+        eq_(self.allocator.table_occupancy(), {1: 10, 2: 10, 3: 0, 4: 0,
+                                               5: 4})
+        # the core switch forwards on the tags only
+        eq_(self._vids(5), self._vids(5, fac.QOS_TABLE))
+        eq_(len(set(self._vids(5))), 2)
+        for flow in self._flows(5):
+            eq_(list(dict(flow.match.items())), ['vlan_vid'])
+        self._check()
+
+    def test_per_pair_rules(self):
+        # the same flows outside of the slice get 2 rules per switch each
+        for src, dst in (('h1', 'h3'), ('h2', 'h3'), ('h1', 'h4')):
+            ok_(self._allocate(src, dst, 5, proactive=True))
+        eq_(self.allocator.slice_paths, {})
+        eq_(self.allocator.table_occupancy(), {1: 6, 2: 6, 3: 0, 4: 0,
+                                               5: 6})
+        self._check()
+
+    def test_members_leave(self):
+        for src, dst in (('h1', 'h3'), ('h2', 'h3'), ('h1', 'h4')):
+            ok_(self._allocate(src, dst, 5, proactive=True,
+                               slice_name='gold'))
+        ok_(self.allocator.delete_flow(_mac('h1'), _mac('h4')))
+        # the rules of h4 are gone, the shared ones stay
+        eq_(self.allocator.table_occupancy(), {1: 9, 2: 7, 3: 0, 4: 0,
+                                               5: 4})
+        eq_(self.allocator.slices['gold'].used[(1, 5)], 10)
+        self._check()
+
+        ok_(self.allocator.delete_flow(_mac('h1'), _mac('h3')))
+        ok_(self.allocator.delete_flow(_mac('h2'), _mac('h3')))
+        eq_(self.allocator.slice_paths, {})
+        eq_(self._flows(), [])
+        self._check()
+
+
+def _instructions(flow):
+    # (table, instructions) of a flow mod, as comparable tuples
+    parser = ofproto_v1_3_parser
+    instructions = []
+    for inst in flow.instructions:
+        if isinstance(inst, parser.OFPInstructionGotoTable):
+            instructions.append(('goto', inst.table_id))
+        elif isinstance(inst, parser.OFPInstructionWriteMetadata):
+            instructions.append(('metadata', inst.metadata, inst.metadata_mask))
+        elif isinstance(inst, parser.OFPInstructionMeter):
+            instructions.append(('meter', inst.meter_id))
+        else:
+            actions = []
+            for action in inst.actions:
+                if isinstance(action, parser.OFPActionOutput):
+                    actions.append(('output', action.port))
+                elif isinstance(action, parser.OFPActionSetQueue):
+                    actions.append(('queue', action.queue_id))
+                elif isinstance(action, parser.OFPActionPushVlan):
+                    actions.append(('push_vlan', action.ethertype))
+                elif isinstance(action, parser.OFPActionPopVlan):
+                    actions.append(('pop_vlan',))
+                elif isinstance(action, parser.OFPActionSetField):
+                    actions.append(('set_field', action.key, action.value))
+            kind = {ofproto_v1_3.OFPIT_APPLY_ACTIONS: 'apply',
+                    ofproto_v1_3.OFPIT_WRITE_ACTIONS: 'write'}[inst.type]
+            instructions.append((kind, actions))
+    return flow.table_id, instructions
+
+
+class Test_slice_pipeline(_FlowAllocatorTestCase):
+    """ Test case for the flow mods of the slice pipeline
+    """
+
+    # h1 and h2 on 1, h3 and h4 on 3
+    LINKS = [(1, 2), (2, 3)]
+    HOSTS = {'h1': 1, 'h2': 1, 'h3': 3, 'h4': 3}
+
+    def setUp(self):
+        super(Test_slice_pipeline, self).setUp()
+        ok_(self.allocator.create_slice(
+            'gold', 'tenant', 20, hosts=[_mac(host) for host in self.HOSTS]))
+
+    @staticmethod
+    def _sorted(flows):
+        return sorted(((instructions, sorted(match.items()))
+                       for instructions, match in flows), key=repr)
+
+    def _sent(self, dpid):
+        flow_mods = self.datapaths[dpid].sent(
+            ofproto_v1_3_parser.OFPFlowMod)
+        return self._sorted((_instructions(flow), dict(flow.match.items()))
+                            for flow in flow_mods)
+
+    def _queue(self, dpid, port):
+        return self.allocator.get_or_create_queue_id(
+            dpid, port, 20, 20, 0, owner='gold')
+
+    def test_table_miss(self):
+        datapath = self.datapaths[1]
+        msg = ofproto_v1_3_parser.OFPSwitchFeatures(datapath)
+        self.allocator.switch_features_handler(ofp_event.ofp_msg_to_ev(msg))
+        present = ofproto_v1_3.OFPVID_PRESENT
+        eq_([(flow.table_id, flow.priority, _instructions(flow)[1],
+              dict(flow.match.items()))
+             for flow in datapath.sent(ofproto_v1_3_parser.OFPFlowMod)],
+            [(fac.CLASSIFICATION_TABLE, 0,
+              [('apply', [('output', ofproto_v1_3.OFPP_CONTROLLER)])], {}),
+             # tagged packets skip classification and tagging
+             (fac.CLASSIFICATION_TABLE, 1,
+              [('goto', fac.FORWARDING_TABLE)],
+              {'vlan_vid': (present, present)}),
+             # packets leave the QoS table with their written actions
+             (fac.QOS_TABLE, 0, [], {})])
+
+    def test_first_flow(self):
+        ok_(self._allocate('h1', 'h3', 5, proactive=True, slice_name='gold'))
+        forward = self.allocator.slice_paths[('gold', (1, 2, 3))]['vid']
+        reverse = self.allocator.slice_paths[('gold', (3, 2, 1))]['vid']
+        ok_(forward != reverse)
+        present = ofproto_v1_3.OFPVID_PRESENT
+        mask = fac.SLICE_METADATA_MASK
+
+        eq_(self._sent(1), self._sorted([
+            # classification, tagging, forwarding and QoS of the forward
+            # direction
+            ((fac.CLASSIFICATION_TABLE,
+              [('metadata', forward, mask), ('goto', fac.SLICE_TAG_TABLE)]),
+             {'in_port': 1, 'eth_src': _mac('h1'), 'eth_dst': _mac('h3')}),
+            ((fac.SLICE_TAG_TABLE,
+              [('apply', [('push_vlan', 0x8100),
+                          ('set_field', 'vlan_vid', present | forward)]),
+               ('goto', fac.FORWARDING_TABLE)]),
+             {'metadata': (forward, mask)}),
+            ((fac.FORWARDING_TABLE,
+              [('write', [('output', 102)]), ('goto', fac.QOS_TABLE)]),
+             {'vlan_vid': present | forward}),
+            ((fac.QOS_TABLE, [('write', [('queue', self._queue(1, 102))])]),
+             {'vlan_vid': present | forward}),
+            # egress of the reverse direction
+            ((fac.FORWARDING_TABLE,
+              [('write', [('pop_vlan',), ('output', 1)]),
+               ('goto', fac.QOS_TABLE)]),
+             {'vlan_vid': present | reverse, 'eth_dst': _mac('h1')}),
+            ((fac.QOS_TABLE, [('write', [('queue', self._queue(1, 1))])]),
+             {'vlan_vid': present | reverse, 'eth_dst': _mac('h1')}),
+        ]))
+        # the core switch forwards both tags to their queue
+        eq_(self._sent(2), self._sorted([
+            ((fac.FORWARDING_TABLE,
+              [('write', [('output', 103)]), ('goto', fac.QOS_TABLE)]),
+             {'vlan_vid': present | forward}),
+            ((fac.QOS_TABLE, [('write', [('queue', self._queue(2, 103))])]),
+             {'vlan_vid': present | forward}),
+            ((fac.FORWARDING_TABLE,
+              [('write', [('output', 101)]), ('goto', fac.QOS_TABLE)]),
+             {'vlan_vid': present | reverse}),
+            ((fac.QOS_TABLE, [('write', [('queue', self._queue(2, 101))])]),
+             {'vlan_vid': present | reverse}),
+        ]))
+        eq_(len(self._sent(3)), 6)
+
+        cookie = self._reservation('h1', 'h3')['cookie']
+        for flow in self.datapaths[1].sent(ofproto_v1_3_parser.OFPFlowMod):
+            if flow.table_id == fac.CLASSIFICATION_TABLE:
+                eq_((flow.cookie, flow.flags),
+                    (cookie, ofproto_v1_3.OFPFF_SEND_FLOW_REM))
+            else:
+                eq_((flow.cookie, flow.flags), (0, 0))
+        self._check()
+
+    def test_next_flows(self):
+        ok_(self._allocate('h1', 'h3', 5, proactive=True, slice_name='gold'))
+        for datapath in self.datapaths.values():
+            del datapath.msgs[:]
+
+        # a new source towards the same host: one classification rule, and
+        # the egress rules of the new destination of the reverse direction
+        ok_(self._allocate('h2', 'h3', 5, proactive=True, slice_name='gold'))
+        eq_([table for (table, _), _ in self._sent(1)],
+            [fac.CLASSIFICATION_TABLE, fac.FORWARDING_TABLE, fac.QOS_TABLE])
+        eq_(self._sent(2), [])
+        eq_([table for (table, _), _ in self._sent(3)],
+            [fac.CLASSIFICATION_TABLE])
+        self._check()
+
+
+class Test_meters(_FlowAllocatorTestCase):
+    """ Test case for the meters of the metered reservations
+    """
+
+    def _meter_mods(self, dpid):
+        return [(mod.command, mod.meter_id) for mod in
+                self.datapaths[dpid].sent(ofproto_v1_3_parser.OFPMeterMod)]
+
+    def test_install(self):
+        ok_(self._allocate('h1', 'h2', 10, proactive=True,
+                           rate_limiter='meter'))
+        ofp = ofproto_v1_3
+        # one meter per direction, on its ingress switch
+        for dpid, src, out_port in ((1, 'h1', 102), (2, 'h2', 101)):
+            meter, = self.datapaths[dpid].meters.values()
+            eq_((meter.meter_id, meter.flags), (1, ofp.OFPMF_KBPS |
+                                                ofp.OFPMF_BURST))
+            band, = meter.bands
+            ok_(isinstance(band, ofproto_v1_3_parser.OFPMeterBandDrop))
+            eq_((band.rate, band.burst_size), (10000, 1000))
+            for flow in self._flows(dpid):
+                if dict(flow.match.items())['eth_src'] == _mac(src):
+                    eq_(_instructions(flow)[1],
+                        [('meter', 1), ('apply', [('output', out_port)])])
+                else:
+                    eq_(_instructions(flow)[1], [('apply', [('output', 1)])])
+        # and no queue
+        ok_(not self.system.called)
+        self._check()
+
+    def test_reuse(self):
+        ok_(self._allocate('h1', 'h2', 10, proactive=True,
+                           rate_limiter='meter'))
+        ok_(self._allocate('h1', 'h4', 10, proactive=True,
+                           rate_limiter='meter'))
+        eq_(self.allocator.meter_ids[1], set([1, 2]))
+
+        ok_(self.allocator.delete_flow(_mac('h1'), _mac('h2')))
+        eq_(self.allocator.meter_ids[1], set([2]))
+        eq_(self._meter_mods(1)[-1], (ofproto_v1_3.OFPMC_DELETE, 1))
+        self._check()
+
+        # the free ID is taken again
+        ok_(self._allocate('h1', 'h3', 10, proactive=True,
+                           rate_limiter='meter'))
+        cookie = self._reservation('h1', 'h3')['cookie']
+        eq_(self.allocator.flow_meters[(cookie, _mac('h1'))], (1, 1))
+        eq_(self.allocator.meter_ids[1], set([1, 2]))
+        self._check()
+
+    def test_install_again(self):
+        ok_(self._allocate('h1', 'h2', 10, proactive=True,
+                           rate_limiter='meter'))
+        ok_(self.allocator.install_reservation(_mac('h1'), _mac('h2')))
+        ofp = ofproto_v1_3
+        # the meter is updated in place
+        eq_(self._meter_mods(1), [(ofp.OFPMC_ADD, 1), (ofp.OFPMC_MODIFY, 1)])
+        eq_(len(self.allocator.flow_meters), 2)
+        self._check()
+
+    def test_teardown(self):
+        for src, dst in (('h1', 'h2'), ('h3', 'h4'), ('h2', 'h4')):
+            ok_(self._allocate(src, dst, 10, proactive=True,
+                               rate_limiter='meter'))
+        eq_(len(self.allocator.flow_meters), 6)
+        for key in list(self.allocator.flow_reservations):
+            ok_(self.allocator.delete_flow(*key))
+        eq_(self.allocator.flow_meters, {})
+        for dpid, datapath in self.datapaths.items():
+            eq_(datapath.meters, {})
+            eq_(self.allocator.meter_ids[dpid], set())
+        eq_(self._flows(), [])
+        self._check()
+
+
+class Test_slice_admission(_FlowAllocatorTestCase):
+    """ Test case for the admission of slices and of their flows at the
+    capacity boundary
+    """
+
+    def _create(self, name, guaranteed, hosts, **kwargs):
+        return self.allocator.create_slice(
+            name, 'tenant', guaranteed, hosts=[_mac(host) for host in hosts],
+            **kwargs)
+
+    def test_create(self):
+        ok_(self._create('all', CAPACITY, ['h1', 'h2']))
+        eq_(self.allocator.flow_capacity[(1, 2)], 0)
+        ok_(self._create('other', CAPACITY, ['h3', 'h4']))
+        # the path around the ring has no capacity left either
+        ok_(not self._create('more', 1, ['h1', 'h2']))
+        ok_(self._allocate('h2', 'h3', CAPACITY))
+        ok_(not self._allocate('h1', 'h3', .5))
+        self._check()
+
+    def test_create_rejected(self):
+        ok_(not self._create('large', CAPACITY + .5, ['h1', 'h2']))
+        # h3 is only reachable with 10 Mbps left: the links carved towards
+        # h2 are given back
+        ok_(self._allocate('h2', 'h3', CAPACITY - 10))
+        ok_(self._allocate('h4', 'h3', CAPACITY - 10))
+        ok_(not self._create('gold', 20, ['h1', 'h2', 'h3']))
+        eq_(self.allocator.slices, {})
+        eq_(self.allocator.flow_capacity[(1, 2)], CAPACITY)
+        ok_(self._create('gold', 10, ['h1', 'h2', 'h3']))
+        self._check()
+
+    def test_flows(self):
+        ok_(self._create('gold', 20, ['h1', 'h2']))
+        ok_(self._allocate('h1', 'h2', 12, slice_name='gold'))
+        ok_(self._allocate('h2', 'h1', 8, slice_name='gold'))
+        eq_(self.allocator.slices['gold'].headroom((1, 2)), 0)
+        ok_(not self._allocate('h1', 'h2', .5, slice_name='gold'))
+        # outside of the slice, the rest of the link is free
+        eq_(self.allocator.flow_capacity[(1, 2)], CAPACITY - 20)
+        ok_(self.allocator.delete_flow(_mac('h2'), _mac('h1')))
+        ok_(self._allocate('h2', 'h1', 8, slice_name='gold'))
+        self._check()
+
+    def test_flows_outside(self):
+        ok_(self._create('gold', 20, ['h1', 'h2']))
+        # h3 is not in the slice, and the slice has no link towards it
+        ok_(not self._allocate('h1', 'h3', 1, slice_name='gold'))
+        ok_(not self._allocate('h1', 'h2', 1, slice_name='silver'))
+        eq_(self.allocator.flow_reservations, {})
+
+    def test_resize(self):
+        ok_(self._create('gold', 20, ['h1', 'h2']))
+        ok_(self._allocate('h1', 'h2', 15, slice_name='gold'))
+        ok_(not self.allocator.resize_slice('gold', 14))
+        ok_(self.allocator.resize_slice('gold', 15))
+        eq_(self.allocator.flow_capacity[(1, 2)], CAPACITY - 15)
+
+        ok_(self._allocate('h2', 'h1', CAPACITY - 20, path_policy='min_hop'))
+        # 5 Mbps left on the link
+        ok_(not self.allocator.resize_slice('gold', 20.5))
+        ok_(self.allocator.resize_slice('gold', 20))
+        eq_(self.allocator.flow_capacity[(1, 2)], 0)
+        self._check()
+
+        ok_(self.allocator.delete_slice('gold'))
+        eq_(self.allocator.flow_capacity[(1, 2)], 20)
+        self._check()
+
+
+class Test_preemption(_FlowAllocatorTestCase):
+    """ Test case for the choice of the reservations to preempt
+    """
+
+    # h1 to h3 on 1, h4 to h6 on 2, h7 to h9 on 3
+    LINKS = [(1, 2), (2, 3)]
+    HOSTS = dict(('h%d' % i, (i + 2) // 3) for i in range(1, 10))
+
+    def _key(self, src, dst):
+        return (_mac(src), _mac(dst))
+
+    def test_priority_order(self):
+        ok_(self._allocate('h1', 'h4', 40))
+        ok_(self._allocate('h2', 'h5', 40, priority=1))
+        ok_(self._allocate('h3', 'h6', 20))
+        # the largest of the lowest class is enough
+        eq_(self.allocator._plan_preemption(1, 2, 40, 2),
+            ([1, 2], [self._key('h1', 'h4')]))
+        # the lowest class is taken whole before the next one
+        eq_(self.allocator._plan_preemption(1, 2, 50, 2)[1],
+            [self._key('h1', 'h4'), self._key('h3', 'h6')])
+        # the next class only when the lowest is not enough, dropping the
+        # reservations of the lowest class it makes unneeded
+        path, victims = self.allocator._plan_preemption(1, 2, 70, 2)
+        eq_(sorted(victims), [self._key('h1', 'h4'), self._key('h2', 'h5')])
+
+        ok_(self._allocate('h1', 'h5', 40, priority=2, admission='preempt',
+                           proactive=True))
+        ok_(self._key('h1', 'h4') not in self.allocator.flow_reservations)
+        eq_(self._reservation('h1', 'h5')['preempted'],
+            ['%s->%s' % self._key('h1', 'h4')])
+        self._check()
+
+    def test_minimal_victims(self):
+        ok_(self._allocate('h1', 'h7', 30))
+        ok_(self._allocate('h2', 'h4', 40))
+        ok_(self._allocate('h5', 'h8', 40))
+        ok_(self._allocate('h3', 'h9', 30, priority=1))
+        # h1->h7 crosses both congested links and is taken first, the
+        # reservations taken for the rest of the deficits make it unneeded
+        path, victims = self.allocator._plan_preemption(1, 3, 40, 1)
+        eq_(path, [1, 2, 3])
+        eq_(sorted(victims), [self._key('h2', 'h4'), self._key('h5', 'h8')])
+        eq_(self.allocator._plan_preemption(1, 3, 30, 1),
+            ([1, 2, 3], [self._key('h1', 'h7')]))
+
+        ok_(self._allocate('h3', 'h7', 40, priority=1, admission='preempt'))
+        ok_(self._key('h1', 'h7') in self.allocator.flow_reservations)
+        eq_(sorted(self._reservation('h3', 'h7')['preempted']),
+            ['%s->%s' % self._key('h2', 'h4'),
+             '%s->%s' % self._key('h5', 'h8')])
+        self._check()
+
+    def test_not_enough(self):
+        ok_(self._allocate('h1', 'h4', 60, priority=1))
+        ok_(self._allocate('h2', 'h5', 40))
+        eq_(self.allocator._plan_preemption(1, 2, 50, 1), (None, []))
+        ok_(not self._allocate('h3', 'h6', 50, priority=1,
+                               admission='preempt'))
+        eq_(len(self.allocator.flow_reservations), 2)
+        eq_(self.allocator.flow_capacity[(1, 2)], 0)
+
+        # rejected without preemption, or from the lowest class
+        ok_(not self._allocate('h3', 'h6', 40, priority=2))
+        ok_(not self._allocate('h3', 'h6', 40, admission='preempt'))
+        eq_(len(self.allocator.flow_reservations), 2)
+        self._check()
+
+
+class Test_link_failure(_FlowAllocatorTestCase):
+    """ Test case for moving the reservations off failed links, and giving
+    the links back once restored
+    """
+
+    def _outcomes(self, report):
+        return dict((outcome, report[outcome])
+                    for outcome in ('kept', 'backup', 'rerouted', 'released'))
+
+    def _pair(self, src, dst):
+        return '%s->%s' % (_mac(src), _mac(dst))
+
+    def test_backup(self):
+        ok_(self._allocate('h1', 'h2', 50, proactive=True, protection=True))
+        eq_(self._reservation('h1', 'h2')['backup'], [1, 4, 3, 2])
+        eq_(len(self.datapaths[1].groups), 1)
+        cookie = self._reservation('h1', 'h2')['cookie']
+
+        report = self.allocator._fail_links([(2, 1)])
+        eq_(report['links'], [(1, 2)])
+        eq_(self._outcomes(report), {'kept': [],
+                                     'backup': [self._pair('h1', 'h2')],
+                                     'rerouted': [], 'released': []})
+        eq_(self.allocator.failed_links, set([(1, 2), (2, 1)]))
+        ok_((1, 2) not in self.allocator.path_finder.link_capacities)
+        reservation = self._reservation('h1', 'h2')
+        eq_(reservation['path'], [1, 4, 3, 2])
+        # the ring has no other path avoiding 4 and 3
+        eq_(reservation['backup'], None)
+        ok_(reservation['installed'])
+        # the rules of the old cookie are gone, with the fast failover group
+        ok_(all(flow.cookie != cookie for flow in self._flows()))
+        eq_(len(self.datapaths[1].groups), 0)
+        ok_(self._flows(4) and self._flows(3))
+        eq_(self.allocator.flow_capacity[(1, 4)], CAPACITY - 50)
+        self._check()
+
+        # failed already
+        eq_(self.allocator._fail_links([(1, 2)]), None)
+        eq_(len(self.allocator.show_recoveries()), 1)
+
+    def test_backup_failed(self):
+        ok_(self._allocate('h1', 'h2', 50, proactive=True, protection=True))
+        report = self.allocator._fail_links([(4, 3)])
+        eq_(self._outcomes(report), {'kept': [self._pair('h1', 'h2')],
+                                     'backup': [], 'rerouted': [],
+                                     'released': []})
+        reservation = self._reservation('h1', 'h2')
+        eq_(reservation['path'], [1, 2])
+        eq_(reservation['backup'], None)
+        ok_(reservation['installed'])
+        eq_(len(self.datapaths[1].groups), 0)
+        self._check()
+
+    def test_rerouted_and_released(self):
+        ok_(self._allocate('h4', 'h3', 50, proactive=True))
+        ok_(self._allocate('h1', 'h2', 20, proactive=True, priority=1))
+        ok_(self._allocate('h1', 'h3', 40, proactive=True))
+        eq_(self._reservation('h1', 'h3')['path'], [1, 2, 3])
+        # both cross 1-2, 4-3 is left with the bandwidth of one of them,
+        # the highest priority one takes it
+        report = self.allocator._fail_links([(1, 2)])
+        eq_(self._outcomes(report), {'kept': [], 'backup': [],
+                                     'rerouted': [self._pair('h1', 'h2')],
+                                     'released': [self._pair('h1', 'h3')]})
+        eq_(self._reservation('h1', 'h2')['path'], [1, 4, 3, 2])
+        ok_((_mac('h1'), _mac('h3')) not in self.allocator.flow_reservations)
+        eq_(self.allocator.flow_capacity[(4, 3)], CAPACITY - 70)
+        self._check()
+
+    def test_restore(self):
+        ok_(self._allocate('h1', 'h2', 50, proactive=True, protection=True))
+        self.allocator._fail_links([(1, 2)])
+        self.allocator._restore_links([(2, 1)])
+        eq_(self.allocator.failed_links, set())
+        eq_(self.allocator.path_finder.link_capacities[(1, 2)], CAPACITY)
+        # kept where it was moved, with the restored link as backup path
+        reservation = self._reservation('h1', 'h2')
+        eq_(reservation['path'], [1, 4, 3, 2])
+        eq_(reservation['backup'], [1, 2])
+        eq_(len(self.datapaths[1].groups), 1)
+        self._check()
+
+        # the link takes new reservations again
+        ok_(self._allocate('h2', 'h1', 60))
+        eq_(self._reservation('h2', 'h1')['path'], [2, 1])
+        self._check()
+
+
+def _link(src, dst, port_no=None):
+    # the port of a switch towards dst is 100 + dst, as in setUp
+    def port(dpid, port_no):
+        return switches.Port(dpid, ofproto_v1_3, ofproto_v1_3_parser.OFPPort(
+            port_no, '00:00:00:00:00:01', 'eth%d' % port_no,
+            0, 0, 0, 0, 0, 0, 0, 0))
+    return switches.Link(port(src, port_no or 100 + dst),
+                         port(dst, 100 + src))
+
+
+class Test_topology_delta(_FlowAllocatorTestCase):
+    """ Test case for the topology deltas, and catching up with the ones
+    missed
+    """
+
+    def setUp(self):
+        super(Test_topology_delta, self).setUp()
+        self.allocator.links.clear()
+        self.allocator._restore_links = mock.Mock()
+
+    def _delta(self, version, added=(), deleted=()):
+        self.allocator.topology_delta_handler(topology_event.EventTopologyDelta(
+            version, [_link(*link) for link in added],
+            [_link(*link) for link in deleted]))
+
+    def _reply(self, version, links=None, deltas=None):
+        self.allocator.send_request = mock.Mock(
+            return_value=topology_event.EventTopologySnapshotReply(
+                None, version, links, deltas))
+
+    def test_delta(self):
+        self.allocator.failed_links.update([(1, 2), (2, 1)])
+        self._delta(1, added=[(1, 2), (2, 1), (2, 3)])
+        eq_(sorted(self.allocator.links), [(1, 2), (2, 1), (2, 3)])
+        eq_(self.allocator.links[(1, 2)]['src_port'], 102)
+        eq_(sorted(self.allocator._restore_links.call_args[0][0]),
+            [(1, 2), (2, 1)])
+        # applied already
+        self._delta(1, deleted=[(1, 2)])
+        ok_((1, 2) in self.allocator.links)
+        # a link of another port is not the one known
+        self._delta(2, deleted=[(1, 2), (2, 3, 9)])
+        eq_(sorted(self.allocator.links), [(2, 1), (2, 3)])
+        eq_(self.allocator.topology.version, 2)
+
+    def test_catch_up(self):
+        self._delta(1, added=[(1, 2), (2, 1), (2, 3)])
+        missed = [topology_event.EventTopologyDelta(2, [], [_link(2, 3)]),
+                  topology_event.EventTopologyDelta(3, [_link(3, 4)], []),
+                  topology_event.EventTopologyDelta(4, [_link(4, 1)], [])]
+        self._reply(4, deltas=missed)
+        self._delta(4, added=[(4, 1)])
+        # the deltas after the last version applied
+        eq_(self.allocator.send_request.call_args[0][0].version, 1)
+        eq_(sorted(self.allocator.links), [(1, 2), (2, 1), (3, 4), (4, 1)])
+        eq_(self.allocator.topology.version, 4)
+
+        # the deltas are gone, all the links are replied
+        self.allocator.failed_links.update([(3, 2), (2, 3)])
+        self._reply(7, links=[_link(2, 1), _link(3, 2), _link(4, 1)])
+        self._delta(6, deleted=[(1, 2)])
+        eq_(sorted(self.allocator.links), [(2, 1), (3, 2), (4, 1)])
+        eq_(self.allocator._restore_links.call_args[0][0], [(3, 2)])
+        eq_(self.allocator.topology.version, 7)
+        # the next delta follows the catch up
+        self._delta(8, added=[(2, 3)])
+        ok_((2, 3) in self.allocator.links)
@@ -0,0 +1,98 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from nose.tools import eq_, ok_
+
+from ryu.app.path_cache import PathCache
+
+
+def _links(path):
+    return [(path[i], path[i + 1]) for i in range(len(path) - 1)]
+
+
+class Test_path_cache(unittest.TestCase):
+    """ Test case for the invalidation rules of PathCache
+    """
+
+    def setUp(self):
+        self.cache = PathCache(bucket=10)
+        self.key = self.cache.key(1, 3, 15, 'widest')
+
+    def _put(self, path, available, bandwidth=15):
+        self.cache.put(self.key, bandwidth, path, available,
+                       _links(path) if path else ())
+
+    def test_key(self):
+        eq_(self.key, self.cache.key(1, 3, 20, 'widest'))
+        ok_(self.key != self.cache.key(1, 3, 21, 'widest'))
+        ok_(self.key != self.cache.key(1, 3, 15, 'widest', 10))
+
+    def test_hit(self):
+        eq_(self.cache.get(self.key, 15), None)
+        self._put((1, 2, 3), 18)
+        eq_(self.cache.get(self.key, 15), ((1, 2, 3), 18))
+        # same bucket, but more than the path has
+        eq_(self.cache.get(self.key, 20), None)
+        stats = self.cache.stats()
+        eq_((stats['hits'], stats['misses'], stats['entries']), (1, 2, 1))
+
+    def test_link_changed(self):
+        self._put((1, 2, 3), 18)
+        self.cache.invalidate([(3, 4), (4, 3)], released=True)
+        eq_(self.cache.get(self.key, 15), ((1, 2, 3), 18))
+        self.cache.invalidate([(2, 3), (3, 2)], released=False)
+        eq_(self.cache.get(self.key, 15), None)
+        eq_(self.cache.stats()['invalidations'], 1)
+
+    def test_recached_avoiding_link(self):
+        self._put((1, 2, 3), 18)
+        self._put((1, 4, 3), 30)
+        # the key is indexed by (1, 2) still, its new path is kept
+        self.cache.invalidate([(1, 2)], released=False)
+        eq_(self.cache.get(self.key, 15), ((1, 4, 3), 30))
+        self.cache.invalidate([(4, 3)], released=False)
+        eq_(self.cache.get(self.key, 15), None)
+
+    def test_rejection_kept(self):
+        self._put(None, 0)
+        self.cache.invalidate([(1, 2), (2, 1)], released=False)
+        eq_(self.cache.get(self.key, 15), (None, 0))
+        eq_(self.cache.get(self.key, 20), (None, 0))
+        # a rejection of more bandwidth tells nothing of less
+        eq_(self.cache.get(self.key, 11), None)
+        # rejecting less in the same epoch lowers the cached rejection
+        self.cache.put(self.key, 12, None, 0)
+        eq_(self.cache.get(self.key, 12), (None, 0))
+        eq_(self.cache.get(self.key, 11), None)
+
+    def test_rejection_dropped(self):
+        self._put(None, 0)
+        # released anywhere, the request may fit now
+        self.cache.invalidate([(5, 6), (6, 5)], released=True)
+        eq_(self.cache.get(self.key, 15), None)
+        eq_(self.cache.stats()['epoch'], 1)
+        self._put(None, 0)
+        eq_(self.cache.get(self.key, 15), (None, 0))
+
+    def test_lru(self):
+        cache = PathCache(max_entries=2)
+        keys = [cache.key(1, dst, 1, 'widest') for dst in (2, 3, 4)]
+        cache.put(keys[0], 1, (1, 2), 10, [(1, 2)])
+        cache.put(keys[1], 1, (1, 3), 10, [(1, 3)])
+        ok_(cache.get(keys[0], 1))
+        cache.put(keys[2], 1, (1, 4), 10, [(1, 4)])
+        eq_(cache.get(keys[1], 1), None)
+        ok_(cache.get(keys[0], 1))
+        ok_(cache.get(keys[2], 1))
@@ -0,0 +1,100 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import unittest
+
+from nose.tools import eq_, raises
+
+from ryu.app.path_finder import PathFinder, PATH_POLICIES
+
+
+LOG = logging.getLogger(__name__)
+
+SRC = {'dpid': 1}
+DST = {'dpid': 20}
+
+# Paths from 1 to 20: (switches in between, capacity of each link,
+# delay of each link in ms)
+PATHS = {
+    'long_wide': ([2, 3, 4], [100] * 4, 10),
+    'short_wide': ([5, 6], [100] * 3, 20),
+    'two_hop_wide': ([7], [50] * 2, 40),
+    'two_hop_fast': ([8], [40] * 2, 15),
+    'balanced': ([9, 10], [90, 1000, 1000], 20),
+    'fastest': ([11, 12, 13, 14], [20] * 5, 1),
+}
+
+
+def _path(name):
+    return [SRC['dpid']] + PATHS[name][0] + [DST['dpid']]
+
+
+class Test_path_finder(unittest.TestCase):
+    """ Test case for the path policies of PathFinder
+    """
+
+    def setUp(self):
+        capacities = {}
+        self.delays = {}
+        for name, (_, link_capacities, delay) in PATHS.items():
+            path = _path(name)
+            for i, capacity in enumerate(link_capacities):
+                capacities[(path[i], path[i + 1])] = capacity
+                self.delays[(path[i], path[i + 1])] = delay
+        self.finder = PathFinder(capacities, LOG)
+
+    def _find(self, policy, bandwidth=10, max_delay=None):
+        path, _ = self.finder.find_path(SRC, DST, bandwidth, policy,
+                                        self.delays, max_delay)
+        return path
+
+    def test_policies(self):
+        # long_wide and short_wide are both the widest, widest takes the
+        # first one its search reaches
+        expected = {
+            'widest': 'long_wide',
+            'shortest_widest': 'short_wide',
+            'widest_shortest': 'two_hop_wide',
+            'min_hop': 'two_hop_fast',
+            'latency': 'fastest',
+            'load_balance': 'balanced',
+        }
+        eq_(set(expected), set(PATH_POLICIES))
+        for policy, name in expected.items():
+            eq_(self._find(policy), _path(name), policy)
+
+    def test_bandwidth(self):
+        eq_(self.finder.find_path(SRC, DST, 10, 'widest'),
+            (_path('long_wide'), 100))
+        eq_(self.finder.find_path(SRC, DST, 10, 'widest_shortest'),
+            (_path('two_hop_wide'), 50))
+        # the links without the bandwidth are left out
+        eq_(self._find('latency', 60), _path('long_wide'))
+        # as short as balanced and as fast, but wider
+        eq_(self._find('min_hop', 60), _path('short_wide'))
+        eq_(self._find('widest', 101), None)
+
+    def test_max_delay(self):
+        eq_(self._find('latency', max_delay=5), _path('fastest'))
+        eq_(self._find('latency', max_delay=4), None)
+        eq_(self._find('latency', 60, max_delay=40), _path('long_wide'))
+        eq_(self._find('latency', 60, max_delay=39), None)
+
+    def test_path_delay(self):
+        eq_(PathFinder.path_delay(_path('two_hop_fast'), self.delays), 30)
+        eq_(PathFinder.path_delay([1], self.delays), 0)
+
+    @raises(ValueError)
+    def test_unknown_policy(self):
+        self._find('cheapest')
@@ -0,0 +1,229 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import struct
+import unittest
+
+from nose.tools import eq_, ok_, raises
+import numpy as np
+
+from ryu.app.stats import event
+from ryu.app.stats import service
+from ryu.ofproto import ofproto_parser
+from ryu.ofproto import ofproto_protocol
+from ryu.ofproto import ofproto_v1_3 as ofp
+from ryu.ofproto import ofproto_v1_3_parser as parser
+
+
+class _Datapath(ofproto_protocol.ProtocolDesc):
+    def __init__(self, id):
+        super(_Datapath, self).__init__(ofp.OFP_VERSION)
+        self.id = id
+        self.xid = 0
+        self.sent = []
+
+    def set_xid(self, msg):
+        self.xid += 1
+        msg.set_xid(self.xid)
+
+    def send_msg(self, msg):
+        self.sent.append(msg)
+        return True
+
+
+def _flow_stats(cookie, packet_count, byte_count, in_port=1):
+    buf = bytearray(ofp.OFP_FLOW_STATS_0_SIZE)
+    parser.OFPMatch(in_port=in_port, eth_dst='00:00:00:00:00:02').serialize(
+        buf, len(buf))
+    parser.OFPInstructionActions(
+        ofp.OFPIT_APPLY_ACTIONS,
+        [parser.OFPActionOutput(2)]).serialize(buf, len(buf))
+    struct.pack_into(ofp.OFP_FLOW_STATS_0_PACK_STR, buf, 0, len(buf), 0, 1,
+                     0, 1, 0, 0, 0, cookie, packet_count, byte_count)
+    return bytes(buf)
+
+
+def _port_stats(port_no, *counters):
+    # the other counters are 0, duration 1s
+    counters += (0,) * (12 - len(counters)) + (1, 0)
+    return struct.pack(ofp.OFP_PORT_STATS_PACK_STR, port_no, *counters)
+
+
+def _reply(dp, stats_type, entries, xid=1, flags=0):
+    body = b''.join(entries)
+    length = ofp.OFP_MULTIPART_REPLY_SIZE + len(body)
+    buf = struct.pack(ofp.OFP_HEADER_PACK_STR, ofp.OFP_VERSION,
+                      ofp.OFPT_MULTIPART_REPLY, length, xid)
+    buf += struct.pack(ofp.OFP_MULTIPART_REPLY_PACK_STR, stats_type, flags)
+    buf += body
+    return ofproto_parser.msg(dp, ofp.OFP_VERSION, ofp.OFPT_MULTIPART_REPLY,
+                              length, xid, buf)
+
+
+class Test_parse(unittest.TestCase):
+    """ Test case for the stats reply parsers of the stats service
+    """
+
+    def test_flow_stats(self):
+        entries = [_flow_stats(3, 10, 1000), _flow_stats(1, 20, 3000, 2),
+                   _flow_stats(2 ** 64 - 1, 2 ** 40, 2 ** 50)]
+        msg = _reply(_Datapath(1), ofp.OFPMP_FLOW, entries)
+        cookies, counters = service.parse_flow_stats(
+            msg.buf, ofp.OFP_MULTIPART_REPLY_SIZE, msg.msg_len)
+        eq_(cookies.tolist(), [s.cookie for s in msg.body])
+        eq_(counters.tolist(), [[s.packet_count, s.byte_count]
+                                for s in msg.body])
+
+    def test_flow_stats_empty(self):
+        msg = _reply(_Datapath(1), ofp.OFPMP_FLOW, [])
+        cookies, counters = service.parse_flow_stats(
+            msg.buf, ofp.OFP_MULTIPART_REPLY_SIZE, msg.msg_len)
+        eq_(cookies.shape, (0,))
+        eq_(counters.shape, (0, 2))
+
+    @raises(ValueError)
+    def test_flow_stats_invalid_length(self):
+        buf = bytearray(_flow_stats(1, 1, 1))
+        struct.pack_into('!H', buf, 0, 0)
+        service.parse_flow_stats(bytes(buf), 0, len(buf))
+
+    def test_port_stats(self):
+        entries = [_port_stats(1, 10, 20, 1000, 2000, 1, 2, 3, 4),
+                   _port_stats(ofp.OFPP_LOCAL, 5, 6, 7, 8)]
+        msg = _reply(_Datapath(1), ofp.OFPMP_PORT_STATS, entries)
+        ports, counters = service.parse_port_stats(
+            msg.buf, ofp.OFP_MULTIPART_REPLY_SIZE, msg.msg_len)
+        eq_(ports.tolist(), [s.port_no for s in msg.body])
+        eq_(counters.tolist(),
+            [[getattr(s, name) for name in event.EventPortRates.columns]
+             for s in msg.body])
+
+
+class Test_StatsHistory(unittest.TestCase):
+    """ Test case for service.StatsHistory
+    """
+
+    def setUp(self):
+        self.history = service.StatsHistory(event.EventFlowRates.columns, 3)
+
+    def _append(self, timestamp, stats):
+        self.history.append(timestamp,
+                            np.array([s[0] for s in stats], np.uint64),
+                            np.array([s[1:] for s in stats], np.float64))
+
+    def test_rates(self):
+        eq_(self.history.rates(), None)
+        self._append(0, [(1, 10, 100), (2, 5, 50)])
+        eq_(self.history.rates(), None)
+        self._append(2, [(2, 15, 150), (1, 20, 300)])
+        interval, keys, rates = self.history.rates()
+        eq_(interval, 2)
+        eq_(keys.tolist(), [1, 2])
+        eq_(rates.tolist(), [[5, 100], [5, 50]])
+
+    def test_aggregate(self):
+        self._append(0, [(1, 10, 100), (1, 10, 100), (0, 1, 1)])
+        timestamp, keys, counters = self.history.samples[-1]
+        eq_(keys.tolist(), [0, 1])
+        eq_(counters.tolist(), [[1, 1], [20, 200]])
+
+    def test_new_and_reset(self):
+        self._append(0, [(1, 10, 100), (2, 50, 500), (3, 1, 1)])
+        self._append(10, [(2, 20, 200), (4, 30, 300), (1, 20, 200)])
+        interval, keys, rates = self.history.rates()
+        eq_(keys.tolist(), [1, 2, 4])
+        eq_(rates.tolist(), [[1, 10], [2, 20], [3, 30]])
+
+    def test_window(self):
+        self._append(0, [(1, 0, 0)])
+        self._append(1, [(1, 10, 100)])
+        self._append(2, [(1, 30, 300)])
+        self._append(4, [(1, 40, 400)])
+        eq_(len(self.history), 3)
+        eq_(self.history.rates()[2].tolist(), [[5, 50]])
+        interval, keys, rates = self.history.rates(window=5)
+        eq_(interval, 3)
+        eq_(rates.tolist(), [[10, 100]])
+
+
+class Test_StatsService(unittest.TestCase):
+    """ Test case for service.StatsService
+    """
+
+    def setUp(self):
+        self.service = service.StatsService()
+        self.events = []
+        self.service.send_event_to_observers = \
+            lambda ev, state=None: self.events.append(ev)
+        self.dp = _Datapath(1)
+        self.service.datapaths[1] = self.dp
+
+    def _request(self):
+        self.dp.sent = []
+        self.service.request_stats()
+        return dict((type(msg), msg.xid) for msg in self.dp.sent)
+
+    def _flow_stats_reply(self, xid, counts):
+        entries = [_flow_stats(cookie, count, count * 100)
+                   for cookie, count in counts]
+        # one entry per part
+        for i, entry in enumerate(entries):
+            flags = ofp.OFPMPF_REPLY_MORE if i < len(entries) - 1 else 0
+            self.service._handle_reply(
+                _reply(self.dp, ofp.OFPMP_FLOW, [entry], xid, flags))
+
+    def test_request(self):
+        xids = self._request()
+        eq_(sorted(xids, key=lambda cls: cls.__name__),
+            [parser.OFPFlowStatsRequest, parser.OFPPortStatsRequest])
+        eq_(len(set(xids.values())), 2)
+
+    def test_flow_rates(self):
+        xid = self._request()[parser.OFPFlowStatsRequest]
+        self._flow_stats_reply(xid, [(1, 10), (2, 20), (1, 10)])
+        eq_(self.events, [])
+        xid = self._request()[parser.OFPFlowStatsRequest]
+        self._flow_stats_reply(xid, [(1, 15), (2, 30), (1, 15)])
+        eq_(len(self.events), 1)
+        ev = self.events[0]
+        ok_(isinstance(ev, event.EventFlowRates))
+        eq_(ev.dpid, 1)
+        eq_(ev.keys.tolist(), [1, 2])
+        eq_(ev.to_dict('packet_count'),
+            {1: 10 / ev.interval, 2: 10 / ev.interval})
+        eq_(ev.column('byte_count').tolist(),
+            [1000 / ev.interval, 1000 / ev.interval])
+
+    def test_port_rates(self):
+        for count in (10, 20):
+            xid = self._request()[parser.OFPPortStatsRequest]
+            self.service._handle_reply(_reply(
+                self.dp, ofp.OFPMP_PORT_STATS,
+                [_port_stats(1, count), _port_stats(2, count * 2)], xid))
+        eq_(len(self.events), 1)
+        ok_(isinstance(self.events[0], event.EventPortRates))
+        eq_(self.events[0].keys.tolist(), [1, 2])
+
+    def test_other_reply(self):
+        self._request()
+        self.service._handle_reply(
+            _reply(self.dp, ofp.OFPMP_FLOW, [_flow_stats(1, 1, 1)], 1000))
+        eq_(self.service.histories[event.EventFlowRates], {})
+
+    def test_stale_request(self):
+        xid = self._request()[parser.OFPFlowStatsRequest]
+        self._request()
+        self.service._handle_reply(
+            _reply(self.dp, ofp.OFPMP_FLOW, [_flow_stats(1, 1, 1)], xid))
+        eq_(self.service.histories[event.EventFlowRates], {})
+        eq_(len(self.service._replies), 2)
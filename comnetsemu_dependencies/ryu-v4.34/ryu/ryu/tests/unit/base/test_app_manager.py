@@ -0,0 +1,114 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from nose.tools import eq_, ok_
+
+from ryu.base import app_manager
+from ryu.controller import event
+from ryu.controller.handler import CONFIG_DISPATCHER
+from ryu.controller.handler import MAIN_DISPATCHER
+from ryu.controller.handler import register_instance
+from ryu.controller.handler import set_ev_cls
+
+
+class _EventTest(event.EventBase):
+    pass
+
+
+class _OtherEventTest(event.EventBase):
+    pass
+
+
+class _TestApp(app_manager.RyuApp):
+
+    @set_ev_cls(_EventTest, MAIN_DISPATCHER)
+    def main_handler(self, ev):
+        pass
+
+    @set_ev_cls(_EventTest, CONFIG_DISPATCHER)
+    def config_handler(self, ev):
+        pass
+
+    @set_ev_cls(_EventTest)
+    def any_state_handler(self, ev):
+        pass
+
+
+class Test_get_handlers(unittest.TestCase):
+    """ Test case for RyuApp.get_handlers
+    """
+
+    def setUp(self):
+        self.app = _TestApp()
+        register_instance(self.app)
+        self.ev = _EventTest()
+
+    def _names(self, handlers):
+        return sorted(handler.__name__ for handler in handlers)
+
+    def test_state(self):
+        eq_(['any_state_handler', 'main_handler'],
+            self._names(self.app.get_handlers(self.ev, MAIN_DISPATCHER)))
+        eq_(['any_state_handler', 'config_handler'],
+            self._names(self.app.get_handlers(self.ev, CONFIG_DISPATCHER)))
+        eq_(['any_state_handler', 'config_handler', 'main_handler'],
+            self._names(self.app.get_handlers(self.ev)))
+        eq_([], list(self.app.get_handlers(_OtherEventTest(),
+                                           MAIN_DISPATCHER)))
+
+    def test_resolved_once(self):
+        handlers = self.app.get_handlers(self.ev, MAIN_DISPATCHER)
+        ok_(self.app.get_handlers(_EventTest(), MAIN_DISPATCHER) is handlers)
+
+    def test_register_handler(self):
+        self.app.get_handlers(self.ev, MAIN_DISPATCHER)
+
+        def dynamic_handler(ev):
+            pass
+
+        self.app.register_handler(_EventTest, dynamic_handler)
+        eq_(['any_state_handler', 'dynamic_handler', 'main_handler'],
+            self._names(self.app.get_handlers(self.ev, MAIN_DISPATCHER)))
+
+        self.app.unregister_handler(_EventTest, dynamic_handler)
+        eq_(['any_state_handler', 'main_handler'],
+            self._names(self.app.get_handlers(self.ev, MAIN_DISPATCHER)))
+
+    def test_unregister_handler(self):
+        self.app.get_handlers(self.ev, MAIN_DISPATCHER)
+        self.app.unregister_handler(_EventTest, self.app.main_handler)
+        eq_(['any_state_handler'],
+            self._names(self.app.get_handlers(self.ev, MAIN_DISPATCHER)))
+
+
+class Test_unsharded_apps(unittest.TestCase):
+    """ Test case for AppManager.unsharded_apps
+    """
+
+    def _unsharded(self, app_lists):
+        app_mgr = app_manager.AppManager()
+        app_mgr.load_apps(app_lists)
+        return app_mgr.unsharded_apps()
+
+    def test_sharded(self):
+        # ofp_handler is required too
+        eq_([], self._unsharded(['ryu.app.simple_switch_13']))
+
+    def test_unsharded(self):
+        # the wsgi context of rest_topology is not a RyuApp
+        eq_(['Switches', 'TopologyAPI'],
+            self._unsharded(['ryu.app.simple_switch_13',
+                             'ryu.app.rest_topology',
+                             'ryu.topology.switches']))
@@ -0,0 +1,141 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+try:
+    import mock  # Python 2
+except ImportError:
+    from unittest import mock  # Python 3
+
+import os
+import pickle
+import socket
+import struct
+import unittest
+
+from nose.tools import eq_, ok_
+
+from ryu.base import shard
+from ryu.lib import hub
+from ryu.ofproto import ofproto_parser
+from ryu.ofproto import ofproto_protocol
+from ryu.ofproto import ofproto_v1_3
+from ryu.ofproto import ofproto_v1_3_parser
+
+
+def _socketpair():
+    socks = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+    for sock in socks:
+        sock.setblocking(False)
+    return socks
+
+
+class _Datapath(ofproto_protocol.ProtocolDesc):
+    def __init__(self, sock):
+        super(_Datapath, self).__init__(ofproto_v1_3.OFP_VERSION)
+        self.socket = sock
+        self.address = ('127.0.0.1', 6653)
+
+
+def _features_reply(datapath, dpid):
+    buf = struct.pack(ofproto_v1_3.OFP_HEADER_PACK_STR,
+                      ofproto_v1_3.OFP_VERSION,
+                      ofproto_v1_3.OFPT_FEATURES_REPLY,
+                      ofproto_v1_3.OFP_SWITCH_FEATURES_SIZE, 0)
+    buf += struct.pack(ofproto_v1_3.OFP_SWITCH_FEATURES_PACK_STR,
+                       dpid, 0, 0, 0, 0, 0)
+    return ofproto_parser.msg(datapath, ofproto_v1_3.OFP_VERSION,
+                              ofproto_v1_3.OFPT_FEATURES_REPLY,
+                              len(buf), 0, buf)
+
+
+class Test_shard(unittest.TestCase):
+    """ Test case for the sharding of the datapaths across processes
+    """
+
+    def setUp(self):
+        self.sock, self.peer = _socketpair()
+        self.bus = shard.ShardBus(0, 2, self.sock)
+
+    def tearDown(self):
+        self.sock.close()
+        self.peer.close()
+
+    def _recv(self):
+        dst, data, fds = shard._recv(self.peer)
+        kind, args = pickle.loads(data)
+        return dst, kind, args, fds
+
+    def test_frames(self):
+        data = os.urandom(shard._FRAME_SIZE * 3 + 5)
+        # the peer reads while the frames are sent
+        thread = hub.spawn(shard._recv, self.peer)
+        shard._send(self.sock, 1, data)
+        eq_(thread.wait(), (1, data, []))
+
+    def test_owner(self):
+        eq_(self.bus.owner(3), 1)
+        ok_(self.bus.owns(4))
+        ok_(not self.bus.owns(5))
+
+    def test_publish(self):
+        self.bus.publish('switches', {'dpid': 1}, 'main')
+        eq_(self._recv(), (shard._ALL, 'event',
+                           ('switches', {'dpid': 1}, 'main'), []))
+
+    def test_deliver(self):
+        brick = mock.Mock()
+        with mock.patch('ryu.base.app_manager.lookup_service_brick',
+                        return_value=brick) as lookup:
+            self.bus._deliver('switches', 'ev', 'main')
+        lookup.assert_called_once_with('switches')
+        brick.send_event_to_observers.assert_called_once_with('ev', 'main')
+
+    def test_hand_off(self):
+        conn, switch = socket.socketpair()
+        try:
+            dp = _Datapath(conn)
+            ok_(not self.bus.hand_off(dp, _features_reply(dp, 2), b''))
+            echo = ofproto_v1_3_parser.OFPEchoReply(dp, data=b'')
+            echo.serialize()
+            ok_(not self.bus.hand_off(dp, echo, b''))
+            ok_(self.bus.hand_off(dp, _features_reply(dp, 3), b'features'))
+
+            dst, kind, args, fds = self._recv()
+            eq_((dst, kind), (1, 'datapath'))
+            eq_(args, (conn.family, dp.address, ofproto_v1_3.OFP_VERSION,
+                       b'features'))
+            eq_(len(fds), 1)
+            # the shard owning the datapath writes to the connection
+            os.write(fds[0], b'hello')
+            os.close(fds[0])
+            eq_(switch.recv(5), b'hello')
+        finally:
+            conn.close()
+            switch.close()
+
+    def test_relay(self):
+        pairs = [_socketpair() for _ in range(3)]
+        socks = [sock for sock, _ in pairs]
+        sems = [hub.Semaphore() for _ in socks]
+        thread = hub.spawn(shard._relay, 0, socks, sems)
+        try:
+            shard._send(pairs[0][1], shard._ALL, b'all')
+            shard._send(pairs[0][1], 2, b'two')
+            eq_(shard._recv(pairs[1][1]), (shard._ALL, b'all', []))
+            eq_(shard._recv(pairs[2][1]), (shard._ALL, b'all', []))
+            eq_(shard._recv(pairs[2][1]), (2, b'two', []))
+        finally:
+            hub.kill(thread)
+            for pair in pairs:
+                for sock in pair:
+                    sock.close()
@@ -32,9 +32,11 @@ import unittest
 from nose.tools import eq_, raises
 
 from ryu.base import app_manager  # To suppress cyclic import
+from ryu.base import shard
 from ryu.controller import controller
 from ryu.controller import handler
 from ryu.lib import hub
+from ryu.ofproto import ofproto_v1_3
 from ryu.ofproto import ofproto_v1_3_parser
 from ryu.ofproto import ofproto_v1_2_parser
 from ryu.ofproto import ofproto_v1_0_parser
@@ -117,8 +119,20 @@ class Test_Datapath(unittest.TestCase):
     def test_ports_accessibility_v10(self):
         self._test_ports_accessibility(ofproto_v1_0_parser, 0)
 
+    def test_recv_loop(self):
+        self._test_recv_loop()
+
+    def test_recv_loop_wrap_around(self):
+        # Fill the smallest receive buffer many times over, so that
+        # messages straddle its end and are moved back to its front.
+        controller.CONF.set_override('socket_recv_buffer_size', 0xffff)
+        try:
+            self._test_recv_loop(repeat=1024)
+        finally:
+            controller.CONF.clear_override('socket_recv_buffer_size')
+
     @mock.patch("ryu.base.app_manager", spec=app_manager)
-    def test_recv_loop(self, app_manager_mock):
+    def _test_recv_loop(self, app_manager_mock, repeat=1):
         # Prepare test data
         test_messages = [
             "4-6-ofp_features_reply.packet",
@@ -141,6 +155,8 @@ class Test_Datapath(unittest.TestCase):
             packet_buf += open(packet_data_file, 'rb').read()
             json_data_file = os.path.join(json_dir, msg + '.json')
             expected_json.append(json.load(open(json_data_file)))
+        packet_buf *= repeat
+        expected_json *= repeat
 
         # Prepare mock for socket
         class SocketMock(mock.MagicMock):
@@ -153,6 +169,11 @@ class Test_Datapath(unittest.TestCase):
                 self.buf = self.buf[size:]
                 return out
 
+            def recv_into(self, buffer):
+                out = self.recv(len(buffer))
+                buffer[:len(out)] = out
+                return len(out)
+
         # Prepare mock
         ofp_brick_mock = mock.MagicMock(spec=app_manager.RyuApp)
         app_manager_mock.lookup_service_brick.return_value = ofp_brick_mock
@@ -181,6 +202,151 @@ class Test_Datapath(unittest.TestCase):
             self.assertEqual(kwargs, {})
         self.assertEqual(expected_json, output_json)
 
+    def _send_datapath(self, app_manager_mock, sendmsg):
+        ofp_brick_mock = mock.MagicMock(spec=app_manager.RyuApp)
+        app_manager_mock.lookup_service_brick.return_value = ofp_brick_mock
+        sock_mock = mock.MagicMock()
+        sock_mock.sendmsg = sendmsg
+        dp = controller.Datapath(sock_mock, mock.MagicMock())
+        dp.set_state(handler.MAIN_DISPATCHER)
+        ofp_brick_mock.reset_mock()
+        return dp
+
+    def _sent(self, dp):
+        # Bytes written, one item per socket write
+        writes = []
+        for name, args, _ in dp.socket.method_calls:
+            if name == 'sendall':
+                writes.append(bytes(args[0]))
+        return writes
+
+    @mock.patch("ryu.base.app_manager", spec=app_manager)
+    def test_send_loop_batch(self, app_manager_mock):
+        writes = []
+
+        def sendmsg(bufs):
+            writes.append(b''.join(bufs))
+            return len(writes[-1])
+
+        dp = self._send_datapath(app_manager_mock, sendmsg)
+        for i in range(3):
+            dp.send(bytearray(b'%d' % i * 8))
+        dp.send(b'close', close_socket=True)
+        dp._send_loop()
+
+        eq_([b'0' * 8 + b'1' * 8 + b'2' * 8 + b'close'], writes)
+        eq_([], self._sent(dp))
+        eq_(4, dp.send_stats['messages'])
+        eq_(29, dp.send_stats['bytes'])
+        eq_(1, dp.send_stats['writes'])
+        self.assertTrue(dp.send_stats['latency_max'] >= 0)
+
+    @mock.patch("ryu.base.app_manager", spec=app_manager)
+    def test_send_loop_partial_write(self, app_manager_mock):
+        dp = self._send_datapath(app_manager_mock, lambda bufs: 5)
+        dp.send(b'0' * 8)
+        dp.send(b'1' * 8, close_socket=True)
+        dp._send_loop()
+
+        eq_([b'000' + b'1' * 8], self._sent(dp))
+
+    @mock.patch("ryu.base.app_manager", spec=app_manager)
+    def test_send_loop_without_sendmsg(self, app_manager_mock):
+        def sendmsg(bufs):
+            raise NotImplementedError()
+
+        dp = self._send_datapath(app_manager_mock, sendmsg)
+        dp.send(b'0' * 8)
+        dp.send(b'1' * 8, close_socket=True)
+        dp._send_loop()
+
+        eq_([b'0' * 8 + b'1' * 8], self._sent(dp))
+        self.assertIsNone(dp._sendmsg)
+
+    @mock.patch("ryu.base.app_manager", spec=app_manager)
+    def test_send_backpressure(self, app_manager_mock):
+        controller.CONF.set_override('ofp_send_queue_size', 8)
+        controller.CONF.set_override('ofp_send_queue_high_watermark', 4)
+        controller.CONF.set_override('ofp_send_queue_low_watermark', 1)
+        try:
+            dp = self._send_datapath(app_manager_mock, lambda bufs: 0)
+        finally:
+            controller.CONF.clear_override('ofp_send_queue_size')
+            controller.CONF.clear_override('ofp_send_queue_high_watermark')
+            controller.CONF.clear_override('ofp_send_queue_low_watermark')
+
+        def events():
+            hub.sleep(0)
+            calls = dp.ofp_brick.send_event_to_observers.call_args_list
+            return [(args[0].congested, args[0].queued)
+                    for args, _ in calls]
+
+        for _ in range(3):
+            dp.send(b'0' * 8)
+        self.assertFalse(dp.congested)
+        dp.send(b'0' * 8, close_socket=True)
+        self.assertTrue(dp.congested)
+        eq_([(True, 4)], events())
+
+        dp._send_loop()
+        self.assertFalse(dp.congested)
+        eq_([(True, 4), (False, 0)], events())
+
+    def _packets(self, *names):
+        this_dir = os.path.dirname(sys.modules[__name__].__file__)
+        packet_data_dir = os.path.join(this_dir, '../../packet_data/of13')
+        return b''.join(open(os.path.join(packet_data_dir, name), 'rb').read()
+                        for name in names)
+
+    def _config_datapath(self, app_manager_mock):
+        ofp_brick_mock = mock.MagicMock(spec=app_manager.RyuApp)
+        app_manager_mock.lookup_service_brick.return_value = ofp_brick_mock
+        sock_mock = mock.MagicMock()
+        sock_mock.recv_into.return_value = 0
+        dp = controller.Datapath(sock_mock, mock.MagicMock())
+        dp.set_state(handler.CONFIG_DISPATCHER)
+        ofp_brick_mock.reset_mock()
+        return dp
+
+    def _received(self, dp):
+        calls = dp.ofp_brick.send_event_to_observers.call_args_list
+        return [args[0].msg.msg_type for args, _ in calls
+                if hasattr(args[0], 'msg')]
+
+    @mock.patch("ryu.base.app_manager", spec=app_manager)
+    def test_recv_loop_handed_over(self, app_manager_mock):
+        # the bytes received by the shard which handed the connection over
+        data = self._packets("4-6-ofp_features_reply.packet",
+                             "4-14-ofp_echo_reply.packet")
+        dp = self._config_datapath(app_manager_mock)
+        dp._recv_loop(data)
+
+        eq_([ofproto_v1_3.OFPT_FEATURES_REPLY, ofproto_v1_3.OFPT_ECHO_REPLY],
+            self._received(dp))
+
+    @mock.patch("ryu.base.app_manager", spec=app_manager)
+    def test_recv_loop_hand_off(self, app_manager_mock):
+        data = self._packets("4-14-ofp_echo_reply.packet",
+                             "4-6-ofp_features_reply.packet",
+                             "4-14-ofp_echo_reply.packet")
+        echo_len = len(self._packets("4-14-ofp_echo_reply.packet"))
+        handed_over = []
+
+        def hand_off(datapath, msg, data):
+            if msg.msg_type != ofproto_v1_3.OFPT_FEATURES_REPLY:
+                return False
+            handed_over.append(bytes(data))
+            return True
+
+        dp = self._config_datapath(app_manager_mock)
+        with mock.patch.object(shard, 'bus') as bus_mock:
+            bus_mock.hand_off.side_effect = hand_off
+            dp._recv_loop(data)
+
+        eq_([ofproto_v1_3.OFPT_ECHO_REPLY], self._received(dp))
+        eq_([data[echo_len:]], handed_over)
+        dp.socket.close.assert_called_once_with()
+
 
 class TestOpenFlowController(unittest.TestCase):
     """
@@ -0,0 +1,112 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import unittest
+
+from nose.tools import eq_, ok_, raises
+
+from ryu import exception
+from ryu.ofproto import ofproto_parser
+from ryu.ofproto import ofproto_protocol
+from ryu.ofproto import ofproto_v1_3
+from ryu.ofproto import ofproto_v1_3_parser
+
+
+PACKET_DATA_DIR = os.path.join(os.path.dirname(__file__),
+                               '../../packet_data/of13')
+
+
+def _datapath(lazy_decoding):
+    dp = ofproto_protocol.ProtocolDesc(version=ofproto_v1_3.OFP_VERSION)
+    dp.lazy_decoding = lazy_decoding
+    return dp
+
+
+def _parse(name, lazy_decoding):
+    with open(os.path.join(PACKET_DATA_DIR, name), 'rb') as f:
+        buf = f.read()
+    version, msg_type, msg_len, xid = ofproto_parser.header(buf)
+    return ofproto_parser.msg(_datapath(lazy_decoding),
+                              version, msg_type, msg_len, xid, buf)
+
+
+class TestLazyDecoding(unittest.TestCase):
+    """ Test case for the lazy decoding of ofproto_v1_3_parser messages
+    """
+
+    def _test_same_as_eager(self, name):
+        eager = _parse(name, False)
+        lazy = _parse(name, True)
+        eq_(eager.to_jsondict(), lazy.to_jsondict())
+        eq_(str(eager), str(lazy))
+
+    def test_packet_in(self):
+        self._test_same_as_eager('4-4-ofp_packet_in.packet')
+        self._test_same_as_eager('4-59-ofp_packet_in.packet')
+        self._test_same_as_eager('libofproto-OFP13-packet_in.packet')
+
+    def test_flow_stats_reply(self):
+        self._test_same_as_eager('4-12-ofp_flow_stats_reply.packet')
+
+    def test_packet_in_undecoded(self):
+        msg = _parse('libofproto-OFP13-packet_in.packet', True)
+        ok_('data' not in msg.__dict__)
+        ok_(msg.match._raw is not None)
+
+        eq_(msg.match['in_port'], 43981)
+        eq_(msg.match['tun_ipv4_src'], '192.168.2.3')
+        ok_('tunnel_id' in msg.match)
+        ok_('tcp_src' not in msg.match)
+        eq_(msg.match.get('tcp_src', 0), 0)
+        # the lookups did not decode the other fields
+        ok_(msg.match._raw is not None)
+
+        eq_(msg.data, _parse('libofproto-OFP13-packet_in.packet',
+                             False).data)
+        ok_('data' in msg.__dict__)
+
+    def test_packet_in_data_set(self):
+        msg = _parse('4-4-ofp_packet_in.packet', True)
+        msg.data = b'data'
+        eq_(msg.data, b'data')
+
+    def test_flow_stats_reply_undecoded(self):
+        msg = _parse('4-12-ofp_flow_stats_reply.packet', True)
+        ok_('body' not in msg.__dict__)
+        eager = _parse('4-12-ofp_flow_stats_reply.packet', False)
+        eq_(len(msg.body), len(eager.body))
+        for stats, eager_stats in zip(msg.body, eager.body):
+            ok_(stats.match._raw is not None)
+            eq_(stats.match.items(), eager_stats.match.items())
+            ok_(stats.match._raw is None)
+
+    def test_match_fields(self):
+        lazy = _parse('libofproto-OFP13-packet_in.packet', True).match
+        eager = _parse('libofproto-OFP13-packet_in.packet', False).match
+        eq_(len(lazy.fields), len(eager.fields))
+        eq_(dict(lazy.iteritems()), dict(eager.iteritems()))
+
+    def test_match_unknown_field(self):
+        match = _parse('libofproto-OFP13-packet_in.packet', True).match
+        ok_('no_such_field' not in match)
+        eq_(match.get('no_such_field'), None)
+
+    @raises(exception.OFPTruncatedMessage)
+    def test_match_truncated(self):
+        match = ofproto_v1_3_parser.OFPMatch(in_port=1, eth_type=0x800,
+                                             ipv4_src='10.0.0.1')
+        buf = bytearray()
+        match.serialize(buf, 0)
+        ofproto_v1_3_parser.OFPMatch.parser(bytes(buf[:match.length - 2]), 0,
+                                            lazy=True)
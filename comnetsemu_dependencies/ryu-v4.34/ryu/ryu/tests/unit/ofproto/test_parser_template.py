@@ -0,0 +1,121 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from nose.tools import eq_, ok_, raises
+
+from ryu.ofproto import ofproto_protocol
+from ryu.ofproto import ofproto_v1_3 as ofp
+from ryu.ofproto import ofproto_v1_3_parser as parser
+
+
+_Datapath = ofproto_protocol.ProtocolDesc(version=ofp.OFP_VERSION)
+
+
+def _flow_mod(src, dst, in_port, queue_id, out_port, **kwargs):
+    match = parser.OFPMatch(in_port=in_port, eth_src=src, eth_dst=dst)
+    actions = [parser.OFPActionSetQueue(queue_id),
+               parser.OFPActionOutput(out_port)]
+    inst = [parser.OFPInstructionMeter(1),
+            parser.OFPInstructionActions(ofp.OFPIT_APPLY_ACTIONS, actions),
+            parser.OFPInstructionGotoTable(2)]
+    return parser.OFPFlowMod(_Datapath, match=match, instructions=inst,
+                             **kwargs)
+
+
+def _serialize(msg, xid=1):
+    msg.xid = xid
+    msg.serialize()
+    return bytes(msg.buf)
+
+
+class TestOFPFlowModTemplate(unittest.TestCase):
+    """ Test case for ofproto_v1_3_parser.OFPFlowModTemplate
+    """
+
+    def setUp(self):
+        self.template = parser.OFPFlowModTemplate(_flow_mod(
+            '00:00:00:00:00:00', '00:00:00:00:00:00', 0, 0, 0, priority=1))
+
+    def _to_msg(self, src, dst, in_port, queue_id, out_port, **kwargs):
+        return self.template.to_msg(
+            _Datapath,
+            match={'eth_src': src, 'eth_dst': dst, 'in_port': in_port},
+            actions={0: {'queue_id': queue_id}, 1: {'port': out_port}},
+            **kwargs)
+
+    def test_serialize(self):
+        for args in (('00:00:00:00:00:01', '00:00:00:00:00:02', 1, 3, 2),
+                     ('0a:00:00:00:00:02', '0a:00:00:00:00:01', 4, 3, 7),
+                     ('0a:00:00:00:00:02', '0a:00:00:00:00:01', 4, 5, 7),
+                     ('00:00:00:00:00:01', '00:00:00:00:00:02', 1, 3, 2)):
+            eq_(_serialize(self._to_msg(*args)),
+                _serialize(_flow_mod(*args, priority=1)))
+
+    def test_serialize_attributes(self):
+        args = ('00:00:00:00:00:01', '00:00:00:00:00:02', 1, 3, 2)
+        kwargs = dict(cookie=0x1234, idle_timeout=10, hard_timeout=20,
+                      flags=ofp.OFPFF_SEND_FLOW_REM,
+                      command=ofp.OFPFC_MODIFY_STRICT, table_id=3)
+        eq_(_serialize(self._to_msg(*args, **kwargs), xid=7),
+            _serialize(_flow_mod(*args, priority=1, **kwargs), xid=7))
+
+    def test_serialize_unchanged(self):
+        msg = self.template.to_msg(_Datapath)
+        eq_(_serialize(msg), _serialize(self.template.flow_mod))
+
+    def test_serialize_masked(self):
+        flow_mod = parser.OFPFlowMod(_Datapath, match=parser.OFPMatch(
+            eth_type=0x800, ipv4_dst=('10.0.0.0', '255.255.255.0')))
+        template = parser.OFPFlowModTemplate(flow_mod)
+        msg = template.to_msg(
+            _Datapath, match={'ipv4_dst': ('10.0.1.0', '255.255.255.0')})
+        eq_(_serialize(msg), _serialize(parser.OFPFlowMod(
+            _Datapath, match=parser.OFPMatch(
+                eth_type=0x800, ipv4_dst=('10.0.1.0', '255.255.255.0')))))
+
+    def test_decode(self):
+        args = ('00:00:00:00:00:01', '00:00:00:00:00:02', 1, 3, 2)
+        msg = self._to_msg(*args)
+        ok_('match' not in msg.__dict__)
+        expected = _flow_mod(*args, priority=1)
+        _serialize(expected)
+        _serialize(msg)
+        eq_(msg.match.to_jsondict(), expected.match.to_jsondict())
+        eq_(msg.to_jsondict(), expected.to_jsondict())
+
+    def test_template_unchanged(self):
+        flow_mod = self.template.flow_mod
+        eq_(flow_mod.xid, None)
+        self._to_msg('00:00:00:00:00:01', '00:00:00:00:00:02', 1, 3, 2)
+        eq_(flow_mod.match['in_port'], 0)
+        eq_(flow_mod.instructions[1].actions[1].port, 0)
+
+    @raises(KeyError)
+    def test_unknown_field(self):
+        self.template.to_msg(_Datapath, match={'vlan_vid': 1})
+
+    @raises(ValueError)
+    def test_masked_field(self):
+        self.template.to_msg(
+            _Datapath, match={'eth_dst': ('00:00:00:00:00:01',
+                                          'ff:ff:ff:00:00:00')})
+
+    @raises(AttributeError)
+    def test_unknown_action_attribute(self):
+        self.template.to_msg(_Datapath, actions={1: {'queue_id': 1}})
+
+    @raises(TypeError)
+    def test_unknown_attribute(self):
+        self.template.to_msg(_Datapath, match_len=1)
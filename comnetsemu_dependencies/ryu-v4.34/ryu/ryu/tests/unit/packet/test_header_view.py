@@ -0,0 +1,177 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import struct
+import unittest
+
+from nose.tools import eq_, raises
+
+from ryu.lib.packet import arp
+from ryu.lib.packet import ether_types
+from ryu.lib.packet import ethernet
+from ryu.lib.packet import header_view
+from ryu.lib.packet import in_proto
+from ryu.lib.packet import ipv4
+from ryu.lib.packet import ipv6
+from ryu.lib.packet import lldp
+from ryu.lib.packet import packet
+from ryu.lib.packet import tcp
+from ryu.lib.packet import udp
+from ryu.lib.packet import vlan
+from ryu.lib.packet.header_view import HeaderView
+
+
+SRC = '08:60:6e:7f:74:e7'
+DST = 'ff:ff:ff:ff:ff:ff'
+
+
+def _serialize(*protocols):
+    pkt = packet.Packet()
+    for p in protocols:
+        pkt.add_protocol(p)
+    pkt.serialize()
+    return bytes(pkt.data)
+
+
+class Test_header_view(unittest.TestCase):
+    """ Test case for header_view
+    """
+
+    def _test_ethernet(self, view, data):
+        eth = packet.Packet(data).get_protocol(ethernet.ethernet)
+        eq_(view.eth_dst, eth.dst)
+        eq_(view.eth_src, eth.src)
+        eq_(view.ethertype, eth.ethertype)
+
+    def test_arp(self):
+        data = _serialize(
+            ethernet.ethernet(DST, SRC, ether_types.ETH_TYPE_ARP),
+            arp.arp_ip(arp.ARP_REQUEST, SRC, '10.0.0.1',
+                       '00:00:00:00:00:00', '10.0.0.2'))
+        view = HeaderView(data)
+        self._test_ethernet(view, data)
+        a = packet.Packet(data).get_protocol(arp.arp)
+        eq_(view.eth_type, ether_types.ETH_TYPE_ARP)
+        eq_(view.arp_op, a.opcode)
+        eq_(view.arp_sha, a.src_mac)
+        eq_(view.arp_spa, a.src_ip)
+        eq_(view.arp_tha, a.dst_mac)
+        eq_(view.arp_tpa, a.dst_ip)
+        eq_(view.ip_proto, None)
+        eq_(view.ipv4_src, None)
+
+    def test_ipv4_tcp(self):
+        data = _serialize(
+            ethernet.ethernet(DST, SRC, ether_types.ETH_TYPE_IP),
+            ipv4.ipv4(proto=in_proto.IPPROTO_TCP, src='10.0.0.1',
+                      dst='10.0.0.2'),
+            tcp.tcp(src_port=40000, dst_port=5001))
+        view = HeaderView(data)
+        self._test_ethernet(view, data)
+        ip = packet.Packet(data).get_protocol(ipv4.ipv4)
+        eq_(view.ip_proto, ip.proto)
+        eq_(view.ipv4_src, ip.src)
+        eq_(view.ipv4_dst, ip.dst)
+        eq_(view.src_port, 40000)
+        eq_(view.dst_port, 5001)
+
+    def test_ipv4_options(self):
+        data = _serialize(
+            ethernet.ethernet(DST, SRC, ether_types.ETH_TYPE_IP),
+            ipv4.ipv4(header_length=6, proto=in_proto.IPPROTO_UDP,
+                      option=b'\x01\x01\x01\x00'),
+            udp.udp(src_port=53, dst_port=1053))
+        view = HeaderView(data)
+        eq_(view.src_port, 53)
+        eq_(view.dst_port, 1053)
+
+    def test_ipv4_fragment(self):
+        data = _serialize(
+            ethernet.ethernet(DST, SRC, ether_types.ETH_TYPE_IP),
+            ipv4.ipv4(proto=in_proto.IPPROTO_UDP, offset=185),
+            udp.udp(src_port=53, dst_port=1053))
+        view = HeaderView(data)
+        eq_(view.ip_proto, in_proto.IPPROTO_UDP)
+        eq_(view.src_port, None)
+
+    def test_ipv6_udp(self):
+        data = _serialize(
+            ethernet.ethernet(DST, SRC, ether_types.ETH_TYPE_IPV6),
+            ipv6.ipv6(nxt=in_proto.IPPROTO_UDP, src='fe80::1',
+                      dst='ff02::1:ff00:2'),
+            udp.udp(src_port=546, dst_port=547))
+        view = HeaderView(data)
+        ip = packet.Packet(data).get_protocol(ipv6.ipv6)
+        eq_(view.ip_proto, in_proto.IPPROTO_UDP)
+        eq_(view.ipv6_src, ip.src)
+        eq_(view.ipv6_dst, ip.dst)
+        eq_(view.src_port, 546)
+        eq_(view.dst_port, 547)
+
+    def test_vlan(self):
+        data = _serialize(
+            ethernet.ethernet(DST, SRC, ether_types.ETH_TYPE_8021Q),
+            vlan.vlan(vid=10, ethertype=ether_types.ETH_TYPE_IP),
+            ipv4.ipv4(proto=in_proto.IPPROTO_TCP, src='10.0.0.1'),
+            tcp.tcp(src_port=1, dst_port=2))
+        view = HeaderView(data)
+        self._test_ethernet(view, data)
+        eq_(view.ethertype, ether_types.ETH_TYPE_8021Q)
+        eq_(view.eth_type, ether_types.ETH_TYPE_IP)
+        eq_(view.vlan_vid, 10)
+        eq_(view.ipv4_src, '10.0.0.1')
+        eq_(view.dst_port, 2)
+
+    def test_lldp(self):
+        tlvs = (lldp.ChassisID(subtype=lldp.ChassisID.SUB_LOCALLY_ASSIGNED,
+                               chassis_id=b'dpid:0000000000000001'),
+                lldp.PortID(subtype=lldp.PortID.SUB_PORT_COMPONENT,
+                            port_id=struct.pack('!I', 1)),
+                lldp.TTL(ttl=120), lldp.End())
+        data = _serialize(
+            ethernet.ethernet(lldp.LLDP_MAC_NEAREST_BRIDGE, SRC,
+                              ether_types.ETH_TYPE_LLDP),
+            lldp.lldp(tlvs))
+        view = HeaderView(data)
+        self._test_ethernet(view, data)
+        eq_(view.eth_type, ether_types.ETH_TYPE_LLDP)
+        eq_(view.ip_proto, None)
+
+    def test_depth(self):
+        data = _serialize(
+            ethernet.ethernet(DST, SRC, ether_types.ETH_TYPE_IP),
+            ipv4.ipv4(proto=in_proto.IPPROTO_TCP, src='10.0.0.1'),
+            tcp.tcp(src_port=1, dst_port=2))
+        view = HeaderView(data, depth=header_view.ETHERNET)
+        eq_(view.eth_src, SRC)
+        eq_(view.eth_type, ether_types.ETH_TYPE_IP)
+        eq_(view.ipv4_src, None)
+        view = HeaderView(data, depth=header_view.NETWORK)
+        eq_(view.ipv4_src, '10.0.0.1')
+        eq_(view.src_port, None)
+
+    def test_truncated(self):
+        data = _serialize(
+            ethernet.ethernet(DST, SRC, ether_types.ETH_TYPE_IP),
+            ipv4.ipv4(proto=in_proto.IPPROTO_TCP, src='10.0.0.1'),
+            tcp.tcp(src_port=1, dst_port=2))
+        view = HeaderView(data[:30])
+        eq_(view.eth_type, ether_types.ETH_TYPE_IP)
+        eq_(view.ip_proto, None)
+        view = HeaderView(data[:35])
+        eq_(view.ipv4_src, '10.0.0.1')
+        eq_(view.src_port, None)
+
+    @raises(struct.error)
+    def test_truncated_ethernet(self):
+        HeaderView(b'\x00' * 13)
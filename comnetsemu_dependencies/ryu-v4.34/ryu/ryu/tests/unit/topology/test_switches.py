@@ -0,0 +1,276 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import struct
+import unittest
+
+from nose.tools import eq_, ok_, raises
+
+from ryu.lib import hub
+from ryu.ofproto import ofproto_protocol
+from ryu.ofproto import ofproto_v1_3 as ofp
+from ryu.ofproto import ofproto_v1_3_parser as parser
+from ryu.topology import api
+from ryu.topology import event
+from ryu.topology import switches
+
+
+class _Datapath(ofproto_protocol.ProtocolDesc):
+    def __init__(self, id):
+        super(_Datapath, self).__init__(ofp.OFP_VERSION)
+        self.id = id
+        self.xid = 0
+        self.congested = False
+        self.sent = []
+
+    def set_xid(self, msg):
+        self.xid += 1
+        msg.set_xid(self.xid)
+
+    def send(self, buf):
+        self.sent.append(buf)
+        return True
+
+
+def _port(dpid, port_no):
+    hw_addr = '00:00:00:00:%02x:%02x' % (dpid, port_no)
+    ofpport = parser.OFPPort(port_no, hw_addr, 'eth%d' % port_no,
+                             0, 0, 0, 0, 0, 0, 0, 0)
+    return switches.Port(dpid, ofp, ofpport)
+
+
+class Test_lldp_scheduling(unittest.TestCase):
+    """ Test case for the LLDP scheduling of switches.Switches
+    """
+
+    def setUp(self):
+        # the LLDP state alone: Switches() fails once the tests of ryu.cmd
+        # have reloaded app_manager
+        self.switches = switches.Switches.__new__(switches.Switches)
+        self.switches.dps = {}
+        self.switches.ports = switches.PortDataState()
+        self.switches.lldp_period = switches.Switches.LLDP_SEND_PERIOD_PER_PORT
+        self.switches.lldp_cost = 0.
+        self.switches._lldp_time = 0.
+        self.switches.LLDP_SEND_GUARD = 0
+        self.dps = {}
+        for dpid in (1, 2):
+            self.dps[dpid] = self.switches.dps[dpid] = _Datapath(dpid)
+        self.ports = [_port(dpid, port_no)
+                      for dpid in (1, 2) for port_no in range(1, 101)]
+        for port in self.ports:
+            self.switches._port_added(port)
+
+    def test_round(self):
+        timeout = self.switches.lldp_round()
+        eq_(timeout, 0)
+        for dpid in (1, 2):
+            eq_(len(self.dps[dpid].sent), 100)
+        dp = self.dps[1]
+        for port in self.ports[:100]:
+            port_data = self.switches.ports[port]
+            ok_(port_data.lldp_dp is dp)
+            ok_(port_data.lldp_msg in dp.sent)
+
+        port = self.ports[0]
+        buf = self.switches.ports[port].lldp_msg
+        out = parser.OFPPacketOut(
+            datapath=dp, buffer_id=ofp.OFP_NO_BUFFER,
+            in_port=ofp.OFPP_CONTROLLER,
+            actions=[parser.OFPActionOutput(port.port_no)],
+            data=self.switches.ports[port].lldp_data)
+        out.set_xid(struct.unpack_from('!I', buf, 4)[0])
+        out.serialize()
+        eq_(bytes(buf), bytes(out.buf))
+
+        timeout = self.switches.lldp_round()
+        ok_(0 < timeout <= self.switches.lldp_period)
+        eq_(len(dp.sent), 100)
+
+    def test_period(self):
+        self.switches.lldp_round()
+        for port in self.ports:
+            self.switches.ports[port].timestamp -= self.switches.lldp_period
+        self.switches.lldp_round()
+        dp = self.dps[1]
+        eq_(len(dp.sent), 200)
+        # the serialized PacketOut is reused
+        ok_(dp.sent[0] is dp.sent[100])
+
+    def test_reconnect(self):
+        self.switches.lldp_round()
+        self.dps[1] = self.switches.dps[1] = _Datapath(1)
+        self.switches.ports.move_front(self.ports[0])
+        self.switches.lldp_round()
+        eq_(len(self.dps[1].sent), 1)
+        ok_(self.switches.ports[self.ports[0]].lldp_dp is self.dps[1])
+
+    def test_new_port_first(self):
+        self.switches.lldp_round()
+        for port in self.ports:
+            self.switches.ports[port].timestamp -= self.switches.lldp_period
+        new = _port(1, 101)
+        self.switches._port_added(new)
+        ports, timeout = self.switches.ports.due(self.switches.lldp_period,
+                                                 switches.time.time())
+        eq_(ports[0], new)
+        eq_(len(ports), 201)
+        eq_(timeout, None)
+
+    def test_turns(self):
+        self.switches._port_added(_port(3, 1))
+        ports = self.ports + [_port(3, 1)]
+        turns = self.switches._lldp_turns(ports)
+        batch = self.switches.LLDP_SEND_BATCH
+        eq_([[(b[0].dpid, len(b)) for b in turn] for turn in turns],
+            [[(1, batch), (2, batch), (3, 1)],
+             [(1, 100 - batch), (2, 100 - batch)]])
+
+    def test_congested(self):
+        self.dps[2].congested = True
+        timeout = self.switches.lldp_round()
+        eq_(timeout, 0)
+        eq_(len(self.dps[1].sent), 100)
+        eq_(len(self.dps[2].sent), 0)
+        timeout = self.switches.lldp_round()
+        eq_(timeout, self.switches.LLDP_SEND_GUARD)
+        self.dps[2].congested = False
+        self.switches.lldp_round()
+        eq_(len(self.dps[2].sent), 100)
+
+    def test_adaptive_period(self):
+        self.switches.lldp_round()
+        eq_(self.switches.lldp_period,
+            self.switches.LLDP_SEND_PERIOD_PER_PORT)
+        # 1ms per LLDP packet: the 200 ports take 0.2s, 5% of 4s
+        self.switches.LLDP_COST_WEIGHT = 1
+        self.switches._lldp_time = .2
+        self.switches._update_lldp_period(200)
+        ok_(abs(self.switches.lldp_period - 4) < 1e-9)
+        self.switches._lldp_time = 2
+        self.switches._update_lldp_period(200)
+        eq_(self.switches.lldp_period, self.switches.TIMEOUT_CHECK_PERIOD)
+
+
+class Test_topology_delta(unittest.TestCase):
+    """ Test case for the EventTopologyDelta of switches.Switches
+    """
+
+    def setUp(self):
+        self.switches = switches.Switches.__new__(switches.Switches)
+        self.switches.links = switches.LinkState()
+        self.switches.topology_version = 0
+        self.switches._delta = {}
+        self.switches._delta_log = collections.deque(
+            maxlen=switches.Switches.TOPOLOGY_DELTA_LOG)
+        self.switches.delta_event = hub.Event()
+        self.events = []
+        self.replies = []
+        self.switches.send_event_to_observers = \
+            lambda ev, state=None: self.events.append(ev)
+        self.switches.reply_to_request = \
+            lambda req, rep: self.replies.append(rep)
+        self.links = [switches.Link(_port(src, dst), _port(dst, src))
+                      for src in range(1, 5) for dst in range(1, 5)
+                      if src != dst]
+
+    def _add(self, link):
+        self.switches._link_added(link)
+        self.switches.links.update_link(link.src, link.dst)
+
+    def _delete(self, link):
+        self.switches.links.link_down(link)
+        self.switches._link_deleted(link)
+
+    def _request(self, version=None):
+        req = event.EventTopologySnapshotRequest(version)
+        req.src = 'observer'
+        self.switches.topology_snapshot_request_handler(req)
+        return self.replies.pop()
+
+    def test_coalesce(self):
+        for link in self.links:
+            self._add(link)
+        ok_(self.switches.delta_event.is_set())
+        eq_(len(self.events), len(self.links))
+        ev = self.switches.send_topology_delta()
+        eq_(ev.version, 1)
+        eq_(set(ev.added), set(self.links))
+        eq_(ev.deleted, [])
+        ok_(self.events[-1] is ev)
+
+        self._delete(self.links[0])
+        self._delete(self.links[1])
+        ev = self.switches.send_topology_delta()
+        eq_(ev.version, 2)
+        eq_(ev.added, [])
+        eq_(set(ev.deleted), set(self.links[:2]))
+
+    def test_net_change(self):
+        self._add(self.links[0])
+        self.switches.send_topology_delta()
+        # flapping within the window
+        self._add(self.links[1])
+        self._delete(self.links[1])
+        self._delete(self.links[0])
+        self._add(self.links[0])
+        eq_(self.switches.send_topology_delta(), None)
+        eq_(self.switches.topology_version, 1)
+
+    def test_snapshot(self):
+        for link in self.links[:4]:
+            self._add(link)
+        self.switches.send_topology_delta()
+        rep = self._request()
+        eq_(rep.version, 1)
+        eq_(rep.deltas, None)
+        snapshot = api.TopologySnapshot(rep.version, rep.links)
+        eq_(snapshot.links, set(self.links[:4]))
+
+        self._delete(self.links[0])
+        self._add(self.links[4])
+        ev = self.switches.send_topology_delta()
+        ok_(snapshot.apply(ev))
+        ok_(not snapshot.apply(ev))
+        eq_(snapshot.links, set(self.links[1:5]))
+
+    def test_snapshot_deltas(self):
+        snapshot = api.TopologySnapshot()
+        for link in self.links:
+            self._add(link)
+            self.switches.send_topology_delta()
+        rep = self._request(snapshot.version)
+        eq_(rep.links, None)
+        eq_(len(rep.deltas), len(self.links))
+        for ev in rep.deltas:
+            snapshot.apply(ev)
+        eq_(snapshot.links, set(self.links))
+        eq_(self._request(snapshot.version).deltas, [])
+
+        # the log no longer has the deltas after version 0
+        log = self.switches.TOPOLOGY_DELTA_LOG
+        for _ in range(log // 2 + 1):
+            self._delete(self.links[0])
+            self.switches.send_topology_delta()
+            self._add(self.links[0])
+            self.switches.send_topology_delta()
+        rep = self._request(0)
+        eq_(rep.deltas, None)
+        eq_(set(rep.links), set(self.links))
+        eq_(len(self._request(rep.version - log).deltas), log)
+
+    @raises(ValueError)
+    def test_snapshot_gap(self):
+        snapshot = api.TopologySnapshot()
+        snapshot.apply(event.EventTopologyDelta(2, [self.links[0]], []))
@@ -35,6 +35,42 @@ def get_all_link(app):
     return get_link(app)
 
 
+class TopologySnapshot(object):
+    # The links of the topology as of a version of the switches app,
+    # kept up to date by applying the EventTopologyDelta which follow.
+    def __init__(self, version=0, links=()):
+        self.version = version
+        self.links = set(links)
+
+    def apply(self, ev):
+        # return if the delta was applied, False if the snapshot has it
+        if ev.version <= self.version:
+            return False
+        if ev.version != self.version + 1:
+            raise ValueError('missing deltas %d..%d, get_topology_snapshot()'
+                             % (self.version + 1, ev.version - 1))
+        self.links.difference_update(ev.deleted)
+        self.links.update(ev.added)
+        self.version = ev.version
+        return True
+
+    def __str__(self):
+        return 'TopologySnapshot<version=%s, links=%s>' % \
+            (self.version, len(self.links))
+
+
+def get_topology_snapshot(app, snapshot=None):
+    # With a snapshot, bring it up to date with the deltas it missed
+    # instead of getting all the links, if the switches app has them.
+    version = snapshot.version if snapshot is not None else None
+    rep = app.send_request(event.EventTopologySnapshotRequest(version))
+    if rep.deltas is None:
+        return TopologySnapshot(rep.version, rep.links)
+    for ev in rep.deltas:
+        snapshot.apply(ev)
+    return snapshot
+
+
 def get_host(app, dpid=None):
     rep = app.send_request(event.EventHostRequest(dpid))
     return rep.hosts
@@ -134,6 +134,49 @@ class EventLinkReply(event.EventReplyBase):
             (self.dst, self.dpid, len(self.links))
 
 
+class EventTopologyDelta(event.EventBase):
+    # The links added and deleted within Switches.TOPOLOGY_DELTA_WINDOW,
+    # net of the ones which came back or went away again meanwhile.
+    # version counts the deltas sent by the switches app.
+    def __init__(self, version, added, deleted):
+        super(EventTopologyDelta, self).__init__()
+        self.version = version
+        self.added = added
+        self.deleted = deleted
+
+    def __str__(self):
+        return 'EventTopologyDelta<version=%s, added=%s, deleted=%s>' % \
+            (self.version, len(self.added), len(self.deleted))
+
+
+class EventTopologySnapshotRequest(event.EventRequestBase):
+    # If version is None, reply all links, else the deltas after it if
+    # the switches app still has them.
+    def __init__(self, version=None):
+        super(EventTopologySnapshotRequest, self).__init__()
+        self.dst = 'switches'
+        self.version = version
+
+    def __str__(self):
+        return 'EventTopologySnapshotRequest<src=%s, version=%s>' % \
+            (self.src, self.version)
+
+
+class EventTopologySnapshotReply(event.EventReplyBase):
+    # Either links or deltas is None
+    def __init__(self, dst, version, links, deltas):
+        super(EventTopologySnapshotReply, self).__init__(dst)
+        self.version = version
+        self.links = links
+        self.deltas = deltas
+
+    def __str__(self):
+        return 'EventTopologySnapshotReply<dst=%s, version=%s, %s>' % \
+            (self.dst, self.version,
+             'deltas=%d' % len(self.deltas) if self.links is None
+             else 'links=%d' % len(self.links))
+
+
 class EventHostRequest(event.EventRequestBase):
     # if dpid is None, replay all hosts
     def __init__(self, dpid=None):
@@ -13,6 +13,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
 import logging
 import six
 import struct
@@ -30,6 +31,7 @@ from ryu.lib.mac import DONTCARE_STR
 from ryu.lib.dpid import dpid_to_str, str_to_dpid
 from ryu.lib.port_no import port_no_to_str
 from ryu.lib.packet import packet, ethernet
+from ryu.lib.packet import header_view
 from ryu.lib.packet import lldp, ether_types
 from ryu.ofproto.ether import ETH_TYPE_LLDP
 from ryu.ofproto.ether import ETH_TYPE_CFM
@@ -247,6 +249,8 @@ class PortData(object):
         super(PortData, self).__init__()
         self.is_down = is_down
         self.lldp_data = lldp_data
+        self.lldp_msg = None    # PacketOut of lldp_data, serialized
+        self.lldp_dp = None     # datapath lldp_msg was serialized for
         self.timestamp = None
         self.sent = 0
 
@@ -263,6 +267,10 @@ class PortData(object):
     def clear_timestamp(self):
         self.timestamp = None
 
+    def set_lldp_msg(self, dp, msg):
+        self.lldp_dp = dp
+        self.lldp_msg = msg
+
     def set_down(self, is_down):
         self.is_down = is_down
 
@@ -371,6 +379,24 @@ class PortDataState(dict):
         for k in self:
             yield (k, self[k])
 
+    def due(self, period, now):
+        """
+        Returns the ports to send a LLDP packet to, new and changed ports
+        first then the ports sent to period seconds ago or earlier, and
+        the seconds until the next one is due (None if none is left).
+        """
+        ports = []
+        root = self._root
+        curr = root[self._NEXT]
+        while curr is not root:
+            key = curr[self._KEY]
+            timestamp = self[key].timestamp
+            if timestamp is not None and timestamp + period > now:
+                return ports, timestamp + period - now
+            ports.append(key)
+            curr = curr[self._NEXT]
+        return ports, None
+
 
 class LinkState(dict):
     # dict: Link class -> timestamp
@@ -461,6 +487,17 @@ class LLDPPacket(object):
 
     @staticmethod
     def lldp_parse(data):
+        # most packet-ins are not LLDP, tell them apart from the
+        # ethertype before parsing
+        try:
+            ethertype = header_view.HeaderView(
+                data, depth=header_view.ETHERNET).ethertype
+        except struct.error:
+            raise LLDPPacket.LLDPUnknownFormat(msg='truncated frame')
+        if ethertype != ETH_TYPE_LLDP:
+            raise LLDPPacket.LLDPUnknownFormat(
+                msg='unknown ethertype 0x%04x' % ethertype)
+
         pkt = packet.Packet(data)
         i = iter(pkt)
         eth_pkt = six.next(i)
@@ -501,6 +538,7 @@ class Switches(app_manager.RyuApp):
                event.EventPortAdd, event.EventPortDelete,
                event.EventPortModify,
                event.EventLinkAdd, event.EventLinkDelete,
+               event.EventTopologyDelta,
                event.EventHostAdd]
 
     DEFAULT_TTL = 120  # unused. ignored.
@@ -512,6 +550,23 @@ class Switches(app_manager.RyuApp):
     LINK_TIMEOUT = TIMEOUT_CHECK_PERIOD * 2
     LINK_LLDP_DROP = 5
 
+    # LLDP packets are sent in turns of a batch of up to LLDP_SEND_BATCH
+    # packets per datapath, LLDP_SEND_GUARD apart.  Each port gets one
+    # every LLDP_SEND_PERIOD_PER_PORT seconds or, with so many ports that
+    # sending their LLDP packets and handling the packet-ins they cause
+    # would take more than LLDP_CPU_BUDGET of the time, less often, up to
+    # every TIMEOUT_CHECK_PERIOD seconds.
+    LLDP_SEND_BATCH = 64
+    LLDP_CPU_BUDGET = .05
+    LLDP_COST_WEIGHT = .2   # weight of the last round in the LLDP cost
+
+    # Besides an EventLinkAdd/Delete per link, the links added and deleted
+    # within TOPOLOGY_DELTA_WINDOW seconds are sent in one
+    # EventTopologyDelta.  The last TOPOLOGY_DELTA_LOG deltas are kept for
+    # the observers catching up with EventTopologySnapshotRequest.
+    TOPOLOGY_DELTA_WINDOW = .1
+    TOPOLOGY_DELTA_LOG = 64
+
     def __init__(self, *args, **kwargs):
         super(Switches, self).__init__(*args, **kwargs)
 
@@ -523,20 +578,31 @@ class Switches(app_manager.RyuApp):
         self.hosts = HostState()      # mac address -> Host class list
         self.is_active = True
 
+        self.lldp_period = self.LLDP_SEND_PERIOD_PER_PORT
+        self.lldp_cost = 0.     # seconds spent per LLDP packet
+        self._lldp_time = 0.    # seconds spent on LLDP in this round
+
+        self.topology_version = 0
+        self._delta = {}        # Link class -> if it was up before the delta
+        self._delta_log = collections.deque(maxlen=self.TOPOLOGY_DELTA_LOG)
+
         self.link_discovery = self.CONF.observe_links
         if self.link_discovery:
             self.install_flow = self.CONF.install_lldp_flow
             self.explicit_drop = self.CONF.explicit_drop
             self.lldp_event = hub.Event()
             self.link_event = hub.Event()
+            self.delta_event = hub.Event()
             self.threads.append(hub.spawn(self.lldp_loop))
             self.threads.append(hub.spawn(self.link_loop))
+            self.threads.append(hub.spawn(self.delta_loop))
 
     def close(self):
         self.is_active = False
         if self.link_discovery:
             self.lldp_event.set()
             self.link_event.set()
+            self.delta_event.set()
             hub.joinall(self.threads)
 
     def _register(self, dp):
@@ -583,12 +649,25 @@ class Switches(app_manager.RyuApp):
             #           port, self.links.get_peer(port))
             return
         link = Link(port, dst)
-        self.send_event_to_observers(event.EventLinkDelete(link))
+        self._link_deleted(link)
         if rev_link_dst:
             rev_link = Link(dst, rev_link_dst)
-            self.send_event_to_observers(event.EventLinkDelete(rev_link))
+            self._link_deleted(rev_link)
         self.ports.move_front(dst)
 
+    def _link_added(self, link):
+        self._link_changed(link, False)
+        self.send_event_to_observers(event.EventLinkAdd(link))
+
+    def _link_deleted(self, link):
+        self._link_changed(link, True)
+        self.send_event_to_observers(event.EventLinkDelete(link))
+
+    def _link_changed(self, link, was_up):
+        if not self._delta:
+            self.delta_event.set()
+        self._delta.setdefault(link, was_up)
+
     def _is_edge_port(self, port):
         for link in self.links:
             if port == link.src or port == link.dst:
@@ -771,13 +850,19 @@ class Switches(app_manager.RyuApp):
             return
 
         msg = ev.msg
+        start = time.time()
         try:
             src_dpid, src_port_no = LLDPPacket.lldp_parse(msg.data)
         except LLDPPacket.LLDPUnknownFormat:
             # This handler can receive all the packets which can be
             # not-LLDP packet. Ignore it silently
             return
+        try:
+            self._lldp_packet_in(msg, src_dpid, src_port_no)
+        finally:
+            self._lldp_time += time.time() - start
 
+    def _lldp_packet_in(self, msg, src_dpid, src_port_no):
         dst_dpid = msg.datapath.id
         if msg.datapath.ofproto.OFP_VERSION == ofproto_v1_0.OFP_VERSION:
             dst_port_no = msg.in_port
@@ -811,11 +896,11 @@ class Switches(app_manager.RyuApp):
         if old_peer and old_peer != dst:
             old_link = Link(src, old_peer)
             del self.links[old_link]
-            self.send_event_to_observers(event.EventLinkDelete(old_link))
+            self._link_deleted(old_link)
 
         link = Link(src, dst)
         if link not in self.links:
-            self.send_event_to_observers(event.EventLinkAdd(link))
+            self._link_added(link)
 
             # remove hosts if it's not attached to edge port
             host_to_del = []
@@ -837,7 +922,7 @@ class Switches(app_manager.RyuApp):
     @set_ev_cls(ofp_event.EventOFPPacketIn, MAIN_DISPATCHER)
     def host_discovery_packet_in_handler(self, ev):
         msg = ev.msg
-        eth, pkt_type, pkt_data = ethernet.ethernet.parser(msg.data)
+        eth = header_view.HeaderView(msg.data, depth=header_view.NETWORK)
 
         # ignore lldp and cfm packets
         if eth.ethertype in (ETH_TYPE_LLDP, ETH_TYPE_CFM):
@@ -861,7 +946,7 @@ class Switches(app_manager.RyuApp):
         if not self._is_edge_port(port):
             return
 
-        host_mac = eth.src
+        host_mac = eth.eth_src
         host = Host(host_mac, port)
 
         if host_mac not in self.hosts:
@@ -876,19 +961,16 @@ class Switches(app_manager.RyuApp):
 
         # arp packet, update ip address
         if eth.ethertype == ether_types.ETH_TYPE_ARP:
-            arp_pkt, _, _ = pkt_type.parser(pkt_data)
-            self.hosts.update_ip(host, ip_v4=arp_pkt.src_ip)
+            self.hosts.update_ip(host, ip_v4=eth.arp_spa)
 
         # ipv4 packet, update ipv4 address
         elif eth.ethertype == ether_types.ETH_TYPE_IP:
-            ipv4_pkt, _, _ = pkt_type.parser(pkt_data)
-            self.hosts.update_ip(host, ip_v4=ipv4_pkt.src)
+            self.hosts.update_ip(host, ip_v4=eth.ipv4_src)
 
         # ipv6 packet, update ipv6 address
         elif eth.ethertype == ether_types.ETH_TYPE_IPV6:
             # TODO: need to handle NDP
-            ipv6_pkt, _, _ = pkt_type.parser(pkt_data)
-            self.hosts.update_ip(host, ip_v6=ipv6_pkt.src)
+            self.hosts.update_ip(host, ip_v6=eth.ipv6_src)
 
     def send_lldp_packet(self, port):
         try:
@@ -906,50 +988,81 @@ class Switches(app_manager.RyuApp):
             return
 
         # LOG.debug('lldp sent dpid=%s, port_no=%d', dp.id, port.port_no)
-        # TODO:XXX
-        if dp.ofproto.OFP_VERSION == ofproto_v1_0.OFP_VERSION:
-            actions = [dp.ofproto_parser.OFPActionOutput(port.port_no)]
-            dp.send_packet_out(actions=actions, data=port_data.lldp_data)
-        elif dp.ofproto.OFP_VERSION >= ofproto_v1_2.OFP_VERSION:
+        if port_data.lldp_dp is not dp:
+            # the PacketOut is serialized once per port and datapath
+            # connection, then sent as is
+            # TODO:XXX
+            if dp.ofproto.OFP_VERSION == ofproto_v1_0.OFP_VERSION:
+                in_port = dp.ofproto.OFPP_NONE
+            elif dp.ofproto.OFP_VERSION >= ofproto_v1_2.OFP_VERSION:
+                in_port = dp.ofproto.OFPP_CONTROLLER
+            else:
+                LOG.error('cannot send lldp packet. unsupported version. %x',
+                          dp.ofproto.OFP_VERSION)
+                return
             actions = [dp.ofproto_parser.OFPActionOutput(port.port_no)]
             out = dp.ofproto_parser.OFPPacketOut(
-                datapath=dp, in_port=dp.ofproto.OFPP_CONTROLLER,
-                buffer_id=dp.ofproto.OFP_NO_BUFFER, actions=actions,
-                data=port_data.lldp_data)
-            dp.send_msg(out)
-        else:
-            LOG.error('cannot send lldp packet. unsupported version. %x',
-                      dp.ofproto.OFP_VERSION)
+                datapath=dp, buffer_id=0xffffffff, in_port=in_port,
+                actions=actions, data=port_data.lldp_data)
+            dp.set_xid(out)
+            out.serialize()
+            port_data.set_lldp_msg(dp, out.buf)
+        dp.send(port_data.lldp_msg)
+
+    def _lldp_turns(self, ports):
+        # batches of the ports of each datapath, in turns of one batch per
+        # datapath; the ports of a congested datapath are left for later
+        dp_ports = {}
+        for port in ports:
+            dp_ports.setdefault(port.dpid, []).append(port)
+        dp_batches = []
+        for dpid, ports_ in dp_ports.items():
+            dp = self.dps.get(dpid, None)
+            if getattr(dp, 'congested', False):
+                continue
+            dp_batches.append([ports_[i:i + self.LLDP_SEND_BATCH]
+                               for i in range(0, len(ports_),
+                                              self.LLDP_SEND_BATCH)])
+        return [[batch for batch in turn if batch is not None]
+                for turn in six.moves.zip_longest(*dp_batches)]
+
+    def _update_lldp_period(self, sent):
+        cost = self._lldp_time / sent
+        self._lldp_time = 0.
+        self.lldp_cost += (cost - self.lldp_cost) * self.LLDP_COST_WEIGHT
+        period = len(self.ports) * self.lldp_cost / self.LLDP_CPU_BUDGET
+        self.lldp_period = min(max(period, self.LLDP_SEND_PERIOD_PER_PORT),
+                               self.TIMEOUT_CHECK_PERIOD)
+
+    def lldp_round(self):
+        """
+        Sends the LLDP packets which are due, returns the seconds to wait
+        for the next ones (None if there is no port).
+        """
+        ports, timeout = self.ports.due(self.lldp_period, time.time())
+        sent = 0
+        for turn in self._lldp_turns(ports):
+            if sent:
+                hub.sleep(self.LLDP_SEND_GUARD)      # don't burst
+            start = time.time()
+            for batch in turn:
+                for port in batch:
+                    self.send_lldp_packet(port)
+                sent += len(batch)
+            self._lldp_time += time.time() - start
+
+        if sent:
+            self._update_lldp_period(sent)
+            timeout = 0     # the next ones may be due by now
+        elif ports:
+            # the datapaths of the due ports are congested
+            timeout = self.LLDP_SEND_GUARD
+        return timeout
 
     def lldp_loop(self):
         while self.is_active:
             self.lldp_event.clear()
-
-            now = time.time()
-            timeout = None
-            ports_now = []
-            ports = []
-            for (key, data) in self.ports.items():
-                if data.timestamp is None:
-                    ports_now.append(key)
-                    continue
-
-                expire = data.timestamp + self.LLDP_SEND_PERIOD_PER_PORT
-                if expire <= now:
-                    ports.append(key)
-                    continue
-
-                timeout = expire - now
-                break
-
-            for port in ports_now:
-                self.send_lldp_packet(port)
-            for port in ports:
-                self.send_lldp_packet(port)
-                hub.sleep(self.LLDP_SEND_GUARD)      # don't burst
-
-            if timeout is not None and ports:
-                timeout = 0     # We have already slept
+            timeout = self.lldp_round()
             # LOG.debug('lldp sleep %s', timeout)
             self.lldp_event.wait(timeout=timeout)
 
@@ -972,7 +1085,7 @@ class Switches(app_manager.RyuApp):
             for link in deleted:
                 self.links.link_down(link)
                 # LOG.debug('delete %s', link)
-                self.send_event_to_observers(event.EventLinkDelete(link))
+                self._link_deleted(link)
 
                 dst = link.dst
                 rev_link = Link(dst, link.src)
@@ -987,6 +1100,31 @@ class Switches(app_manager.RyuApp):
 
             self.link_event.wait(timeout=self.TIMEOUT_CHECK_PERIOD)
 
+    def send_topology_delta(self):
+        delta, self._delta = self._delta, {}
+        # the links which are back as they were don't change anything
+        added = [link for (link, was_up) in delta.items()
+                 if not was_up and link in self.links]
+        deleted = [link for (link, was_up) in delta.items()
+                   if was_up and link not in self.links]
+        if not added and not deleted:
+            return None
+
+        self.topology_version += 1
+        ev = event.EventTopologyDelta(self.topology_version, added, deleted)
+        self._delta_log.append(ev)
+        self.send_event_to_observers(ev)
+        return ev
+
+    def delta_loop(self):
+        while self.is_active:
+            self.delta_event.wait()
+            # gather the changes of the window, e.g. the links found by
+            # an LLDP round, before sending them
+            hub.sleep(self.TOPOLOGY_DELTA_WINDOW)
+            self.delta_event.clear()
+            self.send_topology_delta()
+
     @set_ev_cls(event.EventSwitchRequest)
     def switch_request_handler(self, req):
         # LOG.debug(req)
@@ -1015,6 +1153,24 @@ class Switches(app_manager.RyuApp):
         rep = event.EventLinkReply(req.src, dpid, links)
         self.reply_to_request(req, rep)
 
+    @set_ev_cls(event.EventTopologySnapshotRequest)
+    def topology_snapshot_request_handler(self, req):
+        # LOG.debug(req)
+        version = req.version
+
+        links = None
+        deltas = None
+        if (version is not None and version <= self.topology_version and
+                (version == self.topology_version or
+                 (self._delta_log and
+                  self._delta_log[0].version <= version + 1))):
+            deltas = [ev for ev in self._delta_log if ev.version > version]
+        else:
+            links = list(self.links)
+        rep = event.EventTopologySnapshotReply(
+            req.src, self.topology_version, links, deltas)
+        self.reply_to_request(req, rep)
+
     @set_ev_cls(event.EventHostRequest)
     def host_request_handler(self, req):
         dpid = req.dpid
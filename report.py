@@ -0,0 +1,7 @@
+from cli.report import main
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -21,4 +21,4 @@ fi
 # Avvia il controller Ryu dalla directory corretta
 cd $CONTROLLER_DIR
 
-ryu-manager --ofp-tcp-listen-port 6653 --observe-links $CONTROLLER_FILE
+ryu-manager --ofp-tcp-listen-port 6653 --observe-links --ofp-lazy-decoding $CONTROLLER_FILE
@@ -1,7 +1,16 @@
-from cli.cli import run_cli
+from cli.cli import run_cli, run_scripted
+import argparse
 import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="NGN tester")
+    parser.add_argument("--script", help="Run the commands of this file ('-' for stdin) non-interactively")
+    parser.add_argument("--json", action="store_true", help="Print the script results as JSON")
+    parser.add_argument("--jobs", type=int, default=8, help="Maximum number of commands running concurrently")
+    args = parser.parse_args()
+
+    if args.script:
+        sys.exit(run_scripted(args.script, as_json=args.json, jobs=args.jobs))
     run_cli()
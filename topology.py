@@ -6,11 +6,16 @@ from mininet.cli import CLI
 from mininet.log import setLogLevel
 from mininet.link import TCLink
 import os
+import time
 import yaml
 import json
 import asyncio
 import websockets
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+# Threads reading the output of the commands executed through the WebSocket server
+exec_pool = ThreadPoolExecutor(max_workers=64)
 
 
 class DynamicTopo(Topo):
@@ -46,15 +51,16 @@ class DynamicTopo(Topo):
             node2 = link["node2"]
             self.addLink(self.getNode(node1), self.getNode(node2))
 
-        # Add links between switches with optional bandwidth
+        # Add links between switches with optional bandwidth and delay (e.g. "5ms")
         for link in topology_data.get("links", {}).get("switches", []):
             node1 = link["node1"]
             node2 = link["node2"]
-            bw = link.get("bw")  # Bandwidth (optional)
-            if bw:
-                self.addLink(self.getNode(node1), self.getNode(node2), bw=bw)
-            else:
-                self.addLink(self.getNode(node1), self.getNode(node2))
+            params = {}
+            if link.get("bw"):
+                params["bw"] = link["bw"]
+            if link.get("delay"):
+                params["delay"] = link["delay"]
+            self.addLink(self.getNode(node1), self.getNode(node2), **params)
 
     def getNode(self, name):
         """Returns the reference of a host or switch given its name."""
@@ -87,9 +93,21 @@ def save_host_info(net: Mininet):
 
     print("Host info (MAC and port) saved to /tmp/host_info.json")
 
+def delay_ms(delay):
+    """
+    Converts a TCLink delay ("5ms", "100us", "1s", 5) into milliseconds.
+    """
+    if not delay:
+        return 0
+    delay = str(delay).strip()
+    for unit, scale in (("us", 1e-3), ("ms", 1), ("s", 1e3)):
+        if delay.endswith(unit):
+            return float(delay[:-len(unit)]) * scale
+    return float(delay)
+
 def save_switch_links_info(net: Mininet):
     """
-    Collects and saves the bandwidth information for switch-to-switch links in a JSON file.
+    Collects and saves the bandwidth and delay information for switch-to-switch links in a JSON file.
     """
     switch_links = {}
 
@@ -104,13 +122,14 @@ def save_switch_links_info(net: Mininet):
             link_pair = tuple(sorted([switch1, switch2]))
             link_pair_reversed = tuple(reversed(link_pair))
 
+            delay = delay_ms(link.intf1.params.get('delay') or link.intf2.params.get('delay'))
             if link_pair not in switch_links:
                 bw = link.intf1.params.get('bw') or link.intf2.params.get('bw') or "N/A"
-                switch_links["-".join(link_pair)] = {"bandwidth": bw}
+                switch_links["-".join(link_pair)] = {"bandwidth": bw, "delay": delay}
                 
             if link_pair_reversed not in switch_links:
                 bw = link.intf1.params.get('bw') or link.intf2.params.get('bw') or "N/A"
-                switch_links["-".join(link_pair_reversed)] = {"bandwidth": bw}
+                switch_links["-".join(link_pair_reversed)] = {"bandwidth": bw, "delay": delay}
 
     # Save to a JSON file
     with open("/tmp/switch_links_info.json", "w") as f:
@@ -172,7 +191,9 @@ def start_ws_server():
 async def mininet_ws_handler(websocket):
     """
     WebSocket handler to execute shell commands on Mininet hosts using non-blocking popen.
-    Sends output incrementally to the client.
+    Sends output incrementally to the client, then "done" with the exit status of the command
+    (None for commands launched without waiting).
+    The "link" command brings a link between two nodes down or up, and answers with the time it did.
     """
     while True:
         try:
@@ -196,25 +217,51 @@ async def mininet_ws_handler(websocket):
                     host.popen(cmd, shell=True)
                     await websocket.send(json.dumps({
                         "status": "done",
-                        "output": f"[{timestamp}] {host_name}$ {cmd} (launched without waiting)"
+                        "output": f"[{timestamp}] {host_name}$ {cmd} (launched without waiting)",
+                        "returncode": None
                     }))
                     return
                 
                 process = host.popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, shell=True, universal_newlines=True)
 
-                # Legge l'output riga per riga e lo manda in streaming al client
-                for line in iter(process.stdout.readline, ''):
-                    if line:
+                # Legge l'output riga per riga e lo manda in streaming al client.
+                # The blocking reads run in a thread so that commands of other clients keep running concurrently
+                loop = asyncio.get_event_loop()
+                while True:
+                    line = await loop.run_in_executor(exec_pool, process.stdout.readline)
+                    if not line:
+                        break
+                    if line.strip():
                         await websocket.send(json.dumps({
                             "status": "stream",
                             "output": line.strip()
                         }))
                 process.stdout.close()
-                process.wait()
+                returncode = await loop.run_in_executor(exec_pool, process.wait)
+
+                await websocket.send(json.dumps({
+                    "status": "done",
+                    "output": f"[{timestamp}] {host_name}$ {cmd}",
+                    "returncode": returncode
+                }))
+
+            elif request.get("command") == "link":
+                node1, node2 = request.get("node1"), request.get("node2")
+                status = request.get("status")
+                if not net or node1 not in net or node2 not in net or status not in ("up", "down"):
+                    await websocket.send(json.dumps({"status": "error", "reason": "Invalid link"}))
+                    continue
+                if not net.linksBetween(net.get(node1), net.get(node2)):
+                    await websocket.send(json.dumps({"status": "error", "reason": "Link not found"}))
+                    continue
 
+                net.configLinkStatus(node1, node2, status)
+                changed_at = time.time()
+                print(f"[{datetime.now().isoformat(timespec='seconds')}] Link {node1}-{node2} {status}")
                 await websocket.send(json.dumps({
                     "status": "done",
-                    "output": f"[{timestamp}] {host_name}$ {cmd}"
+                    "output": f"link {node1} {node2} {status}",
+                    "time": changed_at
                 }))
 
             else: